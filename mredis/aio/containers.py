@@ -0,0 +1,1063 @@
+# -*- coding: UTF-8 -*-
+import uuid
+from collections.abc import Iterable
+
+from redis.exceptions import ResponseError
+
+from mredis.exception import TypeException, EmptyException, IndexErrorException
+from mredis.lua import registry
+from mredis.serializer import default_serializer
+
+
+class AsyncSortable(object):
+    """
+    sortable for redis
+    """
+    def __init__(self, database=None, cache_key=None):
+        self.database = database
+        self.cache_key = cache_key
+
+    async def sort(self, by_pattern=None, start=None, num=None, get_pattern=None, is_desc=False,
+                   is_alpha=False, store=None):
+        return await self.database.sort(
+            self.cache_key, by=by_pattern, start=start, num=num, get=get_pattern,
+            desc=is_desc, alpha=is_alpha, store=store,
+        )
+
+
+class AsyncContainer(object):
+    """
+    基础空间
+    """
+    def __init__(self, database, cache_key):
+        self.database = database
+        self.cache_key = cache_key
+
+    async def _run_script(self, name, keys=(), args=()):
+        """
+        执行注册表中的lua脚本
+        :param name: 脚本名，scripts目录中不包括.lua的文件名
+        :param keys:
+        :param args:
+        :return:
+        """
+        return await registry[name].call_async(self.database, keys, args)
+
+    async def delete(self):
+        """
+        删除key
+        :return:
+        """
+        await self.database.delete(self.cache_key)
+
+    async def expire(self, seconds=None, timestamp=None):
+        """
+        设置过期时间，如果什么都没有设置的话，则默认为永久保存
+        :param seconds:
+        :param timestamp:
+        :return:
+        """
+        if seconds:
+            await self.database.expire(self.cache_key, seconds)
+        elif timestamp:
+            await self.database.expireat(self.cache_key, timestamp)
+        else:
+            await self.database.persist(self.cache_key)
+
+    async def rename(self, new_key, check=True):
+        """
+        对key进行重命名
+        :param new_key:
+        :param check:
+        :return:
+        """
+        if check:
+            await self.database.renamenx(self.cache_key, new_key)
+        else:
+            await self.database.rename(self.cache_key, new_key)
+
+    async def left_seconds(self):
+        """
+        剩余的时间
+        :return:
+        """
+        return await self.database.ttl(self.cache_key)
+
+    def _serializer(self, serializer=None):
+        return serializer or getattr(self.database, 'serializer', None) or default_serializer
+
+    async def set_pickle(self, data, expire_time=None, serializer=None):
+        """
+        设置序列化
+        :param data:
+        :param expire_time:
+        :param serializer:
+        :return:
+        """
+        return await self.database.set(self.cache_key, self._serializer(serializer).dumps(data), expire_time)
+
+    async def get_pickle(self, default="", serializer=None):
+        """
+        获取序列化的值
+        :param default: key不存在时返回的值
+        :param serializer:
+        :return:
+        """
+        res = await self.database.execute_command('GET', self.cache_key, NEVER_DECODE=True)
+        if not res:
+            return default
+
+        try:
+            return self._serializer(serializer).loads(res)
+        except TypeError:
+            return default
+
+
+class AsyncHash(AsyncContainer):
+    """
+    哈希
+    """
+    async def clear(self):
+        """
+        清除所有的键值对，并且把自己给删除
+        """
+        await self.delete()
+
+    async def get(self, key, default=None):
+        """
+        获取值
+        :param key:
+        :param default:
+        :return:
+        """
+        value = await self.database.hget(self.cache_key, key)
+        return default if value is None else value
+
+    async def incr(self, key, amount=1):
+        """
+        增加指定值
+        :param key:
+        :param amount:
+        :return:
+        """
+        if not isinstance(amount, int):
+            raise TypeException(u'类型错误')
+        return await self.database.hincrby(self.cache_key, key, amount)
+
+    async def desc(self, key, amount=1):
+        """
+        减去指定值
+        :param key:
+        :param amount:
+        :return:
+        """
+        if not isinstance(amount, int):
+            raise TypeException(u'类型错误')
+        return await self.database.hincrby(self.cache_key, key, -amount)
+
+    async def incr_float(self, key, amount=1.0):
+        """
+        增加指定值
+        :param key:
+        :param amount:
+        :return:
+        """
+        if not isinstance(amount, float):
+            raise TypeException(u'类型错误')
+        return await self.database.hincrbyfloat(self.cache_key, key, amount)
+
+    async def desc_float(self, key, amount=1.0):
+        """
+        减去指定值
+        :param key:
+        :param amount:
+        :return:
+        """
+        if not isinstance(amount, float):
+            raise TypeException(u'类型错误')
+        return await self.database.hincrbyfloat(self.cache_key, key, -amount)
+
+    async def has_key(self, key):
+        """
+        键是否存在
+        :param key:
+        :return:
+        """
+        return await self.database.hexists(self.cache_key, key)
+
+    contains = has_key
+
+    async def data(self):
+        """
+        获取字典内容
+        :return:
+        """
+        return await self.database.hgetall(self.cache_key)
+
+    async def items(self):
+        """
+        获取所有键值对
+        :return:
+        """
+        return (await self.data()).items()
+
+    def _scan(self, pattern=None, count=None):
+        """
+        分片读取，避免一次获取大量的数据导致内存被挤爆
+        :param pattern:
+        :param count:
+        :return:
+        """
+        return self.database.hscan_iter(self.cache_key, pattern, count)
+
+    def __aiter__(self):
+        """
+        异步迭代器
+        :return:
+        """
+        return self._scan().__aiter__()
+
+    def iteritems(self):
+        """
+        获取所有的键值对
+        """
+        return self._scan()
+
+    def search(self, pattern, count=None):
+        """
+        搜索
+        :param pattern:
+        :param count:
+        :return:
+        """
+        return self._scan(pattern=pattern, count=count)
+
+    async def keys(self):
+        """
+        获取所有的key
+        :return:
+        """
+        return await self.database.hkeys(self.cache_key)
+
+    async def values(self):
+        """
+        获取所有的值
+        """
+        return await self.database.hvals(self.cache_key)
+
+    async def pop(self, key, default=None):
+        """
+        弹出指定的key
+        :param key:
+        :param default:
+        :return:
+        """
+        value = await self._run_script('hash_pop', [self.cache_key], [key])
+        if value is None:
+            if default is not None:
+                return default
+            raise TypeException(u'not found the key')
+        return value
+
+    async def popitem(self):
+        """
+        弹出任意的键值对
+        :return:
+        """
+        result = await self._run_script('hash_popitem', [self.cache_key])
+        if not result:
+            raise TypeException(u'empty hash')
+        return result[0], result[1]
+
+    async def remove(self, *keys):
+        """
+        删除键
+        :param keys:
+        :return:
+        """
+        return await self.database.hdel(self.cache_key, *keys)
+
+    async def set(self, key, value):
+        """
+        设置键值对
+        """
+        return await self.database.hset(self.cache_key, key, value)
+
+    async def setdefault(self, key, default=None):
+        """
+        键不存在时设置为默认值
+        :param key:
+        :param default:
+        :return: 键已经存在时返回原来的值，否则返回default
+        """
+        result = await self._run_script('hash_setdefault', [self.cache_key], [key, default])
+        return default if result[0] else result[1]
+
+    async def update(self, other):
+        """
+        更新键值对
+        :param other:
+        :return:
+        """
+        if not other:
+            return
+        if isinstance(other, AsyncHash):
+            other = await other.data()
+        elif not isinstance(other, dict):
+            raise TypeException(u'类型错误')
+        await self.database.hset(self.cache_key, mapping=other)
+
+    async def len(self):
+        """
+        获取长度
+        :return:
+        """
+        return await self.database.hlen(self.cache_key)
+
+
+class AsyncSet(AsyncSortable, AsyncContainer):
+    """
+    集合
+    """
+    async def add(self, val):
+        """
+        添加值
+        :param val:
+        :return:
+        """
+        return await self.database.sadd(self.cache_key, val)
+
+    async def clear(self):
+        """
+        清除所有的键值对，并且把自己给删除
+        """
+        await self.delete()
+
+    async def data(self):
+        """
+        获取集合内容
+        """
+        return set(await self.database.smembers(self.cache_key))
+
+    async def discard(self, val):
+        """
+        删除值
+        :param val:
+        :return:
+        """
+        return await self.database.srem(self.cache_key, val)
+
+    def _scan(self, pattern=None, count=None):
+        """
+        分片读取，避免一次获取大量的数据导致内存被挤爆
+        :param pattern:
+        :param count:
+        :return:
+        """
+        return self.database.sscan_iter(self.cache_key, pattern, count)
+
+    def __aiter__(self):
+        """
+        异步迭代器
+        """
+        return self._scan().__aiter__()
+
+    async def pop(self, count=1):
+        """
+        随机弹出值
+        :param count:
+        :return:
+        """
+        return await self.database.spop(self.cache_key, count)
+
+    async def remove(self, *args):
+        """
+        删除元素
+        :param args:
+        :return:
+        """
+        return await self.database.srem(self.cache_key, *args)
+
+    def _keys(self, args):
+        keys = [self.cache_key]
+        for obj in args:
+            if isinstance(obj, AsyncSet):
+                keys.append(obj.cache_key)
+            else:
+                raise TypeException(u'类型错误')
+        return keys
+
+    async def union(self, *args):
+        """
+        取并集
+        :param args:
+        :return:
+        """
+        return await self.database.sunion(*self._keys(args))
+
+    async def union_store(self, dest_key, *args):
+        """
+        将并集的结果存储到新的key中
+        :param dest_key:
+        :param args:
+        :return:
+        """
+        return await self.database.sunionstore(dest_key, *self._keys(args))
+
+    async def intersection(self, *args):
+        """
+        取交集
+        :param args: set对象
+        :return:
+        """
+        return await self.database.sinter(*self._keys(args))
+
+    async def intersection_store(self, dest_key, *args):
+        """
+        将交集的结果存储到新的key中
+        :param dest_key:
+        :param args:
+        :return:
+        """
+        return await self.database.sinterstore(dest_key, *self._keys(args))
+
+    async def difference(self, *args):
+        """
+        取差集，取集合中第一个key存在而其他key不存在的
+        :param args:
+        :return:
+        """
+        return await self.database.sdiff(*self._keys(args))
+
+    async def difference_store(self, dest_key, *args):
+        """
+        将差集的结果存储到新的key中
+        :param dest_key:
+        :param args:
+        :return:
+        """
+        return await self.database.sdiffstore(dest_key, *self._keys(args))
+
+    async def update(self, other):
+        """
+        并集
+        :param other:
+        :return:
+        """
+        if isinstance(other, AsyncSet):
+            return await self.union_store(self.cache_key, other)
+        elif isinstance(other, Iterable):
+            return await self.database.sadd(self.cache_key, *other)
+        else:
+            raise TypeException(u'类型错误')
+
+    async def rand(self, count=None):
+        """
+        返回指定个数的值
+        :param count:
+        :return: list
+        """
+        return await self.database.srandmember(self.cache_key, count)
+
+    async def contains(self, item):
+        """
+        判断元素是否存在
+        :param item:
+        :return:
+        """
+        return bool(await self.database.sismember(self.cache_key, item))
+
+    async def len(self):
+        """
+        获取长度
+        """
+        return await self.database.scard(self.cache_key)
+
+
+class AsyncSortedSet(AsyncSortable, AsyncContainer):
+    """
+    有序集合
+    """
+    async def data(self, is_with_score=True):
+        """
+        返回有序集合的结果
+        :param is_with_score:
+        :return:
+        """
+        return await self.range(0, -1, False, is_with_score)
+
+    def _scan(self, pattern=None, count=None):
+        """
+        分片读取，避免一次获取大量的数据导致内存被挤爆
+        :param pattern:
+        :param count:
+        :return:
+        """
+        return self.database.zscan_iter(self.cache_key, pattern, count)
+
+    def __aiter__(self):
+        """
+        异步迭代器
+        """
+        return self._scan().__aiter__()
+
+    async def append(self, mapping=None, **kwargs):
+        """
+        添加成员分值，成员到有序集合中
+        :param mapping:
+        :param kwargs:
+        :return:
+        """
+        if not mapping and not kwargs:
+            raise TypeException(u'类型错误')
+        if not kwargs:
+            _mapping = mapping
+        else:
+            _mapping = mapping.copy() if mapping else {}
+            _mapping.update(kwargs)
+        return await self.database.zadd(self.cache_key, _mapping)
+
+    async def incr(self, member, amount=1):
+        """
+        增加指定值
+        :param member:
+        :param amount:
+        :return:
+        """
+        if not isinstance(amount, int):
+            raise TypeException(u'类型错误')
+        return await self.database.zincrby(self.cache_key, amount, member)
+
+    async def desc(self, member, amount=1):
+        """
+        减去指定值
+        :param member:
+        :param amount:
+        :return:
+        """
+        if not isinstance(amount, int):
+            raise TypeException(u'类型错误')
+        return await self.database.zincrby(self.cache_key, -amount, member)
+
+    def _keys(self, args):
+        keys = [self.cache_key]
+        for obj in args:
+            if isinstance(obj, (AsyncSet, AsyncSortedSet)):
+                keys.append(obj.cache_key)
+            else:
+                raise TypeException(u'类型错误')
+        return keys
+
+    async def intersection_store(self, dest_key, *args):
+        """
+        将交集的结果存储到新的key中
+        :param dest_key:
+        :param args:
+        :return:
+        """
+        return await self.database.zinterstore(dest_key, self._keys(args))
+
+    async def union_store(self, dest_key, *args):
+        """
+        将并集的结果存储到新的key中
+        :param dest_key:
+        :param args:
+        :return:
+        """
+        return await self.database.zunionstore(dest_key, self._keys(args))
+
+    async def pop_max(self, count=1):
+        """
+        弹出指定个数的最大值（根据分值排序），在redis5中的功能
+        :param count:
+        :return: [(member, score),]
+        """
+        return await self.database.zpopmax(self.cache_key, count)
+
+    async def pop_min(self, count=1):
+        """
+        弹出指定个数的最小值（根据分值排序），在redis5中的功能
+        :param count:
+        :return: [(member, score),]
+        """
+        return await self.database.zpopmin(self.cache_key, count)
+
+    async def range(self, start, stop, is_reverse=False, is_desc=False, is_with_scores=False):
+        """
+        获取指定的范围
+        :param start:
+        :param stop:
+        :param is_reverse:
+        :param is_desc:
+        :param is_with_scores:
+        :return:
+        """
+        if not is_reverse:
+            return await self.database.zrange(self.cache_key, start, stop, is_desc, is_with_scores)
+        return await self.database.zrevrange(self.cache_key, start, stop, is_with_scores)
+
+    async def range_by_score(self, mi, ma, start=None, stop=None, is_reverse=False, is_with_scores=False):
+        """
+        根据分值来取
+        :param mi:
+        :param ma:
+        :param start:
+        :param stop:
+        :param is_reverse:
+        :param is_with_scores:
+        :return:
+        """
+        num = None
+        if stop is not None and start is not None:
+            num = stop - start + 1
+        if not is_reverse:
+            return await self.database.zrangebyscore(self.cache_key, mi, ma, start, num, is_with_scores)
+        return await self.database.zrevrangebyscore(self.cache_key, ma, mi, start, num, is_with_scores)
+
+    async def rank(self, value, is_reverse=False):
+        """
+        获取排名
+        :param value:
+        :param is_reverse:
+        :return:
+        """
+        if not is_reverse:
+            return await self.database.zrank(self.cache_key, value)
+        return await self.database.zrevrank(self.cache_key, value)
+
+    async def score(self, value):
+        """
+        获取分值
+        :param value:
+        :return:
+        """
+        return await self.database.zscore(self.cache_key, value)
+
+    async def remove(self, *members):
+        """
+        删除成员
+        :param members:
+        :return:
+        """
+        return await self.database.zrem(self.cache_key, *members)
+
+    async def remove_by_rank(self, mi, ma):
+        """
+        通过排名来删除下标在mi至ma区间内的所有元素
+        :param mi:
+        :param ma:
+        :return:
+        """
+        return await self.database.zremrangebyrank(self.cache_key, mi, ma)
+
+    async def remove_by_score(self, mi, ma):
+        """
+        通过分值来删除
+        :param mi:
+        :param ma:
+        :return:
+        """
+        return await self.database.zremrangebyscore(self.cache_key, mi, ma)
+
+    async def contains(self, item):
+        """
+        判断元素是否在有序集合中
+        """
+        return await self.score(item) is not None
+
+    async def len(self):
+        """
+        获取长度
+        """
+        return await self.database.zcard(self.cache_key)
+
+
+class AsyncList(AsyncSortable, AsyncContainer):
+    """
+    列表
+    """
+    async def data(self):
+        """
+        获取列表内容
+        :return:
+        """
+        return await self.database.lrange(self.cache_key, 0, -1)
+
+    async def append(self, val):
+        """
+        往数组末尾添加值
+        :param val:
+        :return:
+        """
+        return await self.database.rpush(self.cache_key, val)
+
+    async def prepend(self, val):
+        """
+        往数组头添加值
+        :param val:
+        :return:
+        """
+        return await self.database.lpush(self.cache_key, val)
+
+    async def extend(self, values):
+        """
+        添加数组
+        :param values:
+        :return:
+        """
+        return await self.database.rpush(self.cache_key, *values)
+
+    async def insert_by_value(self, item, value, is_before=True):
+        """
+        往指定位置插入值
+        :param item:
+        :param value:
+        :param is_before:
+        :return:
+        """
+        where = 'BEFORE' if is_before else 'AFTER'
+        return await self.database.linsert(self.cache_key, where, item, value)
+
+    async def pop(self, index=None):
+        """
+        弹出指定位置的值，默认弹出末尾的值
+        :param index:
+        :return:
+        """
+        if index is None or index == 0:
+            if index is None:
+                value = await self.database.rpop(self.cache_key)
+            else:
+                value = await self.database.lpop(self.cache_key)
+            if value is None:
+                raise EmptyException("不允许为空")
+            return value
+
+        result = await self._run_script(
+            'list_pop', [self.cache_key], [index, '__mredis_deleted_%s' % uuid.uuid4().hex])
+        if result[0] == 1:
+            raise EmptyException("不允许为空")
+        if result[0] == 2:
+            raise IndexErrorException('越界错误')
+        return result[1]
+
+    async def block_pop_left(self, timeout=0):
+        """
+        阻塞弹出列表头部的值
+        :param timeout:
+        :return:
+        """
+        return await self.database.blpop(self.cache_key, timeout)
+
+    async def block_pop_right(self, timeout=0):
+        """
+        阻塞弹出列表尾部的值
+        :param timeout:
+        :return:
+        """
+        return await self.database.brpop(self.cache_key, timeout)
+
+    async def remove(self, value, count=1):
+        """
+        删除指定个数的出现的值
+        :param value:
+        :param count:
+        :return:
+        """
+        return await self.database.lrem(self.cache_key, count, value)
+
+    async def trim(self, start, end):
+        """
+        保留指定区间的值
+        :param start:
+        :param end:
+        :return:
+        """
+        return await self.database.ltrim(self.cache_key, start, end)
+
+    async def get(self, index):
+        """
+        获取指定位置的值
+        :param index:
+        :return:
+        """
+        result = await self.database.lrange(self.cache_key, index, index)
+        if not result:
+            raise IndexErrorException(u'越界错误')
+        return result[0]
+
+    async def slice(self, start=0, stop=-1):
+        """
+        获取[start, stop]区间的值
+        :param start:
+        :param stop:
+        :return:
+        """
+        return await self.database.lrange(self.cache_key, start, stop)
+
+    async def set(self, index, value):
+        """
+        设置值
+        :param index:
+        :param value:
+        :return:
+        """
+        if not isinstance(index, int):
+            raise TypeException(u'类型错误')
+        if index < 0:
+            raise IndexErrorException(u'越界错误')
+        try:
+            return await self.database.lset(self.cache_key, index, value)
+        except ResponseError:
+            raise IndexErrorException(u'越界错误')
+
+    def __aiter__(self):
+        """
+        异步迭代器
+        """
+        return self._iter()
+
+    async def _iter(self):
+        for value in await self.data():
+            yield value
+
+    async def len(self):
+        """
+        获取列表长度
+        :return:
+        """
+        return await self.database.llen(self.cache_key)
+
+
+class AsyncHyperLogLog(AsyncContainer):
+    """
+    redis命令hyperloglog
+    hyperloglog是用来做基数统计的
+    """
+    async def add(self, *args):
+        """
+        添加值
+        :param args:
+        :return:
+        """
+        return await self.database.pfadd(self.cache_key, *args)
+
+    async def count(self):
+        """
+        获取个数
+        :return:
+        """
+        return await self.database.pfcount(self.cache_key)
+
+    len = count
+
+    async def merge(self, dest, *others):
+        """
+        合并
+        :param dest:
+        :param others:
+        :return:
+        """
+        items = [self.cache_key]
+        items.extend([other.cache_key for other in others])
+        await self.database.pfmerge(dest, *items)
+        return AsyncHyperLogLog(self.database, dest)
+
+
+class AsyncStream(AsyncContainer):
+    """
+    流
+    """
+    async def add(self, mapping, id="*", maxlen=None):
+        """
+        加入到流中
+        :param mapping:
+        :param id:
+        :param maxlen:
+        :return: message's id
+        """
+        return await self.database.xadd(self.cache_key, mapping, id, maxlen)
+
+    async def range(self, start='-', end='+', count=None):
+        """
+        获取指定范围的信息流
+        :param start: 最旧的消息
+        :param end: 最新的信息
+        :param count: 返回的信息个数
+        :return:
+        """
+        return await self.database.xrange(self.cache_key, start, end, count)
+
+    async def revrange(self, start='+', end='-', count=None):
+        """
+        获取反向的指定范围的信息流
+        :param start: 最新的消息
+        :param end: 最旧的消息
+        :param count: 返回的信息个数
+        :return:
+        """
+        return await self.database.xrevrange(self.cache_key, start, end, count)
+
+    async def get(self, msg_id):
+        """
+        根据id获取信息流
+        :param msg_id:
+        :return:
+        """
+        res = await self.range(msg_id, msg_id, 1)
+        if res:
+            return res[0]
+
+    async def len(self):
+        """
+        获取长度
+        :return:
+        """
+        return await self.database.xlen(self.cache_key)
+
+    async def remove(self, *msg_ids):
+        """
+        删除消息
+        :param msg_ids:
+        :return:
+        """
+        return await self.database.xdel(self.cache_key, *msg_ids)
+
+    async def remove_old(self, count):
+        """
+        删除旧的消息
+        :param count:
+        :return:
+        """
+        return await self.database.xtrim(self.cache_key, count)
+
+    async def remove_group(self, group_key):
+        """
+        根据消费组名字删除指定消费组
+        :param group_key:
+        :return:
+        """
+        return await self.database.xgroup_destroy(self.cache_key, group_key)
+
+    async def read(self, last_id=None, count=None, block=None, is_reverse=False):
+        """
+        获取信息
+        :param last_id: 已被读取的最后一条消息的id
+        :param count:
+        :param block: 阻塞时间（毫秒）
+        :param is_reverse: 是否从头读取，默认从头读取
+        :return:
+        """
+        if not last_id:
+            last_id = "$" if is_reverse else "0-0"
+        return await self.database.xread({self.cache_key: last_id}, count, block)
+
+    async def info(self):
+        """
+        获取流的信息
+        :return:
+        """
+        return await self.database.xinfo_stream(self.cache_key)
+
+    async def consumers_info(self, group_key):
+        """
+        返回消费者信息
+        :param group_key:
+        :return:
+        """
+        return await self.database.xinfo_consumers(self.cache_key, group_key)
+
+    async def groups_info(self):
+        """
+        获取消费组信息
+        :return:
+        """
+        return await self.database.xinfo_groups(self.cache_key)
+
+
+class AsyncConsumerGroup(object):
+    """
+    消费组，创建后需要await create()在stream上创建消费组
+    """
+    def __init__(self, database, cache_key, stream_keys):
+        self.database = database
+        self.cache_key = cache_key
+        self.stream_keys = stream_keys
+
+    async def create(self, start_id='$', mkstream=False):
+        """
+        在所有的stream上创建新的消费组
+        :param start_id: 起始消息id，默认从尾部开始消费，只接受新消息，当前Stream消息会全部忽略
+        :param mkstream: stream不存在时是否创建
+        :return:
+        """
+        for stream_key in self.stream_keys:
+            await self.database.xgroup_create(stream_key, self.cache_key, start_id, mkstream=mkstream)
+        return self
+
+    async def remove_consumer(self, stream_key, consumer_key):
+        """
+        从消费组移除消费者
+        :param stream_key:
+        :param consumer_key:
+        :return:
+        """
+        return await self.database.xgroup_delconsumer(stream_key, self.cache_key, consumer_key)
+
+    async def delete(self):
+        """
+        销毁消费组
+        :return:
+        """
+        for stream_key in self.stream_keys:
+            await self.database.xgroup_destroy(stream_key, self.cache_key)
+
+    async def set_id(self, last_id='$'):
+        """
+        设置消费者最近一次的消费id
+        :param last_id:最近一次消费的id
+        :return:
+        """
+        for stream_key in self.stream_keys:
+            await self.database.xgroup_setid(stream_key, self.cache_key, last_id)
+
+    async def streams_info(self):
+        """
+        获取流的信息
+        :return:
+        """
+        res = {}
+        for stream_key in self.stream_keys:
+            res[stream_key] = await self.database.xinfo_stream(stream_key)
+        return res
+
+    async def read(self, consumer_key, count=None, block=None, noack=False):
+        """
+        从消费者中读取信息
+        :param consumer_key:
+        :param count:
+        :param block:
+        :param noack:
+        :return:
+        """
+        streams = {stream_key: '>' for stream_key in self.stream_keys}
+        return await self.database.xreadgroup(self.cache_key, consumer_key, streams, count, block, noack)
+
+    async def ack(self, stream_key, *msg_ids):
+        """
+        确认消息
+        :param stream_key:
+        :param msg_ids:
+        :return:
+        """
+        return await self.database.xack(stream_key, self.cache_key, *msg_ids)
+
+    async def pending(self):
+        """
+        消费组中待处理的消息
+        :return:
+        """
+        res = {}
+        for stream_key in self.stream_keys:
+            res[stream_key] = await self.database.xpending(stream_key, self.cache_key)
+        return res
@@ -0,0 +1,109 @@
+# -*- coding: UTF-8 -*-
+from collections.abc import Mapping
+
+from mredis.lua import registry
+
+
+class AsyncCounter(object):
+    """
+    计数器
+    """
+    lua_incr = registry['counter_incr']
+
+    def __init__(self, database, cache_key, expire_time=60 * 60 * 24):
+        self.database = database
+        self.cache_key = cache_key
+        self.expire_time = expire_time
+
+    async def incr(self, key, amount=1):
+        """
+        增加指定的值，每次更新后会重新设置过期时间，为0时删除；在脚本中执行，只有一次网络往返
+        :param key:
+        :param amount:
+        :return:
+        """
+        return await self.lua_incr.call_async(
+            self.database, keys=[self.cache_key], args=[key, amount, self.expire_time])
+
+    async def decr(self, key, amount=-1):
+        """
+        减少指定的值
+        :param key:
+        :param amount:
+        :return:
+        """
+        return await self.incr(key, amount)
+
+    async def value(self, key):
+        """
+        当前的值
+        :param key:
+        :return:
+        """
+        return await self.database.hget(self.cache_key, key) or 0
+
+    async def values(self, keys):
+        """
+        批量获取
+        :param keys:
+        :return:
+        """
+        if not keys:
+            return []
+
+        return await self.database.hmget(self.cache_key, keys)
+
+    async def _expire(self):
+        """
+        设置过期时间
+        :return:
+        """
+        await self.database.expire(self.cache_key, self.expire_time)
+
+    async def update(self, other):
+        """
+        添加值，可以是字典或者计数器
+        :param other:
+        :return:
+        """
+        if not other:
+            raise TypeError('parameter can not be empty.')
+
+        if isinstance(other, AsyncCounter):
+            other = await other.as_dict()
+        elif not isinstance(other, Mapping):
+            raise TypeError('parameter format error')
+
+        await self.database.hset(self.cache_key, mapping=other)
+
+    async def remove(self, *args):
+        """
+        删除键
+        :param args:
+        :return:
+        """
+        await self.database.hdel(self.cache_key, *args)
+
+    async def clear(self):
+        """
+        清除所有的数字
+        :return:
+        """
+        await self.database.delete(self.cache_key)
+
+    async def set(self, key, value):
+        """
+        设置键值对
+        :param key:
+        :param value:
+        :return:
+        """
+        await self.database.hset(self.cache_key, key, value)
+        await self._expire()
+
+    async def as_dict(self):
+        """
+        获取所有键值对
+        :return:
+        """
+        return await self.database.hgetall(self.cache_key)
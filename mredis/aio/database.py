@@ -0,0 +1,220 @@
+# -*- coding: UTF-8 -*-
+import functools
+import math
+import random
+import time
+from collections.abc import Iterable
+
+from redis.asyncio import Redis
+
+from mredis.aio.containers import AsyncList, AsyncSet, AsyncSortedSet, AsyncHash, AsyncHyperLogLog, \
+    AsyncStream, AsyncConsumerGroup, AsyncContainer
+from mredis.aio.counter import AsyncCounter
+from mredis.aio.lock import AsyncLock
+from mredis.aio.rate_limit import AsyncRateLimit
+from mredis.database import MRedis
+from mredis.lua import registry
+from mredis.serializer import default_serializer
+
+_MISSING = object()
+
+
+class AsyncMRedis(Redis):
+    """
+    异步的redis客户端
+    """
+    def __init__(self, *args, **kwargs):
+        """
+        除了Redis的参数外：
+        :param serializer: 序列化器
+        :param preload_scripts: 建立连接时是否把mredis的lua脚本加载到服务端，只对自己创建的连接池有效
+        """
+        self.serializer = kwargs.pop('serializer', None) or default_serializer
+        preload_scripts = kwargs.pop('preload_scripts', True)
+        own_pool = kwargs.get('connection_pool') is None
+        super(AsyncMRedis, self).__init__(*args, **kwargs)
+
+        if preload_scripts and own_pool:
+            connection_kwargs = self.connection_pool.connection_kwargs
+            connection_kwargs['redis_connect_func'] = functools.partial(
+                registry.on_connect_async, connect_func=connection_kwargs.get('redis_connect_func'))
+
+    _get_func_cache_key_id = MRedis._get_func_cache_key_id
+    _get_func_mutex_key_id = MRedis._get_func_mutex_key_id
+
+    def __aiter__(self):
+        """
+        异步迭代器
+        :return:
+        """
+        return self.scan_iter().__aiter__()
+
+    def search(self, pattern):
+        """
+        按照格式来搜索
+        :param pattern:
+        :return:
+        """
+        return self.scan_iter(pattern)
+
+    def List(self, cache_key):
+        """
+        创建列表对象
+        :param cache_key:
+        :return:
+        """
+        return AsyncList(self, cache_key)
+
+    def Set(self, cache_key):
+        """
+        创建集合对象
+        :param cache_key:
+        :return:
+        """
+        return AsyncSet(self, cache_key)
+
+    def SortedSet(self, cache_key):
+        """
+        创建有序集合对象
+        :param cache_key:
+        :return:
+        """
+        return AsyncSortedSet(self, cache_key)
+
+    def Hash(self, cache_key):
+        """
+        创建哈希对象
+        :param cache_key:
+        :return:
+        """
+        return AsyncHash(self, cache_key)
+
+    def HyperLogLog(self, cache_key):
+        """
+        创建基数统计对象
+        :param cache_key:
+        :return:
+        """
+        return AsyncHyperLogLog(self, cache_key)
+
+    def Stream(self, cache_key):
+        """
+        创建流对象
+        :param cache_key:
+        :return:
+        """
+        return AsyncStream(self, cache_key)
+
+    def ConsumerGroup(self, cache_key, stream_keys):
+        """
+        创建消费组对象，需要await create()
+        :param cache_key:
+        :param stream_keys:
+        :return:
+        """
+        return AsyncConsumerGroup(self, cache_key, stream_keys)
+
+    def Counter(self, cache_key, expire_time=60 * 60 * 24):
+        """
+        创建计数器对象
+        :param cache_key:
+        :param expire_time:
+        :return:
+        """
+        return AsyncCounter(self, cache_key, expire_time)
+
+    def RateLimit(self, cache_key, limit=5, per=60, ret=None):
+        """
+        创建频率限制对象
+        :param cache_key:
+        :param limit:
+        :param per:
+        :param ret:
+        :return:
+        """
+        return AsyncRateLimit(self, cache_key, limit, per, ret)
+
+    def Lock(self, cache_key):
+        """
+        创建锁
+        :param cache_key:
+        :return:
+        """
+        return AsyncLock(self, cache_key)
+
+    def func_cache(self, expire_times=60 * 60, beta=None, serializer=None, key_func=None):
+        """
+        协程函数的缓存，缓存的key和格式与MRedis.func_cache相同，被装饰的函数提供invalidate
+        :param expire_times:
+        :param beta: 提前计算的系数，默认不提前计算
+        :param serializer:
+        :param key_func:
+        :return:
+        """
+        serializer = serializer or self.serializer
+
+        def wrapper(func):
+            async def load(cache_key):
+                if not beta:
+                    res = await AsyncContainer(self, cache_key).get_pickle(_MISSING, serializer)
+                    return res is not _MISSING, res, False
+
+                pipe = self.pipeline(transaction=False)
+                pipe.execute_command('GET', cache_key, NEVER_DECODE=True)
+                pipe.pttl(cache_key)
+                data, left_ms = await pipe.execute()
+                if not data:
+                    return False, None, False
+
+                res, delta = serializer.loads(data)
+                is_early = left_ms >= 0 and -delta * beta * math.log(1.0 - random.random()) >= left_ms / 1000.0
+                return True, res, is_early
+
+            @functools.wraps(func)
+            async def _wrapper(*args, **kwargs):
+                cache_key = self._get_func_cache_key_id(func, args, kwargs, key_func)
+                is_hit, res, is_early = await load(cache_key)
+                if is_hit and not is_early:
+                    return res
+
+                start_time = time.time()
+                res = await func(*args, **kwargs)
+                data = (res, time.time() - start_time) if beta else res
+                await AsyncContainer(self, cache_key).set_pickle(data, expire_times, serializer)
+                return res
+
+            async def invalidate(*args, **kwargs):
+                """
+                删除指定参数的缓存
+                """
+                await self.delete(self._get_func_cache_key_id(func, args, kwargs, key_func))
+
+            _wrapper.invalidate = invalidate
+            return _wrapper
+
+        return wrapper
+
+    def func_mutex(self, lock_params=(), default=None, lock_times=1):
+        """
+        协程函数锁
+        :param lock_params: 根据指定的参数加锁
+        :param default: 默认返回值
+        :param lock_times: 默认锁的时间
+        :return:
+        """
+        if not isinstance(lock_params, Iterable):
+            raise Exception("参数类型错误")
+
+        def wrapper(func):
+            @functools.wraps(func)
+            async def _wrapper(*args, **kwargs):
+                cache_key = self._get_func_mutex_key_id(func, lock_params)
+                lock = AsyncLock(database=self, cache_key=cache_key)
+                if await lock.acquire(expire_time=lock_times):
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        await lock.release()
+                return default
+            return _wrapper
+        return wrapper
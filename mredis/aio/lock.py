@@ -0,0 +1,66 @@
+# -*- coding: UTF-8 -*-
+import asyncio
+import functools
+import time
+
+from mredis.exception import LockReleaseException
+from mredis.lock import Lock
+
+
+class AsyncLock(Lock):
+    """
+    异步的分布式锁，和Lock使用相同的lua脚本，可以和同步的Lock互斥
+    """
+    async def acquire(self, block_timeout=1, expire_time=1, blocking=True):
+        """
+        获取锁，锁被释放时会重新尝试获取，直到获取成功或者超时
+        :param block_timeout: 阻塞获取锁的时间，0表示一直阻塞
+        :param expire_time: 设置锁的时间
+        :param blocking: 为False时只尝试一次，不阻塞
+        :return:
+        """
+        deadline = time.time() + block_timeout if block_timeout else None
+        while True:
+            result = await self.lua_acquire.call_async(
+                self.database, keys=[self.cache_key], args=[self._value, expire_time])
+            if result:
+                return True
+            if not blocking:
+                return False
+
+            timeout = 0
+            if deadline is not None:
+                left_time = deadline - time.time()
+                if left_time <= 0:
+                    return False
+                timeout = left_time
+
+            if await self.database.blpop(self.event_key, timeout) is None:
+                return False
+
+    async def release(self):
+        """
+        释放锁
+        :return:
+        """
+        return bool(await self.lua_release.call_async(self.database, keys=[self.cache_key, self.event_key]))
+
+    async def clear(self):
+        await self.database.delete(self.cache_key, self.event_key)
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if not await self.release():
+            raise LockReleaseException(u'锁释放失败')
+
+    def __call__(self, func):
+        if not asyncio.iscoroutinefunction(func):
+            raise TypeError('AsyncLock can only decorate coroutine functions')
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with self:
+                return await func(*args, **kwargs)
+        return wrapper
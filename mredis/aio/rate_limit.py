@@ -0,0 +1,52 @@
+# -*- coding: UTF-8 -*-
+import functools
+import hashlib
+import json
+import time
+
+from mredis.aio.containers import AsyncList
+from mredis.rate_limit import RateLimit
+
+
+class AsyncRateLimit(RateLimit):
+    """
+    异步的频率限制
+    """
+    async def limit(self, key):
+        """
+        是否限制关键字
+        :param key:
+        :return:
+        """
+        counter = AsyncList(self.database, key)
+        ll = await counter.len()
+        if ll < self._limit:
+            await counter.prepend(str(time.time()))
+        else:
+            old_time = float(await counter.get(-1))
+            if time.time() - old_time < self._per:
+                return True
+            await counter.pop()
+            await counter.prepend(str(time.time()))
+        return False
+
+    def rate_limit(self, function=None):
+        """
+        协程函数限制的装饰器
+        :param function: 根据参数生成关键字的函数
+        :return:
+        """
+        function_key = function
+        if function_key is None:
+            def function_key(*args, **kwargs):
+                data = json.dumps((args, sorted(kwargs.items())), default=str)
+                return hashlib.md5(data.encode('utf-8')).hexdigest()
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if await self.limit(function_key(*args, **kwargs)):
+                    return self._ret
+                return await fn(*args, **kwargs)
+            return wrapper
+        return decorator
@@ -0,0 +1,229 @@
+# -*- coding: UTF-8 -*-
+from mredis.badge import BadgeManager
+from mredis.containers import List, CappedList, Set, SortedSet, Hash, HyperLogLog, Bitmap
+from mredis.counter import Counter
+from mredis.exception import BatchException
+from mredis.probabilistic import BloomFilter, CountMinSketch, TopK
+
+
+class Deferred(object):
+    """
+    批量执行中的命令结果，在批量执行结束（或者自动执行）后才有值
+
+    需要用到值的时候（bool、len、迭代等）会先执行已经排队的命令，所以容器中依赖中间结果的方法（如Hash.get）仍然可以使用，
+    只是会多一次网络请求
+    """
+    def __init__(self, batch):
+        self._batch = batch
+        self._value = None
+        self.resolved = False
+
+    def _resolve(self, value):
+        self._value = value
+        self.resolved = True
+
+    @property
+    def value(self):
+        """
+        命令的结果
+        :return:
+        """
+        if not self.resolved:
+            self._batch.execute()
+        if not self.resolved:
+            raise BatchException(u'批量执行已经取消')
+        return self._value
+
+    def __bool__(self):
+        return bool(self.value)
+
+    __nonzero__ = __bool__
+
+    def __index__(self):
+        return self.value.__index__()
+
+    def __int__(self):
+        return int(self.value)
+
+    def __float__(self):
+        return float(self.value)
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __contains__(self, item):
+        return item in self.value
+
+    def __getitem__(self, item):
+        return self.value[item]
+
+    def __repr__(self):
+        if not self.resolved:
+            return '<Deferred pending>'
+        return '<Deferred %r>' % (self._value, )
+
+
+class Batch(object):
+    """
+    批量执行，通过Batch创建的容器的命令都会进入同一个pipeline，返回Deferred，在with结束时一次性执行
+
+    with mredis.batch() as batch:
+        counter = batch.Hash('hash').data()
+        batch.Set('set').add(1)
+    counter.value
+    """
+    # 需要多次网络请求或者阻塞的方法，不能放进pipeline，先执行排队的命令再直接调用
+    direct_methods = ('scan', 'hscan', 'sscan', 'zscan', 'scan_iter', 'hscan_iter', 'sscan_iter', 'zscan_iter',
+                      'register_script', 'pubsub', 'pipeline', 'lock', 'blpop', 'brpop', 'brpoplpush')
+    # 容器分块写入时直接把命令放进Batch的pipeline
+    is_batch = True
+
+    def __init__(self, database, size=None, transaction=False):
+        """
+
+        :param database:
+        :param size: 排队的命令达到该数量时自动执行，默认只在结束时执行
+        :param transaction: 是否使用MULTI/EXEC事务执行
+        """
+        self.database = database
+        self.size = size
+        self.transaction = transaction
+        self.serializer = getattr(database, 'serializer', None)
+        self.pipe = database.pipeline(transaction=transaction)
+        self._deferreds = []
+
+    def __getattr__(self, name):
+        if name in self.direct_methods:
+            self.execute()
+            return getattr(self.database, name)
+
+        attr = getattr(self.pipe, name)
+        if not callable(attr):
+            return attr
+
+        def command(*args, **kwargs):
+            count = len(self.pipe.command_stack)
+            res = attr(*args, **kwargs)
+            if len(self.pipe.command_stack) == count:
+                return res
+
+            deferred = Deferred(self)
+            self._deferreds.append(deferred)
+            if self.size and len(self._deferreds) >= self.size:
+                self.execute()
+            return deferred
+
+        return command
+
+    def __len__(self):
+        """
+        排队中的命令个数
+        :return:
+        """
+        return len(self._deferreds)
+
+    def execute(self):
+        """
+        执行排队中的命令
+        :return: 结果列表
+        """
+        if not self._deferreds:
+            return []
+
+        deferreds, self._deferreds = self._deferreds, []
+        results = self.pipe.execute()
+        for deferred, result in zip(deferreds, results):
+            deferred._resolve(result)
+        return results
+
+    def reset(self):
+        """
+        丢弃排队中的命令
+        :return:
+        """
+        self._deferreds = []
+        self.pipe.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.reset()
+
+    def List(self, cache_key):
+        """
+        创建批量执行的列表对象
+        """
+        return List(self, cache_key)
+
+    def CappedList(self, cache_key, max_length):
+        """
+        创建批量执行的固定长度列表对象
+        """
+        return CappedList(self, cache_key, max_length)
+
+    def Set(self, cache_key):
+        """
+        创建批量执行的集合对象
+        """
+        return Set(self, cache_key)
+
+    def SortedSet(self, cache_key):
+        """
+        创建批量执行的有序集合对象
+        """
+        return SortedSet(self, cache_key)
+
+    def Hash(self, cache_key):
+        """
+        创建批量执行的哈希对象
+        """
+        return Hash(self, cache_key)
+
+    def Bitmap(self, cache_key):
+        """
+        创建批量执行的位图对象
+        """
+        return Bitmap(self, cache_key)
+
+    def HyperLogLog(self, cache_key):
+        """
+        创建批量执行的基数统计对象
+        """
+        return HyperLogLog(self, cache_key)
+
+    def BloomFilter(self, cache_key, capacity, error_rate=0.01, scalable=False, growth=2, tightening=0.5):
+        """
+        创建批量执行的布隆过滤器对象
+        """
+        return BloomFilter(self, cache_key, capacity, error_rate, scalable, growth, tightening)
+
+    def CountMinSketch(self, cache_key, width=2000, depth=5, conservative=True):
+        """
+        创建批量执行的Count-Min Sketch对象
+        """
+        return CountMinSketch(self, cache_key, width, depth, conservative)
+
+    def TopK(self, cache_key, k, width=2000, depth=5, conservative=True):
+        """
+        创建批量执行的top k对象
+        """
+        return TopK(self, cache_key, k, width, depth, conservative)
+
+    def Counter(self, cache_key, expire_time=60 * 60 * 24):
+        """
+        创建批量执行的计数器对象
+        """
+        return Counter(self, cache_key, expire_time)
+
+    def BadgeManager(self, basic_cache_key, expire_time=60 * 60 * 24):
+        """
+        创建批量执行的badge管理对象
+        """
+        return BadgeManager(self, basic_cache_key, expire_time)
@@ -0,0 +1,124 @@
+# -*- coding: UTF-8 -*-
+"""
+性能测试，在本地启动的redis-server上运行，结果可以输出为json，用于比较不同提交之间的差异
+
+python -m mredis.benchmarks --json result.json
+python -m mredis.benchmarks.compare old.json new.json
+"""
+import os
+import shutil
+import socket
+import subprocess
+import time
+
+from redis.connection import Connection, ConnectionPool
+
+from mredis.database import MRedis
+from mredis.instrument import Histogram
+
+
+class CountingConnection(Connection):
+    """
+    记录网络往返次数的连接，一次发送（pipeline也是一次）记为一次往返
+    """
+    round_trips = 0
+
+    def send_packed_command(self, command, check_health=True):
+        CountingConnection.round_trips += 1
+        return super(CountingConnection, self).send_packed_command(command, check_health)
+
+
+class RedisServer(object):
+    """
+    在空闲端口上启动一个临时的redis-server
+    """
+    def __init__(self, executable=None, port=None):
+        self.executable = executable or os.environ.get('REDIS_SERVER') or shutil.which('redis-server')
+        if not self.executable:
+            raise RuntimeError('redis-server not found, set REDIS_SERVER')
+        self.port = port or self._free_port()
+        self.process = None
+
+    @staticmethod
+    def _free_port():
+        sock = socket.socket()
+        sock.bind(('localhost', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [self.executable, '--port', str(self.port), '--save', '', '--appendonly', 'no'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for _ in range(200):
+            try:
+                socket.create_connection(('localhost', self.port), 0.1).close()
+                return self
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError('redis-server did not start')
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+    def client(self, **kwargs):
+        """
+        创建连接到该服务器的MRedis，使用CountingConnection
+        :return:
+        """
+        kwargs.setdefault('decode_responses', True)
+        pool = ConnectionPool(host='localhost', port=self.port, connection_class=CountingConnection, **kwargs)
+        return MRedis(connection_pool=pool)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def summarize(name, histogram, elapsed, ops, round_trips=None, **extra):
+    """
+    生成单项结果
+    :param name:
+    :param histogram: 每次操作的延迟
+    :param elapsed: 总耗时
+    :param ops: 操作次数
+    :param round_trips: 网络往返次数
+    :return:
+    """
+    result = {
+        'name': name,
+        'ops': ops,
+        'ops_per_sec': round(ops / elapsed, 1) if elapsed else 0.0,
+        'p50_us': round(histogram.percentile(50) * 1e6, 1),
+        'p99_us': round(histogram.percentile(99) * 1e6, 1),
+    }
+    if round_trips is not None:
+        result['round_trips_per_op'] = round(float(round_trips) / ops, 2)
+    result.update(extra)
+    return result
+
+
+def measure(name, func, number):
+    """
+    执行number次func，统计吞吐量、延迟和网络往返次数
+    :param name:
+    :param func: 参数为第几次执行
+    :param number:
+    :return:
+    """
+    histogram = Histogram()
+    round_trips = CountingConnection.round_trips
+    start_time = time.time()
+    for idx in range(number):
+        op_start = time.time()
+        func(idx)
+        histogram.record(time.time() - op_start)
+    elapsed = time.time() - start_time
+    return summarize(name, histogram, elapsed, number, CountingConnection.round_trips - round_trips)
@@ -0,0 +1,59 @@
+# -*- coding: UTF-8 -*-
+"""
+运行全部性能测试
+
+python -m mredis.benchmarks [-n 1000] [-w 4] [-k Hash] [--json result.json]
+"""
+import json
+import optparse
+import platform
+import subprocess
+import time
+
+import redis
+
+from mredis.benchmarks import RedisServer, containers, contention
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('-n', '--number', type='int', default=1000, help='每个用例的执行次数')
+    parser.add_option('-w', '--workers', type='int', default=4, help='竞争场景的线程或者进程数')
+    parser.add_option('-k', '--pattern', default=None, help='只运行名字中包含该字符串的容器用例')
+    parser.add_option('--no-contention', action='store_true', default=False, help='不运行竞争场景')
+    parser.add_option('--json', default=None, help='把结果写入json文件')
+    options, _ = parser.parse_args(argv)
+
+    with RedisServer() as server:
+        database = server.client()
+        results = containers.run(database, options.number, options.pattern)
+        containers.print_results(results)
+        if not options.no_contention:
+            contention_results = contention.run(database, options.workers, max(options.number // 2, 1))
+            containers.print_results(contention_results)
+            results.extend(contention_results)
+        redis_version = database.info('server').get('redis_version')
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump({
+                'revision': _git_revision(),
+                'time': int(time.time()),
+                'python': platform.python_version(),
+                'redis_py': redis.__version__,
+                'redis_server': redis_version,
+                'number': options.number,
+                'results': results,
+            }, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
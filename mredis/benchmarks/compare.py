@@ -0,0 +1,57 @@
+# -*- coding: UTF-8 -*-
+"""
+比较两次性能测试的结果，吞吐量下降或者网络往返次数增加的比例超过阈值时返回非0
+
+python -m mredis.benchmarks.compare old.json new.json [--threshold 0.1]
+"""
+import json
+import optparse
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    results = data['results'] if isinstance(data, dict) else data
+    return dict((item['name'], item) for item in results)
+
+
+def compare(old, new, threshold=0.1):
+    """
+    比较两次的结果
+    :param old: {名字: 结果}
+    :param new: {名字: 结果}
+    :param threshold: 吞吐量下降或者往返次数增加的比例超过该值时认为变差
+    :return: [(名字, 旧的ops/sec, 新的ops/sec, 变化比例, 旧的往返次数, 新的往返次数, 是否变差)]
+    """
+    rows = []
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name], new[name]
+        if 'error' in before or 'error' in after:
+            continue
+        old_ops, new_ops = before['ops_per_sec'], after['ops_per_sec']
+        change = (new_ops - old_ops) / old_ops if old_ops else 0.0
+        old_rtt, new_rtt = before.get('round_trips_per_op'), after.get('round_trips_per_op')
+        regressed = change < -threshold or (old_rtt is not None and new_rtt is not None and
+                                            new_rtt > old_rtt * (1 + threshold))
+        rows.append((name, old_ops, new_ops, change, old_rtt, new_rtt, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog old.json new.json')
+    parser.add_option('-t', '--threshold', type='float', default=0.1, help='吞吐量下降的比例阈值')
+    options, args = parser.parse_args(argv)
+    if len(args) != 2:
+        parser.error('need old.json and new.json')
+
+    rows = compare(load(args[0]), load(args[1]), options.threshold)
+    print('%-34s %12s %12s %8s %8s %8s' % ('name', 'old ops/s', 'new ops/s', 'change', 'old rtt', 'new rtt'))
+    for name, old_ops, new_ops, change, old_rtt, new_rtt, regressed in rows:
+        print('%-34s %12.1f %12.1f %+7.1f%% %8s %8s%s' % (
+            name, old_ops, new_ops, change * 100, old_rtt, new_rtt, '  <-' if regressed else ''))
+    return 1 if any(row[-1] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,258 @@
+# -*- coding: UTF-8 -*-
+"""
+容器和辅助类的每个公开方法的吞吐量、每次操作的网络往返次数以及p50/p99延迟
+
+python -m mredis.benchmarks.containers
+"""
+import json
+import optparse
+import sys
+
+from mredis.badge import BadgeManager
+from mredis.benchmarks import RedisServer, measure
+from mredis.channel import Queue
+from mredis.containers import Stream
+
+
+def _hash(db, number):
+    hash = db.Hash('bench_hash')
+    hash.update(dict(('key_%s' % idx, idx) for idx in range(number)))
+    return hash
+
+
+def _set(db, number, cache_key='bench_set'):
+    container = db.Set(cache_key)
+    container.update(range(number))
+    return container
+
+
+def _sorted_set(db, number):
+    sorted_set = db.SortedSet('bench_sorted_set')
+    sorted_set.append(dict(('member_%s' % idx, idx) for idx in range(number)))
+    return sorted_set
+
+
+def _list(db, number):
+    values = db.List('bench_list')
+    values.extend(range(number))
+    return values
+
+
+def _stream(db, number):
+    stream = Stream(db, 'bench_stream')
+    for idx in range(number):
+        stream.add({'idx': idx})
+    return stream
+
+
+def _stream_ids(db, number):
+    stream = Stream(db, 'bench_stream')
+    return stream, [stream.add({'idx': idx}) for idx in range(number)]
+
+
+def _iterate(iterable):
+    for _ in iterable:
+        pass
+
+
+# (名字, 准备数据的函数, 操作函数)，准备数据的函数参数为(db, number)，操作函数参数为(准备的对象, 第几次执行)
+CASES = [
+    ('Hash.__setitem__', lambda db, n: db.Hash('bench_hash'), lambda h, i: h.__setitem__('key_%s' % i, i)),
+    ('Hash.get', _hash, lambda h, i: h.get('key_%s' % i)),
+    ('Hash.__getitem__', _hash, lambda h, i: h['key_%s' % i]),
+    ('Hash.__contains__', _hash, lambda h, i: 'key_%s' % i in h),
+    ('Hash.has_key', _hash, lambda h, i: h.has_key('key_%s' % i)),
+    ('Hash.incr', _hash, lambda h, i: h.incr('key_%s' % i)),
+    ('Hash.desc', _hash, lambda h, i: h.desc('key_%s' % i)),
+    ('Hash.incr_float', _hash, lambda h, i: h.incr_float('key_%s' % i)),
+    ('Hash.desc_float', _hash, lambda h, i: h.desc_float('key_%s' % i)),
+    ('Hash.data', lambda db, n: _hash(db, 100), lambda h, i: h.data()),
+    ('Hash.items', lambda db, n: _hash(db, 100), lambda h, i: h.items()),
+    ('Hash.keys', lambda db, n: _hash(db, 100), lambda h, i: h.keys()),
+    ('Hash.values', lambda db, n: _hash(db, 100), lambda h, i: h.values()),
+    ('Hash.__iter__', lambda db, n: _hash(db, 100), lambda h, i: _iterate(h)),
+    ('Hash.search', lambda db, n: _hash(db, 100), lambda h, i: _iterate(h.search('key_1*'))),
+    ('Hash.iter_scan', lambda db, n: _hash(db, 1000), lambda h, i: _iterate(h.iter_scan(count=100))),
+    ('Hash.iter_scan(prefetch=0)', lambda db, n: _hash(db, 1000),
+     lambda h, i: _iterate(h.iter_scan(count=100, prefetch=0))),
+    ('Hash.pop', _hash, lambda h, i: h.pop('key_%s' % i)),
+    ('Hash.popitem', _hash, lambda h, i: h.popitem()),
+    ('Hash.setdefault', _hash, lambda h, i: h.setdefault('other_%s' % i, i)),
+    ('Hash.update', lambda db, n: db.Hash('bench_hash'), lambda h, i: h.update({'key_%s' % i: i, 'other': i})),
+    ('Hash.__len__', _hash, lambda h, i: len(h)),
+    ('Hash.__delitem__', _hash, lambda h, i: h.__delitem__('key_%s' % i)),
+
+    ('Set.add', lambda db, n: db.Set('bench_set'), lambda s, i: s.add(i)),
+    ('Set.discard', _set, lambda s, i: s.discard(i)),
+    ('Set.remove', _set, lambda s, i: s.remove(i)),
+    ('Set.pop', _set, lambda s, i: s.pop()),
+    ('Set.__contains__', _set, lambda s, i: i in s),
+    ('Set.__len__', _set, lambda s, i: len(s)),
+    ('Set.data', lambda db, n: _set(db, 100), lambda s, i: s.data()),
+    ('Set.rand', lambda db, n: _set(db, 100), lambda s, i: s.rand(10)),
+    ('Set.__iter__', lambda db, n: _set(db, 100), lambda s, i: _iterate(s)),
+    ('Set.update', lambda db, n: db.Set('bench_set'), lambda s, i: s.update([i, i + 1])),
+    ('Set.union', lambda db, n: (_set(db, 100), _set(db, 100, 'bench_other')), lambda s, i: s[0].union(s[1])),
+    ('Set.intersection', lambda db, n: (_set(db, 100), _set(db, 100, 'bench_other')),
+     lambda s, i: s[0].intersection(s[1])),
+    ('Set.difference', lambda db, n: (_set(db, 100), _set(db, 100, 'bench_other')),
+     lambda s, i: s[0].difference(s[1])),
+    ('Set.union_store', lambda db, n: (_set(db, 100), _set(db, 100, 'bench_other')),
+     lambda s, i: s[0].union_store('bench_dest', s[1])),
+    ('Set.intersection_store', lambda db, n: (_set(db, 100), _set(db, 100, 'bench_other')),
+     lambda s, i: s[0].intersection_store('bench_dest', s[1])),
+    ('Set.difference_store', lambda db, n: (_set(db, 100), _set(db, 100, 'bench_other')),
+     lambda s, i: s[0].difference_store('bench_dest', s[1])),
+
+    ('SortedSet.append', lambda db, n: db.SortedSet('bench_sorted_set'), lambda s, i: s.append({'m_%s' % i: i})),
+    ('SortedSet.__setitem__', lambda db, n: db.SortedSet('bench_sorted_set'),
+     lambda s, i: s.__setitem__('m_%s' % i, i)),
+    ('SortedSet.incr', _sorted_set, lambda s, i: s.incr('member_%s' % i)),
+    ('SortedSet.desc', _sorted_set, lambda s, i: s.desc('member_%s' % i)),
+    ('SortedSet.score', _sorted_set, lambda s, i: s.score('member_%s' % i)),
+    ('SortedSet.rank', _sorted_set, lambda s, i: s.rank('member_%s' % i)),
+    ('SortedSet.__contains__', _sorted_set, lambda s, i: 'member_%s' % i in s),
+    ('SortedSet.range', _sorted_set, lambda s, i: s.range(0, 9)),
+    ('SortedSet.range_by_score', _sorted_set, lambda s, i: s.range_by_score(0, 9)),
+    ('SortedSet.__getitem__', _sorted_set, lambda s, i: s[0:9]),
+    ('SortedSet.data', lambda db, n: _sorted_set(db, 100), lambda s, i: s.data()),
+    ('SortedSet.__iter__', lambda db, n: _sorted_set(db, 100), lambda s, i: _iterate(s)),
+    ('SortedSet.__reversed__', lambda db, n: _sorted_set(db, 100), lambda s, i: reversed(s)),
+    ('SortedSet.__len__', _sorted_set, lambda s, i: len(s)),
+    ('SortedSet.remove', _sorted_set, lambda s, i: s.remove('member_%s' % i)),
+    ('SortedSet.pop_max', _sorted_set, lambda s, i: s.pop_max()),
+    ('SortedSet.pop_min', _sorted_set, lambda s, i: s.pop_min()),
+    ('SortedSet.remove_by_rank', _sorted_set, lambda s, i: s.remove_by_rank(0, 0)),
+    ('SortedSet.remove_by_score', _sorted_set, lambda s, i: s.remove_by_score(i, i)),
+
+    ('List.append', lambda db, n: db.List('bench_list'), lambda lst, i: lst.append(i)),
+    ('List.prepend', lambda db, n: db.List('bench_list'), lambda lst, i: lst.prepend(i)),
+    ('List.extend', lambda db, n: db.List('bench_list'), lambda lst, i: lst.extend([i, i + 1, i + 2])),
+    ('List.insert_by_value', lambda db, n: _list(db, 10), lambda lst, i: lst.insert_by_value(5, i)),
+    ('List.__getitem__', _list, lambda lst, i: lst[i]),
+    ('List.__getitem__(slice)', _list, lambda lst, i: lst[i:i + 9]),
+    ('List.__setitem__', _list, lambda lst, i: lst.__setitem__(i, i)),
+    ('List.__len__', _list, lambda lst, i: len(lst)),
+    ('List.data', lambda db, n: _list(db, 100), lambda lst, i: lst.data()),
+    ('List.__iter__', lambda db, n: _list(db, 100), lambda lst, i: _iterate(lst)),
+    ('List.pop', _list, lambda lst, i: lst.pop()),
+    ('List.pop(index)', lambda db, n: _list(db, n + 10), lambda lst, i: lst.pop(1)),
+    ('List.remove', _list, lambda lst, i: lst.remove(i)),
+    ('List.trim', _list, lambda lst, i: lst.trim(0, -2)),
+
+    ('HyperLogLog.add', lambda db, n: db.HyperLogLog('bench_hll'), lambda h, i: h.add(i)),
+    ('HyperLogLog.count', lambda db, n: db.HyperLogLog('bench_hll'), lambda h, i: h.count()),
+
+    ('Stream.add', lambda db, n: Stream(db, 'bench_stream'), lambda s, i: s.add({'idx': i})),
+    ('Stream.range', lambda db, n: _stream(db, 100), lambda s, i: s.range(count=10)),
+    ('Stream.revrange', lambda db, n: _stream(db, 100), lambda s, i: s.revrange(count=10)),
+    ('Stream.get', _stream_ids, lambda s, i: s[0].get(s[1][i])),
+    ('Stream.__len__', lambda db, n: _stream(db, 100), lambda s, i: len(s)),
+    ('Stream.read', lambda db, n: _stream(db, 100), lambda s, i: s.read(last_id='0', count=10)),
+
+    ('Counter.incr', lambda db, n: db.Counter('bench_counter'), lambda c, i: c.incr('key_%s' % (i % 100))),
+    ('Counter.decr', lambda db, n: db.Counter('bench_counter'), lambda c, i: c.decr('key_%s' % (i % 100))),
+    ('Counter.__setitem__', lambda db, n: db.Counter('bench_counter'), lambda c, i: c.__setitem__('key_%s' % i, i)),
+    ('Counter.value', lambda db, n: db.Counter('bench_counter'), lambda c, i: c.value('key_%s' % i)),
+    ('Counter.values', lambda db, n: db.Counter('bench_counter'), lambda c, i: c.values(['a', 'b', 'c'])),
+    ('Counter.update', lambda db, n: db.Counter('bench_counter'), lambda c, i: c.update({'key_%s' % i: i})),
+    ('Counter.as_dict', lambda db, n: db.Counter('bench_counter'), lambda c, i: c.as_dict()),
+
+    ('Lock.acquire+release', lambda db, n: db.Lock('bench_lock'),
+     lambda lock, i: lock.acquire(expire_time=10) and lock.release()),
+    ('Lock.__enter__+__exit__', lambda db, n: db.Lock('bench_lock'), lambda lock, i: _with(lock)),
+    ('RateLimit.limit', lambda db, n: db.RateLimit('bench_rate_limit', limit=10 ** 9),
+     lambda r, i: r.limit('bench_rate_limit_key')),
+    ('BadgeManager.incr_badge', lambda db, n: BadgeManager(db, 'bench_badge'), lambda b, i: b.incr_badge(1, i)),
+    ('BadgeManager.has_service_badge', lambda db, n: BadgeManager(db, 'bench_badge'),
+     lambda b, i: b.has_service_badge(1, i)),
+    ('BadgeManager.badge_count', lambda db, n: BadgeManager(db, 'bench_badge'), lambda b, i: b.badge_count(1)),
+
+    ('Queue.push', lambda db, n: Queue(db, 'bench_queue'), lambda q, i: q.push(i)),
+    ('Queue.pop+ack', lambda db, n: _filled_queue(db, n), lambda q, i: q.ack(q.pop())),
+    ('Queue.__len__', lambda db, n: Queue(db, 'bench_queue'), lambda q, i: len(q)),
+]
+
+# 分块写入的用例，每次操作写入BULK_ITEMS个元素，执行次数是其他用例的1/100，结果中有每秒写入的元素个数
+BULK_ITEMS = 10000
+BULK_CASES = [
+    ('Hash.update(bulk)', lambda db, n: db.Hash('bench_hash'),
+     lambda h, i: h.update(('key_%s' % idx, idx) for idx in range(BULK_ITEMS))),
+    ('Set.update(bulk)', lambda db, n: db.Set('bench_set'), lambda s, i: s.update(range(BULK_ITEMS))),
+    ('SortedSet.append(bulk)', lambda db, n: db.SortedSet('bench_sorted_set'),
+     lambda s, i: s.append(('member_%s' % idx, idx) for idx in range(BULK_ITEMS))),
+    ('List.extend(bulk)', lambda db, n: db.List('bench_list'), lambda lst, i: lst.extend(range(BULK_ITEMS))),
+]
+
+
+def _with(context):
+    with context:
+        pass
+
+
+def _filled_queue(db, number):
+    queue = Queue(db, 'bench_queue')
+    for idx in range(number):
+        queue.push(idx)
+    return queue
+
+
+def run(database, number=1000, pattern=None):
+    """
+    运行所有的用例
+    :param database:
+    :param number: 每个用例的执行次数
+    :param pattern: 只运行名字中包含pattern的用例
+    :return: 结果列表
+    """
+    results = []
+    cases = [(case, number, None) for case in CASES] + \
+        [(case, max(number // 100, 1), BULK_ITEMS) for case in BULK_CASES]
+    for (name, setup, operation), case_number, items in cases:
+        if pattern and pattern not in name:
+            continue
+        database.flushdb()
+        state = setup(database, case_number)
+        try:
+            result = measure(name, lambda idx: operation(state, idx), case_number)
+        except Exception as e:
+            results.append({'name': name, 'error': '%s: %s' % (type(e).__name__, e)})
+            continue
+        if items:
+            result['items_per_sec'] = result['ops_per_sec'] * items
+        results.append(result)
+    database.flushdb()
+    return results
+
+
+def print_results(results, out=sys.stdout):
+    out.write('%-34s %12s %10s %10s %10s %12s\n' % ('name', 'ops/sec', 'rtt/op', 'p50(us)', 'p99(us)', 'items/sec'))
+    for item in results:
+        if 'error' in item:
+            out.write('%-34s %s\n' % (item['name'], item['error']))
+            continue
+        out.write('%-34s %12.1f %10s %10.1f %10.1f %12s\n' % (
+            item['name'], item['ops_per_sec'], item.get('round_trips_per_op', '-'), item['p50_us'],
+            item['p99_us'], '%.1f' % item['items_per_sec'] if 'items_per_sec' in item else '-'))
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('-n', '--number', type='int', default=1000, help='每个用例的执行次数')
+    parser.add_option('-k', '--pattern', default=None, help='只运行名字中包含该字符串的用例')
+    parser.add_option('--json', action='store_true', default=False, help='以json格式输出')
+    options, _ = parser.parse_args(argv)
+
+    with RedisServer() as server:
+        results = run(server.client(), options.number, options.pattern)
+
+    if options.json:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        print_results(results)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# -*- coding: UTF-8 -*-
+"""
+多个线程或者进程竞争同一个Lock、Counter、RateLimit的key
+
+python -m mredis.benchmarks.contention
+"""
+import json
+import multiprocessing
+import optparse
+import sys
+import threading
+import time
+
+from redis import ConnectionPool
+
+from mredis.benchmarks import CountingConnection, RedisServer, summarize
+from mredis.database import MRedis
+from mredis.instrument import Histogram
+
+
+def _lock_operation(db):
+    lock = db.Lock('bench_contention_lock')
+
+    def operation():
+        if not lock.acquire(block_timeout=10, expire_time=10):
+            raise RuntimeError('acquire timeout')
+        try:
+            # 锁内的读-改-写，锁失效时最终的值会小于操作次数
+            value = int(db.get('bench_contention_value') or 0)
+            db.set('bench_contention_value', value + 1)
+        finally:
+            lock.release()
+    return operation
+
+
+def _counter_operation(db):
+    counter = db.Counter('bench_contention_counter')
+    return lambda: counter.incr('key')
+
+
+def _rate_limit_operation(db):
+    rate_limit = db.RateLimit('bench_contention_rate_limit', limit=10 ** 9)
+    return lambda: rate_limit.limit('bench_contention_rate_limit_key')
+
+
+# 场景名: (创建操作的函数, 检查结果的函数)
+SCENARIOS = {
+    'Lock': (_lock_operation, lambda db: int(db.get('bench_contention_value') or 0)),
+    'Counter': (_counter_operation, lambda db: int(db.Counter('bench_contention_counter').value('key') or 0)),
+    'RateLimit': (_rate_limit_operation, lambda db: len(db.List('bench_contention_rate_limit_key'))),
+}
+
+
+def _worker(scenario, connection_kwargs, number):
+    """
+    在一个线程或者进程中执行number次操作
+    :return: (延迟直方图, 错误次数, 网络往返次数)
+    """
+    db = MRedis(connection_pool=ConnectionPool(connection_class=CountingConnection, **connection_kwargs))
+    operation = SCENARIOS[scenario][0](db)
+    histogram = Histogram()
+    errors = 0
+    round_trips = CountingConnection.round_trips
+    for _ in range(number):
+        start_time = time.time()
+        try:
+            operation()
+        except Exception:
+            errors += 1
+        histogram.record(time.time() - start_time)
+    db.connection_pool.disconnect()
+    return histogram, errors, CountingConnection.round_trips - round_trips
+
+
+def _merge(histograms):
+    merged = Histogram()
+    for histogram in histograms:
+        for index, count in histogram.counts.items():
+            merged.counts[index] = merged.counts.get(index, 0) + count
+        merged.count += histogram.count
+        merged.total += histogram.total
+        if histogram.min is not None and (merged.min is None or histogram.min < merged.min):
+            merged.min = histogram.min
+        if histogram.max is not None and (merged.max is None or histogram.max > merged.max):
+            merged.max = histogram.max
+    return merged
+
+
+def _run_threads(scenario, connection_kwargs, workers, number):
+    results = [None] * workers
+
+    def target(idx):
+        results[idx] = _worker(scenario, connection_kwargs, number)
+
+    threads = [threading.Thread(target=target, args=(idx,)) for idx in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _run_processes(scenario, connection_kwargs, workers, number):
+    pool = multiprocessing.Pool(workers)
+    try:
+        return pool.starmap(_worker, [(scenario, connection_kwargs, number)] * workers)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def run(database, workers=4, number=500, modes=('thread', 'process'), scenarios=None):
+    """
+    运行竞争场景
+    :param database: 用于准备和检查数据的MRedis
+    :param workers: 并发的线程或者进程数
+    :param number: 每个线程或者进程的操作次数
+    :param modes: thread和/或process
+    :param scenarios: 场景名列表，默认全部
+    :return: 结果列表，expected为期望的最终值，actual为实际的最终值
+    """
+    config = database.connection_pool.connection_kwargs
+    connection_kwargs = dict((key, config[key]) for key in ('host', 'port', 'db', 'decode_responses') if key in config)
+
+    results = []
+    for scenario in sorted(scenarios or SCENARIOS):
+        check = SCENARIOS[scenario][1]
+        for mode in modes:
+            database.flushdb()
+            runner = _run_threads if mode == 'thread' else _run_processes
+            round_trips = CountingConnection.round_trips
+            start_time = time.time()
+            outputs = runner(scenario, connection_kwargs, workers, number)
+            elapsed = time.time() - start_time
+
+            ops = workers * number
+            # 线程共用同一个计数，进程的计数在各自的子进程里
+            if mode == 'thread':
+                round_trips = CountingConnection.round_trips - round_trips
+            else:
+                round_trips = sum(output[2] for output in outputs)
+            results.append(summarize(
+                '%s[%s x %s]' % (scenario, mode, workers), _merge(output[0] for output in outputs), elapsed, ops,
+                round_trips, errors=sum(output[1] for output in outputs), expected=ops, actual=check(database),
+            ))
+    database.flushdb()
+    return results
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('-w', '--workers', type='int', default=4, help='并发的线程或者进程数')
+    parser.add_option('-n', '--number', type='int', default=500, help='每个线程或者进程的操作次数')
+    parser.add_option('--json', action='store_true', default=False, help='以json格式输出')
+    options, _ = parser.parse_args(argv)
+
+    with RedisServer() as server:
+        results = run(server.client(), options.workers, options.number)
+
+    if options.json:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        for item in results:
+            sys.stdout.write('%-28s %10.1f ops/sec  p50 %8.1fus  p99 %8.1fus  errors %d  %s/%s\n' % (
+                item['name'], item['ops_per_sec'], item['p50_us'], item['p99_us'], item['errors'],
+                item['actual'], item['expected']))
+    return results
+
+
+if __name__ == '__main__':
+    main()
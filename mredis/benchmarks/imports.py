@@ -0,0 +1,104 @@
+# -*- coding: UTF-8 -*-
+"""
+导入耗时，基于python -X importtime，在新的进程中多次导入取中位数
+
+python -m mredis.benchmarks.imports [-n 10] [--max-ms 20] [--json]
+"""
+import json
+import optparse
+import subprocess
+import sys
+
+STATEMENT = 'from mredis.database import MRedis'
+BASELINE = 'import redis'
+
+
+def import_times(statement):
+    """
+    在新的进程中执行导入语句
+    :param statement:
+    :return: {模块名: (自身耗时, 累计耗时)}，单位微秒
+    """
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            stderr=subprocess.PIPE, check=True).stderr.decode('utf-8')
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            times[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+        except ValueError:
+            continue
+    return times
+
+
+def _total(times):
+    return sum(cumulative for name, (_, cumulative) in times.items() if '.' not in name) / 1000.0
+
+
+def _own(times, baseline):
+    """
+    mredis自身的耗时：只导入redis时不会导入的模块（mredis和它额外依赖的模块）的自身耗时之和
+    """
+    return sum(own for name, (own, _) in times.items() if name not in baseline) / 1000.0
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def run(number=10):
+    """
+    导入MRedis的耗时，以及在另外的进程中只导入redis的耗时
+    :param number: 执行次数
+    :return:
+    """
+    totals = []
+    owns = []
+    baselines = []
+    modules = set()
+    for _ in range(number):
+        times = import_times(STATEMENT)
+        baseline = import_times(BASELINE)
+        totals.append(_total(times))
+        owns.append(_own(times, baseline))
+        modules.update(times)
+        baselines.append(_total(baseline))
+
+    return {
+        'name': 'import',
+        'statement': STATEMENT,
+        'total_ms': round(_median(totals), 2),
+        'redis_ms': round(_median(baselines), 2),
+        'mredis_ms': round(_median(owns), 2),
+        'mredis_modules': sorted(name for name in modules if name.startswith('mredis')),
+        'optional_modules': sorted(name for name in modules if name.split('.')[0] in (
+            'simplejson', 'mako', 'msgpack')),
+    }
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('-n', '--number', type='int', default=10, help='执行次数')
+    parser.add_option('--max-ms', type='float', default=None, help='mredis自身的导入耗时超过该值时返回非0')
+    parser.add_option('--json', action='store_true', default=False, help='以json格式输出')
+    options, _ = parser.parse_args(argv)
+
+    result = run(options.number)
+    if options.json:
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        print('%s: %.2fms (redis %.2fms, mredis %.2fms)' % (
+            result['statement'], result['total_ms'], result['redis_ms'], result['mredis_ms']))
+        print('mredis modules: %s' % ', '.join(result['mredis_modules']))
+        print('optional modules: %s' % (', '.join(result['optional_modules']) or '-'))
+    if options.max_ms is not None and result['mredis_ms'] > options.max_ms:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+# -*- coding: UTF-8 -*-
+"""
+序列化方式的性能对比：编码耗时、解码耗时以及存储的字节数
+
+python -m mredis.benchmarks.serializer
+"""
+import json
+import optparse
+import pickle
+import sys
+import timeit
+
+from mredis.serializer import PickleCodec, Serializer, msgpack, lzma
+
+PAYLOADS = {
+    'small': {'id': 1, 'name': u'mredis', 'score': 9.5},
+    'list': list(range(1000)),
+    'records': [{'id': idx, 'name': u'user_%s' % idx, 'tags': ['a', 'b', 'c'], 'score': idx * 0.5}
+                for idx in range(1000)],
+    'text': u'redis wrapper ' * 5000,
+}
+
+
+def serializers():
+    """
+    参与对比的序列化器
+    :return: [(名字, 序列化器)]
+    """
+    codecs = [('pickle-p2', Serializer(PickleCodec(protocol=2))),
+              ('pickle-p%s' % pickle.HIGHEST_PROTOCOL, Serializer('pickle')),
+              ('marshal', Serializer('marshal')),
+              ('json', Serializer('json'))]
+    if msgpack is not None:
+        codecs.append(('msgpack', Serializer('msgpack')))
+
+    compressors = ['zlib'] if lzma is None else ['zlib', 'lzma']
+    for compress in compressors:
+        codecs.append(('pickle+%s' % compress, Serializer('pickle', compress=compress, compress_threshold=0)))
+    return codecs
+
+
+def bench(serializer, payload, number):
+    """
+    测试单个序列化器
+    :return: (编码微秒, 解码微秒, 字节数)
+    """
+    raw = serializer.dumps(payload)
+    dumps_time = timeit.timeit(lambda: serializer.dumps(payload), number=number)
+    loads_time = timeit.timeit(lambda: serializer.loads(raw), number=number)
+    return dumps_time / number * 1e6, loads_time / number * 1e6, len(raw)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('-n', '--number', type='int', default=200, help='每项的执行次数')
+    parser.add_option('--json', action='store_true', default=False, help='以json格式输出')
+    options, _ = parser.parse_args(argv)
+
+    results = []
+    for payload_name, payload in sorted(PAYLOADS.items()):
+        for name, serializer in serializers():
+            try:
+                dumps_us, loads_us, size = bench(serializer, payload, options.number)
+            except (TypeError, ValueError):
+                continue
+            results.append({'payload': payload_name, 'serializer': name, 'dumps_us': round(dumps_us, 2),
+                            'loads_us': round(loads_us, 2), 'bytes': size})
+
+    if options.json:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return results
+
+    print('%-10s %-14s %12s %12s %10s' % ('payload', 'serializer', 'dumps(us)', 'loads(us)', 'bytes'))
+    for item in results:
+        print('%-10s %-14s %12.2f %12.2f %10d' % (item['payload'], item['serializer'], item['dumps_us'],
+                                                  item['loads_us'], item['bytes']))
+    return results
+
+
+if __name__ == '__main__':
+    main()
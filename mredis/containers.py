@@ -1,8 +1,37 @@
 # -*- coding: UTF-8 -*-
-import pickle
-from collections import Iterable
+import itertools
+import re
+import uuid
+try:
+    from collections.abc import Iterable
+except ImportError:
+    from collections import Iterable
+
+from redis.exceptions import ResponseError
 
 from mredis.exception import TypeException, EmptyException, IndexErrorException
+from mredis.lua import registry
+from mredis.scan import iter_pages, prefetch_scan
+from mredis.serializer import default_serializer
+
+# 批量写入时每条命令的元素个数，以及每次网络往返发送的命令个数
+CHUNK_SIZE = 1000
+MAX_IN_FLIGHT = 8
+
+
+def _chunks(iterable, size):
+    """
+    按照size把可迭代对象切分成列表，不会一次读取整个可迭代对象
+    :param iterable:
+    :param size:
+    :return:
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 class Sortable(object):
@@ -29,6 +58,88 @@ class Container(object):
         self.database = database
         self.cache_key = cache_key
 
+    def _run_script(self, name, keys=(), args=()):
+        """
+        执行注册表中的lua脚本
+        :param name: 脚本名，scripts目录中不包括.lua的文件名
+        :param keys:
+        :param args:
+        :return:
+        """
+        return registry[name](self.database, keys, args)
+
+    @staticmethod
+    def _value(result):
+        """
+        批量执行中命令返回的是Deferred，需要根据结果判断时取出真正的值
+        :param result:
+        :return:
+        """
+        return getattr(result, 'value', result)
+
+    def _write_chunks(self, items, send, chunk_size=CHUNK_SIZE, max_in_flight=MAX_IN_FLIGHT):
+        """
+        分块写入，每块是一条命令，通过pipeline每次发送max_in_flight条，内存中最多有max_in_flight块；
+        只有一块时直接执行，和原来一样只有一条命令，Batch中的写入仍然进入Batch的pipeline
+        :param items: 可迭代对象，可以是生成器
+        :param send: 参数为(database或者pipeline, 块)，发送一块的命令
+        :param chunk_size: 每块的元素个数
+        :param max_in_flight: 每次网络往返发送的块数
+        :return: 写入的元素个数
+        """
+        if chunk_size < 1 or max_in_flight < 1:
+            raise TypeException(u'chunk_size和max_in_flight必须大于0')
+
+        chunks = _chunks(items, chunk_size)
+        first = next(chunks, None)
+        if first is None:
+            return 0
+        second = next(chunks, None)
+        if second is None or getattr(self.database, 'is_batch', False):
+            client = self.database
+        else:
+            client = self.database.pipeline(transaction=False)
+            chunks = itertools.chain([second], chunks)
+            second = None
+
+        total = 0
+        for chunk in itertools.chain([first], [second] if second is not None else [], chunks):
+            send(client, chunk)
+            total += len(chunk)
+            if client is not self.database and len(client) >= max_in_flight:
+                client.execute()
+        if client is not self.database and len(client):
+            client.execute()
+        return total
+
+    def _temp_key(self):
+        """
+        临时key，包含当前key的分片标签，在redis cluster和ShardedMRedis中和当前key在同一个节点
+        :return:
+        """
+        from mredis.sharding import hash_tag
+        return 'mredis_tmp:{%s}:%s' % (hash_tag(self.cache_key), uuid.uuid4().hex)
+
+    def _check_keys(self, keys):
+        """
+        多个key的命令执行前的检查，客户端分片中检查所有的key在同一个节点
+        :param keys:
+        :return:
+        """
+
+    def _atomic(self, *commands):
+        """
+        在事务中执行多个命令，只有一次网络往返，Batch中的命令进入Batch的pipeline
+        :param commands: (方法名, 参数)
+        :return: 所有命令的结果
+        """
+        if getattr(self.database, 'is_batch', False):
+            return [getattr(self.database, name)(*args) for name, args in commands]
+        pipe = self.database.pipeline()
+        for name, args in commands:
+            getattr(pipe, name)(*args)
+        return pipe.execute()
+
     def delete(self):
         """
         删除key
@@ -69,26 +180,34 @@ class Container(object):
         """
         return self.database.ttl(self.cache_key)
 
-    def set_pickle(self, data, expire_time=None):
+    def _serializer(self, serializer=None):
+        return serializer or getattr(self.database, 'serializer', None) or default_serializer
+
+    def set_pickle(self, data, expire_time=None, serializer=None):
         """
         设置序列化
+        :param data:
+        :param expire_time:
+        :param serializer: 序列化器，默认使用database上的序列化器
         :return:
         """
-        return self.database.set(self.cache_key, pickle.dumps(data), expire_time)
+        return self.database.set(self.cache_key, self._serializer(serializer).dumps(data), expire_time)
 
-    def get_pickle(self):
+    def get_pickle(self, default="", serializer=None):
         """
-        获取序列化的值
+        获取序列化的值，同时兼容没有头部的旧数据
+        :param default: key不存在时返回的值
+        :param serializer:
         :return:
         """
-        res = self.database.get(self.cache_key)
+        res = self.database.execute_command('GET', self.cache_key, NEVER_DECODE=True)
         if not res:
-            return ""
+            return default
 
         try:
-            return pickle.loads(res)
+            return self._serializer(serializer).loads(res)
         except TypeError:
-            return ""
+            return default
 
 
 class Hash(Container):
@@ -114,9 +233,10 @@ class Hash(Container):
         :param default:
         :return:
         """
-        if key not in self:
+        value = self.database.hget(self.cache_key, key)
+        if default is not None and self._value(value) is None:
             return default
-        return self.database.hget(self.cache_key, key)
+        return value
 
     def incr(self, key, amount=1):
         """
@@ -200,14 +320,27 @@ class Hash(Container):
         """
         return self.data().items()
 
-    def _scan(self, pattern=None, count=None):
+    def _scan(self, pattern=None, count=None, prefetch=1, partition=None):
         """
-        分片读取，避免一次获取大量的数据导致内存被挤爆
+        分片读取，避免一次获取大量的数据导致内存被挤爆，读取当前页的同时在辅助线程中预取之后的页
         :param pattern:
         :param count:
+        :param prefetch: 最多预取的页数
+        :param partition: (index, total)，只返回属于该分区的元素
+        :return:
+        """
+        return prefetch_scan(self.database, 'hscan', self.cache_key, pattern, count, prefetch, partition)
+
+    def iter_scan(self, pattern=None, count=None, prefetch=2, partition=None):
+        """
+        预取的分片读取，多个进程可以通过partition分别处理一部分元素
+        :param pattern:
+        :param count: 每页的COUNT
+        :param prefetch: 最多预取的页数，内存中最多有prefetch + 2页
+        :param partition: (index, total)
         :return:
         """
-        return self.database.hscan_iter(self.cache_key, pattern, count)
+        return self._scan(pattern, count, prefetch, partition)
 
     def __iter__(self):
         """
@@ -251,13 +384,11 @@ class Hash(Container):
         :param default:
         :return:
         """
-        if key not in self:
-            if default:
+        value = self._value(self._run_script('hash_pop', [self.cache_key], [key]))
+        if value is None:
+            if default is not None:
                 return default
             raise TypeException(u'not found the key')
-
-        value = self.get(key)
-        self._del_key(key)
         return value
 
     def popitem(self):
@@ -265,11 +396,10 @@ class Hash(Container):
         弹出任意的键值对
         :return:
         """
-        if not self:
+        result = self._value(self._run_script('hash_popitem', [self.cache_key]))
+        if not result:
             raise TypeException(u'empty hash')
-
-        rand_key, rand_val = next(self.iteritems())
-        return rand_key, self.pop(rand_key)
+        return result[0], result[1]
 
     def __delitem__(self, key):
         self._del_key(key)
@@ -282,30 +412,32 @@ class Hash(Container):
 
     def setdefault(self, key, default=None):
         """
-        设置默认值
+        键不存在时设置为默认值
         :param key:
         :param default:
-        :return:
+        :return: 键已经存在时返回原来的值，否则返回default
         """
-        value = self.get(key)
-        if not value:
-            self[key] = default
-        return value
+        result = self._run_script('hash_setdefault', [self.cache_key], [key, default])
+        return default if result[0] else result[1]
 
-    def update(self, other):
+    def update(self, other, chunk_size=CHUNK_SIZE, max_in_flight=MAX_IN_FLIGHT):
         """
-        更新键值对
-        :param other:
-        :return:
+        更新键值对，分块写入，不会一次构造所有的参数
+        :param other: Hash、dict或者(key, value)的可迭代对象
+        :param chunk_size: 每条HSET的键值对个数
+        :param max_in_flight: 每次网络往返发送的HSET个数
+        :return: 写入的键值对个数
         """
-        if not other:
-            return
         if isinstance(other, Hash):
-            self.database.hmset(self.cache_key, other.data())
+            items = other.iter_scan(count=chunk_size)
         elif isinstance(other, dict):
-            self.database.hmset(self.cache_key, other)
+            items = other.items()
+        elif isinstance(other, Iterable) and not isinstance(other, (str, bytes)):
+            items = other
         else:
             raise TypeException(u'类型错误')
+        return self._write_chunks(
+            items, lambda client, chunk: client.hset(self.cache_key, mapping=dict(chunk)), chunk_size, max_in_flight)
 
     def __len__(self):
         """
@@ -347,14 +479,27 @@ class Set(Sortable, Container):
         """
         self.database.srem(self.cache_key, val)
 
-    def _scan(self, pattern=None, count=None):
+    def _scan(self, pattern=None, count=None, prefetch=1, partition=None):
         """
-        分片读取，避免一次获取大量的数据导致内存被挤爆
+        分片读取，避免一次获取大量的数据导致内存被挤爆，读取当前页的同时在辅助线程中预取之后的页
         :param pattern:
         :param count:
+        :param prefetch: 最多预取的页数
+        :param partition: (index, total)，只返回属于该分区的元素
         :return:
         """
-        return self.database.sscan_iter(self.cache_key, pattern, count)
+        return prefetch_scan(self.database, 'sscan', self.cache_key, pattern, count, prefetch, partition)
+
+    def iter_scan(self, pattern=None, count=None, prefetch=2, partition=None):
+        """
+        预取的分片读取，多个进程可以通过partition分别处理一部分元素
+        :param pattern:
+        :param count: 每页的COUNT
+        :param prefetch: 最多预取的页数，内存中最多有prefetch + 2页
+        :param partition: (index, total)
+        :return:
+        """
+        return self._scan(pattern, count, prefetch, partition)
 
     def pop(self, count=1):
         """
@@ -378,14 +523,7 @@ class Set(Sortable, Container):
         :param args:
         :return:
         """
-        keys = [self.cache_key]
-        for obj in args:
-            if isinstance(obj, Set):
-                keys.append(obj.cache_key)
-            else:
-                raise TypeException(u'类型错误')
-
-        return self.database.sunion(*keys)
+        return self.database.sunion(*self._set_keys(args))
 
     def union_store(self, dest_key, *args):
         """
@@ -394,14 +532,7 @@ class Set(Sortable, Container):
         :param args:
         :return:
         """
-        keys = [self.cache_key]
-        for obj in args:
-            if isinstance(obj, Set):
-                keys.append(obj.cache_key)
-            else:
-                raise TypeException(u'类型错误')
-
-        return self.database.sunionstore(dest_key, *keys)
+        return self.database.sunionstore(dest_key, *self._set_keys(args, dest_key))
 
     def intersection(self, *args):
         """
@@ -409,14 +540,7 @@ class Set(Sortable, Container):
         :param args: set对象
         :return:
         """
-        keys = [self.cache_key]
-        for obj in args:
-            if isinstance(obj, Set):
-                keys.append(obj.cache_key)
-            else:
-                raise TypeException(u'类型错误')
-
-        return self.database.sinter(*keys)
+        return self.database.sinter(*self._set_keys(args))
 
     def intersection_store(self, dest_key, *args):
         """
@@ -425,14 +549,7 @@ class Set(Sortable, Container):
         :param args:
         :return:
         """
-        keys = [self.cache_key]
-        for obj in args:
-            if isinstance(obj, Set):
-                keys.append(obj.cache_key)
-            else:
-                raise TypeException(u'类型错误')
-
-        return self.database.sinterstore(dest_key, *keys)
+        return self.database.sinterstore(dest_key, *self._set_keys(args, dest_key))
 
     def difference(self, *args):
         """
@@ -440,14 +557,7 @@ class Set(Sortable, Container):
         :param args:
         :return:
         """
-        keys = [self.cache_key]
-        for obj in args:
-            if isinstance(obj, Set):
-                keys.append(obj.cache_key)
-            else:
-                raise TypeException(u'类型错误')
-
-        return self.database.sdiff(*keys)
+        return self.database.sdiff(*self._set_keys(args))
 
     def difference_store(self, dest_key, *args):
         """
@@ -456,25 +566,21 @@ class Set(Sortable, Container):
         :param args:
         :return:
         """
-        keys = [self.cache_key]
-        for obj in args:
-            if isinstance(obj, Set):
-                keys.append(obj.cache_key)
-            else:
-                raise TypeException(u'类型错误')
-
-        return self.database.sdiffstore(dest_key, *keys)
+        return self.database.sdiffstore(dest_key, *self._set_keys(args, dest_key))
 
-    def update(self, other):
+    def update(self, other, chunk_size=CHUNK_SIZE, max_in_flight=MAX_IN_FLIGHT):
         """
-        并集
-        :param other:
-        :return:
+        并集，可迭代对象分块写入
+        :param other: Set或者可迭代对象
+        :param chunk_size: 每条SADD的元素个数
+        :param max_in_flight: 每次网络往返发送的SADD个数
+        :return: 写入的元素个数，other是Set时在服务端合并，返回合并后的元素个数
         """
         if isinstance(other, Set):
-            self.union_store(self.cache_key, other)
+            return self.union_store(self.cache_key, other)
         elif isinstance(other, Iterable):
-            self.database.sadd(self.cache_key, *other)
+            return self._write_chunks(
+                other, lambda client, chunk: client.sadd(self.cache_key, *chunk), chunk_size, max_in_flight)
         else:
             raise TypeException(u'类型错误')
 
@@ -486,6 +592,75 @@ class Set(Sortable, Container):
         """
         return self.database.srandmember(self.cache_key, count)
 
+    def _set_keys(self, args, dest_key=None):
+        keys = [self.cache_key]
+        for obj in args:
+            if not isinstance(obj, Set):
+                raise TypeException(u'类型错误')
+            keys.append(obj.cache_key)
+        self._check_keys(keys if dest_key is None else [dest_key] + keys)
+        return keys
+
+    def _lazy(self, command, args, ttl):
+        dest_key = self._temp_key()
+        count = self._atomic((command, [dest_key] + self._set_keys(args)), ('expire', (dest_key, ttl)))[0]
+        return SetResult(self.database, dest_key, count)
+
+    def _count(self, command, args):
+        dest_key = self._temp_key()
+        return self._atomic((command, [dest_key] + self._set_keys(args)), ('delete', (dest_key, )))[0]
+
+    def lazy_union(self, *args, **kwargs):
+        """
+        在服务端取并集，结果保存在有过期时间的临时key中，不会把成员传输到客户端
+        :param args: set对象
+        :param kwargs: ttl，临时key的过期时间（秒），默认60
+        :return: SetResult
+        """
+        return self._lazy('sunionstore', args, kwargs.get('ttl', 60))
+
+    def lazy_intersection(self, *args, **kwargs):
+        """
+        在服务端取交集，结果保存在有过期时间的临时key中
+        :param args: set对象
+        :param kwargs: ttl
+        :return: SetResult
+        """
+        return self._lazy('sinterstore', args, kwargs.get('ttl', 60))
+
+    def lazy_difference(self, *args, **kwargs):
+        """
+        在服务端取差集，结果保存在有过期时间的临时key中
+        :param args: set对象
+        :param kwargs: ttl
+        :return: SetResult
+        """
+        return self._lazy('sdiffstore', args, kwargs.get('ttl', 60))
+
+    def union_count(self, *args):
+        """
+        并集的元素个数，在事务中保存到临时key后立即删除，只返回个数
+        :param args: set对象
+        :return:
+        """
+        return self._count('sunionstore', args)
+
+    def intersection_count(self, *args):
+        """
+        交集的元素个数
+        :param args: set对象
+        :return:
+        """
+        return self._count('sinterstore', args)
+
+    def difference_count(self, *args):
+        """
+        差集的元素个数
+        :param args: set对象
+        :return:
+        """
+        return self._count('sdiffstore', args)
+
     def __contains__(self, item):
         """
         判断元素是否存在
@@ -549,6 +724,35 @@ class Set(Sortable, Container):
         return self.database.scard(self.cache_key)
 
 
+class SetResult(Set):
+    """
+    集合运算的结果，保存在有过期时间的临时key中；可以用SSCAN分页遍历、rand抽样、继续进行集合运算，
+    with结束时删除临时key，过期之后是一个空集合
+
+    with audience.lazy_intersection(active) as result:
+        len(result)
+        result.lazy_difference(blocked).rand(100)
+    """
+    def __init__(self, database, cache_key, count=None):
+        """
+
+        :param database:
+        :param cache_key: 临时key
+        :param count: 运算时得到的元素个数
+        """
+        super(SetResult, self).__init__(database, cache_key)
+        self.count = count
+
+    def __repr__(self):
+        return '<SetResult %s count=%r>' % (self.cache_key, self.count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.delete()
+
+
 class SortedSet(Sortable, Container):
     def data(self, is_with_score=True):
         """
@@ -558,30 +762,44 @@ class SortedSet(Sortable, Container):
         """
         return self.range(0, -1, False, is_with_score)
 
-    def _scan(self, pattern=None, count=None):
+    def _scan(self, pattern=None, count=None, prefetch=1, partition=None):
         """
-        分片读取，避免一次获取大量的数据导致内存被挤爆
+        分片读取，避免一次获取大量的数据导致内存被挤爆，读取当前页的同时在辅助线程中预取之后的页
         :param pattern:
         :param count:
+        :param prefetch: 最多预取的页数
+        :param partition: (index, total)，只返回属于该分区的元素
         :return:
         """
-        return self.database.zscan_iter(self.cache_key, pattern, count)
+        return prefetch_scan(self.database, 'zscan', self.cache_key, pattern, count, prefetch, partition)
 
-    def append(self, mapping=None, **kwargs):
+    def iter_scan(self, pattern=None, count=None, prefetch=2, partition=None):
         """
-        添加成员分值，成员到有序集合中
-        :param mapping:
-        :param kwargs:
+        预取的分片读取，多个进程可以通过partition分别处理一部分元素
+        :param pattern:
+        :param count: 每页的COUNT
+        :param prefetch: 最多预取的页数，内存中最多有prefetch + 2页
+        :param partition: (index, total)
         :return:
         """
+        return self._scan(pattern, count, prefetch, partition)
+
+    def append(self, mapping=None, chunk_size=CHUNK_SIZE, max_in_flight=MAX_IN_FLIGHT, **kwargs):
+        """
+        添加成员分值，成员到有序集合中，分块写入
+        :param mapping: {成员: 分值}或者(成员, 分值)的可迭代对象
+        :param chunk_size: 每条ZADD的成员个数
+        :param max_in_flight: 每次网络往返发送的ZADD个数
+        :param kwargs:
+        :return: 写入的成员个数
+        """
         if not mapping and not kwargs:
             raise TypeException(u'类型错误')
-        if not kwargs:
-            _mapping = mapping
-        else:
-            _mapping = mapping.copy() if mapping else {}
-            _mapping.update(kwargs)
-        self.database.zadd(self.cache_key, _mapping)
+        items = mapping.items() if isinstance(mapping, dict) else mapping or ()
+        if kwargs:
+            items = itertools.chain(items, kwargs.items())
+        return self._write_chunks(
+            items, lambda client, chunk: client.zadd(self.cache_key, dict(chunk)), chunk_size, max_in_flight)
 
     def incr(self, member, amount=1):
         """
@@ -619,6 +837,7 @@ class SortedSet(Sortable, Container):
             else:
                 raise TypeException(u'类型错误')
 
+        self._check_keys([dest_key] + keys)
         return self.database.zinterstore(dest_key, keys)
 
     def union_store(self, dest_key, *args):
@@ -635,6 +854,7 @@ class SortedSet(Sortable, Container):
             else:
                 raise TypeException(u'类型错误')
 
+        self._check_keys([dest_key] + keys)
         return self.database.zunionstore(dest_key, keys)
 
     def pop_max(self, count=1):
@@ -745,6 +965,48 @@ class SortedSet(Sortable, Container):
         """
         return self.database.zscore(self.cache_key, value)
 
+    def _lookup(self, command, members):
+        return self._value(self._run_script('sorted_set_lookup', [self.cache_key], [command] + members))
+
+    def scores(self, members):
+        """
+        一次网络往返获取多个成员的分值，服务端支持时使用ZMSCORE（redis 6.2），否则以及Batch中使用lua脚本
+        :param members:
+        :return: 和members对应的分值列表，不存在的成员是None
+        """
+        members = list(members)
+        if not members:
+            return []
+        # 服务端不支持ZMSCORE时记录在database上，之后不再尝试
+        if not getattr(self.database, 'is_batch', False) and not getattr(self.database, '_no_zmscore', False):
+            try:
+                return self.database.zmscore(self.cache_key, members)
+            except ResponseError as e:
+                if 'unknown command' not in str(e).lower():
+                    raise
+                self.database._no_zmscore = True
+        return [None if score is None else float(score) for score in self._lookup('zscore', members)]
+
+    def ranks(self, members, is_reverse=False):
+        """
+        一次网络往返获取多个成员的排名
+        :param members:
+        :param is_reverse:
+        :return: 和members对应的排名列表，不存在的成员是None
+        """
+        members = list(members)
+        if not members:
+            return []
+        return self._lookup('zrevrank' if is_reverse else 'zrank', members)
+
+    def contains_many(self, members):
+        """
+        一次网络往返判断多个成员是否存在
+        :param members:
+        :return: 和members对应的bool列表
+        """
+        return [score is not None for score in self.scores(members)]
+
     def remove(self, *members):
         """
         删除成员
@@ -799,9 +1061,9 @@ class SortedSet(Sortable, Container):
 
     def __contains__(self, item):
         """
-        判断元素是否在有序集合中
+        判断元素是否在有序集合中，分值为0时也存在
         """
-        return bool(self.score(item))
+        return self._value(self.score(item)) is not None
 
     def __iter__(self):
         """
@@ -840,13 +1102,38 @@ class List(Sortable, Container):
         """
         self.database.lpush(self.cache_key, val)
 
-    def extend(self, values):
+    def extend(self, values, chunk_size=CHUNK_SIZE, max_in_flight=MAX_IN_FLIGHT):
+        """
+        添加数组，分块写入，保持原来的顺序
+        :param values: 可迭代对象，可以是生成器
+        :param chunk_size: 每条RPUSH的元素个数
+        :param max_in_flight: 每次网络往返发送的RPUSH个数
+        :return: 写入的元素个数
+        """
+        return self._write_chunks(
+            values, lambda client, chunk: client.rpush(self.cache_key, *chunk), chunk_size, max_in_flight)
+
+    def push_capped(self, max_length, *values):
+        """
+        往数组头添加值，并且只保留最新的max_length个，在脚本中执行，只有一次网络往返
+        :param max_length: 最大长度
+        :param values: 按照时间顺序，最后一个在数组头
+        :return: 添加后的长度
+        """
+        if max_length < 1 or not values:
+            raise TypeException(u'max_length必须大于0，并且至少有一个值')
+        # 更早的值添加之后也会被删除
+        return self._run_script('list_push_capped', [self.cache_key], (max_length, ) + values[-max_length:])
+
+    def latest(self, count):
         """
-        添加数组
-        :param values:
+        获取数组头的count个值，也就是push_capped最新添加的值，不需要获取长度
+        :param count: 小于1时返回空列表
         :return:
         """
-        self.database.rpush(self.cache_key, *values)
+        if count < 1:
+            return []
+        return self.database.lrange(self.cache_key, 0, count - 1)
 
     def insert_by_value(self, item, value, is_before=True):
         """
@@ -865,23 +1152,19 @@ class List(Sortable, Container):
         :param index:
         :return:
         """
-        ll = len(self)
-        if not ll:
-            raise EmptyException("不允许为空")
-
-        if index is None or index == ll - 1:
-            return self.database.rpop(self.cache_key)
-        if index == 0:
-            return self.database.lpop(self.cache_key)
-        else:
-            l = len(self)
-            if not (0 <= index < l):
-                raise IndexErrorException('越界错误')
+        if index is None or index == 0:
+            value = self.database.rpop(self.cache_key) if index is None else self.database.lpop(self.cache_key)
+            if self._value(value) is None:
+                raise EmptyException("不允许为空")
+            return value
 
-            val = self[index]
-            self.database.lset(self.cache_key, index, "__del")
-            self.database.lrem(self.cache_key, 1, "__del")
-            return val
+        # 先用唯一的占位值替换，再删除占位值，在脚本中执行不会被其他客户端插入
+        result = self._run_script('list_pop', [self.cache_key], [index, '__mredis_deleted_%s' % uuid.uuid4().hex])
+        if result[0] == 1:
+            raise EmptyException("不允许为空")
+        if result[0] == 2:
+            raise IndexErrorException('越界错误')
+        return result[1]
 
     def block_pop_left(self, timeout=0):
         """
@@ -924,12 +1207,10 @@ class List(Sortable, Container):
 
     def __getitem__(self, item):
         """
-        cur[index]
+        cur[index]，切片和python的列表相同（不包括stop，支持负数和步长），只有一次LRANGE
         """
         if isinstance(item, slice):
-            start = item.start or 0
-            stop = item.stop or len(self)
-            return self.database.lrange(self.cache_key, start, stop)
+            return self._slice(item.start, item.stop, item.step)
         elif isinstance(item, int):
             result = self.database.lrange(self.cache_key, item, item)
             if not result:
@@ -938,6 +1219,53 @@ class List(Sortable, Container):
         else:
             raise TypeException(u'类型错误')
 
+    def _slice(self, start, stop, step):
+        """
+        把python的切片转换成LRANGE的闭区间，LRANGE和python一样处理负数和越界的下标，不需要先获取长度
+        :param start:
+        :param stop:
+        :param step:
+        :return:
+        """
+        step = 1 if step is None else step
+        if step == 0:
+            raise ValueError('slice step cannot be zero')
+
+        if step > 0:
+            if stop == 0:
+                return []
+            result = self.database.lrange(self.cache_key, start or 0, -1 if stop is None else stop - 1)
+            return result if step == 1 else self._value(result)[::step]
+
+        # 倒序时读取(stop, start]，反转后再按步长取
+        if stop == -1:
+            return []
+        result = self.database.lrange(self.cache_key, 0 if stop is None else stop + 1, -1 if start is None else start)
+        return self._value(result)[::-1][::-step]
+
+    def iter_chunks(self, size=CHUNK_SIZE, is_reverse=False, prefetch=1):
+        """
+        按照LRANGE的窗口分页读取，辅助线程在返回当前页的同时读取下一页，内存中最多有prefetch + 2页；
+        遍历期间其他客户端修改列表时可能重复或者遗漏元素
+        :param size: 每页的元素个数
+        :param is_reverse: 是否从末尾开始读取，每页中的元素也是倒序的
+        :param prefetch: 最多预取的页数，Batch中不预取
+        :return: 生成器，每次返回一页的列表
+        """
+        if size < 1:
+            raise TypeException(u'size必须大于0')
+        if getattr(self.database, 'is_batch', False):
+            prefetch = 0
+
+        def page(offset):
+            if is_reverse:
+                items = self._value(self.database.lrange(self.cache_key, -offset - size, -offset - 1))[::-1]
+            else:
+                items = self._value(self.database.lrange(self.cache_key, offset, offset + size - 1))
+            return offset + size if len(items) == size else 0, items
+
+        return iter_pages(page, prefetch, self.database)
+
     def __iadd__(self, other):
         """
         累加
@@ -956,9 +1284,16 @@ class List(Sortable, Container):
 
     def __iter__(self):
         """
-        iter for list
+        iter for list，分页读取，不会一次读取整个列表
+        """
+        return itertools.chain.from_iterable(self.iter_chunks())
+
+    def __reversed__(self):
         """
-        return iter(self.data())
+        从末尾开始分页读取
+        :return:
+        """
+        return itertools.chain.from_iterable(self.iter_chunks(is_reverse=True))
 
     def __len__(self):
         """
@@ -979,10 +1314,59 @@ class List(Sortable, Container):
         """
         if not isinstance(item, int):
             raise TypeException(u'类型错误')
-        ll = len(self)
-        if not (0 <= item < ll):
+        if item < 0:
+            raise IndexErrorException(u'越界错误')
+        try:
+            return self.database.lset(self.cache_key, item, value)
+        except ResponseError:
+            # 越界或者列表不存在
             raise IndexErrorException(u'越界错误')
-        return self.database.lset(self.cache_key, item, value)
+
+
+class CappedList(List):
+    """
+    固定长度的列表，保存最新的max_length个值，例如每个用户最近的事件，最新的值在数组头
+
+    通过Batch创建时，多个key的push进入同一个pipeline，见MRedis.push_capped
+    """
+    def __init__(self, database, cache_key, max_length):
+        super(CappedList, self).__init__(database, cache_key)
+        if max_length < 1:
+            raise TypeException(u'max_length必须大于0')
+        self.max_length = max_length
+
+    def push(self, *values):
+        """
+        添加值，超出的最早的值被删除
+        :param values: 按照时间顺序，最后一个最新
+        :return: 添加后的长度
+        """
+        return self.push_capped(self.max_length, *values)
+
+    def prepend(self, val):
+        """
+        往数组头添加值
+        :param val:
+        :return:
+        """
+        return self.push(val)
+
+    def _not_capped(self, *args, **kwargs):
+        raise TypeException(u'固定长度的列表只能通过push或者prepend添加值')
+
+    # 往数组尾或者中间添加值不会删除超出的值
+    append = extend = insert_by_value = _not_capped
+
+    def __iadd__(self, other):
+        return self._not_capped()
+
+    def latest(self, count=None):
+        """
+        获取最新的count个值，默认获取全部
+        :param count: 小于1时返回空列表
+        :return:
+        """
+        return super(CappedList, self).latest(self.max_length if count is None else count)
 
 
 class HyperLogLog(Container):
@@ -996,14 +1380,14 @@ class HyperLogLog(Container):
         :param args:
         :return:
         """
-        self.database.pfadd(self.cache_key, args)
+        return self.database.pfadd(self.cache_key, *args)
 
     def count(self):
         """
         获取个数
         :return:
         """
-        return self.database.pfcount()
+        return self.database.pfcount(self.cache_key)
 
     def __len__(self):
         return self.count()
@@ -1027,6 +1411,270 @@ class HyperLogLog(Container):
         return HyperLogLog(self.database, dest)
 
 
+class Bitmap(Container):
+    """
+    整数id的集合，id是字符串中的位，1000万个id只需要1.2MB；id越大字符串越长，适合从0开始连续分配的id
+
+    交集、并集、差集通过BITOP在服务端计算，结果保存在有过期时间的临时key中
+    """
+    # 遍历时每次读取的字节数
+    WINDOW = 4096
+    # 每个字节中为1的位，高位在前
+    _BITS = tuple(tuple(bit for bit in range(8) if byte & (0x80 >> bit)) for byte in range(256))
+    _NOT_ZERO = re.compile(b'[^\\x00]+')
+
+    def __repr__(self):
+        return '<Bitmap %s>' % self.cache_key
+
+    @staticmethod
+    def _offset(member):
+        if isinstance(member, bool) or not isinstance(member, int) or not 0 <= member < 2 ** 32:
+            raise TypeException(u'id必须是小于2^32的非负整数: %r' % (member, ))
+        return member
+
+    def add(self, member):
+        """
+        添加id
+        :param member: 非负整数
+        :return: 之前是否存在，0或者1
+        """
+        return self.database.setbit(self.cache_key, self._offset(member), 1)
+
+    def discard(self, member):
+        """
+        删除id
+        :param member:
+        :return: 之前是否存在，0或者1
+        """
+        return self.database.setbit(self.cache_key, self._offset(member), 0)
+
+    def _set_bits(self, members, bit, chunk_size, max_in_flight):
+        def send(client, chunk):
+            args = []
+            for member in chunk:
+                args.extend(('SET', 'u1', self._offset(member), bit))
+            client.execute_command('BITFIELD', self.cache_key, *args)
+
+        return self._write_chunks(members, send, chunk_size, max_in_flight)
+
+    def add_many(self, members, chunk_size=CHUNK_SIZE, max_in_flight=MAX_IN_FLIGHT):
+        """
+        批量添加，每chunk_size个id一条BITFIELD，每次网络往返发送max_in_flight条
+        :param members: 可迭代对象，可以是生成器
+        :param chunk_size:
+        :param max_in_flight:
+        :return: 写入的id个数
+        """
+        return self._set_bits(members, 1, chunk_size, max_in_flight)
+
+    def discard_many(self, members, chunk_size=CHUNK_SIZE, max_in_flight=MAX_IN_FLIGHT):
+        """
+        批量删除
+        :param members:
+        :param chunk_size:
+        :param max_in_flight:
+        :return: 写入的id个数
+        """
+        return self._set_bits(members, 0, chunk_size, max_in_flight)
+
+    def contains_many(self, members):
+        """
+        一条BITFIELD判断多个id是否存在
+        :param members:
+        :return: 和members对应的bool列表
+        """
+        args = []
+        for member in members:
+            args.extend(('GET', 'u1', self._offset(member)))
+        if not args:
+            return []
+        return [bool(bit) for bit in self._value(self.database.execute_command('BITFIELD', self.cache_key, *args))]
+
+    def _keys(self, others):
+        keys = [self.cache_key]
+        for other in others:
+            if not isinstance(other, Bitmap):
+                raise TypeException(u'类型错误')
+            keys.append(other.cache_key)
+        return keys
+
+    def _bitop(self, operation, others, dest_key):
+        """
+        运算结果保存到dest_key的命令，差集是self AND NOT (others的并集)，通过OR、AND、XOR得到
+        :return: 命令列表
+        """
+        keys = self._keys(others)
+        if operation != 'DIFF':
+            return [('bitop', [operation, dest_key] + keys)]
+        if len(keys) == 1:
+            return [('bitop', ['OR', dest_key, self.cache_key])]
+        return [
+            ('bitop', ['OR', dest_key] + keys[1:]),
+            ('bitop', ['AND', dest_key, self.cache_key, dest_key]),
+            ('bitop', ['XOR', dest_key, self.cache_key, dest_key]),
+        ]
+
+    def _lazy(self, operation, others, ttl):
+        dest_key = self._temp_key()
+        commands = self._bitop(operation, others, dest_key)
+        commands.extend((('bitcount', (dest_key, )), ('expire', (dest_key, ttl))))
+        return BitmapResult(self.database, dest_key, self._atomic(*commands)[-2])
+
+    def _count(self, operation, others):
+        dest_key = self._temp_key()
+        commands = self._bitop(operation, others, dest_key)
+        commands.extend((('bitcount', (dest_key, )), ('delete', (dest_key, ))))
+        return self._atomic(*commands)[-2]
+
+    def intersection(self, *others, **kwargs):
+        """
+        交集，保存在有过期时间的临时key中
+        :param others: Bitmap对象
+        :param kwargs: ttl，临时key的过期时间（秒），默认60
+        :return: BitmapResult
+        """
+        return self._lazy('AND', others, kwargs.get('ttl', 60))
+
+    def union(self, *others, **kwargs):
+        """
+        并集
+        :param others: Bitmap对象
+        :param kwargs: ttl
+        :return: BitmapResult
+        """
+        return self._lazy('OR', others, kwargs.get('ttl', 60))
+
+    def difference(self, *others, **kwargs):
+        """
+        差集
+        :param others: Bitmap对象
+        :param kwargs: ttl
+        :return: BitmapResult
+        """
+        return self._lazy('DIFF', others, kwargs.get('ttl', 60))
+
+    def symmetric_difference(self, other, ttl=60):
+        """
+        对称差集
+        :param other: Bitmap对象
+        :param ttl:
+        :return: BitmapResult
+        """
+        return self._lazy('XOR', (other, ), ttl)
+
+    def intersection_count(self, *others):
+        """
+        交集的id个数，在事务中保存到临时key、计数后立即删除
+        :param others: Bitmap对象
+        :return:
+        """
+        return self._count('AND', others)
+
+    def union_count(self, *others):
+        """
+        并集的id个数
+        :param others: Bitmap对象
+        :return:
+        """
+        return self._count('OR', others)
+
+    def difference_count(self, *others):
+        """
+        差集的id个数
+        :param others: Bitmap对象
+        :return:
+        """
+        return self._count('DIFF', others)
+
+    def __and__(self, other):
+        return self.intersection(other)
+
+    def __or__(self, other):
+        return self.union(other)
+
+    def __sub__(self, other):
+        return self.difference(other)
+
+    def __xor__(self, other):
+        return self.symmetric_difference(other)
+
+    def iter_ids(self, window=None, prefetch=1):
+        """
+        按照id从小到大遍历，每次读取window个字节并在本地解码；同一次网络往返中通过BITPOS找到下一个不为0的位置，
+        跳过为0的区域，稀疏的位图不会读取整个字符串
+        :param window: 每次读取的字节数，默认WINDOW
+        :param prefetch: 最多预取的页数，Batch中不预取
+        :return: 生成器
+        """
+        window = window or self.WINDOW
+        if window < 1:
+            raise TypeException(u'window必须大于0')
+        if getattr(self.database, 'is_batch', False):
+            prefetch = 0
+
+        def page(offset):
+            pipe = self.database.pipeline(transaction=False)
+            pipe.execute_command('GETRANGE', self.cache_key, offset, offset + window - 1, NEVER_DECODE=True)
+            pipe.bitpos(self.cache_key, 1, offset + window)
+            value, position = pipe.execute()
+            ids = []
+            for match in self._NOT_ZERO.finditer(value):
+                for index, byte in enumerate(match.group(), offset + match.start()):
+                    ids.extend(index * 8 + bit for bit in self._BITS[byte])
+            return (position // 8 if position >= 0 else 0), ids
+
+        return itertools.chain.from_iterable(iter_pages(page, prefetch, self.database))
+
+    def __iter__(self):
+        return self.iter_ids()
+
+    def data(self):
+        """
+        所有的id
+        :return: set
+        """
+        return set(self.iter_ids())
+
+    def __contains__(self, member):
+        """
+        判断id是否存在
+        :param member:
+        :return:
+        """
+        return bool(self._value(self.database.getbit(self.cache_key, self._offset(member))))
+
+    def __len__(self):
+        """
+        id的个数
+        :return:
+        """
+        return self.database.bitcount(self.cache_key)
+
+
+class BitmapResult(Bitmap):
+    """
+    位图运算的结果，保存在有过期时间的临时key中，with结束时删除
+    """
+    def __init__(self, database, cache_key, count=None):
+        """
+
+        :param database:
+        :param cache_key: 临时key
+        :param count: 运算时得到的id个数
+        """
+        super(BitmapResult, self).__init__(database, cache_key)
+        self.count = count
+
+    def __repr__(self):
+        return '<BitmapResult %s count=%r>' % (self.cache_key, self.count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.delete()
+
+
 class Stream(Container):
     """
     流
@@ -1068,9 +1716,8 @@ class Stream(Container):
         :return:
         """
         if isinstance(item, slice):
-            return self.database.range(item.start, item.stop, item.stop - item.start + 1)
-
-        return self.database.get(item)
+            return self.range(item.start or '-', item.stop or '+')
+        return self.get(item)
 
     def get(self, msg_id):
         """
@@ -1078,7 +1725,7 @@ class Stream(Container):
         :param msg_id:
         :return:
         """
-        res = self[msg_id:msg_id:1]
+        res = self.database.xrange(self.cache_key, msg_id, msg_id, 1)
         if res:
             return res[0]
 
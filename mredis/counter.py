@@ -1,11 +1,18 @@
 # -*- coding: UTF-8 -*-
-from collections import Mapping
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from mredis.lua import registry
 
 
 class Counter(object):
     """
     计数器
     """
+    lua_incr = registry['counter_incr']
+
     def __init__(self, database, cache_key, expire_time=60 * 60 * 24):
         self.database = database
         self.cache_key = cache_key
@@ -13,16 +20,13 @@ class Counter(object):
 
     def incr(self, key, amount=1):
         """
-        增加指定的值，每次更新后会重新设置过期时间
+        增加指定的值，每次更新后会重新设置过期时间，为0时删除；在脚本中执行，只有一次网络往返，
+        批量执行中不需要先取出结果
         :param key:
         :param amount:
         :return:
         """
-        count = self.database.hincrby(self.cache_key, key, amount)
-        if not count:
-            self.remove(key)
-        self._expire()
-        return count
+        return self.lua_incr(self.database, keys=[self.cache_key], args=[key, amount, self.expire_time])
 
     def decr(self, key, amount=-1):
         """
@@ -1,16 +1,67 @@
 # -*- coding: UTF-8 -*-
 
+import contextlib
 import functools
 import hashlib
-from collections import Iterable
+import math
+import random
+import threading
+import time
+try:
+    from collections.abc import Iterable
+except ImportError:
+    from collections import Iterable
 
 from redis import Redis
+from redis.client import Pipeline as BasePipeline
+from redis.exceptions import ConnectionError, TimeoutError
 
-from mredis.badge import BadgeManager
-from mredis.containers import List, Set, SortedSet, Hash, HyperLogLog, Container
-from mredis.counter import Counter
-from mredis.lock import Lock
-from mredis.rate_limit import RateLimit
+from mredis.utils import hash_key
+
+# 容器和辅助类在第一次使用时才导入，只使用MRedis的进程不需要加载全部模块
+
+_MISSING = object()
+
+
+def _preload_scripts(connect_func=None):
+    """
+    建立连接时预加载lua脚本的redis_connect_func
+    :param connect_func: 原来的redis_connect_func，预加载之前调用
+    :return:
+    """
+    def on_connect(connection):
+        from mredis.lua import registry
+        registry.on_connect(connection, connect_func)
+    return on_connect
+
+
+class Pipeline(BasePipeline):
+    """
+    MRedis的pipeline，开启explain时记录整个pipeline，开启命令统计时记录其中的每个命令
+    """
+    def __init__(self, database, transaction=True, shard_hint=None):
+        self.database = database
+        super(Pipeline, self).__init__(database.connection_pool, database.response_callbacks, transaction, shard_hint)
+
+    def execute(self, raise_on_error=True):
+        if not self.command_stack:
+            return self._execute(raise_on_error)
+        execute = self._execute
+        explain = getattr(self.database._local, 'explain', None)
+        if explain is not None:
+            execute = functools.partial(explain.execute_pipeline, execute, list(self.command_stack))
+        instrumentation = getattr(self.database, 'instrumentation', None)
+        if instrumentation is not None:
+            return instrumentation.execute_pipeline(execute, list(self.command_stack), raise_on_error)
+        return execute(raise_on_error)
+
+    def _execute(self, raise_on_error):
+        """
+        真正执行排队的命令
+        :param raise_on_error:
+        :return:
+        """
+        return super(Pipeline, self).execute(raise_on_error)
 
 
 class MRedis(Redis):
@@ -18,14 +69,135 @@ class MRedis(Redis):
     redis客户端
     """
     def __init__(self, *args, **kwargs):
+        """
+        除了Redis的参数外：
+        :param serializer: 序列化器，set_pickle/get_pickle和func_cache默认使用
+        :param replicas: 从库列表，只读的命令会发送到从库，事务、pipeline、锁内的命令仍然发送到主库；
+                         容器的方法需要读取主库时使用with db.consistent()
+        :param replica_strategy: 选择从库的策略，round_robin或者least_outstanding
+        :param max_replica_lag: 允许从库落后的最大复制偏移量（字节）
+        :param preload_scripts: 建立连接时是否把mredis的lua脚本加载到服务端，
+                                只对MRedis自己创建的连接池有效，传入的connection_pool可能被其他客户端共用，不会修改
+        """
+        self._serializer = kwargs.pop('serializer', None)
+        replicas = kwargs.pop('replicas', None)
+        replica_strategy = kwargs.pop('replica_strategy', 'round_robin')
+        max_replica_lag = kwargs.pop('max_replica_lag', None)
+        preload_scripts = kwargs.pop('preload_scripts', True)
+        self._local = threading.local()
+        self.replica_set = None
+        self.instrumentation = None
+        own_pool = kwargs.get('connection_pool') is None
         super(MRedis, self).__init__(*args, **kwargs)
 
+        if preload_scripts and own_pool:
+            connection_kwargs = self.connection_pool.connection_kwargs
+            connection_kwargs['redis_connect_func'] = _preload_scripts(connection_kwargs.get('redis_connect_func'))
+
+        if replicas:
+            from mredis.replica import ReplicaSet
+            self.replica_set = ReplicaSet(self, replicas, replica_strategy, max_replica_lag)
+
+    @property
+    def serializer(self):
+        """
+        序列化器，没有指定时使用默认的pickle序列化器
+        :return:
+        """
+        if self._serializer is None:
+            from mredis.serializer import default_serializer
+            self._serializer = default_serializer
+        return self._serializer
+
+    @serializer.setter
+    def serializer(self, serializer):
+        self._serializer = serializer
+
+    def execute_command(self, *args, **options):
+        """
+        执行命令，只读命令在开启从库时发送到从库，consistent=True时强制发送到主库；
+        容器的方法不支持consistent参数，需要读取主库时使用with db.consistent()
+        :param args:
+        :param options:
+        :return:
+        """
+        execute = self._route_command
+        explain = getattr(self._local, 'explain', None)
+        if explain is not None:
+            execute = functools.partial(explain.execute, execute)
+        if self.instrumentation is not None:
+            return self.instrumentation.execute(execute, *args, **options)
+        return execute(*args, **options)
+
+    def _route_command(self, *args, **options):
+        consistent = options.pop('consistent', False)
+        if self.replica_set is not None and not consistent and not getattr(self._local, 'consistent', 0):
+            from mredis.replica import READ_COMMANDS
+            if args[0] in READ_COMMANDS:
+                idx = self.replica_set.choose()
+                if idx is not None:
+                    try:
+                        return self.replica_set.execute_command(idx, *args, **options)
+                    except (ConnectionError, TimeoutError):
+                        # 从库不可用时在主库上重试
+                        pass
+        return super(MRedis, self).execute_command(*args, **options)
+
+    def instrument(self, attribute=True):
+        """
+        开启命令统计，记录每个命令的次数和延迟，并且归属到发起命令的容器方法
+        :param attribute: 是否通过调用栈找到发起命令的容器方法
+        :return: Instrumentation
+        """
+        if self.instrumentation is None:
+            from mredis.instrument import Instrumentation
+            self.instrumentation = Instrumentation(attribute)
+        return self.instrumentation
+
+    def uninstrument(self):
+        """
+        关闭命令统计
+        :return:
+        """
+        self.instrumentation = None
+
+    def explain(self, server_time=True):
+        """
+        记录当前线程中每次高层调用执行的命令、网络往返次数、字节数和耗时，
+        with db.explain() as explain: ...; print(explain.report())
+        :param server_time: 是否通过INFO commandstats统计服务端耗时
+        :return: Explain
+        """
+        from mredis.explain import Explain
+        return Explain(self, server_time)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        """
+        创建pipeline，执行时会被explain和命令统计记录
+        :param transaction:
+        :param shard_hint:
+        :return:
+        """
+        return Pipeline(self, transaction, shard_hint)
+
+    @contextlib.contextmanager
+    def consistent(self):
+        """
+        在with中的命令都发送到主库，可以嵌套，容器的方法只能通过它读取主库
+        :return:
+        """
+        self._local.consistent = getattr(self._local, 'consistent', 0) + 1
+        try:
+            yield self
+        finally:
+            self._local.consistent -= 1
+
     def __iter__(self):
         """
         迭代器
         :return:
         """
-        return iter(self.scan_iter())
+        return self.iter_scan(prefetch=1)
 
     def search(self, pattern):
         """
@@ -33,7 +205,21 @@ class MRedis(Redis):
         :param pattern:
         :return:
         """
-        return self.scan_iter(pattern)
+        return self.iter_scan(pattern, prefetch=1)
+
+    def iter_scan(self, match=None, count=None, prefetch=2, partition=None, _type=None):
+        """
+        预取的SCAN，读取当前页的同时在辅助线程中读取之后的页
+        :param match:
+        :param count: 每页的COUNT
+        :param prefetch: 最多预取的页数
+        :param partition: (index, total)，多个进程分别遍历时只返回属于第index个分区的key
+        :param _type: 只返回该类型的key
+        :return:
+        """
+        from mredis.scan import prefetch_scan
+        kwargs = {'_type': _type} if _type is not None else {}
+        return prefetch_scan(self, 'scan', match=match, count=count, prefetch=prefetch, partition=partition, **kwargs)
 
     def List(self, cache_key):
         """
@@ -41,14 +227,43 @@ class MRedis(Redis):
         :param cache_key:
         :return:
         """
+        from mredis.containers import List
         return List(self, cache_key)
 
+    def CappedList(self, cache_key, max_length):
+        """
+        创建固定长度的列表对象，只保留最新的max_length个值
+        :param cache_key:
+        :param max_length:
+        :return:
+        """
+        from mredis.containers import CappedList
+        return CappedList(self, cache_key, max_length)
+
+    def push_capped(self, cache_keys, values, max_length, chunk_size=1000):
+        """
+        把相同的值添加到多个固定长度的列表中，例如把一个事件分发给所有的关注者，每chunk_size个key一次网络往返
+        :param cache_keys: 可迭代对象
+        :param values: 值的列表，最后一个最新
+        :param max_length:
+        :param chunk_size: 每个pipeline中的key的个数
+        :return: key的个数
+        """
+        from mredis.batch import Batch
+        count = 0
+        with Batch(self, chunk_size) as batch:
+            for cache_key in cache_keys:
+                batch.CappedList(cache_key, max_length).push(*values)
+                count += 1
+        return count
+
     def Set(self, cache_key):
         """
         创建集合对象
         :param cache_key:
         :return:
         """
+        from mredis.containers import Set
         return Set(self, cache_key)
 
     def SortedSet(self, cache_key):
@@ -57,6 +272,7 @@ class MRedis(Redis):
         :param cache_key:
         :return:
         """
+        from mredis.containers import SortedSet
         return SortedSet(self, cache_key)
 
     def Hash(self, cache_key):
@@ -65,16 +281,66 @@ class MRedis(Redis):
         :param cache_key:
         :return:
         """
+        from mredis.containers import Hash
         return Hash(self, cache_key)
 
+    def Bitmap(self, cache_key):
+        """
+        创建整数id的位图对象
+        :param cache_key:
+        :return:
+        """
+        from mredis.containers import Bitmap
+        return Bitmap(self, cache_key)
+
     def HyperLogLog(self, cache_key):
         """
         创建基数统计对象
         :param cache_key:
         :return:
         """
+        from mredis.containers import HyperLogLog
         return HyperLogLog(self, cache_key)
 
+    def BloomFilter(self, cache_key, capacity, error_rate=0.01, scalable=False, growth=2, tightening=0.5):
+        """
+        创建布隆过滤器对象
+        :param cache_key:
+        :param capacity: 预计的元素个数
+        :param error_rate: 误判率
+        :param scalable: 超过容量后是否增加一层
+        :param growth:
+        :param tightening:
+        :return:
+        """
+        from mredis.probabilistic import BloomFilter
+        return BloomFilter(self, cache_key, capacity, error_rate, scalable, growth, tightening)
+
+    def CountMinSketch(self, cache_key, width=2000, depth=5, conservative=True):
+        """
+        创建估计元素次数的Count-Min Sketch对象
+        :param cache_key:
+        :param width: 每行计数器的个数
+        :param depth: 行数
+        :param conservative: 是否使用保守更新
+        :return:
+        """
+        from mredis.probabilistic import CountMinSketch
+        return CountMinSketch(self, cache_key, width, depth, conservative)
+
+    def TopK(self, cache_key, k, width=2000, depth=5, conservative=True):
+        """
+        创建出现次数最多的k个元素的对象
+        :param cache_key:
+        :param k:
+        :param width: sketch每行计数器的个数
+        :param depth: sketch的行数
+        :param conservative:
+        :return:
+        """
+        from mredis.probabilistic import TopK
+        return TopK(self, cache_key, k, width, depth, conservative)
+
     def Counter(self, cache_key, expire_time=60 * 60 * 24):
         """
         创建计数器对象
@@ -82,6 +348,7 @@ class MRedis(Redis):
         :param expire_time:
         :return:
         """
+        from mredis.counter import Counter
         return Counter(self, cache_key, expire_time)
 
     def RateLimit(self, cache_key, limit=5, per=60, ret=None):
@@ -93,16 +360,17 @@ class MRedis(Redis):
         :param ret:
         :return:
         """
+        from mredis.rate_limit import RateLimit
         return RateLimit(self, cache_key, limit, per, ret)
 
-    def Lock(self, cache_key, expire_times=60 * 60 * 24):
+    def Lock(self, cache_key):
         """
-        创建锁
+        创建锁，过期时间在acquire时指定
         :param cache_key:
-        :param expire_times:
         :return:
         """
-        return Lock(self, cache_key, expire_times)
+        from mredis.lock import Lock
+        return Lock(self, cache_key)
 
     def BadgeManager(self, basic_cache_key, expire_time=60 * 60 * 24):
         """
@@ -111,35 +379,244 @@ class MRedis(Redis):
         :param expire_time:
         :return:
         """
+        from mredis.badge import BadgeManager
         return BadgeManager(self, basic_cache_key, expire_time)
 
-    def _get_func_cache_key_id(self, func, args, kwargs):
+    def batch(self, size=None, transaction=False):
         """
-        函数缓存的key
+        创建批量执行，通过它创建的容器的命令会进入同一个pipeline
+        :param size: 排队的命令达到该数量时自动执行
+        :param transaction: 是否使用事务
         :return:
         """
-        str_value = (func.__name__ + str(args) + str(kwargs)).encode('utf-8')
-        md5 = hashlib.md5()
-        md5.update(str_value)
-        return md5.hexdigest()
+        from mredis.batch import Batch
+        return Batch(self, size, transaction)
+
+    def LocalCache(self, max_entries=1024, max_size=None, expire_time=60,
+                   channel='mredis_local_cache_invalidate'):
+        """
+        创建进程内的一级缓存
+        :param max_entries:
+        :param max_size:
+        :param expire_time:
+        :param channel:
+        :return:
+        """
+        from mredis.local_cache import LocalCache
+        return LocalCache(self, max_entries, max_size, expire_time, channel)
+
+    def NearCache(self, max_entries=1024, max_size=None, max_staleness=5, invalidation='keyspace', **kwargs):
+        """
+        创建容器的进程内副本，通过返回对象的Hash、Set、SortedSet创建的容器读取本地副本
+        :param max_entries:
+        :param max_size:
+        :param max_staleness:
+        :param invalidation: keyspace或者version
+        :param kwargs: key_pattern、configure、channel
+        :return:
+        """
+        from mredis.near_cache import NearCache
+        return NearCache(self, max_entries, max_size, max_staleness, invalidation, **kwargs)
+
+    def _get_func_cache_key_id(self, func, args, kwargs, key_func=None):
+        """
+        函数缓存的key，格式为func_cache:模块名.函数名:参数的哈希值
+        关键字参数按照名字排序，顺序不同的相同参数得到相同的key
+        :param func:
+        :param args:
+        :param kwargs:
+        :param key_func: 自定义参数部分的函数，参数和被装饰的函数相同
+        :return:
+        """
+        name = '%s.%s' % (func.__module__, getattr(func, '__qualname__', func.__name__))
+        if key_func is not None:
+            return 'func_cache:%s:%s' % (name, key_func(*args, **kwargs))
+
+        str_value = repr((args, sorted(kwargs.items()))).encode('utf-8')
+        return 'func_cache:%s:%s' % (name, hash_key(str_value))
+
+    def _load_func_cache(self, cache_key, with_ttl=False, serializer=None):
+        """
+        读取函数缓存
+        :param cache_key:
+        :param with_ttl: 是否同时获取剩余的过期时间（同一次网络请求）
+        :param serializer:
+        :return: (是否命中, 值, 剩余的秒数)
+        """
+        from mredis.containers import Container
+        container = Container(database=self, cache_key=cache_key)
+        if not with_ttl:
+            res = container.get_pickle(default=_MISSING, serializer=serializer)
+            return res is not _MISSING, res, None
+
+        pipe = self.pipeline(transaction=False)
+        pipe.execute_command('GET', cache_key, NEVER_DECODE=True)
+        pipe.pttl(cache_key)
+        data, left_ms = pipe.execute()
+        if not data:
+            return False, None, None
+        return True, (serializer or self.serializer).loads(data), left_ms / 1000.0
 
-    def func_cache(self, expire_times=60 * 60):
+    def func_cache(self, expire_times=60 * 60, local_cache=None, single_flight=False, wait_timeout=1,
+                   lock_times=10, beta=None, serializer=None, key_func=None):
         """
-        函数缓存实现
+        函数缓存实现，被装饰的函数提供：
+        1.invalidate(*args, **kwargs)：删除缓存
+        2.many(list_of_args, **kwargs)：批量调用，一次MGET读取所有缓存，只计算没有命中的，并且用一个pipeline写回
+        3.stats：记录每一层的命中次数，多线程调用时加锁计数
+
+        防止缓存击穿：
+        1.single_flight：缓存失效时只有获取到锁的调用者重新计算，其他调用者等待结果，超时后自己计算
+        2.beta：概率性提前重新计算（XFetch），越接近过期、计算越耗时，提前计算的概率越大；
+          开启后缓存的值为(结果, 计算耗时)，不能和未开启的缓存混用
         :param expire_times:
+        :param local_cache: 进程内的一级缓存（LocalCache），默认只使用redis
+        :param single_flight: 是否只允许一个调用者重新计算
+        :param wait_timeout: 等待其他调用者计算结果的时间
+        :param lock_times: 重新计算时锁的时间
+        :param beta: 提前计算的系数，一般为1，越大越提前，默认不提前计算
+        :param serializer: 序列化器，默认使用self.serializer
+        :param key_func: 自定义缓存key的参数部分，参数和被装饰的函数相同，默认为参数的哈希值
         :return:
         """
+        if local_cache is not None:
+            local_cache.subscribe()
+        from mredis.containers import Container
+        from mredis.lock import Lock
+        serializer = serializer or self.serializer
+
         def wrapper(func):
+            stats = {'local': {'hits': 0, 'misses': 0}, 'redis': {'hits': 0, 'misses': 0}}
+            stats_mutex = threading.Lock()
+
+            def count(tier, is_hit):
+                with stats_mutex:
+                    stats[tier]['hits' if is_hit else 'misses'] += 1
+
+            def load(cache_key):
+                is_hit, res, left_time = self._load_func_cache(cache_key, bool(beta), serializer)
+                if not is_hit or not beta:
+                    return is_hit, res, False
+
+                res, delta = res
+                # XFetch: -delta * beta * ln(rand)大于剩余时间时提前计算
+                is_early = left_time >= 0 and -delta * beta * math.log(1.0 - random.random()) >= left_time
+                return True, res, is_early
+
+            def call(args, kwargs):
+                """
+                调用函数
+                :return: (结果, 需要缓存的值)
+                """
+                start_time = time.time()
+                res = func(*args, **kwargs)
+                return res, (res, time.time() - start_time) if beta else res
+
+            def compute(cache_key, args, kwargs):
+                res, data = call(args, kwargs)
+                Container(database=self, cache_key=cache_key).set_pickle(data, expire_times, serializer)
+                return res
+
+            def set_local(cache_key, res):
+                size = len(serializer.dumps(res)) if local_cache.max_size is not None else 1
+                local_expire_time = min(expire_times, local_cache.expire_time) if expire_times else None
+                local_cache.set(cache_key, res, size, local_expire_time)
+
+            def compute_once(cache_key, is_hit, res, args, kwargs):
+                lock = Lock(database=self, cache_key='func_cache_lock_%s' % cache_key)
+                if is_hit:
+                    # 提前计算时只有一个调用者计算，其他调用者继续使用旧的值
+                    if not lock.acquire(expire_time=lock_times, blocking=False):
+                        return res
+                elif lock.acquire(block_timeout=wait_timeout, expire_time=lock_times):
+                    # 等待期间可能已经被其他调用者计算好了，从主库读取，从库可能还没有同步
+                    with self.consistent():
+                        is_hit, res, _ = load(cache_key)
+                    if is_hit:
+                        lock.release()
+                        return res
+                else:
+                    return func(*args, **kwargs)
+
+                try:
+                    return compute(cache_key, args, kwargs)
+                finally:
+                    lock.release()
+
             @functools.wraps(func)
             def _wrapper(*args, **kwargs):
-                cache_key = self._get_func_cache_key_id(func, args, kwargs)
-                container = Container(database=self, cache_key=cache_key)
-                res = container.get_pickle()
-                if not res:
-                    res = func(*args, **kwargs)
-                    container.set_pickle(res, expire_times)
+                cache_key = self._get_func_cache_key_id(func, args, kwargs, key_func)
+                if local_cache is not None:
+                    is_hit, res = local_cache.get(cache_key)
+                    count('local', is_hit)
+                    if is_hit:
+                        return res
+
+                is_hit, res, is_early = load(cache_key)
+                count('redis', is_hit)
+
+                if not is_hit or is_early:
+                    if single_flight:
+                        res = compute_once(cache_key, is_hit, res, args, kwargs)
+                    else:
+                        res = compute(cache_key, args, kwargs)
+
+                if local_cache is not None:
+                    set_local(cache_key, res)
                 return res
 
+            def many(list_of_args, **kwargs):
+                """
+                批量调用，不会提前计算，也不会只允许一个调用者计算
+                :param list_of_args: 每一次调用的位置参数，不是tuple的当作单个参数
+                :param kwargs: 每一次调用都使用的关键字参数
+                :return: 和list_of_args顺序相同的结果
+                """
+                list_of_args = [args if isinstance(args, tuple) else (args, ) for args in list_of_args]
+                cache_keys = [self._get_func_cache_key_id(func, args, kwargs, key_func) for args in list_of_args]
+                results = [_MISSING] * len(cache_keys)
+
+                if local_cache is not None:
+                    for idx, cache_key in enumerate(cache_keys):
+                        is_hit, res = local_cache.get(cache_key)
+                        count('local', is_hit)
+                        if is_hit:
+                            results[idx] = res
+
+                indexes = [idx for idx, res in enumerate(results) if res is _MISSING]
+                if not indexes:
+                    return results
+
+                values = self.execute_command('MGET', *[cache_keys[idx] for idx in indexes], NEVER_DECODE=True)
+                pipe = self.pipeline(transaction=False)
+                for idx, data in zip(indexes, values):
+                    count('redis', bool(data))
+                    if data:
+                        res = serializer.loads(data)
+                        results[idx] = res[0] if beta else res
+                    else:
+                        results[idx], data = call(list_of_args[idx], kwargs)
+                        pipe.set(cache_keys[idx], serializer.dumps(data), expire_times)
+
+                    if local_cache is not None:
+                        set_local(cache_keys[idx], results[idx])
+
+                if len(pipe):
+                    pipe.execute()
+                return results
+
+            def invalidate(*args, **kwargs):
+                """
+                删除指定参数的缓存，其他进程的一级缓存也会被删除
+                """
+                cache_key = self._get_func_cache_key_id(func, args, kwargs, key_func)
+                self.delete(cache_key)
+                if local_cache is not None:
+                    local_cache.invalidate(cache_key)
+
+            _wrapper.invalidate = invalidate
+            _wrapper.many = many
+            _wrapper.stats = stats
             return _wrapper
 
         return wrapper
@@ -162,6 +639,7 @@ class MRedis(Redis):
         :param lock_times: 默认锁的时间
         :return:
         """
+        from mredis.lock import Lock
         if not isinstance(lock_params, Iterable):
             raise Exception("参数类型错误")
 
@@ -171,7 +649,8 @@ class MRedis(Redis):
                 cache_key = self._get_func_mutex_key_id(func, lock_params)
                 lock = Lock(database=self, cache_key=cache_key)
                 if lock.acquire(expire_time=lock_times):
-                    res = func(*args, **kwargs)
+                    with self.consistent():
+                        res = func(*args, **kwargs)
                     lock.release()
                     return res
                 return default
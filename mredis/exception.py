@@ -48,3 +48,17 @@ class IndexErrorException(Exception):
     越界错误
     """
     pass
+
+
+class BatchException(Exception):
+    """
+    批量执行错误
+    """
+    pass
+
+
+class MigrateException(Exception):
+    """
+    迁移错误
+    """
+    pass
@@ -0,0 +1,259 @@
+# -*- coding: UTF-8 -*-
+import sys
+import time
+
+from mredis.instrument import _SKIP_MODULES
+
+
+def _is_library(module):
+    return module.startswith('mredis.') and not module.startswith('mredis.tests') \
+        and not module.startswith('mredis.benchmarks')
+
+
+def _is_client(module):
+    return _is_library(module) or module == 'redis' or module.startswith('redis.')
+
+
+def _resp_size(value):
+    """
+    按照RESP2估算返回值的字节数，返回值已经经过redis-py的回调处理，所以只是近似值
+    :param value:
+    :return:
+    """
+    if value is None:
+        return 5
+    if isinstance(value, bool):
+        return 5
+    if isinstance(value, int):
+        return len(str(value)) + 3
+    if isinstance(value, float):
+        value = repr(value)
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(str(len(value))) + len(value) + 5
+    if isinstance(value, dict):
+        items = [item for pair in value.items() for item in pair]
+        return len(str(len(items))) + 3 + sum(_resp_size(item) for item in items)
+    if isinstance(value, (list, tuple, set)):
+        return len(str(len(value))) + 3 + sum(_resp_size(item) for item in value)
+    return _resp_size(str(value))
+
+
+class Explain(object):
+    """
+    记录每次高层调用（例如Hash.get、List.pop）实际执行的命令序列、网络往返次数、发送和接收的字节数以及耗时
+
+    同一个容器方法调用中连续执行的命令归为一次调用，没有经过容器方法的命令各自是一次调用；
+    只记录开启explain的线程中的命令；
+    server_time通过前后两次INFO commandstats的差值按命令的平均耗时分摊，其他客户端同时执行相同命令时只是近似值
+    """
+    def __init__(self, database, server_time=True):
+        """
+
+        :param database: MRedis
+        :param server_time: 是否统计redis服务端的耗时
+        """
+        self.database = database
+        self.server_time = server_time
+        self.calls = []
+        self._current = None
+        self._frame = None
+        self._previous = None
+        self._stats = None
+
+    def start(self):
+        """
+        开始记录
+        :return:
+        """
+        if self.server_time:
+            self._stats = self._command_stats()
+        self._previous = getattr(self.database._local, 'explain', None)
+        self.database._local.explain = self
+        return self
+
+    def stop(self):
+        """
+        停止记录
+        :return:
+        """
+        self.database._local.explain = self._previous
+        self._previous = None
+        self._current = self._frame = None
+        if self._stats is not None:
+            self._apply_server_time(self._stats, self._command_stats())
+            self._stats = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _command_stats(self):
+        return self.database.info('commandstats')
+
+    def _apply_server_time(self, before, after):
+        """
+        根据命令的平均耗时计算每个命令的服务端耗时
+        """
+        usec_per_call = {}
+        for name, stats in after.items():
+            previous = before.get(name, {})
+            calls = stats.get('calls', 0) - previous.get('calls', 0)
+            if calls > 0:
+                usec_per_call[name[len('cmdstat_'):]] = (stats.get('usec', 0) - previous.get('usec', 0)) / float(calls)
+
+        for call in self.calls:
+            call['server_time'] = 0.0
+            for record in call['commands']:
+                name = str(record['command']).split()[0].lower()
+                record['server_time'] = usec_per_call.get(name, 0.0) / 1e6
+                call['server_time'] += record['server_time']
+
+    def _sent_size(self, args):
+        """
+        按照RESP计算发送的字节数
+        """
+        encoder = self.database.get_encoder()
+        size = len(str(len(args))) + 3
+        for arg in args:
+            length = len(encoder.encode(arg))
+            size += len(str(length)) + length + 5
+        return size
+
+    @staticmethod
+    def _locate(depth):
+        """
+        找到最外层的容器方法和调用它的位置
+        :param depth: 跳过的栈帧数
+        :return: (容器方法的栈帧, 类名, 方法名, 调用位置)
+        """
+        frames = []
+        frame = sys._getframe(depth)
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+
+        outer = None
+        for idx, frame in enumerate(frames):
+            module = frame.f_globals.get('__name__', '')
+            if _is_library(module) and module not in _SKIP_MODULES and 'self' in frame.f_locals:
+                outer = idx
+
+        start = 0 if outer is None else outer + 1
+        site = None
+        for frame in frames[start:]:
+            if not _is_client(frame.f_globals.get('__name__', '')):
+                site = '%s:%s %s' % (frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name)
+                break
+
+        if outer is None:
+            return None, None, None, site
+        frame = frames[outer]
+        return frame, type(frame.f_locals['self']).__name__, frame.f_code.co_name, site
+
+    def _add(self, location, name, records, round_trips, elapsed):
+        frame, container, method, site = location
+        call = self._current
+        if call is None or frame is None or frame is not self._frame:
+            call = self._current = {
+                'name': '%s.%s' % (container, method) if container else name,
+                'container': container,
+                'method': method,
+                'site': site,
+                'commands': [],
+                'round_trips': 0,
+                'sent': 0,
+                'received': 0,
+                'elapsed': 0.0,
+                'server_time': 0.0,
+            }
+            self._frame = frame
+            self.calls.append(call)
+        call['commands'].extend(records)
+        call['round_trips'] += round_trips
+        call['sent'] += sum(record['sent'] for record in records)
+        call['received'] += sum(record['received'] for record in records)
+        call['elapsed'] += elapsed
+
+    def execute(self, func, *args, **options):
+        """
+        执行一个命令并记录
+        :param func: 真正执行命令的函数
+        :return:
+        """
+        location = self._locate(3)
+        record = {'command': args[0], 'args': args[1:], 'sent': self._sent_size(args), 'received': 0,
+                  'elapsed': 0.0, 'server_time': 0.0}
+        start_time = time.time()
+        try:
+            result = func(*args, **options)
+            record['received'] = _resp_size(result)
+            return result
+        finally:
+            record['elapsed'] = time.time() - start_time
+            self._add(location, str(args[0]), [record], 1, record['elapsed'])
+
+    def execute_pipeline(self, func, command_stack, *args):
+        """
+        执行pipeline并记录，所有命令是一次网络往返，耗时平均分给每个命令
+        :param func: 真正执行pipeline的函数
+        :param command_stack: pipeline中的命令
+        :return:
+        """
+        location = self._locate(3)
+        records = [{'command': command[0], 'args': command[1:], 'sent': self._sent_size(command), 'received': 0,
+                    'elapsed': 0.0, 'server_time': 0.0} for command, _ in command_stack]
+        start_time = time.time()
+        try:
+            results = func(*args)
+            for record, result in zip(records, results):
+                record['received'] = _resp_size(result)
+            return results
+        finally:
+            elapsed = time.time() - start_time
+            for record in records:
+                record['elapsed'] = elapsed / len(records)
+            self._add(location, 'PIPELINE', records, 1, elapsed)
+
+    def commands(self):
+        """
+        按照顺序执行的所有命令
+        :return: [(命令, 参数)]
+        """
+        return [(record['command'], record['args']) for call in self.calls for record in call['commands']]
+
+    def sites(self):
+        """
+        按照调用位置汇总，根据redis耗时从大到小排序
+        :return: [{'site', 'name', 'calls', 'commands', 'round_trips', 'sent', 'received', 'elapsed', 'server_time'}]
+        """
+        sites = {}
+        for call in self.calls:
+            item = sites.get((call['site'], call['name']))
+            if item is None:
+                item = sites[(call['site'], call['name'])] = {
+                    'site': call['site'], 'name': call['name'], 'calls': 0, 'commands': 0, 'round_trips': 0, 'sent': 0,
+                    'received': 0, 'elapsed': 0.0, 'server_time': 0.0,
+                }
+            item['calls'] += 1
+            item['commands'] += len(call['commands'])
+            for field in ('round_trips', 'sent', 'received', 'elapsed', 'server_time'):
+                item[field] += call[field]
+        return sorted(sites.values(), key=lambda x: x['elapsed'], reverse=True)
+
+    def report(self, limit=20):
+        """
+        生成按照调用位置排名的报告，同一个位置调用次数很多时通常是N+1的问题，可以改用批量或者pipeline
+        :param limit: 最多显示的调用位置个数
+        :return:
+        """
+        lines = ['%10s %10s %6s %6s %6s %10s %10s  %s' % (
+            'redis(ms)', 'server(ms)', 'calls', 'cmds', 'rtt', 'sent', 'received', 'call site')]
+        for item in self.sites()[:limit]:
+            lines.append('%10.3f %10.3f %6d %6d %6d %10d %10d  %s (%s)' % (
+                item['elapsed'] * 1e3, item['server_time'] * 1e3, item['calls'], item['commands'],
+                item['round_trips'], item['sent'], item['received'], item['site'], item['name']))
+        return '\n'.join(lines)
@@ -0,0 +1,279 @@
+# -*- coding: UTF-8 -*-
+import sys
+import threading
+import time
+
+# 不作为调用方的模块，其中的方法只是转发命令
+_SKIP_MODULES = ('mredis.database', 'mredis.replica', 'mredis.instrument', 'mredis.batch', 'mredis.explain')
+
+# prometheus直方图的边界（秒）
+PROMETHEUS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram(object):
+    """
+    HDR风格的延迟直方图，以微秒为单位，每个2的幂区间分成16个子桶，相对误差不超过1/16，占用的内存和记录次数无关
+    """
+    sub_buckets = 16
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value < self.sub_buckets * 2:
+            return value
+        shift = value.bit_length() - 5
+        return self.sub_buckets * (shift + 1) + (value >> shift) - self.sub_buckets
+
+    def _bound(self, index):
+        """
+        桶的上界（微秒）
+        """
+        if index < self.sub_buckets * 2:
+            return index + 1
+        shift = index // self.sub_buckets - 1
+        return (index % self.sub_buckets + self.sub_buckets + 1) << shift
+
+    def record(self, seconds):
+        """
+        记录一次延迟
+        :param seconds:
+        :return:
+        """
+        index = self._index(int(seconds * 1e6))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent):
+        """
+        获取百分位的延迟（秒）
+        :param percent: 0-100
+        :return:
+        """
+        if not self.count:
+            return 0.0
+        threshold = self.count * percent / 100.0
+        cumulative = 0
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            if cumulative >= threshold:
+                return min(self._bound(index) / 1e6, self.max)
+        return self.max
+
+    def count_below(self, seconds):
+        """
+        延迟不超过seconds的次数（按照桶的上界计算）
+        :param seconds:
+        :return:
+        """
+        limit = seconds * 1e6
+        return sum(count for index, count in self.counts.items() if self._bound(index) <= limit)
+
+    def copy(self):
+        histogram = Histogram()
+        histogram.counts = dict(self.counts)
+        histogram.count, histogram.total, histogram.min, histogram.max = self.count, self.total, self.min, self.max
+        return histogram
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min or 0.0,
+            'max': self.max or 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+
+class Instrumentation(object):
+    """
+    命令统计，记录每个命令的次数和延迟，并且归属到发起命令的容器方法（例如Hash.pop -> HEXISTS、HGET、HDEL）
+
+    pre_hooks中的函数在命令执行前调用：hook(call)
+    post_hooks中的函数在命令执行后调用：hook(call, elapsed, error)
+    call为字典，包括command、args、container、method
+    """
+    def __init__(self, attribute=True):
+        """
+
+        :param attribute: 是否通过调用栈找到发起命令的容器方法
+        """
+        self.attribute = attribute
+        self.pre_hooks = []
+        self.post_hooks = []
+        self.histograms = {}
+        self._mutex = threading.Lock()
+
+    def add_hook(self, pre=None, post=None):
+        """
+        添加钩子
+        :param pre:
+        :param post:
+        :return:
+        """
+        if pre is not None:
+            self.pre_hooks.append(pre)
+        if post is not None:
+            self.post_hooks.append(post)
+
+    @staticmethod
+    def caller(depth=2):
+        """
+        找到最外层发起命令的mredis对象的方法
+        :param depth: 跳过的栈帧数
+        :return: (类名, 方法名)
+        """
+        frame = sys._getframe(depth)
+        result = (None, None)
+        while frame is not None:
+            module = frame.f_globals.get('__name__', '')
+            if module.startswith('mredis.') and not module.startswith('mredis.tests') \
+                    and module not in _SKIP_MODULES:
+                obj = frame.f_locals.get('self')
+                if obj is not None:
+                    result = (type(obj).__name__, frame.f_code.co_name)
+            frame = frame.f_back
+        return result
+
+    def execute(self, func, *args, **options):
+        """
+        执行命令并记录
+        :param func: 真正执行命令的函数
+        :param args:
+        :param options:
+        :return:
+        """
+        container, method = self.caller(3) if self.attribute else (None, None)
+        command = args[0]
+        call = {'command': command, 'args': args[1:], 'container': container, 'method': method}
+        for hook in self.pre_hooks:
+            hook(call)
+
+        error = None
+        start_time = time.time()
+        try:
+            return func(*args, **options)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.time() - start_time
+            self.record(container, method, command, elapsed)
+            for hook in self.post_hooks:
+                hook(call, elapsed, error)
+
+    def execute_pipeline(self, func, command_stack, *args):
+        """
+        执行pipeline并记录其中的每个命令，所有命令是一次网络往返，耗时平均分给每个命令
+        :param func: 真正执行pipeline的函数
+        :param command_stack: pipeline中的命令
+        :return:
+        """
+        container, method = self.caller(3) if self.attribute else (None, None)
+        calls = [{'command': command[0], 'args': command[1:], 'container': container, 'method': method}
+                 for command, _ in command_stack]
+        for call in calls:
+            for hook in self.pre_hooks:
+                hook(call)
+
+        error = None
+        results = []
+        start_time = time.time()
+        try:
+            results = func(*args)
+            return results
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = (time.time() - start_time) / len(calls)
+            for idx, call in enumerate(calls):
+                self.record(container, method, call['command'], elapsed)
+                # raise_on_error=False时出错的命令的结果是异常
+                result = results[idx] if idx < len(results) else None
+                command_error = result if isinstance(result, Exception) else error
+                for hook in self.post_hooks:
+                    hook(call, elapsed, command_error)
+
+    def record(self, container, method, command, elapsed):
+        """
+        记录一次命令的延迟
+        :return:
+        """
+        key = (container, method, command)
+        with self._mutex:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.record(elapsed)
+
+    def reset(self):
+        """
+        清空统计
+        :return:
+        """
+        with self._mutex:
+            self.histograms = {}
+
+    def _snapshot(self):
+        """
+        在锁内复制所有的统计，导出时其他线程可以继续记录
+        :return: [((容器, 方法, 命令), Histogram)]
+        """
+        with self._mutex:
+            items = [(key, histogram.copy()) for key, histogram in self.histograms.items()]
+        return sorted(items, key=lambda x: str(x[0]))
+
+    def to_dict(self):
+        """
+        导出为字典
+        :return: {'commands': {命令: 次数}, 'calls': {容器.方法: {'commands': {命令: 延迟统计}}}}
+        """
+        commands = {}
+        calls = {}
+        for (container, method, command), histogram in self._snapshot():
+            commands[command] = commands.get(command, 0) + histogram.count
+            name = '%s.%s' % (container, method) if container else ''
+            calls.setdefault(name, {'commands': {}})['commands'][command] = histogram.to_dict()
+        return {'commands': commands, 'calls': calls}
+
+    def to_prometheus(self, prefix='mredis'):
+        """
+        导出为prometheus的文本格式
+        :param prefix: 指标名的前缀
+        :return:
+        """
+        lines = [
+            '# HELP %s_commands_total Redis commands sent by MRedis.' % prefix,
+            '# TYPE %s_commands_total counter' % prefix,
+        ]
+        items = self._snapshot()
+        for (container, method, command), histogram in items:
+            lines.append('%s_commands_total{%s} %d' % (prefix, _labels(container, method, command), histogram.count))
+
+        lines.append('# HELP %s_command_duration_seconds Redis command latency.' % prefix)
+        lines.append('# TYPE %s_command_duration_seconds histogram' % prefix)
+        for (container, method, command), histogram in items:
+            labels = _labels(container, method, command)
+            for bound in PROMETHEUS_BUCKETS:
+                lines.append('%s_command_duration_seconds_bucket{%s,le="%s"} %d' % (
+                    prefix, labels, bound, histogram.count_below(bound)))
+            lines.append('%s_command_duration_seconds_bucket{%s,le="+Inf"} %d' % (prefix, labels, histogram.count))
+            lines.append('%s_command_duration_seconds_sum{%s} %.9f' % (prefix, labels, histogram.total))
+            lines.append('%s_command_duration_seconds_count{%s} %d' % (prefix, labels, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(container, method, command):
+    return 'container="%s",method="%s",command="%s"' % (container or '', method or '', command)
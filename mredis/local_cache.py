@@ -0,0 +1,168 @@
+# -*- coding: UTF-8 -*-
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalCache(object):
+    """
+    进程内的LRU缓存，放在redis前面作为一级缓存
+
+    1.容量限制：max_entries限制条目数，max_size限制所有条目的总大小（字节），超出时淘汰最久未使用的条目
+    2.过期时间：每个条目都有自己的过期时间，过期后视为未命中
+    3.跨进程失效：通过redis的发布订阅广播失效的key，所有进程都会删除本地副本
+    """
+    def __init__(self, database, max_entries=1024, max_size=None, expire_time=60,
+                 channel='mredis_local_cache_invalidate'):
+        """
+
+        :param database:
+        :param max_entries: 最大条目数
+        :param max_size: 最大总字节数，None表示不限制
+        :param expire_time: 默认的过期时间（秒）
+        :param channel: 广播失效消息的频道
+        """
+        self.database = database
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.expire_time = expire_time
+        self.channel = channel
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._data = OrderedDict()
+        self._mutex = threading.Lock()
+        self.pubsub = None
+        self.subscriber = None
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size(self):
+        """
+        当前占用的总字节数
+        :return:
+        """
+        return self._size
+
+    def get(self, key):
+        """
+        获取值
+        :param key:
+        :return: (是否命中, 值)
+        """
+        with self._mutex:
+            item = self._data.get(key)
+            if item is not None and item[1] < time.time():
+                self._remove(key)
+                item = None
+
+            if item is None:
+                self.misses += 1
+                return False, None
+
+            # 移到末尾，表示最近使用过
+            self._data.pop(key)
+            self._data[key] = item
+            self.hits += 1
+            return True, item[0]
+
+    def set(self, key, value, size=1, expire_time=None):
+        """
+        设置值
+        :param key:
+        :param value:
+        :param size: 条目的大小（字节），用于按大小淘汰
+        :param expire_time: 过期时间，默认使用expire_time
+        :return:
+        """
+        if self.max_size is not None and size > self.max_size:
+            return
+
+        expire_time = expire_time or self.expire_time
+        with self._mutex:
+            self._remove(key)
+            self._data[key] = (value, time.time() + expire_time, size)
+            self._size += size
+            while self._data and (len(self._data) > self.max_entries or
+                                  (self.max_size is not None and self._size > self.max_size)):
+                oldest_key = next(iter(self._data))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def _remove(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._size -= item[2]
+
+    def delete(self, key):
+        """
+        删除本进程中的值
+        :param key:
+        :return:
+        """
+        with self._mutex:
+            self._remove(key)
+
+    def clear(self):
+        """
+        清空本进程中的所有值
+        :return:
+        """
+        with self._mutex:
+            self._data.clear()
+            self._size = 0
+
+    def invalidate(self, key):
+        """
+        删除本地的值，并通知其他进程删除
+        :param key:
+        :return:
+        """
+        self.delete(key)
+        return self.database.publish(self.channel, key)
+
+    def _handle_invalidate(self, message):
+        key = message['data']
+        if isinstance(key, bytes):
+            key = key.decode('utf-8')
+        self.delete(key)
+
+    def subscribe(self):
+        """
+        在单独的线程中订阅失效消息
+        :return:
+        """
+        if self.subscriber:
+            return
+        self.pubsub = self.database.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(**{self.channel: self._handle_invalidate})
+        self.subscriber = self.pubsub.run_in_thread(sleep_time=0.001, daemon=True)
+
+    def close(self):
+        """
+        停止订阅
+        :return:
+        """
+        if self.subscriber:
+            self.subscriber.stop()
+            self.subscriber.join(1)
+            self.subscriber = None
+        if self.pubsub:
+            self.pubsub.close()
+            self.pubsub = None
+
+    def stats(self):
+        """
+        命中统计
+        :return:
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._data),
+            'size': self._size,
+        }
@@ -7,11 +7,12 @@
 
 import functools
 import hashlib
-import os
-
-from mako.template import Template
+import math
+import threading
+import time
 
 from mredis.exception import LockReleaseException
+from mredis.lua import registry
 
 
 class Lock(object):
@@ -25,31 +26,16 @@ class Lock(object):
     3.复用：客户端发送的脚本会永久存储在Redis中，意味着其他客户端可以复用这一脚本而不需要使用代码完成同样的逻辑。
 
     """
-    lua_release = None
-    lua_add = None
-    lua_acquire = None
+    # 脚本来自进程内共用的注册表，创建锁时没有文件读取和脚本注册
+    lua_acquire = registry['lock_acquire']
+    lua_release = registry['lock_release']
+    lua_add = registry['lock_add']
 
     def __init__(self, database, cache_key):
         self.database = database
         self.cache_key = cache_key
-        self.base_dir = os.path.dirname(os.path.abspath(__file__)) + '/scripts/'
-
-        self.register_scripts()
-
-    def get_script(self, lua_name):
-        return Template(filename=lua_name).render()
-
-    def register_scripts(self):
-        """
-        注册lua命令
-        :return:
-        """
-        if self.lua_acquire is None:
-            self.lua_acquire = self.database.register_script(self.get_script(self.base_dir + 'lock_acquire.lua'))
-        if self.lua_release is None:
-            self.lua_release = self.database.register_script(self.get_script(self.base_dir + 'lock_release.lua'))
-        if self.lua_add is None:
-            self.lua_add = self.database.register_script(self.get_script(self.base_dir + 'lock_add.lua'))
+        # 同一个锁可以被多个线程使用（装饰器），每个线程的consistent分别保存
+        self._local = threading.local()
 
     @property
     def _value(self):
@@ -69,27 +55,38 @@ class Lock(object):
         """
         return "lock_event_%s" % self.cache_key
 
-    def acquire(self, block_timeout=1, expire_time=1):
+    def acquire(self, block_timeout=1, expire_time=1, blocking=True):
         """
-        获取锁
-        :param block_timeout: 阻塞获取锁的时间
+        获取锁，锁被释放时会重新尝试获取，直到获取成功或者超时
+        :param block_timeout: 阻塞获取锁的时间，0表示一直阻塞
         :param expire_time: 设置锁的时间
+        :param blocking: 为False时只尝试一次，不阻塞
         :return:
         """
+        deadline = time.time() + block_timeout if block_timeout else None
         while True:
-            result = self.lua_acquire(keys=[self.cache_key], args=[self._value, expire_time])
+            result = self.lua_acquire(self.database, keys=[self.cache_key], args=[self._value, expire_time])
             if result:
                 return True
+            if not blocking:
+                return False
+
+            timeout = 0
+            if deadline is not None:
+                left_time = deadline - time.time()
+                if left_time <= 0:
+                    return False
+                timeout = int(math.ceil(left_time))
 
-            result = self.database.blpop(self.event_key, block_timeout)
-            return result is not None
+            if self.database.blpop(self.event_key, timeout) is None:
+                return False
 
     def release(self):
         """
         释放锁
         :return:
         """
-        return bool(self.lua_release(keys=[self.cache_key, self.event_key]))
+        return bool(self.lua_release(self.database, keys=[self.cache_key, self.event_key]))
 
     def clear(self):
         self.database.delete(self.cache_key)
@@ -97,8 +94,18 @@ class Lock(object):
 
     def __enter__(self):
         self.acquire()
+        # 锁内的读取都发送到主库
+        consistent = getattr(self.database, 'consistent', None)
+        context = consistent() if consistent is not None else None
+        if context is not None:
+            context.__enter__()
+        self._local.contexts = getattr(self._local, 'contexts', [])
+        self._local.contexts.append(context)
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        context = self._local.contexts.pop()
+        if context is not None:
+            context.__exit__(exc_type, exc_val, exc_tb)
         if not self.release():
             raise LockReleaseException(u'锁释放失败')
 
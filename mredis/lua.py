@@ -0,0 +1,157 @@
+# -*- coding: UTF-8 -*-
+import hashlib
+import os
+
+from redis.exceptions import NoScriptError, ResponseError
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts')
+
+
+class Script(object):
+    """
+    lua脚本，SHA在创建时计算，使用EVALSHA执行，服务端没有缓存脚本（NOSCRIPT）时先SCRIPT LOAD再重试
+    """
+    def __init__(self, name, source):
+        self.name = name
+        self.source = source
+        self.sha = hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    @property
+    def script(self):
+        """
+        脚本内容，redis-py的pipeline在执行前通过它加载脚本
+        :return:
+        """
+        return self.source
+
+    def __call__(self, client, keys=(), args=()):
+        """
+        执行脚本
+        :param client: MRedis、pipeline或者Batch，pipeline中的命令在执行时才会返回NOSCRIPT，
+                       和redis-py一样把脚本加入pipeline的scripts，执行前检查服务端没有的脚本并加载
+        :param keys:
+        :param args:
+        :return:
+        """
+        keys = list(keys)
+        scripts = getattr(client, 'scripts', None)
+        if isinstance(scripts, set):
+            scripts.add(self)
+            return client.evalsha(self.sha, len(keys), *(keys + list(args)))
+        try:
+            return client.evalsha(self.sha, len(keys), *(keys + list(args)))
+        except NoScriptError:
+            client.script_load(self.source)
+            return client.evalsha(self.sha, len(keys), *(keys + list(args)))
+
+    async def call_async(self, client, keys=(), args=()):
+        """
+        在异步客户端上执行脚本
+        :param client: AsyncMRedis
+        :param keys:
+        :param args:
+        :return:
+        """
+        keys = list(keys)
+        try:
+            return await client.evalsha(self.sha, len(keys), *(keys + list(args)))
+        except NoScriptError:
+            await client.script_load(self.source)
+            return await client.evalsha(self.sha, len(keys), *(keys + list(args)))
+
+    def __repr__(self):
+        return '<Script %s %s>' % (self.name, self.sha)
+
+
+class ScriptRegistry(object):
+    """
+    进程内共用的脚本注册表，导入时读取scripts目录中所有的lua脚本
+
+    MRedis在建立连接时通过on_connect把所有脚本SCRIPT LOAD到服务端，之后的EVALSHA不会遇到NOSCRIPT
+    """
+    def __init__(self, directory=SCRIPT_DIR):
+        self.scripts = {}
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.lua'):
+                with open(os.path.join(directory, filename)) as f:
+                    self.register(filename[:-len('.lua')], f.read())
+
+    def register(self, name, source):
+        """
+        注册脚本，之后建立的连接会预加载该脚本
+        :param name:
+        :param source:
+        :return: Script
+        """
+        script = self.scripts[name] = Script(name, source)
+        return script
+
+    def __getitem__(self, name):
+        return self.scripts[name]
+
+    def __contains__(self, name):
+        return name in self.scripts
+
+    def __iter__(self):
+        return iter(self.scripts.values())
+
+    def __len__(self):
+        return len(self.scripts)
+
+    def load(self, client):
+        """
+        把所有脚本加载到服务端，只有一次网络往返
+        :param client: MRedis
+        :return: 脚本的SHA列表
+        """
+        pipe = client.pipeline(transaction=False)
+        for script in self:
+            pipe.script_load(script.source)
+        return pipe.execute()
+
+    def on_connect(self, connection, connect_func=None):
+        """
+        作为连接的redis_connect_func，完成连接的初始化后预加载所有脚本，失败时（例如禁用了脚本）不影响连接
+        :param connection: redis.connection.Connection
+        :param connect_func: 原来的redis_connect_func，代替connection.on_connect完成连接的初始化
+        :return:
+        """
+        if connect_func is not None:
+            connect_func(connection)
+        else:
+            connection.on_connect()
+        scripts = list(self)
+        if not scripts:
+            return
+        connection.send_packed_command(connection.pack_commands(
+            [('SCRIPT', 'LOAD', script.source) for script in scripts]))
+        for _ in scripts:
+            try:
+                connection.read_response()
+            except ResponseError:
+                pass
+
+    async def on_connect_async(self, connection, connect_func=None):
+        """
+        异步连接的redis_connect_func
+        :param connection: redis.asyncio.connection.Connection
+        :param connect_func: 原来的redis_connect_func
+        :return:
+        """
+        if connect_func is not None:
+            await connect_func(connection)
+        else:
+            await connection.on_connect()
+        scripts = list(self)
+        if not scripts:
+            return
+        await connection.send_packed_command(connection.pack_commands(
+            [('SCRIPT', 'LOAD', script.source) for script in scripts]))
+        for _ in scripts:
+            try:
+                await connection.read_response()
+            except ResponseError:
+                pass
+
+
+registry = ScriptRegistry()
@@ -0,0 +1,2502 @@
+# -*- coding: UTF-8 -*-
+"""
+进程内的内存后端，实现了mredis用到的命令，不需要redis服务器，适用于单元测试、单进程的工具和进程内的缓存
+
+db = MemoryRedis(decode_responses=True)
+db.Hash('test_hash')['key'] = 1
+
+数据保存在MemoryStore中，字符串为bytes，哈希为dict，列表为deque，集合为set，有序集合为字典加上有序列表，
+所有命令在同一把锁内执行，和redis一样是原子的；过期时间保存在小顶堆中，每次执行命令前删除已经过期的key
+"""
+import bisect
+import collections
+import decimal
+import functools
+import hashlib
+import heapq
+import inspect
+import itertools
+import math
+import random
+import re
+import threading
+import time
+
+from redis import Redis
+from redis.client import EMPTY_RESPONSE, NEVER_DECODE, PubSubWorkerThread
+from redis.exceptions import NoScriptError, PubSubError, ResponseError
+
+from mredis.database import MRedis, Pipeline
+from mredis.lua import registry
+
+_MISSING = object()
+
+_OK = b'OK'
+_WRONGTYPE = 'WRONGTYPE Operation against a key holding the wrong kind of value'
+_NOT_INTEGER = 'value is not an integer or out of range'
+_NOT_FLOAT = 'value is not a valid float'
+_SYNTAX = 'syntax error'
+_MAX_INT = 2 ** 63 - 1
+_MAX_ID = 2 ** 64 - 1
+
+# redis-py 5以上默认使用RESP3的回调，内存后端返回的是RESP2格式的结果
+_PROTOCOL = {'protocol': 2} if 'protocol' in inspect.signature(Redis.__init__).parameters else {}
+
+
+class _Max(object):
+    """
+    比任何member都大，用于在(score, member)的有序列表中查找score的边界
+    """
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_MAX = _Max()
+
+
+def _to_bytes(value):
+    """
+    脚本中的参数和redis.call一样转换为字符串
+    """
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    if isinstance(value, float) and value == int(value):
+        value = int(value)
+    if isinstance(value, int):
+        return b'%d' % value
+    if isinstance(value, float):
+        return repr(value).encode()
+    return bytes(value)
+
+
+def _int(value, message=_NOT_INTEGER):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ResponseError(message)
+
+
+def _float(value, message=_NOT_FLOAT):
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        raise ResponseError(message)
+    if math.isnan(result):
+        raise ResponseError(message)
+    return result
+
+
+def _format_float(value):
+    """
+    有序集合的分数，整数不带小数点
+    """
+    if math.isinf(value):
+        return b'inf' if value > 0 else b'-inf'
+    if value == int(value) and abs(value) < 1e17:
+        return b'%d' % value
+    return repr(value).encode()
+
+
+def _incr_float(value, amount, message=_NOT_FLOAT):
+    """
+    INCRBYFLOAT使用十进制计算，和redis的long double一样1.1加2.2得到3.3
+    """
+    try:
+        result = decimal.Decimal((value or b'0').decode()) + decimal.Decimal(amount.decode())
+    except (decimal.InvalidOperation, UnicodeDecodeError):
+        raise ResponseError(message)
+    if not result.is_finite():
+        raise ResponseError('increment would produce NaN or Infinity')
+    text = '{:f}'.format(result)
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return text.encode()
+
+
+def _index_range(start, stop, length):
+    """
+    把LRANGE、ZRANGE的下标转换为切片的范围
+    :return: (start, stop)，stop不包括
+    """
+    start, stop = _int(start), _int(stop)
+    if start < 0:
+        start = max(start + length, 0)
+    if stop < 0:
+        stop += length
+    stop = min(stop, length - 1)
+    if start > stop:
+        return 0, 0
+    return start, stop + 1
+
+
+def _bit_range(value, start, end, unit):
+    """
+    BITCOUNT、BITPOS的范围，单位是BYTE或者BIT
+    :return: (start, stop)，单位是bit，stop不包括
+    """
+    unit = (unit or b'BYTE').upper()
+    if unit not in (b'BYTE', b'BIT'):
+        raise ResponseError(_SYNTAX)
+    scale = 8 if unit == b'BYTE' else 1
+    length = len(value) * 8 // scale
+    start, stop = _index_range(start, -1 if end is None else end, length)
+    return start * scale, stop * scale
+
+
+def _bitfield_type(value):
+    """
+    BITFIELD的类型，例如u8、i16
+    :return: (是否有符号, 位数)
+    """
+    signed = value[:1] in (b'i', b'I')
+    bits = _int(value[1:]) if value[:1] in (b'i', b'I', b'u', b'U') and value[1:].isdigit() else 0
+    if not 1 <= bits <= (64 if signed else 63):
+        raise ResponseError('Invalid bitfield type. Use something like i16 u8. '
+                            'Note that u64 is not supported but i64 is.')
+    return signed, bits
+
+
+def _bitfield_offset(value, bits):
+    multiply = value[:1] == b'#'
+    offset = _int(value[1:] if multiply else value, 'bit offset is not an integer or out of range')
+    offset = offset * bits if multiply else offset
+    if offset < 0 or offset + bits > 2 ** 32:
+        raise ResponseError('bit offset is not an integer or out of range')
+    return offset
+
+
+def _get_bits(buf, offset, bits):
+    start, stop = offset >> 3, (offset + bits + 7) >> 3
+    chunk = bytes(buf[start:stop]).ljust(stop - start, b'\x00')
+    return (int.from_bytes(chunk, 'big') >> (stop * 8 - offset - bits)) & ((1 << bits) - 1)
+
+
+def _set_bits(buf, offset, bits, value):
+    start, stop = offset >> 3, (offset + bits + 7) >> 3
+    if len(buf) < stop:
+        buf.extend(b'\x00' * (stop - len(buf)))
+    shift = stop * 8 - offset - bits
+    mask = ((1 << bits) - 1) << shift
+    chunk = int.from_bytes(bytes(buf[start:stop]), 'big')
+    chunk = (chunk & ~mask) | ((value << shift) & mask)
+    buf[start:stop] = chunk.to_bytes(stop - start, 'big')
+
+
+def _score_bound(value):
+    """
+    ZRANGEBYSCORE的边界，(开头表示不包括
+    :return: (分数, 是否不包括)
+    """
+    exclusive = value.startswith(b'(')
+    if exclusive:
+        value = value[1:]
+    return _float(value, 'min or max is not a float'), exclusive
+
+
+@functools.lru_cache(maxsize=256)
+def _glob(pattern):
+    """
+    把redis的glob格式转换为正则表达式
+    :param pattern: bytes
+    :return:
+    """
+    out = []
+    idx, length = 0, len(pattern)
+    while idx < length:
+        char = pattern[idx:idx + 1]
+        if char == b'*':
+            out.append(b'.*')
+        elif char == b'?':
+            out.append(b'.')
+        elif char == b'\\' and idx + 1 < length:
+            idx += 1
+            out.append(re.escape(pattern[idx:idx + 1]))
+        elif char == b'[' and pattern.find(b']', idx + 1) != -1:
+            end = pattern.find(b']', idx + 1)
+            body = pattern[idx + 1:end]
+            chars = [b'^'] if body.startswith(b'^') else []
+            body = body[1:] if chars else body
+            pos = 0
+            while pos < len(body):
+                item = body[pos:pos + 1]
+                if item == b'\\' and pos + 1 < len(body):
+                    pos += 1
+                    chars.append(re.escape(body[pos:pos + 1]))
+                elif item == b'-':
+                    chars.append(b'-')
+                else:
+                    chars.append(re.escape(item))
+                pos += 1
+            out.append(b'[' + b''.join(chars) + b']')
+            idx = end
+        else:
+            out.append(re.escape(char))
+        idx += 1
+    return re.compile(b''.join(out) + b'\\Z', re.S)
+
+
+def _match(pattern, value):
+    return pattern is None or _glob(pattern).match(value) is not None
+
+
+def _stream_id(value, seq=0):
+    """
+    解析消息id，-和+分别为最小和最大的id，没有序号时使用seq
+    :return: (毫秒, 序号)
+    """
+    if value == b'-':
+        return 0, 0
+    if value == b'+':
+        return _MAX_ID, _MAX_ID
+    ms, sep, number = value.partition(b'-')
+    try:
+        return int(ms), int(number) if sep else seq
+    except ValueError:
+        raise ResponseError('Invalid stream ID specified as stream command argument')
+
+
+def _stream_bound(value, is_start):
+    """
+    XRANGE的边界，(开头表示不包括
+    """
+    exclusive = value.startswith(b'(')
+    if exclusive:
+        value = value[1:]
+    ms, seq = _stream_id(value, 0 if is_start else _MAX_ID)
+    if not exclusive:
+        return ms, seq
+    if is_start:
+        return (ms, seq + 1) if seq < _MAX_ID else (ms + 1, 0)
+    return (ms, seq - 1) if seq > 0 else (ms - 1, _MAX_ID)
+
+
+def _format_id(stream_id):
+    return b'%d-%d' % stream_id
+
+
+class _SortedSet(object):
+    """
+    有序集合，member到score的字典加上按照(score, member)排序的列表，排名和范围查询都是二分查找
+    """
+    __slots__ = ('scores', 'items')
+
+    def __init__(self):
+        self.scores = {}
+        self.items = []
+
+    def __len__(self):
+        return len(self.scores)
+
+    def add(self, member, score):
+        old = self.scores.get(member)
+        if old is not None:
+            if old == score:
+                return
+            del self.items[bisect.bisect_left(self.items, (old, member))]
+        self.scores[member] = score
+        bisect.insort(self.items, (score, member))
+
+    def remove(self, member):
+        score = self.scores.pop(member, None)
+        if score is None:
+            return False
+        del self.items[bisect.bisect_left(self.items, (score, member))]
+        return True
+
+    def rank(self, member):
+        score = self.scores.get(member)
+        if score is None:
+            return None
+        return bisect.bisect_left(self.items, (score, member))
+
+    def score_range(self, min_score, min_exclusive, max_score, max_exclusive):
+        """
+        分数在范围内的下标
+        :return: (start, stop)，stop不包括
+        """
+        start = bisect.bisect_left(self.items, (min_score, _MAX) if min_exclusive else (min_score, ))
+        stop = bisect.bisect_left(self.items, (max_score, ) if max_exclusive else (max_score, _MAX))
+        return start, max(start, stop)
+
+
+class _HyperLogLog(set):
+    """
+    基数统计，内存后端使用精确的集合
+    """
+
+
+class _ConsumerGroup(object):
+    __slots__ = ('last_id', 'pending', 'consumers')
+
+    def __init__(self, last_id):
+        self.last_id = last_id
+        # 消息id: [消费者, 投递时间（毫秒）, 投递次数]
+        self.pending = {}
+        # 消费者: 最近一次读取的时间（毫秒）
+        self.consumers = {}
+
+
+class _Stream(object):
+    """
+    流，有序的消息id列表加上id到字段的字典
+    """
+    __slots__ = ('ids', 'entries', 'last_id', 'groups')
+
+    def __init__(self):
+        self.ids = []
+        self.entries = {}
+        self.last_id = (0, 0)
+        self.groups = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, stream_id, fields):
+        self.ids.append(stream_id)
+        self.entries[stream_id] = fields
+        self.last_id = stream_id
+
+    def remove(self, stream_id):
+        if self.entries.pop(stream_id, None) is None:
+            return False
+        del self.ids[bisect.bisect_left(self.ids, stream_id)]
+        return True
+
+    def entry(self, stream_id):
+        return [_format_id(stream_id), self.entries[stream_id]]
+
+    def after(self, stream_id, count=None):
+        start = bisect.bisect_right(self.ids, stream_id)
+        return self.ids[start:start + count if count is not None else None]
+
+
+_TYPE_NAMES = {
+    bytes: b'string',
+    dict: b'hash',
+    collections.deque: b'list',
+    set: b'set',
+    _SortedSet: b'zset',
+    _Stream: b'stream',
+    _HyperLogLog: b'string',
+}
+
+
+def _lua_number(value):
+    result = float(value)
+    return int(result) if result == int(result) else result
+
+
+def _lock_acquire(call, keys, args):
+    result = call('SETNX', keys[0], args[0])
+    if result == 1 and _lua_number(args[1]) > 0:
+        call('EXPIRE', keys[0], args[1])
+    return result
+
+
+def _lock_add(call, keys, args):
+    ttl = _lua_number(keys[1])
+    left_ttl = call('TTL', keys[0])
+    if left_ttl > 0:
+        call('EXPIRE', keys[0], left_ttl + ttl)
+        return 1
+    return 0
+
+
+def _lock_release(call, keys, args):
+    if call('GET', keys[0]) is not None:
+        call('LPUSH', keys[1], 1)
+        call('LTRIM', keys[1], 0, 0)
+        return call('DEL', keys[0])
+    return 0
+
+
+def _counter_incr(call, keys, args):
+    count = call('HINCRBY', keys[0], args[0], args[1])
+    if count == 0:
+        call('HDEL', keys[0], args[0])
+    call('EXPIRE', keys[0], args[2])
+    return count
+
+
+def _hash_pop(call, keys, args):
+    value = call('HGET', keys[0], args[0])
+    if value is not None:
+        call('HDEL', keys[0], args[0])
+    return value
+
+
+def _hash_popitem(call, keys, args):
+    cursor = b'0'
+    while True:
+        cursor, items = call('HSCAN', keys[0], cursor, 'COUNT', 10)
+        if items:
+            call('HDEL', keys[0], items[0])
+            return [items[0], items[1]]
+        if cursor == b'0':
+            return None
+
+
+def _hash_setdefault(call, keys, args):
+    created = call('HSETNX', keys[0], args[0], args[1])
+    return [created, call('HGET', keys[0], args[0])]
+
+
+def _list_pop(call, keys, args):
+    index = _lua_number(args[0])
+    length = call('LLEN', keys[0])
+    if length == 0:
+        return [1]
+    if index < 0 or index >= length:
+        return [2]
+    value = call('LINDEX', keys[0], index)
+    call('LSET', keys[0], index, args[1])
+    call('LREM', keys[0], 1, args[1])
+    return [0, value]
+
+
+def _list_push_capped(call, keys, args):
+    max_length = _lua_number(args[0])
+    length = call('LPUSH', keys[0], *args[1:])
+    if length > max_length:
+        call('LTRIM', keys[0], 0, max_length - 1)
+        return max_length
+    return length
+
+
+def _bloom_filter(call, keys, args):
+    is_add = args[0] == b'add'
+    capacity, error_rate, growth, tightening = [_lua_number(value) for value in args[1:5]]
+    scalable = args[5] == b'1'
+    max_layers = 32
+    ln2 = math.log(2)
+    counts = call('BITFIELD', keys[0], *[part for index in range(max_layers)
+                                         for part in ('GET', 'u32', '#%s' % index)])
+
+    def layer(index, offset):
+        size = math.floor(capacity * growth ** index)
+        bits = math.ceil(-size * math.log(error_rate * tightening ** index) / (ln2 * ln2))
+        return [offset, bits, math.ceil(ln2 * bits / size), size, counts[index]]
+
+    def positions(item, h1, h2):
+        return [item[0] + (h1 + idx * h2) % item[1] for idx in range(item[2])]
+
+    layers = [layer(0, max_layers * 32)]
+    while scalable and len(layers) < max_layers and layers[-1][4] >= layers[-1][3]:
+        layers.append(layer(len(layers), layers[-1][0] + layers[-1][1]))
+
+    result = []
+    changed = {}
+    for idx in range(6, len(args), 2):
+        h1, h2 = _lua_number(args[idx]), _lua_number(args[idx + 1])
+        if any(all(call('GETBIT', keys[0], position) for position in positions(item, h1, h2)) for item in layers):
+            result.append(0 if is_add else 1)
+        elif not is_add:
+            result.append(0)
+        else:
+            current = layers[-1]
+            for position in positions(current, h1, h2):
+                call('SETBIT', keys[0], position, 1)
+            current[4] += 1
+            changed[len(layers) - 1] = current[4]
+            if scalable and len(layers) < max_layers and current[4] >= current[3]:
+                layers.append(layer(len(layers), current[0] + current[1]))
+            result.append(1)
+    if changed:
+        call('BITFIELD', keys[0], *[part for index, count in changed.items()
+                                    for part in ('SET', 'u32', '#%s' % index, count)])
+    return result
+
+
+def _count_min_sketch(call, keys, args):
+    width, depth, k = _lua_number(args[0]), _lua_number(args[1]), _lua_number(args[3])
+    conservative = args[2] == b'1'
+    step = 4 if len(keys) > 1 else 3
+    max_count = 4294967295
+
+    estimates, evicted = [], []
+    total = 0
+    for idx in range(4, len(args), step):
+        h1, h2, amount = [_lua_number(value) for value in args[idx: idx + 3]]
+        offsets = [64 + (row * width + (h1 + row * h2) % width) * 32 for row in range(depth)]
+        if conservative:
+            values = call('BITFIELD', keys[0], *[part for offset in offsets for part in ('GET', 'u32', offset)])
+            estimate = min(min(values) + amount, max_count)
+            command = [part for offset, value in zip(offsets, values) if value < estimate
+                       for part in ('SET', 'u32', offset, estimate)]
+            if command:
+                call('BITFIELD', keys[0], *command)
+            counters = [estimate]
+        else:
+            counters = call('BITFIELD', keys[0], 'OVERFLOW', 'SAT',
+                            *[part for offset in offsets for part in ('INCRBY', 'u32', offset, amount)])
+        estimate = min(counters)
+        estimates.append(estimate)
+        total += amount
+
+        if len(keys) > 1:
+            member = args[idx + 3]
+            if call('ZSCORE', keys[1], member) is not None or call('ZCARD', keys[1]) < k:
+                call('ZADD', keys[1], estimate, member)
+            else:
+                smallest = call('ZRANGE', keys[1], 0, 0, 'WITHSCORES')
+                if estimate > _lua_number(smallest[1]):
+                    call('ZREM', keys[1], smallest[0])
+                    call('ZADD', keys[1], estimate, member)
+                    evicted.append(smallest[0])
+    call('BITFIELD', keys[0], 'OVERFLOW', 'SAT', 'INCRBY', 'i64', 0, total)
+    return [estimates, evicted]
+
+
+def _sorted_set_lookup(call, keys, args):
+    return [call(args[0].decode('utf-8'), keys[0], member) for member in args[1:]]
+
+
+# scripts目录中的lua脚本对应的python实现，参数和redis.call相同
+SCRIPTS = {
+    'lock_acquire': _lock_acquire,
+    'lock_add': _lock_add,
+    'lock_release': _lock_release,
+    'counter_incr': _counter_incr,
+    'hash_pop': _hash_pop,
+    'hash_popitem': _hash_popitem,
+    'hash_setdefault': _hash_setdefault,
+    'list_pop': _list_pop,
+    'list_push_capped': _list_push_capped,
+    'bloom_filter': _bloom_filter,
+    'count_min_sketch': _count_min_sketch,
+    'sorted_set_lookup': _sorted_set_lookup,
+}
+
+
+class MemoryStore(object):
+    """
+    内存中的数据，可以被多个MemoryRedis共用；命令的参数和返回值都和RESP2一致（bytes、int、list、None）
+    """
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.RLock()
+        self.condition = threading.Condition(self.lock)
+        self.stats = {}
+        self.channels = {}
+        self.patterns = {}
+        self._expiry = []
+        self._now = time.time()
+        self._block = True
+        self._waiting = 0
+        self._implementations = {}
+        self._scripts = set()
+        for script in registry:
+            if script.name in SCRIPTS:
+                self.register_script(script.source, SCRIPTS[script.name])
+
+    def register_script(self, source, func):
+        """
+        注册lua脚本的python实现，内存后端不能执行lua，EVAL/EVALSHA执行的是对应的python函数
+        :param source: lua脚本
+        :param func: func(call, keys, args)，call(*args)执行一个命令，和redis.call相同
+        :return: 脚本的SHA
+        """
+        if isinstance(source, str):
+            source = source.encode('utf-8')
+        sha = hashlib.sha1(source).hexdigest()
+        self._implementations[sha] = func
+        self._scripts.add(sha)
+        return sha
+
+    def execute(self, args, block=True):
+        """
+        执行一个命令
+        :param args: 命令名和bytes的参数
+        :param block: 阻塞的命令是否等待，pipeline中不等待
+        :return:
+        """
+        with self.lock:
+            self._now = time.time()
+            self._expire_keys()
+            handler, args = self._handler(args)
+            self._block = block
+            start_time = time.perf_counter()
+            try:
+                return handler(self, *args)
+            finally:
+                stats = self.stats.get(handler.stats_name)
+                if stats is None:
+                    stats = self.stats[handler.stats_name] = [0, 0.0]
+                stats[0] += 1
+                stats[1] += time.perf_counter() - start_time
+                if self._waiting:
+                    self.condition.notify_all()
+
+    def _call(self, *args):
+        """
+        脚本中执行命令
+        """
+        handler, args = self._handler((str(args[0]), ) + tuple(_to_bytes(arg) for arg in args[1:]))
+        return handler(self, *args)
+
+    @staticmethod
+    def _handler(args):
+        name = args[0].upper()
+        handler = _COMMANDS.get(name)
+        rest = args[1:]
+        if handler is None and rest:
+            handler = _COMMANDS.get('%s %s' % (name, rest[0].decode('utf-8', 'replace').upper()))
+            rest = rest[1:]
+        if handler is None:
+            raise ResponseError("unknown command '%s'" % args[0])
+        if len(rest) < handler.min_args or (handler.max_args is not None and len(rest) > handler.max_args):
+            raise ResponseError("wrong number of arguments for '%s' command" % handler.stats_name)
+        return handler, rest
+
+    def _expire_keys(self):
+        """
+        删除过期的key，堆中过期时间已经被修改的项直接丢弃
+        """
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= self._now:
+            deadline, key = heapq.heappop(expiry)
+            if self.expires.get(key) == deadline:
+                self._delete(key)
+
+    def _set_expire(self, key, deadline):
+        self.expires[key] = deadline
+        heapq.heappush(self._expiry, (deadline, key))
+        # 同一个key反复设置过期时间时，堆中过期的项太多就重建
+        if len(self._expiry) > 2 * len(self.expires) + 64:
+            self._expiry = [(value, item) for item, value in self.expires.items()]
+            heapq.heapify(self._expiry)
+
+    def _delete(self, key):
+        self.expires.pop(key, None)
+        return self.data.pop(key, None) is not None
+
+    def _get(self, key, kind):
+        value = self.data.get(key)
+        if value is not None and type(value) is not kind:
+            raise ResponseError(_WRONGTYPE)
+        return value
+
+    def _get_or_create(self, key, kind):
+        value = self._get(key, kind)
+        if value is None:
+            value = self.data[key] = kind()
+        return value
+
+    def _check_empty(self, key, value):
+        if not value:
+            self._delete(key)
+
+    def _store(self, key, value):
+        """
+        STORE类的命令覆盖目标key，为空时删除
+        """
+        self._delete(key)
+        if value:
+            self.data[key] = value
+        return len(value)
+
+    def _deadline(self, timeout):
+        timeout = _float(timeout, 'timeout is not a float or out of range')
+        if timeout < 0:
+            raise ResponseError('timeout is negative')
+        return self._now + timeout if timeout else None
+
+    def _wait(self, deadline):
+        """
+        等待其他命令修改数据
+        :param deadline: None表示一直等待
+        :return: 是否还没有超时
+        """
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                return False
+        self._waiting += 1
+        try:
+            self.condition.wait(timeout)
+        finally:
+            self._waiting -= 1
+        self._now = time.time()
+        self._expire_keys()
+        return True
+
+    def _scan(self, cursor, items, args, key=None):
+        """
+        SCAN类的命令一次返回所有匹配的元素，COUNT只是建议值
+        :param items: 所有的元素
+        :param key: 从元素中取出用于MATCH的部分
+        :return: [游标, 匹配的元素]
+        """
+        _int(cursor, 'invalid cursor')
+        pattern = kind = None
+        for name, value in zip(args[::2], args[1::2]):
+            name = name.upper()
+            if name == b'MATCH':
+                pattern = value
+            elif name == b'COUNT':
+                if _int(value) < 1:
+                    raise ResponseError(_SYNTAX)
+            elif name == b'TYPE':
+                kind = value.lower()
+            else:
+                raise ResponseError(_SYNTAX)
+        if len(args) % 2:
+            raise ResponseError(_SYNTAX)
+        key = key or (lambda item: item)
+        result = [item for item in items if _match(pattern, key(item)) and
+                  (kind is None or _TYPE_NAMES[type(self.data.get(item))] == kind)]
+        return [b'0', result]
+
+    # keys
+
+    def cmd_del(self, *keys):
+        return sum(1 for key in keys if self._delete(key))
+
+    cmd_unlink = cmd_del
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if key in self.data)
+
+    def cmd_type(self, key):
+        value = self.data.get(key)
+        return b'none' if value is None else _TYPE_NAMES[type(value)]
+
+    def _expire_at(self, key, deadline):
+        if key not in self.data:
+            return 0
+        if deadline <= self._now:
+            self._delete(key)
+        else:
+            self._set_expire(key, deadline)
+        return 1
+
+    def cmd_expire(self, key, seconds):
+        return self._expire_at(key, self._now + _int(seconds))
+
+    def cmd_pexpire(self, key, milliseconds):
+        return self._expire_at(key, self._now + _int(milliseconds) / 1000.0)
+
+    def cmd_expireat(self, key, timestamp):
+        return self._expire_at(key, _int(timestamp))
+
+    def cmd_pexpireat(self, key, timestamp):
+        return self._expire_at(key, _int(timestamp) / 1000.0)
+
+    def cmd_persist(self, key):
+        return 1 if key in self.data and self.expires.pop(key, None) is not None else 0
+
+    def cmd_pttl(self, key):
+        if key not in self.data:
+            return -2
+        deadline = self.expires.get(key)
+        if deadline is None:
+            return -1
+        return int(round((deadline - self._now) * 1000))
+
+    def cmd_ttl(self, key):
+        left = self.cmd_pttl(key)
+        return left if left < 0 else (left + 500) // 1000
+
+    def cmd_rename(self, key, new_key):
+        if key not in self.data:
+            raise ResponseError('no such key')
+        if key != new_key:
+            value, deadline = self.data[key], self.expires.get(key)
+            self._delete(key)
+            self._delete(new_key)
+            self.data[new_key] = value
+            if deadline is not None:
+                self._set_expire(new_key, deadline)
+        return _OK
+
+    def cmd_renamenx(self, key, new_key):
+        if key not in self.data:
+            raise ResponseError('no such key')
+        if new_key in self.data:
+            return 0
+        self.cmd_rename(key, new_key)
+        return 1
+
+    def cmd_keys(self, pattern):
+        return [key for key in self.data if _match(pattern, key)]
+
+    def cmd_scan(self, cursor, *args):
+        return self._scan(cursor, list(self.data), args)
+
+    def cmd_randomkey(self):
+        return random.choice(list(self.data)) if self.data else None
+
+    def cmd_dbsize(self):
+        return len(self.data)
+
+    def cmd_flushdb(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        self._expiry = []
+        return _OK
+
+    cmd_flushall = cmd_flushdb
+
+    def cmd_ping(self, message=None):
+        return b'PONG' if message is None else message
+
+    def cmd_echo(self, message):
+        return message
+
+    def cmd_time(self):
+        now = time.time()
+        return [b'%d' % now, b'%d' % ((now % 1) * 1e6)]
+
+    def cmd_info(self, *sections):
+        sections = set(section.lower() for section in sections) or {b'server', b'keyspace'}
+        every = b'all' in sections or b'everything' in sections
+        lines = []
+        if every or b'server' in sections:
+            lines += ['# Server', 'redis_version:6.2.0', 'redis_mode:standalone', 'mredis_backend:memory', '']
+        if every or b'commandstats' in sections:
+            lines.append('# Commandstats')
+            for name, (calls, elapsed) in sorted(self.stats.items()):
+                lines.append('cmdstat_%s:calls=%d,usec=%d,usec_per_call=%.2f' % (
+                    name, calls, elapsed * 1e6, elapsed * 1e6 / calls))
+            lines.append('')
+        if every or b'keyspace' in sections:
+            lines.append('# Keyspace')
+            if self.data:
+                lines.append('db0:keys=%d,expires=%d,avg_ttl=0' % (len(self.data), len(self.expires)))
+            lines.append('')
+        return '\r\n'.join(lines).encode()
+
+    # strings
+
+    def _set_string(self, key, value, deadline=None, keep_ttl=False):
+        if not keep_ttl:
+            self.expires.pop(key, None)
+        self.data[key] = value
+        if deadline is not None:
+            self._set_expire(key, deadline)
+
+    def cmd_get(self, key):
+        return self._get(key, bytes)
+
+    def cmd_set(self, key, value, *args):
+        deadline = None
+        nx = xx = keep_ttl = get = False
+        idx = 0
+        while idx < len(args):
+            option = args[idx].upper()
+            if option in (b'EX', b'PX', b'EXAT', b'PXAT') and idx + 1 < len(args):
+                number = _int(args[idx + 1])
+                if number <= 0:
+                    raise ResponseError('invalid expire time in set')
+                deadline = {
+                    b'EX': self._now + number, b'PX': self._now + number / 1000.0,
+                    b'EXAT': number, b'PXAT': number / 1000.0,
+                }[option]
+                idx += 1
+            elif option == b'NX':
+                nx = True
+            elif option == b'XX':
+                xx = True
+            elif option == b'KEEPTTL':
+                keep_ttl = True
+            elif option == b'GET':
+                get = True
+            else:
+                raise ResponseError(_SYNTAX)
+            idx += 1
+        if nx and xx:
+            raise ResponseError(_SYNTAX)
+
+        old = self._get(key, bytes) if get else None
+        exists = key in self.data
+        if (nx and exists) or (xx and not exists):
+            return old
+        self._set_string(key, value, deadline, keep_ttl)
+        return old if get else _OK
+
+    def cmd_setnx(self, key, value):
+        if key in self.data:
+            return 0
+        self._set_string(key, value)
+        return 1
+
+    def cmd_setex(self, key, seconds, value):
+        seconds = _int(seconds)
+        if seconds <= 0:
+            raise ResponseError('invalid expire time in setex')
+        self._set_string(key, value, self._now + seconds)
+        return _OK
+
+    def cmd_psetex(self, key, milliseconds, value):
+        milliseconds = _int(milliseconds)
+        if milliseconds <= 0:
+            raise ResponseError('invalid expire time in psetex')
+        self._set_string(key, value, self._now + milliseconds / 1000.0)
+        return _OK
+
+    def cmd_getset(self, key, value):
+        old = self._get(key, bytes)
+        self._set_string(key, value)
+        return old
+
+    def cmd_getdel(self, key):
+        value = self._get(key, bytes)
+        if value is not None:
+            self._delete(key)
+        return value
+
+    def cmd_mget(self, *keys):
+        result = []
+        for key in keys:
+            value = self.data.get(key)
+            result.append(value if type(value) is bytes else None)
+        return result
+
+    def cmd_mset(self, *args):
+        if len(args) % 2:
+            raise ResponseError("wrong number of arguments for 'mset' command")
+        for key, value in zip(args[::2], args[1::2]):
+            self._set_string(key, value)
+        return _OK
+
+    def cmd_msetnx(self, *args):
+        if len(args) % 2:
+            raise ResponseError("wrong number of arguments for 'msetnx' command")
+        if any(key in self.data for key in args[::2]):
+            return 0
+        self.cmd_mset(*args)
+        return 1
+
+    def _incr(self, key, amount):
+        value = self._get(key, bytes)
+        result = (0 if value is None else _int(value)) + amount
+        if not -_MAX_INT - 1 <= result <= _MAX_INT:
+            raise ResponseError('increment or decrement would overflow')
+        self.data[key] = b'%d' % result
+        return result
+
+    def cmd_incr(self, key):
+        return self._incr(key, 1)
+
+    def cmd_decr(self, key):
+        return self._incr(key, -1)
+
+    def cmd_incrby(self, key, amount):
+        return self._incr(key, _int(amount))
+
+    def cmd_decrby(self, key, amount):
+        return self._incr(key, -_int(amount))
+
+    def cmd_incrbyfloat(self, key, amount):
+        result = self.data[key] = _incr_float(self._get(key, bytes), amount)
+        return result
+
+    def cmd_append(self, key, value):
+        result = self.data[key] = (self._get(key, bytes) or b'') + value
+        return len(result)
+
+    def cmd_strlen(self, key):
+        return len(self._get(key, bytes) or b'')
+
+    def cmd_getrange(self, key, start, end):
+        value = self._get(key, bytes) or b''
+        start, stop = _index_range(start, end, len(value))
+        return value[start:stop]
+
+    cmd_substr = cmd_getrange
+
+    def cmd_setrange(self, key, offset, value):
+        offset = _int(offset)
+        if offset < 0:
+            raise ResponseError('offset is out of range')
+        old = self._get(key, bytes) or b''
+        if not value:
+            return len(old)
+        old = old.ljust(offset, b'\x00')
+        result = self.data[key] = old[:offset] + value + old[offset + len(value):]
+        return len(result)
+
+    # bitmaps
+
+    def cmd_setbit(self, key, offset, value):
+        offset = _int(offset, 'bit offset is not an integer or out of range')
+        if not 0 <= offset < 2 ** 32:
+            raise ResponseError('bit offset is not an integer or out of range')
+        if value not in (b'0', b'1'):
+            raise ResponseError('bit is not an integer or out of range')
+        buf = bytearray(self._get(key, bytes) or b'')
+        old = _get_bits(buf, offset, 1)
+        _set_bits(buf, offset, 1, int(value))
+        self.data[key] = bytes(buf)
+        return old
+
+    def cmd_getbit(self, key, offset):
+        offset = _int(offset, 'bit offset is not an integer or out of range')
+        if not 0 <= offset < 2 ** 32:
+            raise ResponseError('bit offset is not an integer or out of range')
+        return _get_bits(self._get(key, bytes) or b'', offset, 1)
+
+    def cmd_bitcount(self, key, start=None, end=None, unit=None):
+        value = self._get(key, bytes) or b''
+        if start is not None and end is None:
+            raise ResponseError(_SYNTAX)
+        start, stop = _bit_range(value, start or 0, end, unit)
+        if start >= stop:
+            return 0
+        return bin(_get_bits(value, start, stop - start)).count('1')
+
+    def cmd_bitop(self, operation, destkey, key, *keys):
+        operation = operation.upper()
+        values = [self._get(name, bytes) or b'' for name in (key, ) + keys]
+        if operation == b'NOT':
+            if keys:
+                raise ResponseError('BITOP NOT must be called with a single source key.')
+            result = bytes(255 - byte for byte in values[0])
+        elif operation in (b'AND', b'OR', b'XOR'):
+            length = max(len(value) for value in values)
+            numbers = [int.from_bytes(value.ljust(length, b'\x00'), 'big') for value in values]
+            result = numbers[0]
+            for number in numbers[1:]:
+                if operation == b'AND':
+                    result &= number
+                elif operation == b'OR':
+                    result |= number
+                else:
+                    result ^= number
+            result = result.to_bytes(length, 'big')
+        else:
+            raise ResponseError(_SYNTAX)
+        self._delete(destkey)
+        if result:
+            self.data[destkey] = result
+        return len(result)
+
+    def cmd_bitpos(self, key, bit, start=None, end=None, unit=None):
+        if bit not in (b'0', b'1'):
+            raise ResponseError('The bit argument must be 1 or 0.')
+        value = self._get(key, bytes)
+        if value is None:
+            return -1 if bit == b'1' else 0
+        begin, stop = _bit_range(value, start or 0, end, unit)
+        for offset in range(begin, stop):
+            if _get_bits(value, offset, 1) == int(bit):
+                return offset
+        # 查找0并且没有指定结束位置时，字符串之后的位都是0
+        return stop if bit == b'0' and end is None else -1
+
+    def cmd_bitfield(self, key, *args):
+        value = self._get(key, bytes)
+        buf = bytearray(value or b'')
+        overflow = b'WRAP'
+        changed = False
+        result = []
+        idx = 0
+        while idx < len(args):
+            operation = args[idx].upper()
+            if operation == b'OVERFLOW' and idx + 1 < len(args):
+                overflow = args[idx + 1].upper()
+                if overflow not in (b'WRAP', b'SAT', b'FAIL'):
+                    raise ResponseError('Invalid OVERFLOW type specified')
+                idx += 2
+                continue
+            if operation not in (b'GET', b'SET', b'INCRBY') or idx + (2 if operation == b'GET' else 3) >= len(args):
+                raise ResponseError(_SYNTAX)
+            signed, bits = _bitfield_type(args[idx + 1])
+            offset = _bitfield_offset(args[idx + 2], bits)
+            old = _get_bits(buf, offset, bits)
+            if signed and old >= 1 << (bits - 1):
+                old -= 1 << bits
+            if operation == b'GET':
+                result.append(old)
+                idx += 3
+                continue
+
+            number = _int(args[idx + 3])
+            number = old + number if operation == b'INCRBY' else number
+            low, high = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else (0, (1 << bits) - 1)
+            if not low <= number <= high:
+                if overflow == b'FAIL':
+                    result.append(None)
+                    idx += 4
+                    continue
+                if overflow == b'SAT':
+                    number = low if number < low else high
+                else:
+                    number = (number - low) % (1 << bits) + low
+            _set_bits(buf, offset, bits, number & ((1 << bits) - 1))
+            changed = True
+            result.append(old if operation == b'SET' else number)
+            idx += 4
+        if changed:
+            self.data[key] = bytes(buf)
+        return result
+
+    # hashes
+
+    def cmd_hset(self, key, field, value, *args):
+        if len(args) % 2:
+            raise ResponseError("wrong number of arguments for 'hset' command")
+        mapping = self._get_or_create(key, dict)
+        added = 0
+        for field, value in zip((field, ) + args[::2], (value, ) + args[1::2]):
+            if field not in mapping:
+                added += 1
+            mapping[field] = value
+        return added
+
+    def cmd_hmset(self, key, *args):
+        if not args:
+            raise ResponseError("wrong number of arguments for 'hmset' command")
+        self.cmd_hset(key, *args)
+        return _OK
+
+    def cmd_hsetnx(self, key, field, value):
+        mapping = self._get_or_create(key, dict)
+        if field in mapping:
+            return 0
+        mapping[field] = value
+        return 1
+
+    def cmd_hget(self, key, field):
+        mapping = self._get(key, dict)
+        return None if mapping is None else mapping.get(field)
+
+    def cmd_hmget(self, key, *fields):
+        mapping = self._get(key, dict) or {}
+        return [mapping.get(field) for field in fields]
+
+    def cmd_hdel(self, key, *fields):
+        mapping = self._get(key, dict)
+        if mapping is None:
+            return 0
+        count = sum(1 for field in fields if mapping.pop(field, None) is not None)
+        self._check_empty(key, mapping)
+        return count
+
+    def cmd_hexists(self, key, field):
+        return 1 if field in (self._get(key, dict) or {}) else 0
+
+    def cmd_hlen(self, key):
+        return len(self._get(key, dict) or {})
+
+    def cmd_hstrlen(self, key, field):
+        return len((self._get(key, dict) or {}).get(field, b''))
+
+    def cmd_hkeys(self, key):
+        return list(self._get(key, dict) or {})
+
+    def cmd_hvals(self, key):
+        return list((self._get(key, dict) or {}).values())
+
+    def cmd_hgetall(self, key):
+        return [item for pair in (self._get(key, dict) or {}).items() for item in pair]
+
+    def cmd_hincrby(self, key, field, amount):
+        amount = _int(amount)
+        value = (self._get(key, dict) or {}).get(field)
+        result = (0 if value is None else _int(value, 'hash value is not an integer')) + amount
+        if not -_MAX_INT - 1 <= result <= _MAX_INT:
+            raise ResponseError('increment or decrement would overflow')
+        self._get_or_create(key, dict)[field] = b'%d' % result
+        return result
+
+    def cmd_hincrbyfloat(self, key, field, amount):
+        value = (self._get(key, dict) or {}).get(field)
+        result = self._get_or_create(key, dict)[field] = _incr_float(value, amount, 'hash value is not a float')
+        return result
+
+    def cmd_hscan(self, key, cursor, *args):
+        mapping = self._get(key, dict) or {}
+        cursor, items = self._scan(cursor, list(mapping.items()), args, key=lambda item: item[0])
+        return [cursor, [value for item in items for value in item]]
+
+    def cmd_hrandfield(self, key, count=None, with_values=None):
+        mapping = self._get(key, dict) or {}
+        if count is None:
+            return random.choice(list(mapping)) if mapping else None
+        fields = self._random_members(list(mapping), _int(count))
+        if with_values is not None:
+            if with_values.upper() != b'WITHVALUES':
+                raise ResponseError(_SYNTAX)
+            return [item for field in fields for item in (field, mapping[field])]
+        return fields
+
+    # lists
+
+    def _push(self, key, values, left, create=True):
+        items = self._get(key, collections.deque)
+        if items is None:
+            if not create:
+                return 0
+            items = self.data[key] = collections.deque()
+        if left:
+            items.extendleft(values)
+        else:
+            items.extend(values)
+        return len(items)
+
+    def cmd_lpush(self, key, value, *values):
+        return self._push(key, (value, ) + values, True)
+
+    def cmd_rpush(self, key, value, *values):
+        return self._push(key, (value, ) + values, False)
+
+    def cmd_lpushx(self, key, value, *values):
+        return self._push(key, (value, ) + values, True, False)
+
+    def cmd_rpushx(self, key, value, *values):
+        return self._push(key, (value, ) + values, False, False)
+
+    def _pop(self, key, left, count=None):
+        items = self._get(key, collections.deque)
+        if count is not None:
+            count = _int(count)
+            if count < 0:
+                raise ResponseError('value is out of range, must be positive')
+        if items is None:
+            return None
+        pop = items.popleft if left else items.pop
+        if count is None:
+            result = pop()
+        else:
+            result = [pop() for _ in range(min(count, len(items)))]
+        self._check_empty(key, items)
+        return result
+
+    def cmd_lpop(self, key, count=None):
+        return self._pop(key, True, count)
+
+    def cmd_rpop(self, key, count=None):
+        return self._pop(key, False, count)
+
+    def cmd_llen(self, key):
+        return len(self._get(key, collections.deque) or ())
+
+    def cmd_lindex(self, key, index):
+        items = self._get(key, collections.deque) or ()
+        index = _int(index)
+        if -len(items) <= index < len(items):
+            return items[index]
+        return None
+
+    def cmd_lset(self, key, index, value):
+        items = self._get(key, collections.deque)
+        if items is None:
+            raise ResponseError('no such key')
+        index = _int(index)
+        if not -len(items) <= index < len(items):
+            raise ResponseError('index out of range')
+        items[index] = value
+        return _OK
+
+    def cmd_lrange(self, key, start, end):
+        items = self._get(key, collections.deque) or ()
+        start, stop = _index_range(start, end, len(items))
+        return list(itertools.islice(items, start, stop))
+
+    def cmd_ltrim(self, key, start, end):
+        items = self._get(key, collections.deque)
+        if items is None:
+            return _OK
+        start, stop = _index_range(start, end, len(items))
+        kept = list(itertools.islice(items, start, stop))
+        items.clear()
+        items.extend(kept)
+        self._check_empty(key, items)
+        return _OK
+
+    def cmd_lrem(self, key, count, value):
+        items = self._get(key, collections.deque)
+        count = _int(count)
+        if items is None:
+            return 0
+        source = reversed(items) if count < 0 else iter(items)
+        limit = abs(count) or len(items)
+        kept, removed = [], 0
+        for item in source:
+            if removed < limit and item == value:
+                removed += 1
+            else:
+                kept.append(item)
+        if count < 0:
+            kept.reverse()
+        items.clear()
+        items.extend(kept)
+        self._check_empty(key, items)
+        return removed
+
+    def cmd_linsert(self, key, where, pivot, value):
+        where = where.upper()
+        if where not in (b'BEFORE', b'AFTER'):
+            raise ResponseError(_SYNTAX)
+        items = self._get(key, collections.deque)
+        if items is None:
+            return 0
+        try:
+            index = items.index(pivot)
+        except ValueError:
+            return -1
+        items.insert(index if where == b'BEFORE' else index + 1, value)
+        return len(items)
+
+    def _move(self, source, destination, src_left, dst_left):
+        items = self._get(source, collections.deque)
+        if items is None:
+            return None
+        self._get(destination, collections.deque)
+        value = items.popleft() if src_left else items.pop()
+        self._check_empty(source, items)
+        self._push(destination, (value, ), dst_left)
+        return value
+
+    @staticmethod
+    def _side(value):
+        value = value.upper()
+        if value not in (b'LEFT', b'RIGHT'):
+            raise ResponseError(_SYNTAX)
+        return value == b'LEFT'
+
+    def cmd_rpoplpush(self, source, destination):
+        return self._move(source, destination, False, True)
+
+    def cmd_lmove(self, source, destination, src, dst):
+        return self._move(source, destination, self._side(src), self._side(dst))
+
+    def _blocking(self, timeout, func):
+        """
+        func返回None时等待其他命令写入，pipeline中和redis的事务一样不等待
+        """
+        deadline = self._deadline(timeout)
+        block = self._block
+        while True:
+            result = func()
+            if result is not None or not block or not self._wait(deadline):
+                return result
+
+    def _blocking_pop(self, args, left):
+        keys, timeout = args[:-1], args[-1]
+
+        def pop():
+            for key in keys:
+                if self._get(key, collections.deque):
+                    return [key, self._pop(key, left)]
+        return self._blocking(timeout, pop)
+
+    def cmd_blpop(self, key, *args):
+        return self._blocking_pop((key, ) + args, True)
+
+    def cmd_brpop(self, key, *args):
+        return self._blocking_pop((key, ) + args, False)
+
+    def cmd_brpoplpush(self, source, destination, timeout):
+        return self._blocking(timeout, lambda: self._move(source, destination, False, True))
+
+    def cmd_blmove(self, source, destination, src, dst, timeout):
+        src, dst = self._side(src), self._side(dst)
+        return self._blocking(timeout, lambda: self._move(source, destination, src, dst))
+
+    # sets
+
+    def cmd_sadd(self, key, member, *members):
+        items = self._get_or_create(key, set)
+        size = len(items)
+        items.add(member)
+        items.update(members)
+        return len(items) - size
+
+    def cmd_srem(self, key, member, *members):
+        items = self._get(key, set)
+        if items is None:
+            return 0
+        size = len(items)
+        items.difference_update((member, ) + members)
+        self._check_empty(key, items)
+        return size - len(items)
+
+    def cmd_scard(self, key):
+        return len(self._get(key, set) or ())
+
+    def cmd_sismember(self, key, member):
+        return 1 if member in (self._get(key, set) or ()) else 0
+
+    def cmd_smismember(self, key, member, *members):
+        items = self._get(key, set) or ()
+        return [1 if item in items else 0 for item in (member, ) + members]
+
+    def cmd_smembers(self, key):
+        return list(self._get(key, set) or ())
+
+    @staticmethod
+    def _random_members(items, count):
+        """
+        count为负数时可以重复
+        """
+        if count < 0:
+            return [random.choice(items) for _ in range(-count)] if items else []
+        return random.sample(items, min(count, len(items)))
+
+    def cmd_spop(self, key, count=None):
+        items = self._get(key, set)
+        if count is None:
+            if not items:
+                return None
+            member = random.choice(list(items))
+            items.discard(member)
+            self._check_empty(key, items)
+            return member
+        count = _int(count)
+        if count < 0:
+            raise ResponseError('value is out of range, must be positive')
+        members = self._random_members(list(items or ()), count)
+        if items:
+            items.difference_update(members)
+            self._check_empty(key, items)
+        return members
+
+    def cmd_srandmember(self, key, count=None):
+        items = list(self._get(key, set) or ())
+        if count is None:
+            return random.choice(items) if items else None
+        return self._random_members(items, _int(count))
+
+    def cmd_smove(self, source, destination, member):
+        items = self._get(source, set)
+        self._get(destination, set)
+        if not items or member not in items:
+            return 0
+        items.discard(member)
+        self._check_empty(source, items)
+        self._get_or_create(destination, set).add(member)
+        return 1
+
+    def _sets(self, keys):
+        return [self._get(key, set) or set() for key in keys]
+
+    def _sinter(self, keys):
+        sets = self._sets(keys)
+        return set.intersection(*sorted(sets, key=len))
+
+    def _sunion(self, keys):
+        return set().union(*self._sets(keys))
+
+    def _sdiff(self, keys):
+        sets = self._sets(keys)
+        return sets[0].difference(*sets[1:])
+
+    def cmd_sinter(self, key, *keys):
+        return list(self._sinter((key, ) + keys))
+
+    def cmd_sunion(self, key, *keys):
+        return list(self._sunion((key, ) + keys))
+
+    def cmd_sdiff(self, key, *keys):
+        return list(self._sdiff((key, ) + keys))
+
+    def cmd_sinterstore(self, destination, key, *keys):
+        return self._store(destination, self._sinter((key, ) + keys))
+
+    def cmd_sunionstore(self, destination, key, *keys):
+        return self._store(destination, self._sunion((key, ) + keys))
+
+    def cmd_sdiffstore(self, destination, key, *keys):
+        return self._store(destination, self._sdiff((key, ) + keys))
+
+    def cmd_sscan(self, key, cursor, *args):
+        return self._scan(cursor, list(self._get(key, set) or ()), args)
+
+    # sorted sets
+
+    def cmd_zadd(self, key, *args):
+        flags = set()
+        idx = 0
+        while idx < len(args) and args[idx].upper() in (b'NX', b'XX', b'GT', b'LT', b'CH', b'INCR'):
+            flags.add(args[idx].upper())
+            idx += 1
+        pairs = args[idx:]
+        if not pairs or len(pairs) % 2:
+            raise ResponseError(_SYNTAX)
+        if b'NX' in flags and (b'XX' in flags or b'GT' in flags or b'LT' in flags) or \
+                (b'GT' in flags and b'LT' in flags):
+            raise ResponseError('XX and NX options at the same time are not compatible')
+        if b'INCR' in flags and len(pairs) != 2:
+            raise ResponseError('INCR option supports a single increment-element pair')
+        scores = [_float(score) for score in pairs[::2]]
+
+        zset = self._get(key, _SortedSet)
+        created = zset is None
+        if created:
+            zset = _SortedSet()
+        added = changed = 0
+        result = None
+        for score, member in zip(scores, pairs[1::2]):
+            old = zset.scores.get(member)
+            if old is None:
+                if b'XX' in flags:
+                    continue
+                result = score
+                zset.add(member, score)
+                added += 1
+                continue
+            if b'NX' in flags:
+                continue
+            score = old + score if b'INCR' in flags else score
+            if math.isnan(score):
+                raise ResponseError('resulting score is not a number (NaN)')
+            if (b'GT' in flags and score <= old) or (b'LT' in flags and score >= old):
+                continue
+            result = score
+            if score != old:
+                zset.add(member, score)
+                changed += 1
+        if created and zset:
+            self.data[key] = zset
+        if b'INCR' in flags:
+            return None if result is None else _format_float(result)
+        return added + changed if b'CH' in flags else added
+
+    def cmd_zincrby(self, key, amount, member):
+        return self.cmd_zadd(key, b'INCR', amount, member)
+
+    def cmd_zscore(self, key, member):
+        score = (self._get(key, _SortedSet) or _SortedSet()).scores.get(member)
+        return None if score is None else _format_float(score)
+
+    def cmd_zmscore(self, key, member, *members):
+        scores = (self._get(key, _SortedSet) or _SortedSet()).scores
+        return [None if scores.get(item) is None else _format_float(scores[item]) for item in (member, ) + members]
+
+    def cmd_zcard(self, key):
+        return len(self._get(key, _SortedSet) or ())
+
+    def cmd_zcount(self, key, min_score, max_score):
+        zset = self._get(key, _SortedSet) or _SortedSet()
+        start, stop = zset.score_range(*(_score_bound(min_score) + _score_bound(max_score)))
+        return stop - start
+
+    def cmd_zrank(self, key, member):
+        return (self._get(key, _SortedSet) or _SortedSet()).rank(member)
+
+    def cmd_zrevrank(self, key, member):
+        zset = self._get(key, _SortedSet) or _SortedSet()
+        rank = zset.rank(member)
+        return None if rank is None else len(zset) - rank - 1
+
+    def cmd_zrem(self, key, member, *members):
+        zset = self._get(key, _SortedSet)
+        if zset is None:
+            return 0
+        count = sum(1 for item in (member, ) + members if zset.remove(item))
+        self._check_empty(key, zset)
+        return count
+
+    @staticmethod
+    def _with_scores(items, with_scores):
+        if with_scores:
+            return [value for score, member in items for value in (member, _format_float(score))]
+        return [member for score, member in items]
+
+    @staticmethod
+    def _limit(items, limit):
+        if limit is None:
+            return items
+        offset, count = limit
+        if offset < 0:
+            return []
+        return items[offset:offset + count] if count >= 0 else items[offset:]
+
+    def _zrange_by_score(self, key, min_score, max_score, reverse, with_scores, limit):
+        zset = self._get(key, _SortedSet) or _SortedSet()
+        start, stop = zset.score_range(*(_score_bound(min_score) + _score_bound(max_score)))
+        items = zset.items[start:stop]
+        if reverse:
+            items.reverse()
+        return self._with_scores(self._limit(items, limit), with_scores)
+
+    def _zrange_by_rank(self, key, start, end, reverse, with_scores):
+        zset = self._get(key, _SortedSet) or _SortedSet()
+        start, stop = _index_range(start, end, len(zset))
+        if reverse:
+            start, stop = len(zset) - stop, len(zset) - start
+            items = zset.items[start:stop]
+            items.reverse()
+        else:
+            items = zset.items[start:stop]
+        return self._with_scores(items, with_scores)
+
+    @staticmethod
+    def _range_options(args, allowed):
+        options = {'limit': None}
+        idx = 0
+        while idx < len(args):
+            option = args[idx].upper()
+            if option == b'LIMIT' and b'LIMIT' in allowed and idx + 2 < len(args):
+                options['limit'] = (_int(args[idx + 1]), _int(args[idx + 2]))
+                idx += 3
+                continue
+            if option not in allowed or option == b'LIMIT':
+                raise ResponseError(_SYNTAX)
+            options[option] = True
+            idx += 1
+        return options
+
+    def cmd_zrange(self, key, start, end, *args):
+        options = self._range_options(args, (b'BYSCORE', b'REV', b'LIMIT', b'WITHSCORES'))
+        reverse = options.get(b'REV', False)
+        if options.get(b'BYSCORE'):
+            if reverse:
+                start, end = end, start
+            return self._zrange_by_score(key, start, end, reverse, options.get(b'WITHSCORES'), options['limit'])
+        if options['limit'] is not None:
+            raise ResponseError('syntax error, LIMIT is only supported in combination with either BYSCORE or BYLEX')
+        return self._zrange_by_rank(key, start, end, reverse, options.get(b'WITHSCORES'))
+
+    def cmd_zrevrange(self, key, start, end, *args):
+        options = self._range_options(args, (b'WITHSCORES', ))
+        return self._zrange_by_rank(key, start, end, True, options.get(b'WITHSCORES'))
+
+    def cmd_zrangebyscore(self, key, min_score, max_score, *args):
+        options = self._range_options(args, (b'WITHSCORES', b'LIMIT'))
+        return self._zrange_by_score(key, min_score, max_score, False, options.get(b'WITHSCORES'), options['limit'])
+
+    def cmd_zrevrangebyscore(self, key, max_score, min_score, *args):
+        options = self._range_options(args, (b'WITHSCORES', b'LIMIT'))
+        return self._zrange_by_score(key, min_score, max_score, True, options.get(b'WITHSCORES'), options['limit'])
+
+    def _zremove(self, key, items):
+        zset = self._get(key, _SortedSet)
+        for score, member in items:
+            zset.remove(member)
+        self._check_empty(key, zset)
+        return len(items)
+
+    def cmd_zremrangebyrank(self, key, start, end):
+        zset = self._get(key, _SortedSet) or _SortedSet()
+        start, stop = _index_range(start, end, len(zset))
+        return self._zremove(key, zset.items[start:stop]) if stop > start else 0
+
+    def cmd_zremrangebyscore(self, key, min_score, max_score):
+        zset = self._get(key, _SortedSet) or _SortedSet()
+        start, stop = zset.score_range(*(_score_bound(min_score) + _score_bound(max_score)))
+        return self._zremove(key, zset.items[start:stop]) if stop > start else 0
+
+    def _zpop(self, key, count, is_max):
+        zset = self._get(key, _SortedSet)
+        count = 1 if count is None else _int(count)
+        if zset is None or count <= 0:
+            return []
+        items = zset.items[-count:][::-1] if is_max else zset.items[:count]
+        self._zremove(key, items)
+        return self._with_scores(items, True)
+
+    def cmd_zpopmin(self, key, count=None):
+        return self._zpop(key, count, False)
+
+    def cmd_zpopmax(self, key, count=None):
+        return self._zpop(key, count, True)
+
+    def _zcombine(self, destination, numkeys, args, is_union):
+        numkeys = _int(numkeys)
+        if numkeys < 1 or numkeys > len(args):
+            raise ResponseError('at least 1 input key is needed for ZUNIONSTORE/ZINTERSTORE')
+        keys, args = args[:numkeys], args[numkeys:]
+        weights = [1.0] * numkeys
+        aggregate = b'SUM'
+        idx = 0
+        while idx < len(args):
+            option = args[idx].upper()
+            if option == b'WEIGHTS' and idx + numkeys < len(args):
+                weights = [_float(weight, 'weight value is not a float') for weight in args[idx + 1:idx + 1 + numkeys]]
+                idx += numkeys + 1
+            elif option == b'AGGREGATE' and idx + 1 < len(args) and args[idx + 1].upper() in (b'SUM', b'MIN', b'MAX'):
+                aggregate = args[idx + 1].upper()
+                idx += 2
+            else:
+                raise ResponseError(_SYNTAX)
+
+        sources = []
+        for key in keys:
+            value = self.data.get(key)
+            if value is None:
+                sources.append({})
+            elif type(value) is _SortedSet:
+                sources.append(value.scores)
+            elif type(value) is set:
+                sources.append(dict.fromkeys(value, 1.0))
+            else:
+                raise ResponseError(_WRONGTYPE)
+
+        combine = {b'SUM': lambda x, y: x + y, b'MIN': min, b'MAX': max}[aggregate]
+        members = set().union(*sources) if is_union else set.intersection(*(set(source) for source in sources))
+        result = _SortedSet()
+        for member in members:
+            score = None
+            for source, weight in zip(sources, weights):
+                if member in source:
+                    value = source[member] * weight
+                    if math.isnan(value):
+                        value = 0.0
+                    score = value if score is None else combine(score, value)
+                    if math.isnan(score):
+                        score = 0.0
+            result.add(member, score)
+        return self._store(destination, result)
+
+    def cmd_zunionstore(self, destination, numkeys, *args):
+        return self._zcombine(destination, numkeys, args, True)
+
+    def cmd_zinterstore(self, destination, numkeys, *args):
+        return self._zcombine(destination, numkeys, args, False)
+
+    def cmd_zscan(self, key, cursor, *args):
+        zset = self._get(key, _SortedSet) or _SortedSet()
+        cursor, items = self._scan(cursor, list(zset.items), args, key=lambda item: item[1])
+        return [cursor, self._with_scores(items, True)]
+
+    # sort
+
+    def _sort_lookup(self, pattern, element):
+        if pattern == b'#':
+            return element
+        key = pattern.replace(b'*', element, 1)
+        field = None
+        if b'->' in key and not key.endswith(b'->'):
+            key, field = key.split(b'->', 1)
+        value = self.data.get(key)
+        if field is None:
+            return value if type(value) is bytes else None
+        return value.get(field) if type(value) is dict else None
+
+    def cmd_sort(self, key, *args):
+        by, limit, gets, store = None, None, [], None
+        desc = alpha = False
+        idx = 0
+        while idx < len(args):
+            option = args[idx].upper()
+            if option == b'BY' and idx + 1 < len(args):
+                by = args[idx + 1]
+                idx += 1
+            elif option == b'LIMIT' and idx + 2 < len(args):
+                limit = (_int(args[idx + 1]), _int(args[idx + 2]))
+                idx += 2
+            elif option == b'GET' and idx + 1 < len(args):
+                gets.append(args[idx + 1])
+                idx += 1
+            elif option == b'STORE' and idx + 1 < len(args):
+                store = args[idx + 1]
+                idx += 1
+            elif option in (b'ASC', b'DESC'):
+                desc = option == b'DESC'
+            elif option == b'ALPHA':
+                alpha = True
+            else:
+                raise ResponseError(_SYNTAX)
+            idx += 1
+
+        value = self.data.get(key)
+        if value is None:
+            elements = []
+        elif type(value) in (collections.deque, set):
+            elements = list(value)
+        elif type(value) is _SortedSet:
+            elements = [member for score, member in value.items]
+        else:
+            raise ResponseError(_WRONGTYPE)
+
+        if by is None or b'*' in by:
+            def weight(element):
+                item = element if by is None else self._sort_lookup(by, element)
+                if alpha:
+                    return item or b''
+                if item is None:
+                    return 0.0
+                return _float(item, "One or more scores can't be converted into double")
+            elements.sort(key=lambda element: (weight(element), element), reverse=desc)
+        if limit is not None:
+            elements = self._limit(elements, limit)
+        if gets:
+            elements = [self._sort_lookup(pattern, element) for element in elements for pattern in gets]
+        if store is not None:
+            return self._store(store, collections.deque(item or b'' for item in elements))
+        return elements
+
+    # hyperloglog
+
+    def cmd_pfadd(self, key, *elements):
+        items = self._get(key, _HyperLogLog)
+        if items is None:
+            items = self.data[key] = _HyperLogLog(elements)
+            return 1
+        size = len(items)
+        items.update(elements)
+        return 1 if len(items) != size else 0
+
+    def cmd_pfcount(self, key, *keys):
+        return len(set().union(*(self._get(item, _HyperLogLog) or () for item in (key, ) + keys)))
+
+    def cmd_pfmerge(self, destination, *keys):
+        items = self._get_or_create(destination, _HyperLogLog)
+        for key in keys:
+            items.update(self._get(key, _HyperLogLog) or ())
+        return _OK
+
+    # streams
+
+    @staticmethod
+    def _trim_args(args, idx):
+        """
+        解析MAXLEN|MINID [=|~] threshold [LIMIT count]
+        :return: (下一个参数的位置, (策略, 阈值))
+        """
+        strategy = args[idx].upper()
+        idx += 1
+        if idx < len(args) and args[idx] in (b'=', b'~'):
+            idx += 1
+        if idx >= len(args):
+            raise ResponseError(_SYNTAX)
+        threshold = args[idx]
+        idx += 1
+        if idx + 1 < len(args) and args[idx].upper() == b'LIMIT':
+            idx += 2
+        if strategy == b'MAXLEN':
+            threshold = _int(threshold)
+            if threshold < 0:
+                raise ResponseError('The MAXLEN argument must be >= 0.')
+        else:
+            threshold = _stream_id(threshold)
+        return idx, (strategy, threshold)
+
+    @staticmethod
+    def _trim(stream, trim):
+        strategy, threshold = trim
+        if strategy == b'MAXLEN':
+            count = max(len(stream) - threshold, 0)
+        else:
+            count = bisect.bisect_left(stream.ids, threshold)
+        for stream_id in stream.ids[:count]:
+            del stream.entries[stream_id]
+        del stream.ids[:count]
+        return count
+
+    def cmd_xadd(self, key, *args):
+        nomkstream = False
+        trim = None
+        idx = 0
+        while idx < len(args):
+            option = args[idx].upper()
+            if option == b'NOMKSTREAM':
+                nomkstream = True
+                idx += 1
+            elif option in (b'MAXLEN', b'MINID'):
+                idx, trim = self._trim_args(args, idx)
+            else:
+                break
+        args = args[idx:]
+        if len(args) < 3 or len(args) % 2 == 0:
+            raise ResponseError("wrong number of arguments for 'xadd' command")
+
+        stream = self._get(key, _Stream)
+        if stream is None:
+            if nomkstream:
+                return None
+            stream = _Stream()
+        if args[0] == b'*':
+            ms = max(int(self._now * 1000), stream.last_id[0])
+            stream_id = (ms, stream.last_id[1] + 1 if ms == stream.last_id[0] else 0)
+        else:
+            stream_id = _stream_id(args[0])
+            if stream_id == (0, 0):
+                raise ResponseError('The ID specified in XADD must be greater than 0-0')
+            if stream_id <= stream.last_id:
+                raise ResponseError('The ID specified in XADD is equal or smaller than the target stream top item')
+        self.data.setdefault(key, stream)
+        stream.add(stream_id, list(args[1:]))
+        if trim is not None:
+            self._trim(stream, trim)
+        return _format_id(stream_id)
+
+    def cmd_xlen(self, key):
+        return len(self._get(key, _Stream) or ())
+
+    def cmd_xdel(self, key, stream_id, *stream_ids):
+        stream = self._get(key, _Stream)
+        if stream is None:
+            return 0
+        return sum(1 for item in (stream_id, ) + stream_ids if stream.remove(_stream_id(item)))
+
+    def cmd_xtrim(self, key, *args):
+        if not args or args[0].upper() not in (b'MAXLEN', b'MINID'):
+            raise ResponseError(_SYNTAX)
+        idx, trim = self._trim_args(args, 0)
+        if idx != len(args):
+            raise ResponseError(_SYNTAX)
+        stream = self._get(key, _Stream)
+        return 0 if stream is None else self._trim(stream, trim)
+
+    def _xrange(self, key, start, end, args, reverse):
+        count = None
+        if args:
+            if len(args) != 2 or args[0].upper() != b'COUNT':
+                raise ResponseError(_SYNTAX)
+            count = max(_int(args[1]), 0)
+        stream = self._get(key, _Stream)
+        if stream is None:
+            return []
+        start, end = _stream_bound(start, True), _stream_bound(end, False)
+        ids = stream.ids[bisect.bisect_left(stream.ids, start):bisect.bisect_right(stream.ids, end)]
+        if reverse:
+            ids.reverse()
+        return [stream.entry(stream_id) for stream_id in ids[:count]]
+
+    def cmd_xrange(self, key, start, end, *args):
+        return self._xrange(key, start, end, args, False)
+
+    def cmd_xrevrange(self, key, end, start, *args):
+        return self._xrange(key, start, end, args, True)
+
+    @staticmethod
+    def _read_args(args, group=False):
+        """
+        解析XREAD和XREADGROUP的参数
+        :return: (count, block, noack, [(key, id)])
+        """
+        count = block = None
+        noack = False
+        idx = 0
+        while idx < len(args):
+            option = args[idx].upper()
+            if option == b'COUNT' and idx + 1 < len(args):
+                count = _int(args[idx + 1])
+                count = count if count > 0 else None
+                idx += 2
+            elif option == b'BLOCK' and idx + 1 < len(args):
+                block = _int(args[idx + 1], 'timeout is not an integer or out of range')
+                if block < 0:
+                    raise ResponseError('timeout is negative')
+                idx += 2
+            elif option == b'NOACK' and group:
+                noack = True
+                idx += 1
+            elif option == b'STREAMS':
+                idx += 1
+                break
+            else:
+                raise ResponseError(_SYNTAX)
+        else:
+            raise ResponseError(_SYNTAX)
+        streams = args[idx:]
+        if not streams or len(streams) % 2:
+            raise ResponseError('Unbalanced XREAD list of streams: for each stream key an ID or \'$\' must be '
+                                'specified.')
+        half = len(streams) // 2
+        return count, block, noack, list(zip(streams[:half], streams[half:]))
+
+    def _block_deadline(self, block):
+        if block is None or not self._block:
+            return _MISSING
+        return self._now + block / 1000.0 if block else None
+
+    def cmd_xread(self, *args):
+        count, block, _, streams = self._read_args(args)
+        positions = []
+        for key, stream_id in streams:
+            stream = self._get(key, _Stream)
+            if stream_id == b'$':
+                positions.append((key, stream.last_id if stream is not None else (0, 0)))
+            else:
+                positions.append((key, _stream_id(stream_id)))
+
+        deadline = self._block_deadline(block)
+        while True:
+            result = []
+            for key, last_id in positions:
+                stream = self._get(key, _Stream)
+                ids = stream.after(last_id, count) if stream is not None else []
+                if ids:
+                    result.append([key, [stream.entry(stream_id) for stream_id in ids]])
+            if result:
+                return result
+            if deadline is _MISSING or not self._wait(deadline):
+                return None
+
+    def _group(self, key, name, command):
+        stream = self._get(key, _Stream)
+        group = stream.groups.get(name) if stream is not None else None
+        if group is None:
+            raise ResponseError("NOGROUP No such key '%s' or consumer group '%s' in %s" % (
+                key.decode('utf-8', 'replace'), name.decode('utf-8', 'replace'), command))
+        return stream, group
+
+    def cmd_xreadgroup(self, option, group_name, consumer, *args):
+        if option.upper() != b'GROUP':
+            raise ResponseError(_SYNTAX)
+        count, block, noack, streams = self._read_args(args, True)
+        for key, stream_id in streams:
+            self._group(key, group_name, 'XREADGROUP with GROUP option')
+
+        now_ms = int(self._now * 1000)
+        history = [(key, stream_id) for key, stream_id in streams if stream_id != b'>']
+        if history:
+            result = []
+            for key, stream_id in history:
+                stream, group = self._group(key, group_name, 'XREADGROUP with GROUP option')
+                group.consumers[consumer] = now_ms
+                start = _stream_id(stream_id)
+                ids = sorted(item for item, pending in group.pending.items()
+                             if pending[0] == consumer and item > start)[:count]
+                entries = []
+                for item in ids:
+                    group.pending[item][1] = now_ms
+                    group.pending[item][2] += 1
+                    entries.append(stream.entry(item) if item in stream.entries else [_format_id(item), None])
+                result.append([key, entries])
+            return result
+
+        deadline = self._block_deadline(block)
+        while True:
+            result = []
+            for key, _ in streams:
+                stream, group = self._group(key, group_name, 'XREADGROUP with GROUP option')
+                group.consumers[consumer] = int(self._now * 1000)
+                ids = stream.after(group.last_id, count)
+                if ids:
+                    group.last_id = ids[-1]
+                    if not noack:
+                        for item in ids:
+                            group.pending[item] = [consumer, int(self._now * 1000), 1]
+                    result.append([key, [stream.entry(item) for item in ids]])
+            if result:
+                return result
+            if deadline is _MISSING or not self._wait(deadline):
+                return None
+
+    def cmd_xack(self, key, group_name, stream_id, *stream_ids):
+        stream = self._get(key, _Stream)
+        group = stream.groups.get(group_name) if stream is not None else None
+        if group is None:
+            return 0
+        return sum(1 for item in (stream_id, ) + stream_ids
+                   if group.pending.pop(_stream_id(item), None) is not None)
+
+    def cmd_xpending(self, key, group_name, *args):
+        stream, group = self._group(key, group_name, 'XPENDING')
+        if not args:
+            if not group.pending:
+                return [0, None, None, None]
+            ids = sorted(group.pending)
+            consumers = collections.Counter(pending[0] for pending in group.pending.values())
+            return [len(ids), _format_id(ids[0]), _format_id(ids[-1]),
+                    [[name, b'%d' % consumers[name]] for name in sorted(consumers)]]
+
+        idle = 0
+        if args[0].upper() == b'IDLE':
+            if len(args) < 2:
+                raise ResponseError(_SYNTAX)
+            idle = _int(args[1])
+            args = args[2:]
+        if len(args) not in (3, 4):
+            raise ResponseError(_SYNTAX)
+        start, end = _stream_bound(args[0], True), _stream_bound(args[1], False)
+        count = _int(args[2])
+        consumer = args[3] if len(args) == 4 else None
+        now_ms = int(self._now * 1000)
+        result = []
+        for item in sorted(group.pending):
+            name, delivered, times = group.pending[item]
+            if start <= item <= end and (consumer is None or name == consumer) and now_ms - delivered >= idle:
+                result.append([_format_id(item), name, now_ms - delivered, times])
+        return result[:max(count, 0)]
+
+    def cmd_xgroup_create(self, key, group_name, stream_id, *args):
+        mkstream = False
+        idx = 0
+        while idx < len(args):
+            option = args[idx].upper()
+            if option == b'MKSTREAM':
+                mkstream = True
+                idx += 1
+            elif option == b'ENTRIESREAD' and idx + 1 < len(args):
+                idx += 2
+            else:
+                raise ResponseError(_SYNTAX)
+        stream = self._get(key, _Stream)
+        if stream is None:
+            if not mkstream:
+                raise ResponseError('The XGROUP subcommand requires the key to exist. Note that for CREATE you may '
+                                    'want to use the MKSTREAM option to create an empty stream automatically.')
+            stream = self.data[key] = _Stream()
+        if group_name in stream.groups:
+            raise ResponseError('BUSYGROUP Consumer Group name already exists')
+        stream.groups[group_name] = _ConsumerGroup(stream.last_id if stream_id == b'$' else _stream_id(stream_id))
+        return _OK
+
+    def cmd_xgroup_destroy(self, key, group_name):
+        stream = self._get(key, _Stream)
+        if stream is None:
+            raise ResponseError('The XGROUP subcommand requires the key to exist.')
+        return 1 if stream.groups.pop(group_name, None) is not None else 0
+
+    def cmd_xgroup_setid(self, key, group_name, stream_id, *args):
+        stream, group = self._group(key, group_name, 'XGROUP SETID')
+        group.last_id = stream.last_id if stream_id == b'$' else _stream_id(stream_id)
+        return _OK
+
+    def cmd_xgroup_createconsumer(self, key, group_name, consumer):
+        _, group = self._group(key, group_name, 'XGROUP CREATECONSUMER')
+        if consumer in group.consumers:
+            return 0
+        group.consumers[consumer] = int(self._now * 1000)
+        return 1
+
+    def cmd_xgroup_delconsumer(self, key, group_name, consumer):
+        _, group = self._group(key, group_name, 'XGROUP DELCONSUMER')
+        group.consumers.pop(consumer, None)
+        ids = [item for item, pending in group.pending.items() if pending[0] == consumer]
+        for item in ids:
+            del group.pending[item]
+        return len(ids)
+
+    def cmd_xinfo_stream(self, key, *args):
+        if args:
+            raise ResponseError('the memory backend does not support XINFO STREAM FULL')
+        stream = self._get(key, _Stream)
+        if stream is None:
+            raise ResponseError('no such key')
+        first = stream.entry(stream.ids[0]) if stream.ids else None
+        last = stream.entry(stream.ids[-1]) if stream.ids else None
+        return [b'length', len(stream), b'radix-tree-keys', 1, b'radix-tree-nodes', 2,
+                b'last-generated-id', _format_id(stream.last_id), b'groups', len(stream.groups),
+                b'first-entry', first, b'last-entry', last]
+
+    def cmd_xinfo_groups(self, key):
+        stream = self._get(key, _Stream)
+        if stream is None:
+            raise ResponseError('no such key')
+        return [[b'name', name, b'consumers', len(group.consumers), b'pending', len(group.pending),
+                 b'last-delivered-id', _format_id(group.last_id)] for name, group in stream.groups.items()]
+
+    def cmd_xinfo_consumers(self, key, group_name):
+        _, group = self._group(key, group_name, 'XINFO CONSUMERS')
+        now_ms = int(self._now * 1000)
+        pending = collections.Counter(item[0] for item in group.pending.values())
+        return [[b'name', name, b'pending', pending[name], b'idle', now_ms - seen]
+                for name, seen in group.consumers.items()]
+
+    # scripting
+
+    def cmd_evalsha(self, sha, numkeys, *args):
+        sha = sha.decode('utf-8', 'replace').lower()
+        if sha not in self._scripts:
+            raise NoScriptError('No matching script. Please use EVAL.')
+        numkeys = _int(numkeys)
+        if numkeys > len(args):
+            raise ResponseError("Number of keys can't be greater than number of args")
+        if numkeys < 0:
+            raise ResponseError("Number of keys can't be negative")
+        return self._implementations[sha](self._call, list(args[:numkeys]), list(args[numkeys:]))
+
+    def _load_script(self, source):
+        sha = hashlib.sha1(source).hexdigest()
+        if sha not in self._implementations:
+            raise ResponseError('the memory backend cannot run lua scripts, register a python implementation of '
+                                'script %s with MemoryStore.register_script' % sha)
+        self._scripts.add(sha)
+        return sha
+
+    def cmd_eval(self, source, numkeys, *args):
+        return self.cmd_evalsha(self._load_script(source).encode(), numkeys, *args)
+
+    def cmd_script_load(self, source):
+        return self._load_script(source).encode()
+
+    def cmd_script_exists(self, sha, *shas):
+        return [1 if item.decode('utf-8', 'replace').lower() in self._scripts else 0 for item in (sha, ) + shas]
+
+    def cmd_script_flush(self, *args):
+        self._scripts.clear()
+        return _OK
+
+    # pub/sub
+
+    def subscribe(self, pubsub, name, is_pattern):
+        with self.lock:
+            (self.patterns if is_pattern else self.channels).setdefault(name, set()).add(pubsub)
+
+    def unsubscribe(self, pubsub, name, is_pattern):
+        with self.lock:
+            subscribers = self.patterns if is_pattern else self.channels
+            pubsubs = subscribers.get(name)
+            if pubsubs is not None:
+                pubsubs.discard(pubsub)
+                if not pubsubs:
+                    del subscribers[name]
+
+    def cmd_publish(self, channel, message):
+        count = 0
+        for pubsub in self.channels.get(channel, ()):
+            pubsub.put([b'message', channel, message])
+            count += 1
+        for pattern, pubsubs in self.patterns.items():
+            if _match(pattern, channel):
+                for pubsub in pubsubs:
+                    pubsub.put([b'pmessage', pattern, channel, message])
+                    count += 1
+        return count
+
+    def cmd_pubsub_channels(self, pattern=None):
+        return [channel for channel in self.channels if _match(pattern, channel)]
+
+    def cmd_pubsub_numsub(self, *channels):
+        return [item for channel in channels for item in (channel, len(self.channels.get(channel, ())))]
+
+    def cmd_pubsub_numpat(self):
+        return sum(len(pubsubs) for pubsubs in self.patterns.values())
+
+
+def _build_commands():
+    """
+    cmd_开头的方法是命令的实现，名字中的_对应子命令前的空格
+    """
+    commands = {}
+    for attr in dir(MemoryStore):
+        if not attr.startswith('cmd_'):
+            continue
+        func = getattr(MemoryStore, attr)
+        name = attr[len('cmd_'):].upper().replace('_', ' ')
+        code = func.__code__
+        # 同一个函数作为多个命令时（例如DEL和UNLINK）各自记录统计
+        handler = functools.partial(func)
+        handler.stats_name = name.split()[0].lower()
+        handler.min_args = code.co_argcount - 1 - len(func.__defaults__ or ())
+        handler.max_args = None if code.co_flags & inspect.CO_VARARGS else code.co_argcount - 1
+        commands[name] = handler
+    return commands
+
+
+_COMMANDS = _build_commands()
+
+
+def _decode(response, encoder):
+    if isinstance(response, bytes):
+        return encoder.decode(response)
+    if isinstance(response, list):
+        return [_decode(item, encoder) for item in response]
+    return response
+
+
+class MemoryPipeline(Pipeline):
+    """
+    内存后端的pipeline，所有命令在同一把锁内执行，事务和非事务都是原子的，阻塞的命令不等待
+    """
+    def _execute(self, raise_on_error):
+        stack = self.command_stack
+        try:
+            responses = []
+            with self.database.store.lock:
+                for args, options in stack:
+                    try:
+                        responses.append(self.database._execute(args, options, False))
+                    except ResponseError as e:
+                        responses.append(e)
+            if raise_on_error:
+                self.raise_first_error(stack, responses)
+            return responses
+        finally:
+            self.reset()
+
+    def immediate_execute_command(self, *args, **options):
+        return self.database._execute(args, options)
+
+
+class MemoryPubSub(object):
+    """
+    内存后端的发布订阅，接口和redis-py的PubSub相同
+    """
+    def __init__(self, database, ignore_subscribe_messages=False):
+        self.database = database
+        self.store = database.store
+        self.encoder = database._encoder
+        self.ignore_subscribe_messages = ignore_subscribe_messages
+        self.channels = {}
+        self.patterns = {}
+        self.messages = collections.deque()
+        self.condition = threading.Condition()
+
+    @property
+    def subscribed(self):
+        return bool(self.channels or self.patterns)
+
+    def put(self, message):
+        with self.condition:
+            self.messages.append(message)
+            self.condition.notify()
+
+    def _names(self, args, kwargs):
+        names = dict.fromkeys(args[0] if len(args) == 1 and isinstance(args[0], (list, tuple)) else args)
+        names.update(kwargs)
+        return [(bytes(self.encoder.encode(name)), handler) for name, handler in names.items()]
+
+    def _subscribe(self, args, kwargs, is_pattern):
+        subscribed = self.patterns if is_pattern else self.channels
+        for name, handler in self._names(args, kwargs):
+            subscribed[name] = handler
+            self.store.subscribe(self, name, is_pattern)
+            self.put([b'psubscribe' if is_pattern else b'subscribe', name, len(self.channels) + len(self.patterns)])
+
+    def _unsubscribe(self, args, is_pattern):
+        subscribed = self.patterns if is_pattern else self.channels
+        names = [name for name, _ in self._names(args, {})] if args else list(subscribed)
+        for name in names:
+            subscribed.pop(name, None)
+            self.store.unsubscribe(self, name, is_pattern)
+            self.put([b'punsubscribe' if is_pattern else b'unsubscribe', name,
+                      len(self.channels) + len(self.patterns)])
+
+    def subscribe(self, *args, **kwargs):
+        self._subscribe(args, kwargs, False)
+
+    def psubscribe(self, *args, **kwargs):
+        self._subscribe(args, kwargs, True)
+
+    def unsubscribe(self, *args):
+        self._unsubscribe(args, False)
+
+    def punsubscribe(self, *args):
+        self._unsubscribe(args, True)
+
+    def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        """
+        获取一条消息，有处理函数的消息交给处理函数，返回None
+        :param ignore_subscribe_messages:
+        :param timeout: None表示一直等待
+        :return:
+        """
+        with self.condition:
+            if not self.messages:
+                self.condition.wait(timeout)
+            if not self.messages:
+                return None
+            response = self.messages.popleft()
+            # 忽略的订阅消息不占用这次获取
+            while response[0] not in (b'message', b'pmessage') and self.messages and \
+                    (ignore_subscribe_messages or self.ignore_subscribe_messages):
+                response = self.messages.popleft()
+
+        kind = response[0]
+        if kind == b'pmessage':
+            message = {'type': 'pmessage', 'pattern': response[1], 'channel': response[2], 'data': response[3]}
+        else:
+            message = {'type': kind.decode(), 'pattern': None, 'channel': response[1], 'data': response[2]}
+        handler = None
+        if kind == b'message':
+            handler = self.channels.get(message['channel'])
+        elif kind == b'pmessage':
+            handler = self.patterns.get(message['pattern'])
+        for field in ('pattern', 'channel', 'data'):
+            message[field] = self.encoder.decode(message[field])
+
+        if kind not in (b'message', b'pmessage'):
+            if ignore_subscribe_messages or self.ignore_subscribe_messages:
+                return None
+        elif handler is not None:
+            handler(message)
+            return None
+        return message
+
+    def listen(self):
+        while self.subscribed:
+            message = self.get_message(timeout=None)
+            if message is not None:
+                yield message
+
+    def run_in_thread(self, sleep_time=0.0, daemon=False, exception_handler=None):
+        for name, handler in list(self.channels.items()) + list(self.patterns.items()):
+            if handler is None:
+                raise PubSubError("Channel: '%s' has no handler registered" % name.decode('utf-8', 'replace'))
+        kwargs = {'exception_handler': exception_handler} if exception_handler is not None else {}
+        thread = PubSubWorkerThread(self, sleep_time, daemon=daemon, **kwargs)
+        thread.start()
+        return thread
+
+    def reset(self):
+        for name in list(self.channels):
+            self.store.unsubscribe(self, name, False)
+        for name in list(self.patterns):
+            self.store.unsubscribe(self, name, True)
+        self.channels.clear()
+        self.patterns.clear()
+        with self.condition:
+            self.messages.clear()
+
+    close = reset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.reset()
+
+
+class MemoryRedis(MRedis):
+    """
+    不需要redis服务器的MRedis，命令在进程内的MemoryStore中执行，可以用于单元测试，或者作为进程内的缓存
+
+    不支持的命令会抛出ResponseError；lua脚本只能执行注册了python实现的（mredis自己的脚本都已经注册）
+    """
+    def __init__(self, *args, **kwargs):
+        """
+        参数和MRedis相同，连接相关的参数中只有decode_responses、encoding、encoding_errors有效
+        :param store: MemoryStore，多个客户端可以共用同一份数据，默认每个客户端使用自己的数据
+        """
+        store = kwargs.pop('store', None)
+        kwargs['preload_scripts'] = False
+        kwargs.update(_PROTOCOL)
+        super(MemoryRedis, self).__init__(*args, **kwargs)
+        self.store = store if store is not None else MemoryStore()
+        self._encoder = self.get_encoder()
+
+    def _route_command(self, *args, **options):
+        options.pop('consistent', None)
+        return self._execute(args, options)
+
+    def _execute(self, args, options, block=True):
+        """
+        在MemoryStore中执行命令，然后和redis-py一样解码、调用回调
+        :param args:
+        :param options:
+        :param block: 阻塞的命令是否等待
+        :return:
+        """
+        encoder = self._encoder
+        never_decode = options.pop(NEVER_DECODE, False)
+        empty_response = options.pop(EMPTY_RESPONSE, _MISSING)
+        options.pop('keys', None)
+        command_name = args[0]
+        command = [command_name]
+        for arg in args[1:]:
+            arg = encoder.encode(arg)
+            command.append(arg if isinstance(arg, bytes) else bytes(arg))
+        try:
+            response = self.store.execute(command, block)
+        except ResponseError:
+            if empty_response is not _MISSING:
+                return empty_response
+            raise
+
+        if not never_decode and encoder.decode_responses:
+            response = _decode(response, encoder)
+        if command_name in self.response_callbacks:
+            return self.response_callbacks[command_name](response, **options)
+        return response
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return MemoryPipeline(self, transaction, shard_hint)
+
+    def pubsub(self, **kwargs):
+        return MemoryPubSub(self, **kwargs)
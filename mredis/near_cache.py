@@ -0,0 +1,505 @@
+# -*- coding: UTF-8 -*-
+import threading
+import time
+from collections import OrderedDict
+
+from redis.exceptions import ResponseError
+
+from mredis.containers import Hash, Set, SortedSet
+from mredis.exception import TypeException
+from mredis.replica import READ_COMMANDS
+
+# 容器中通过database调用、但是不修改数据的方法
+READ_METHODS = frozenset(['hscan', 'sscan', 'zscan', 'script_load', 'get_encoder'])
+
+
+def _sizeof(value):
+    """
+    估算本地副本占用的字节数
+    :param value:
+    :return:
+    """
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_sizeof(key) + _sizeof(val) for key, val in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(_sizeof(item) for item in value)
+    return 8
+
+
+class NearCache(object):
+    """
+    容器的进程内副本，第一次读取时把整个容器读到本地，之后的读取直接使用本地副本
+
+    1.keyspace：订阅redis的键空间通知，任何客户端修改了key都会删除本地副本，需要服务端的notify-keyspace-events
+      包含K以及事件类型（例如KA）；configure=True时通过CONFIG SET开启，这会影响服务端的所有客户端
+    2.version：只有通过NearCache创建的容器的修改才会失效，修改后广播失效消息；其他客户端（包括普通的MRedis容器）的修改
+      只能等副本超过max_staleness后重新读取
+    两种方式下副本最多使用max_staleness秒（通知丢失、FLUSHDB这类不产生通知的命令、version方式下其他客户端的修改），
+    超出max_entries或者max_size时淘汰最久未使用的副本
+    """
+    modes = ('keyspace', 'version')
+
+    def __init__(self, database, max_entries=1024, max_size=None, max_staleness=5, invalidation='keyspace',
+                 key_pattern='*', configure=False, channel='mredis_near_cache_invalidate'):
+        """
+
+        :param database:
+        :param max_entries: 最多缓存的容器个数
+        :param max_size: 所有副本的最大总字节数（估算），None表示不限制
+        :param max_staleness: 副本最多使用的秒数，None表示只依赖失效消息，version方式下其他客户端的修改不会生效
+        :param invalidation: keyspace或者version
+        :param key_pattern: keyspace方式下订阅的key的模式
+        :param configure: keyspace方式下是否通过CONFIG SET给notify-keyspace-events加上KA，修改的是服务端的全局配置，
+            默认不修改；没有权限时忽略
+        :param channel: version方式下广播失效消息的频道
+        """
+        if invalidation not in self.modes:
+            raise TypeException(u'不支持的失效方式: %s' % invalidation)
+
+        self.database = database
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.max_staleness = max_staleness
+        self.invalidation = invalidation
+        self.channel = channel
+        self.encoder = database.get_encoder()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.lag_count = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self._size = 0
+        # key -> [值, 读取时间, 大小]
+        self._data = OrderedDict()
+        # 正在读取的key，读取期间收到失效消息时不保存读取的结果
+        self._pending = {}
+        # keyspace方式下本进程修改key的时间，用于计算失效的延迟
+        self._writes = {}
+        self._mutex = threading.Lock()
+
+        db = database.connection_pool.connection_kwargs.get('db', 0)
+        self.prefix = '__keyspace@%s__:' % db
+        self.pubsub = database.pubsub()
+        if invalidation == 'keyspace':
+            if configure:
+                self._configure()
+            self.pubsub.psubscribe(**{self.prefix + key_pattern: self._handle_keyspace})
+        else:
+            self.pubsub.subscribe(**{channel: self._handle_version})
+        # 等待订阅生效，之后的修改一定能收到通知
+        self.pubsub.get_message(timeout=1)
+        self.subscriber = self.pubsub.run_in_thread(sleep_time=0.001, daemon=True)
+
+    def _configure(self):
+        try:
+            flags = self.database.config_get('notify-keyspace-events').get('notify-keyspace-events') or ''
+            if isinstance(flags, bytes):
+                flags = flags.decode('utf-8')
+            missing = ''.join(flag for flag in 'KA' if flag not in flags)
+            if missing:
+                self.database.config_set('notify-keyspace-events', flags + missing)
+        except ResponseError:
+            pass
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size(self):
+        """
+        当前副本占用的总字节数
+        :return:
+        """
+        return self._size
+
+    def normalize(self, value):
+        """
+        转换成和读取结果相同的类型，用于在本地副本中查找
+        :param value:
+        :return:
+        """
+        return self.encoder.decode(self.encoder.encode(value))
+
+    def get(self, cache_key, load, convert=None):
+        """
+        获取key的本地副本，没有或者过期时从redis读取
+        :param cache_key:
+        :param load: 读取整个容器的函数，参数是MRedis或者pipeline
+        :param convert: 把读取的结果转换成本地副本的函数
+        :return:
+        """
+        now = time.time()
+        with self._mutex:
+            entry = self._data.get(cache_key)
+            if entry is not None and (self.max_staleness is None or now - entry[1] < self.max_staleness):
+                self._data.move_to_end(cache_key)
+                self.hits += 1
+                return entry[0]
+            token = self._pending[cache_key] = object()
+
+        value = load(self.database)
+        size = _sizeof(value)
+        if convert is not None:
+            value = convert(value)
+
+        with self._mutex:
+            self.misses += 1
+            if self._finish(cache_key, token):
+                self._set(cache_key, [value, now, size])
+        return value
+
+    def _finish(self, cache_key, token):
+        """
+        结束读取
+        :return: 读取期间是否没有失效
+        """
+        current = self._pending.get(cache_key)
+        if current is token or current is None:
+            self._pending.pop(cache_key, None)
+        return current is token
+
+    def _set(self, cache_key, entry):
+        if self.max_size is not None and entry[2] > self.max_size:
+            return
+        self._remove(cache_key)
+        self._data[cache_key] = entry
+        self._size += entry[2]
+        while self._data and (len(self._data) > self.max_entries or
+                              (self.max_size is not None and self._size > self.max_size)):
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def _remove(self, cache_key):
+        entry = self._data.pop(cache_key, None)
+        if entry is not None:
+            self._size -= entry[2]
+        return entry
+
+    def delete(self, cache_key):
+        """
+        删除本进程中的副本
+        :param cache_key:
+        :return:
+        """
+        with self._mutex:
+            if cache_key in self._pending:
+                self._pending[cache_key] = None
+            if self._remove(cache_key) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        清空本进程中的所有副本
+        :return:
+        """
+        with self._mutex:
+            self._data.clear()
+            self._pending = dict.fromkeys(self._pending)
+            self._size = 0
+
+    def before_write(self, cache_key):
+        """
+        修改key之前调用，keyspace方式下记录修改的时间，通知可能比命令的结果先到达
+        :param cache_key:
+        :return:
+        """
+        if self.invalidation == 'keyspace':
+            with self._mutex:
+                if len(self._writes) >= self.max_entries:
+                    self._writes.clear()
+                self._writes[cache_key] = time.time()
+
+    def invalidate(self, cache_key):
+        """
+        key被修改后调用，删除本地副本；version方式下通知其他进程
+        :param cache_key:
+        :return:
+        """
+        self.delete(cache_key)
+        if self.invalidation == 'version':
+            self.database.publish(self.channel, '%r %s' % (time.time(), cache_key))
+
+    def _record_lag(self, lag):
+        with self._mutex:
+            self.lag_count += 1
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+
+    def _handle_keyspace(self, message):
+        channel = message['channel']
+        if isinstance(channel, bytes):
+            channel = channel.decode('utf-8')
+        cache_key = channel[len(self.prefix):]
+        self.delete(cache_key)
+        write_time = self._writes.pop(cache_key, None)
+        if write_time is not None:
+            self._record_lag(time.time() - write_time)
+
+    def _handle_version(self, message):
+        data = message['data']
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        write_time, cache_key = data.split(' ', 1)
+        self.delete(cache_key)
+        self._record_lag(max(time.time() - float(write_time), 0))
+
+    def close(self):
+        """
+        停止订阅
+        :return:
+        """
+        if self.subscriber:
+            self.subscriber.stop()
+            self.subscriber.join(1)
+            self.subscriber = None
+        if self.pubsub:
+            self.pubsub.close()
+            self.pubsub = None
+
+    def stats(self):
+        """
+        命中和失效统计，lag是修改到本进程删除副本的延迟（秒）
+        :return:
+        """
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / requests if requests else 0.0,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+            'entries': len(self._data),
+            'size': self._size,
+            'lag': {
+                'count': self.lag_count,
+                'avg': self.lag_total / self.lag_count if self.lag_count else 0.0,
+                'max': self.lag_max,
+            },
+        }
+
+    def Hash(self, cache_key):
+        """
+        创建使用本地副本的哈希
+        :param cache_key:
+        :return:
+        """
+        return NearHash(self, cache_key)
+
+    def Set(self, cache_key):
+        """
+        创建使用本地副本的集合
+        :param cache_key:
+        :return:
+        """
+        return NearSet(self, cache_key)
+
+    def SortedSet(self, cache_key):
+        """
+        创建使用本地副本的有序集合
+        :param cache_key:
+        :return:
+        """
+        return NearSortedSet(self, cache_key)
+
+
+class _Writer(object):
+    """
+    容器使用的database，修改数据的命令执行后删除副本
+    """
+    def __init__(self, near_cache, cache_key):
+        self.near_cache = near_cache
+        self.cache_key = cache_key
+
+    def __getattr__(self, name):
+        attr = getattr(self.near_cache.database, name)
+        if not callable(attr) or name in READ_METHODS or name.upper() in READ_COMMANDS:
+            return attr
+        return self._wrap(attr)
+
+    def _wrap(self, func):
+        def command(*args, **kwargs):
+            self.near_cache.before_write(self.cache_key)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.near_cache.invalidate(self.cache_key)
+
+        return command
+
+    def pipeline(self, *args, **kwargs):
+        """
+        pipeline中的命令在execute时才执行，执行后删除副本
+        :return:
+        """
+        pipe = self.near_cache.database.pipeline(*args, **kwargs)
+        pipe.execute = self._wrap(pipe.execute)
+        return pipe
+
+
+class NearContainer(object):
+    """
+    读取本地副本的容器，修改仍然直接发送到redis
+    """
+    def __init__(self, near_cache, cache_key):
+        super(NearContainer, self).__init__(_Writer(near_cache, cache_key), cache_key)
+        self.near_cache = near_cache
+
+    def _load(self, client):
+        raise NotImplementedError
+
+    def _convert(self, value):
+        return value
+
+    def _local(self):
+        return self.near_cache.get(self.cache_key, self._load, self._convert)
+
+
+class NearHash(NearContainer, Hash):
+    """
+    使用本地副本的哈希
+    """
+    def _load(self, client):
+        return client.hgetall(self.cache_key)
+
+    def get(self, key, default=None):
+        """
+        获取值
+        :param key:
+        :param default:
+        :return:
+        """
+        return self._local().get(self.near_cache.normalize(key), default)
+
+    def has_key(self, key):
+        """
+        键是否存在
+        :param key:
+        :return:
+        """
+        return self.near_cache.normalize(key) in self._local()
+
+    __contains__ = has_key
+
+    def data(self):
+        """
+        获取字典内容
+        :return:
+        """
+        return dict(self._local())
+
+    def keys(self):
+        """
+        获取所有键
+        :return:
+        """
+        return list(self._local())
+
+    def values(self):
+        """
+        获取所有值
+        :return:
+        """
+        return list(self._local().values())
+
+    def __len__(self):
+        return len(self._local())
+
+
+class NearSet(NearContainer, Set):
+    """
+    使用本地副本的集合
+    """
+    def _load(self, client):
+        return client.smembers(self.cache_key)
+
+    def _convert(self, value):
+        return frozenset(value)
+
+    def data(self):
+        """
+        获取所有元素
+        :return:
+        """
+        return set(self._local())
+
+    def __contains__(self, item):
+        """
+        判断元素是否存在
+        :param item:
+        :return:
+        """
+        return self.near_cache.normalize(item) in self._local()
+
+    def __len__(self):
+        return len(self._local())
+
+
+class NearSortedSet(NearContainer, SortedSet):
+    """
+    使用本地副本的有序集合，副本是成员到(分值, 排名)的字典
+    """
+    def _load(self, client):
+        return client.zrange(self.cache_key, 0, -1, withscores=True)
+
+    def _convert(self, value):
+        return dict((member, (score, rank)) for rank, (member, score) in enumerate(value))
+
+    def score(self, value):
+        """
+        获取分值
+        :param value:
+        :return:
+        """
+        item = self._local().get(self.near_cache.normalize(value))
+        return item[0] if item is not None else None
+
+    def rank(self, value, is_reverse=False):
+        """
+        获取排名
+        :param value:
+        :param is_reverse:
+        :return:
+        """
+        local = self._local()
+        item = local.get(self.near_cache.normalize(value))
+        if item is None:
+            return None
+        return len(local) - 1 - item[1] if is_reverse else item[1]
+
+    def scores(self, members):
+        """
+        获取多个成员的分值
+        :param members:
+        :return:
+        """
+        return [self.score(member) for member in members]
+
+    def ranks(self, members, is_reverse=False):
+        """
+        获取多个成员的排名
+        :param members:
+        :param is_reverse:
+        :return:
+        """
+        return [self.rank(member, is_reverse) for member in members]
+
+    def contains_many(self, members):
+        """
+        判断多个成员是否存在
+        :param members:
+        :return:
+        """
+        return [member in self for member in members]
+
+    def __contains__(self, item):
+        """
+        判断元素是否在有序集合中
+        """
+        return self.near_cache.normalize(item) in self._local()
+
+    def __len__(self):
+        return len(self._local())
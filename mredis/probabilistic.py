@@ -0,0 +1,349 @@
+# -*- coding: UTF-8 -*-
+import hashlib
+import math
+
+from mredis.containers import CHUNK_SIZE, Container
+from mredis.exception import TypeException
+from mredis.lua import registry
+
+# 布隆过滤器最多的层数，字符串开头保存每层的元素个数
+MAX_LAYERS = 32
+HEADER_BITS = MAX_LAYERS * 32
+
+
+def _encode(item):
+    if isinstance(item, bytes):
+        return item
+    return str(item).encode('utf-8')
+
+
+def _hashes(item):
+    """
+    元素的两个32位哈希值，k个位置通过h1 + i * h2得到；不使用xxhash，安装与否不影响已经写入的数据
+    :param item:
+    :return: (h1, h2)，h2是奇数
+    """
+    digest = hashlib.blake2b(_encode(item), digest_size=8).digest()
+    return int.from_bytes(digest[:4], 'big'), int.from_bytes(digest[4:], 'big') | 1
+
+
+def _run_chunks(database, name, keys, params, args, chunk_size):
+    """
+    每chunk_size个参数一次脚本调用，避免长时间阻塞服务端；多次调用通过pipeline一次发送
+    :param database: MRedis或者Batch
+    :param name: 脚本名
+    :param keys:
+    :param params: 每次调用都有的参数
+    :param args: 元素的参数
+    :param chunk_size: 每次调用的参数个数，是每个元素参数个数的倍数
+    :return: 每次调用的结果
+    """
+    if chunk_size < 1:
+        raise TypeException(u'chunk_size必须大于0')
+    if not args:
+        return []
+
+    chunks = [args[idx: idx + chunk_size] for idx in range(0, len(args), chunk_size)]
+    script = registry[name]
+    if len(chunks) == 1 or getattr(database, 'is_batch', False):
+        # Batch中先把所有的调用放进pipeline，取第一个结果时一起执行
+        results = [script(database, keys, params + chunk) for chunk in chunks]
+        return [Container._value(result) for result in results]
+    pipe = database.pipeline(transaction=False)
+    for chunk in chunks:
+        script(pipe, keys, params + chunk)
+    return pipe.execute()
+
+
+def _amounts(items, amount):
+    """
+    :param items: 元素的可迭代对象，或者{元素: 数量}
+    :param amount: items不是字典时每个元素的数量
+    :return: [(元素, 数量)]
+    """
+    pairs = list(items.items()) if isinstance(items, dict) else [(item, amount) for item in items]
+    for _, value in pairs:
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise TypeException(u'数量必须是正整数: %r' % (value, ))
+    return pairs
+
+
+class BloomFilter(Container):
+    """
+    布隆过滤器，判断元素是否出现过；不存在时一定返回False，存在时有error_rate的概率误判，
+    容量1000万、误判率1%时只需要约12MB
+
+    哈希值在客户端批量计算，每批元素通过一次lua脚本写入或者判断；所有客户端需要使用相同的参数。
+    scalable为True时超过容量后增加一层，每层的容量是上一层的growth倍、误判率是上一层的tightening倍，
+    总的误判率不超过error_rate / (1 - tightening)
+    """
+    def __init__(self, database, cache_key, capacity, error_rate=0.01, scalable=False, growth=2, tightening=0.5):
+        """
+
+        :param database:
+        :param cache_key:
+        :param capacity: 预计的元素个数，scalable时是第一层的容量
+        :param error_rate: 误判率
+        :param scalable: 超过容量后是否增加一层
+        :param growth:
+        :param tightening:
+        """
+        super(BloomFilter, self).__init__(database, cache_key)
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise TypeException(u'capacity必须大于0，error_rate必须在0和1之间')
+        if growth < 1 or not 0 < tightening <= 1:
+            raise TypeException(u'growth必须不小于1，tightening必须在0和1之间')
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.scalable = scalable
+        self.growth = growth
+        self.tightening = tightening
+        if HEADER_BITS + self.layer(0)[1] > 2 ** 32:
+            raise TypeException(u'超过字符串的最大长度512MB')
+
+    def __repr__(self):
+        return '<BloomFilter %s capacity=%s error_rate=%s>' % (self.cache_key, self.capacity, self.error_rate)
+
+    def layer(self, index):
+        """
+        每层的大小，和lua脚本中的计算相同
+        :param index:
+        :return: (容量, 位数, 哈希个数)
+        """
+        size = math.floor(self.capacity * self.growth ** index)
+        bits = math.ceil(-size * math.log(self.error_rate * self.tightening ** index) / (math.log(2) * math.log(2)))
+        return size, bits, math.ceil(math.log(2) * bits / size)
+
+    def _call(self, operation, items, chunk_size):
+        """
+        :return: 和items对应的bool列表
+        """
+        args = []
+        for item in items:
+            args.extend(_hashes(item))
+        params = [operation, self.capacity, repr(self.error_rate), self.growth, self.tightening, int(self.scalable)]
+        results = _run_chunks(self.database, 'bloom_filter', [self.cache_key], params, args, chunk_size * 2)
+        return [bool(flag) for result in results for flag in result]
+
+    def add(self, item):
+        """
+        添加元素
+        :param item:
+        :return: 是否是新的元素，误判时返回False
+        """
+        return self.add_many([item])[0]
+
+    def add_many(self, items, chunk_size=CHUNK_SIZE):
+        """
+        批量添加，只有一次网络往返
+        :param items:
+        :param chunk_size: 每次脚本调用的元素个数，避免长时间阻塞服务端
+        :return: 和items对应的bool列表，是否是新的元素
+        """
+        return self._call('add', items, chunk_size)
+
+    def contains_many(self, items, chunk_size=CHUNK_SIZE):
+        """
+        批量判断，只有一次网络往返
+        :param items:
+        :param chunk_size:
+        :return: 和items对应的bool列表
+        """
+        return self._call('check', items, chunk_size)
+
+    def __contains__(self, item):
+        return self.contains_many([item])[0]
+
+    def counts(self):
+        """
+        每层添加的元素个数
+        :return: list
+        """
+        args = []
+        for index in range(MAX_LAYERS):
+            args.extend(('GET', 'u32', '#%s' % index))
+        counts = self._value(self.database.execute_command('BITFIELD', self.cache_key, *args))
+        return counts[:max(1, sum(1 for count in counts if count))]
+
+    def __len__(self):
+        """
+        添加的元素个数，误判为已经存在的元素不计算在内
+        :return:
+        """
+        return sum(self.counts())
+
+
+class CountMinSketch(Container):
+    """
+    Count-Min Sketch，估计每个元素出现的次数，只会高估不会低估；内存固定为width * depth个u32计数器，
+    和元素的个数无关。估计值超过真实值total * e / width的概率不超过e ** -depth
+
+    conservative为True时只增加等于最小值的计数器，高估更少，但每个元素需要先读取计数器
+    """
+    def __init__(self, database, cache_key, width=2000, depth=5, conservative=True):
+        """
+
+        :param database:
+        :param cache_key:
+        :param width: 每行计数器的个数
+        :param depth: 行数，即哈希函数的个数
+        :param conservative: 是否使用保守更新
+        """
+        super(CountMinSketch, self).__init__(database, cache_key)
+        if width < 1 or depth < 1:
+            raise TypeException(u'width和depth必须大于0')
+        if 64 + width * depth * 32 > 2 ** 32:
+            raise TypeException(u'超过字符串的最大长度512MB')
+        self.width = width
+        self.depth = depth
+        self.conservative = conservative
+
+    def __repr__(self):
+        return '<CountMinSketch %s width=%s depth=%s>' % (self.cache_key, self.width, self.depth)
+
+    def _params(self, k=0):
+        return [self.width, self.depth, int(self.conservative), k]
+
+    def _offsets(self, item):
+        h1, h2 = _hashes(item)
+        return [64 + (row * self.width + (h1 + row * h2) % self.width) * 32 for row in range(self.depth)]
+
+    def incr(self, item, amount=1):
+        """
+        增加元素的次数
+        :param item:
+        :param amount:
+        :return: 增加后的估计值
+        """
+        return self.incr_many([item], amount)[0]
+
+    def incr_many(self, items, amount=1, chunk_size=CHUNK_SIZE):
+        """
+        批量增加，只有一次网络往返
+        :param items: 元素的可迭代对象，或者{元素: 数量}
+        :param amount: items不是字典时每个元素增加的数量
+        :param chunk_size: 每次脚本调用的元素个数
+        :return: 和items对应的增加后的估计值
+        """
+        args = []
+        for item, value in _amounts(items, amount):
+            args.extend(_hashes(item) + (value, ))
+        results = _run_chunks(self.database, 'count_min_sketch', [self.cache_key], self._params(), args, chunk_size * 3)
+        return [estimate for result in results for estimate in result[0]]
+
+    def query(self, item):
+        """
+        估计元素的次数
+        :param item:
+        :return:
+        """
+        return self.query_many([item])[0]
+
+    def query_many(self, items):
+        """
+        一条BITFIELD读取所有元素的计数器，在本地取最小值
+        :param items:
+        :return: 和items对应的估计值
+        """
+        args = []
+        for item in items:
+            for offset in self._offsets(item):
+                args.extend(('GET', 'u32', offset))
+        if not args:
+            return []
+        values = self._value(self.database.execute_command('BITFIELD', self.cache_key, *args))
+        return [min(values[idx: idx + self.depth]) for idx in range(0, len(values), self.depth)]
+
+    def __getitem__(self, item):
+        return self.query(item)
+
+    def total(self):
+        """
+        所有元素增加的数量之和
+        :return:
+        """
+        return self._value(self.database.execute_command('BITFIELD', self.cache_key, 'GET', 'i64', 0))[0]
+
+
+class TopK(Container):
+    """
+    出现次数最多的k个元素，次数通过CountMinSketch估计，当前的k个元素保存在有序集合中，
+    内存固定为sketch和k个元素，和元素的个数无关
+
+    sketch保存在{cache_key}:sketch中，cache_key中已经有{tag}时保存在cache_key:sketch中，
+    和有序集合在redis cluster的同一个节点
+    """
+    def __init__(self, database, cache_key, k, width=2000, depth=5, conservative=True):
+        """
+
+        :param database:
+        :param cache_key: 有序集合的key
+        :param k:
+        :param width: sketch每行计数器的个数
+        :param depth: sketch的行数
+        :param conservative: sketch是否使用保守更新
+        """
+        super(TopK, self).__init__(database, cache_key)
+        if k < 1:
+            raise TypeException(u'k必须大于0')
+        from mredis.sharding import hash_tag
+        self.k = k
+        sketch_key = cache_key + ':sketch' if hash_tag(cache_key) != cache_key else '{%s}:sketch' % cache_key
+        self.sketch = CountMinSketch(database, sketch_key, width, depth, conservative)
+
+    def __repr__(self):
+        return '<TopK %s k=%s>' % (self.cache_key, self.k)
+
+    def add(self, item, amount=1):
+        """
+        增加元素的次数
+        :param item:
+        :param amount:
+        :return: 被挤出的元素列表
+        """
+        return self.add_many([item], amount)
+
+    def add_many(self, items, amount=1, chunk_size=CHUNK_SIZE):
+        """
+        批量增加，只有一次网络往返
+        :param items: 元素的可迭代对象，或者{元素: 数量}
+        :param amount: items不是字典时每个元素增加的数量
+        :param chunk_size: 每次脚本调用的元素个数
+        :return: 被挤出的元素列表
+        """
+        args = []
+        for item, value in _amounts(items, amount):
+            args.extend(_hashes(item) + (value, item))
+        results = _run_chunks(self.database, 'count_min_sketch', [self.sketch.cache_key, self.cache_key],
+                              self.sketch._params(self.k), args, chunk_size * 4)
+        return [item for result in results for item in result[1]]
+
+    def top(self, count=None):
+        """
+        次数最多的元素
+        :param count: 默认返回全部k个
+        :return: [(元素, 估计的次数)]，按照次数从大到小
+        """
+        items = self._value(self.database.zrevrange(self.cache_key, 0, (count or self.k) - 1, withscores=True))
+        return [(item, int(score)) for item, score in items]
+
+    def query(self, item):
+        """
+        估计元素的次数，元素不在前k个中时也可以估计
+        :param item:
+        :return:
+        """
+        return self.sketch.query(item)
+
+    def __contains__(self, item):
+        return self._value(self.database.zscore(self.cache_key, item)) is not None
+
+    def __len__(self):
+        return self.database.zcard(self.cache_key)
+
+    def delete(self):
+        """
+        删除有序集合和sketch
+        :return:
+        """
+        self.database.delete(self.cache_key, self.sketch.cache_key)
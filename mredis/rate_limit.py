@@ -2,8 +2,10 @@
 import functools
 import hashlib
 import time
-
-import simplejson
+try:
+    import simplejson as json
+except ImportError:
+    import json
 
 
 class RateLimit(object):
@@ -45,13 +47,14 @@ class RateLimit(object):
     def rate_limit(self, function=None):
         """
         函数限制的装饰器
-        :param function:
+        :param function: 根据参数生成关键字的函数，默认为参数的哈希值
         :return:
         """
-        if function is None:
+        function_key = function
+        if function_key is None:
             def function_key(*args, **kwargs):
-                data = simplejson.dumps((args, sorted(kwargs.items())))
-                return hashlib.md5(data).hexdigest()
+                data = json.dumps((args, sorted(kwargs.items())), default=str)
+                return hashlib.md5(data.encode('utf-8')).hexdigest()
 
         def decorator(fn):
             @functools.wraps(fn)
@@ -0,0 +1,153 @@
+# -*- coding: UTF-8 -*-
+import itertools
+import threading
+import time
+
+from redis import Redis
+from redis.exceptions import ConnectionError, TimeoutError
+
+from mredis.exception import TypeException
+
+# 只读的命令，开启从库后会发送到从库
+READ_COMMANDS = frozenset([
+    'GET', 'MGET', 'STRLEN', 'GETBIT', 'BITCOUNT', 'BITPOS', 'EXISTS', 'TYPE', 'TTL', 'PTTL', 'SCAN',
+    'HGET', 'HMGET', 'HGETALL', 'HEXISTS', 'HLEN', 'HKEYS', 'HVALS', 'HSCAN', 'HSTRLEN',
+    'SISMEMBER', 'SMISMEMBER', 'SMEMBERS', 'SCARD', 'SRANDMEMBER', 'SSCAN', 'SUNION', 'SINTER', 'SDIFF',
+    'ZRANGE', 'ZREVRANGE', 'ZRANGEBYSCORE', 'ZREVRANGEBYSCORE', 'ZRANGEBYLEX', 'ZREVRANGEBYLEX',
+    'ZRANK', 'ZREVRANK', 'ZSCORE', 'ZMSCORE', 'ZCARD', 'ZCOUNT', 'ZLEXCOUNT', 'ZSCAN',
+    'LRANGE', 'LLEN', 'LINDEX', 'PFCOUNT', 'XRANGE', 'XREVRANGE', 'XLEN', 'XREAD',
+])
+
+
+class ReplicaSet(object):
+    """
+    从库集合，负责选择执行只读命令的从库
+
+    1.round_robin：轮流使用每个从库
+    2.least_outstanding：使用正在执行的命令最少的从库
+    设置了max_lag时，每隔check_interval秒比较主从的复制偏移量，落后超过max_lag字节的从库暂时不使用；
+    除了第一次以外在辅助线程中检查，不阻塞读取，检查失败时继续使用上一次的结果；
+    连接失败的从库暂时不使用，check_interval秒后在辅助线程中重新检查
+    """
+    strategies = ('round_robin', 'least_outstanding')
+
+    def __init__(self, primary, replicas, strategy='round_robin', max_lag=None, check_interval=1):
+        """
+
+        :param primary: 主库
+        :param replicas: 从库列表，可以是连接参数的字典（没有的参数和主库相同）或者Redis对象
+        :param strategy: round_robin或者least_outstanding
+        :param max_lag: 允许落后主库的最大复制偏移量（字节），默认不检查
+        :param check_interval: 检查复制偏移量的间隔（秒）
+        """
+        if strategy not in self.strategies:
+            raise TypeException(u'不支持的策略: %s' % strategy)
+
+        self.primary = primary
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.clients = [self._build_client(replica) for replica in replicas]
+        self.outstanding = [0] * len(self.clients)
+        self.lags = [0] * len(self.clients)
+        self._healthy = list(range(len(self.clients)))
+        self._checked_time = 0
+        self._checker = None
+        self._cycle = itertools.count()
+        self._mutex = threading.Lock()
+
+    def _build_client(self, replica):
+        if isinstance(replica, Redis):
+            return replica
+        pool = self.primary.connection_pool
+        kwargs = dict(pool.connection_kwargs)
+        kwargs.update(replica)
+        return Redis(connection_pool=pool.__class__(connection_class=pool.connection_class, **kwargs))
+
+    @staticmethod
+    def _offset(client, field):
+        return int(client.info('replication').get(field, 0))
+
+    def check(self):
+        """
+        检查从库的复制偏移量，更新可用的从库；主库连接失败时保留上一次的结果
+        :return: 每个从库落后的字节数，连接失败的为None
+        """
+        try:
+            primary_offset = self._offset(self.primary, 'master_repl_offset')
+        except Exception:
+            self._checked_time = time.time()
+            return list(self.lags)
+
+        healthy = []
+        for idx, client in enumerate(self.clients):
+            try:
+                lag = max(primary_offset - self._offset(client, 'slave_repl_offset'), 0)
+            except Exception:
+                lag = None
+            self.lags[idx] = lag
+            if lag is not None and (self.max_lag is None or lag <= self.max_lag):
+                healthy.append(idx)
+        self._healthy = healthy
+        self._checked_time = time.time()
+        return list(self.lags)
+
+    def choose(self):
+        """
+        选择一个可用的从库
+        :return: 从库的下标，没有可用的从库时返回None
+        """
+        need_check = self.max_lag is not None or len(self._healthy) < len(self.clients)
+        if need_check and time.time() - self._checked_time >= self.check_interval:
+            if self._checked_time:
+                self._check_later()
+            else:
+                self.check()
+
+        healthy = self._healthy
+        if not healthy:
+            return None
+        if self.strategy == 'round_robin':
+            return healthy[next(self._cycle) % len(healthy)]
+        return min(healthy, key=lambda idx: self.outstanding[idx])
+
+    def _check_later(self):
+        """
+        在辅助线程中检查，同时最多只有一个检查的线程
+        :return:
+        """
+        with self._mutex:
+            if self._checker is not None and self._checker.is_alive():
+                return
+            self._checker = threading.Thread(target=self.check, daemon=True)
+            self._checker.start()
+
+    def mark_unhealthy(self, idx):
+        """
+        暂时不使用连接失败的从库，check_interval秒后重新检查
+        :param idx: 从库的下标
+        :return:
+        """
+        with self._mutex:
+            self._healthy = [_idx for _idx in self._healthy if _idx != idx]
+            self.lags[idx] = None
+            self._checked_time = time.time()
+
+    def execute_command(self, idx, *args, **options):
+        """
+        在指定的从库上执行命令，连接失败或者超时时标记为不可用，异常继续抛出
+        :param idx: 从库的下标
+        :param args:
+        :param options:
+        :return:
+        """
+        with self._mutex:
+            self.outstanding[idx] += 1
+        try:
+            return self.clients[idx].execute_command(*args, **options)
+        except (ConnectionError, TimeoutError):
+            self.mark_unhealthy(idx)
+            raise
+        finally:
+            with self._mutex:
+                self.outstanding[idx] -= 1
@@ -0,0 +1,140 @@
+# -*- coding: UTF-8 -*-
+import queue
+import threading
+
+from mredis.exception import TypeException
+from mredis.utils import hash_key
+
+
+def in_partition(item, partition):
+    """
+    元素是否属于分区，按照元素（哈希是字段，有序集合是成员）的哈希值取模，不同进程的结果相同
+    :param item:
+    :param partition: (index, total)
+    :return:
+    """
+    if isinstance(item, tuple):
+        item = item[0]
+    if not isinstance(item, bytes):
+        item = str(item).encode('utf-8')
+    index, total = partition
+    return int(hash_key(item), 16) % total == index
+
+
+def prefetch_scan(database, command, cache_key=None, match=None, count=None, prefetch=1, partition=None, **kwargs):
+    """
+    预取的SCAN迭代器，SCAN的游标只能依次获取，辅助线程在返回当前页的同时读取之后的prefetch页，
+    遍历不再受每页一次网络往返的限制；内存中最多有prefetch + 2页
+
+    只有一页的时候不会启动线程；prefetch为0时和scan_iter相同
+    :param database: MRedis或者Batch，需要获取的方法在当前线程取出，辅助线程只执行命令
+    :param command: scan、hscan、sscan或者zscan
+    :param cache_key: 容器的key，command是scan时不需要
+    :param match:
+    :param count: 每页的COUNT
+    :param prefetch: 最多预取的页数
+    :param partition: (index, total)，多个进程分别遍历时只返回属于第index个分区的元素，每个进程仍然读取所有的页
+    :param kwargs: 其他参数，例如scan的_type
+    :return: 生成器，hscan和zscan返回(key, value)
+    """
+    if partition is not None and not 0 <= partition[0] < partition[1]:
+        raise TypeException(u'分区错误: %s' % (partition, ))
+
+    fetch = getattr(database, command)
+    args = () if command == 'scan' else (cache_key, )
+
+    def page(cursor):
+        cursor, items = fetch(*(args + (cursor, )), match=match, count=count, **kwargs)
+        if isinstance(items, dict):
+            items = list(items.items())
+        return int(cursor), items
+
+    return _items(iter_pages(page, prefetch, database), partition)
+
+
+def _items(pages, partition):
+    for items in pages:
+        for item in items:
+            if partition is None or in_partition(item, partition):
+                yield item
+
+
+def _worker_context(database):
+    """
+    辅助线程中没有当前线程的threading.local：consistent的层数复制到辅助线程；
+    explain和归属到容器方法的instrument依赖当前线程的调用栈，开启时不预取
+    :param database: MRedis、Batch或者其他包装了MRedis的对象
+    :return: 在辅助线程中恢复上下文的函数，None表示不能预取
+    """
+    if getattr(database, 'is_batch', False):
+        database = database.database
+    local = getattr(database, '_local', None)
+    if getattr(local, 'explain', None) is not None:
+        return None
+    instrumentation = getattr(database, 'instrumentation', None)
+    if instrumentation is not None and instrumentation.attribute:
+        return None
+    consistent = getattr(local, 'consistent', 0)
+
+    def restore():
+        if consistent:
+            local.consistent = consistent
+
+    return restore
+
+
+def iter_pages(page, prefetch=1, database=None):
+    """
+    依次读取每一页，辅助线程在返回当前页的同时读取之后的prefetch页，只有一页的时候不会启动线程；
+    内存中最多有prefetch + 2页：队列中的prefetch页、辅助线程等待放入队列的一页和调用者正在处理的一页
+    :param page: 参数为游标，返回(下一页的游标, 元素列表)，游标为0时表示没有下一页，第一页的游标是0
+    :param prefetch: 最多预取的页数，0表示不预取
+    :param database: page使用的MRedis，辅助线程中恢复当前线程的consistent，开启explain时不预取
+    :return: 生成器，每次返回一页
+    """
+    restore = None
+    if database is not None and prefetch:
+        restore = _worker_context(database)
+        if restore is None:
+            prefetch = 0
+    cursor, items = page(0)
+    pages = stop = None
+    if cursor and prefetch:
+        pages = queue.Queue(prefetch)
+        stop = threading.Event()
+
+        def put(result):
+            while not stop.is_set():
+                try:
+                    pages.put(result, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def work(cursor):
+            try:
+                if restore is not None:
+                    restore()
+                while cursor and not stop.is_set():
+                    cursor, items = page(cursor)
+                    put((cursor, items, None))
+            except Exception as e:
+                put((0, [], e))
+
+        threading.Thread(target=work, args=(cursor, ), daemon=True).start()
+
+    try:
+        while True:
+            if items:
+                yield items
+            if not cursor:
+                return
+            if pages is None:
+                cursor, items = page(cursor)
+                continue
+            cursor, items, error = pages.get()
+            if error is not None:
+                raise error
+    finally:
+        if stop is not None:
+            stop.set()
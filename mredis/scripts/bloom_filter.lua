@@ -0,0 +1,87 @@
+-- ARGV: add或者check, capacity, error_rate, growth, tightening, scalable, 之后每个元素两个哈希值h1 h2
+-- 字符串开头是32个u32，保存每层的元素个数，之后依次是每层的位
+local cache_key = KEYS[1]
+local is_add = ARGV[1] == 'add'
+local capacity, error_rate = tonumber(ARGV[2]), tonumber(ARGV[3])
+local growth, tightening, scalable = tonumber(ARGV[4]), tonumber(ARGV[5]), ARGV[6] == '1'
+local max_layers = 32
+local ln2 = math.log(2)
+
+local args = {}
+for i = 0, max_layers - 1 do
+    args[#args + 1] = 'GET'
+    args[#args + 1] = 'u32'
+    args[#args + 1] = '#' .. i
+end
+local counts = redis.call('bitfield', cache_key, unpack(args))
+
+-- 每层的{偏移, 位数, 哈希个数, 容量, 元素个数}，最后一层是当前写入的层
+local function layer(index, offset)
+    local size = math.floor(capacity * growth ^ index)
+    local bits = math.ceil(-size * math.log(error_rate * tightening ^ index) / (ln2 * ln2))
+    return {offset, bits, math.ceil(ln2 * bits / size), size, counts[index + 1]}
+end
+
+local layers = {layer(0, max_layers * 32)}
+while scalable and #layers < max_layers and layers[#layers][5] >= layers[#layers][4] do
+    local last = layers[#layers]
+    layers[#layers + 1] = layer(#layers, last[1] + last[2])
+end
+
+local function positions(item, h1, h2)
+    local result = {}
+    for i = 0, item[3] - 1 do
+        result[#result + 1] = item[1] + (h1 + i * h2) % item[2]
+    end
+    return result
+end
+
+local function exists(h1, h2)
+    for _, item in ipairs(layers) do
+        local found = true
+        for _, position in ipairs(positions(item, h1, h2)) do
+            if redis.call('getbit', cache_key, position) == 0 then
+                found = false
+                break
+            end
+        end
+        if found then
+            return true
+        end
+    end
+    return false
+end
+
+local result = {}
+local changed = {}
+for i = 7, #ARGV, 2 do
+    local h1, h2 = tonumber(ARGV[i]), tonumber(ARGV[i + 1])
+    if exists(h1, h2) then
+        result[#result + 1] = is_add and 0 or 1
+    elseif not is_add then
+        result[#result + 1] = 0
+    else
+        local current = layers[#layers]
+        for _, position in ipairs(positions(current, h1, h2)) do
+            redis.call('setbit', cache_key, position, 1)
+        end
+        current[5] = current[5] + 1
+        changed[#layers] = current[5]
+        if scalable and #layers < max_layers and current[5] >= current[4] then
+            layers[#layers + 1] = layer(#layers, current[1] + current[2])
+        end
+        result[#result + 1] = 1
+    end
+end
+
+args = {}
+for index, count in pairs(changed) do
+    args[#args + 1] = 'SET'
+    args[#args + 1] = 'u32'
+    args[#args + 1] = '#' .. (index - 1)
+    args[#args + 1] = count
+end
+if #args > 0 then
+    redis.call('bitfield', cache_key, unpack(args))
+end
+return result
@@ -0,0 +1,74 @@
+-- KEYS: sketch，以及可选的top k有序集合
+-- ARGV: width, depth, conservative, k, 之后每个元素h1 h2 amount，有top k时还有元素本身
+-- 字符串开头是i64的总数，之后是depth行、每行width个u32的计数器
+local cache_key, top_key = KEYS[1], KEYS[2]
+local width, depth = tonumber(ARGV[1]), tonumber(ARGV[2])
+local conservative, k = ARGV[3] == '1', tonumber(ARGV[4])
+local step = top_key and 4 or 3
+local max_count = 4294967295
+
+local estimates, evicted = {}, {}
+local total = 0
+for i = 5, #ARGV, step do
+    local h1, h2, amount = tonumber(ARGV[i]), tonumber(ARGV[i + 1]), tonumber(ARGV[i + 2])
+    local args = {}
+    for row = 0, depth - 1 do
+        args[#args + 1] = 64 + (row * width + (h1 + row * h2) % width) * 32
+    end
+
+    local counters = {}
+    if conservative then
+        local command = {}
+        for _, offset in ipairs(args) do
+            command[#command + 1] = 'GET'
+            command[#command + 1] = 'u32'
+            command[#command + 1] = offset
+        end
+        local values = redis.call('bitfield', cache_key, unpack(command))
+        local estimate = math.min(unpack(values)) + amount
+        if estimate > max_count then
+            estimate = max_count
+        end
+        command = {}
+        for index, offset in ipairs(args) do
+            if values[index] < estimate then
+                command[#command + 1] = 'SET'
+                command[#command + 1] = 'u32'
+                command[#command + 1] = offset
+                command[#command + 1] = estimate
+            end
+        end
+        if #command > 0 then
+            redis.call('bitfield', cache_key, unpack(command))
+        end
+        counters = {estimate}
+    else
+        local command = {'OVERFLOW', 'SAT'}
+        for _, offset in ipairs(args) do
+            command[#command + 1] = 'INCRBY'
+            command[#command + 1] = 'u32'
+            command[#command + 1] = offset
+            command[#command + 1] = amount
+        end
+        counters = redis.call('bitfield', cache_key, unpack(command))
+    end
+    local estimate = math.min(unpack(counters))
+    estimates[#estimates + 1] = estimate
+    total = total + amount
+
+    if top_key then
+        local member = ARGV[i + 3]
+        if redis.call('zscore', top_key, member) or redis.call('zcard', top_key) < k then
+            redis.call('zadd', top_key, estimate, member)
+        else
+            local smallest = redis.call('zrange', top_key, 0, 0, 'WITHSCORES')
+            if estimate > tonumber(smallest[2]) then
+                redis.call('zrem', top_key, smallest[1])
+                redis.call('zadd', top_key, estimate, member)
+                evicted[#evicted + 1] = smallest[1]
+            end
+        end
+    end
+end
+redis.call('bitfield', cache_key, 'OVERFLOW', 'SAT', 'INCRBY', 'i64', 0, total)
+return {estimates, evicted}
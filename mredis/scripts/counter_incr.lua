@@ -0,0 +1,8 @@
+local cache_key = KEYS[1]
+local field = ARGV[1]
+local count = redis.call('hincrby', cache_key, field, ARGV[2])
+if count == 0 then
+    redis.call('hdel', cache_key, field)
+end
+redis.call('expire', cache_key, ARGV[3])
+return count
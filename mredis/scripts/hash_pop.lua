@@ -0,0 +1,7 @@
+local cache_key = KEYS[1]
+local field = ARGV[1]
+local value = redis.call('hget', cache_key, field)
+if value then
+    redis.call('hdel', cache_key, field)
+end
+return value
@@ -0,0 +1,12 @@
+local cache_key = KEYS[1]
+local cursor = '0'
+repeat
+    local page = redis.call('hscan', cache_key, cursor, 'count', 10)
+    cursor = page[1]
+    local items = page[2]
+    if #items > 0 then
+        redis.call('hdel', cache_key, items[1])
+        return {items[1], items[2]}
+    end
+until cursor == '0'
+return nil
@@ -0,0 +1,3 @@
+local cache_key = KEYS[1]
+local created = redis.call('hsetnx', cache_key, ARGV[1], ARGV[2])
+return {created, redis.call('hget', cache_key, ARGV[1])}
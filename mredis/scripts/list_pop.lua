@@ -0,0 +1,14 @@
+local cache_key = KEYS[1]
+local index = tonumber(ARGV[1])
+local placeholder = ARGV[2]
+local length = redis.call('llen', cache_key)
+if length == 0 then
+    return {1}
+end
+if index < 0 or index >= length then
+    return {2}
+end
+local value = redis.call('lindex', cache_key, index)
+redis.call('lset', cache_key, index, placeholder)
+redis.call('lrem', cache_key, 1, placeholder)
+return {0, value}
@@ -0,0 +1,13 @@
+local cache_key = KEYS[1]
+local max_length = tonumber(ARGV[1])
+-- unpack的参数个数有上限，每次lpush最多1000个值
+local chunk_size = 1000
+local length = 0
+for i = 2, #ARGV, chunk_size do
+    length = redis.call('lpush', cache_key, unpack(ARGV, i, math.min(i + chunk_size - 1, #ARGV)))
+end
+if length > max_length then
+    redis.call('ltrim', cache_key, 0, max_length - 1)
+    return max_length
+end
+return length
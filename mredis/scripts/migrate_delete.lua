@@ -0,0 +1,10 @@
+-- 只删除DUMP的结果和迁移时相同的key，返回迁移期间修改过的key的下标
+local changed = {}
+for i, cache_key in ipairs(KEYS) do
+    if redis.call('dump', cache_key) == ARGV[i] then
+        redis.call('del', cache_key)
+    else
+        changed[#changed + 1] = i
+    end
+end
+return changed
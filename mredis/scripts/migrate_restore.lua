@@ -0,0 +1,18 @@
+-- ARGV: 每个key三个参数：ttl、DUMP的结果（为空表示源节点上已经删除）、上一次复制的DUMP结果（为空表示没有复制过）
+-- 目标节点上的key和上一次复制的相同时才写入，否则是迁移期间新的写入，保留新的值，返回这些key的下标
+local busy = {}
+for i, cache_key in ipairs(KEYS) do
+    local ttl, data, previous = ARGV[i * 3 - 2], ARGV[i * 3 - 1], ARGV[i * 3]
+    local current = redis.call('dump', cache_key)
+    if (not current and previous == '') or current == previous then
+        if current then
+            redis.call('del', cache_key)
+        end
+        if data ~= '' then
+            redis.call('restore', cache_key, ttl, data)
+        end
+    else
+        busy[#busy + 1] = i
+    end
+end
+return busy
@@ -0,0 +1,6 @@
+local cache_key = KEYS[1]
+local result = {}
+for i = 2, #ARGV do
+    result[#result + 1] = redis.call(ARGV[1], cache_key, ARGV[i]) or false
+end
+return result
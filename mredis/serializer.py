@@ -0,0 +1,183 @@
+# -*- coding: UTF-8 -*-
+import json
+import marshal
+import pickle
+import struct
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from mredis.exception import TypeException
+
+
+class Codec(object):
+    """
+    序列化方式，codec_id会写入到头部字节中，读取时根据头部字节选择对应的方式
+    """
+    codec_id = None
+    name = None
+
+    def dumps(self, data):
+        raise NotImplementedError
+
+    def loads(self, data):
+        raise NotImplementedError
+
+
+class PickleCodec(Codec):
+    """
+    pickle序列化，可以选择协议版本
+    """
+    codec_id = 1
+    name = 'pickle'
+
+    def __init__(self, protocol=pickle.HIGHEST_PROTOCOL):
+        self.protocol = protocol
+
+    def dumps(self, data):
+        return pickle.dumps(data, self.protocol)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+
+class MarshalCodec(Codec):
+    """
+    marshal序列化，只支持内置类型，但是速度更快
+    """
+    codec_id = 2
+    name = 'marshal'
+
+    def dumps(self, data):
+        return marshal.dumps(data)
+
+    def loads(self, data):
+        return marshal.loads(data)
+
+
+class JsonCodec(Codec):
+    """
+    json序列化，可以被其他语言读取
+    """
+    codec_id = 3
+    name = 'json'
+
+    def dumps(self, data):
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data.decode('utf-8'))
+
+
+class MsgpackCodec(Codec):
+    """
+    msgpack序列化，需要安装msgpack
+    """
+    codec_id = 4
+    name = 'msgpack'
+
+    def __init__(self):
+        if msgpack is None:
+            raise TypeException(u'msgpack未安装')
+
+    def dumps(self, data):
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+CODECS = {codec.name: codec for codec in (PickleCodec, MarshalCodec, JsonCodec, MsgpackCodec)}
+
+# 压缩方式：(id, 压缩函数, 解压函数)
+COMPRESSORS = {
+    'zlib': (1, lambda data, level: zlib.compress(data, 6 if level is None else level), zlib.decompress),
+}
+if lzma is not None:
+    COMPRESSORS['lzma'] = (2, lambda data, level: lzma.compress(data, preset=level), lzma.decompress)
+
+
+class Serializer(object):
+    """
+    序列化器，负责redis中值的编码和解码
+
+    编码后的值第一个字节为头部：低3位是序列化方式的id，高位是压缩方式的id。
+    头部的取值范围是0x01-0x17，不会和pickle的操作码冲突，所以没有头部的旧数据会按照pickle读取，新旧数据可以同时存在
+    """
+    def __init__(self, codec='pickle', compress=None, compress_threshold=1024, compress_level=None):
+        """
+
+        :param codec: 序列化方式的名字或者Codec对象
+        :param compress: 压缩方式，zlib或者lzma，默认不压缩
+        :param compress_threshold: 超过该字节数才压缩
+        :param compress_level: 压缩等级
+        """
+        if not isinstance(codec, Codec):
+            if codec not in CODECS:
+                raise TypeException(u'不支持的序列化方式: %s' % codec)
+            codec = CODECS[codec]()
+        if compress is not None and compress not in COMPRESSORS:
+            raise TypeException(u'不支持的压缩方式: %s' % compress)
+
+        self.codec = codec
+        self.compress = compress
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self._decoders = {codec.codec_id: codec}
+
+    def _decoder(self, codec_id):
+        decoder = self._decoders.get(codec_id)
+        if decoder is None:
+            for codec in CODECS.values():
+                if codec.codec_id == codec_id:
+                    decoder = self._decoders[codec_id] = codec()
+                    break
+            else:
+                raise TypeException(u'未知的序列化方式: %s' % codec_id)
+        return decoder
+
+    def dumps(self, data):
+        """
+        编码
+        :param data:
+        :return: bytes
+        """
+        payload = self.codec.dumps(data)
+        compress_id = 0
+        if self.compress is not None and len(payload) >= self.compress_threshold:
+            compress_id, compress_func, _ = COMPRESSORS[self.compress]
+            payload = compress_func(payload, self.compress_level)
+        return struct.pack('B', self.codec.codec_id | compress_id << 3) + payload
+
+    def loads(self, data):
+        """
+        解码
+        :param data: bytes
+        :return:
+        """
+        header = struct.unpack('B', data[:1])[0]
+        if not 0 < header < 0x18:
+            # 没有头部的旧数据
+            return pickle.loads(data)
+
+        payload = data[1:]
+        compress_id = header >> 3
+        if compress_id:
+            for _compress_id, _, decompress_func in COMPRESSORS.values():
+                if _compress_id == compress_id:
+                    payload = decompress_func(payload)
+                    break
+            else:
+                raise TypeException(u'未知的压缩方式: %s' % compress_id)
+        return self._decoder(header & 0x07).loads(payload)
+
+
+default_serializer = Serializer()
@@ -0,0 +1,361 @@
+# -*- coding: UTF-8 -*-
+import bisect
+import hashlib
+import itertools
+
+from mredis.containers import List, Set, SortedSet, Hash, HyperLogLog, Stream
+from mredis.counter import Counter
+from mredis.database import MRedis
+from mredis.exception import MigrateException, TypeException
+from mredis.lock import Lock
+from mredis.lua import registry
+from mredis.rate_limit import RateLimit
+
+
+def hash_tag(cache_key):
+    """
+    获取key中用于分片的部分，和redis cluster相同：如果key中有{tag}并且tag不为空，只根据tag分片
+    :param cache_key:
+    :return:
+    """
+    start = cache_key.find('{')
+    if start != -1:
+        end = cache_key.find('}', start + 1)
+        if end > start + 1:
+            return cache_key[start + 1:end]
+    return cache_key
+
+
+class HashRing(object):
+    """
+    一致性哈希环，每个节点对应replicas个虚拟节点，增删节点时只有相邻区间的key会移动
+    """
+    def __init__(self, names=(), replicas=160):
+        self.replicas = replicas
+        self._hashes = []
+        self._names = []
+        for name in names:
+            self.add(name)
+
+    @staticmethod
+    def _hash(value):
+        return int(hashlib.md5(value.encode('utf-8')).hexdigest()[:8], 16)
+
+    def add(self, name):
+        """
+        添加节点
+        :param name:
+        :return:
+        """
+        for idx in range(self.replicas):
+            point = self._hash('%s#%s' % (name, idx))
+            pos = bisect.bisect(self._hashes, point)
+            self._hashes.insert(pos, point)
+            self._names.insert(pos, name)
+
+    def remove(self, name):
+        """
+        删除节点
+        :param name:
+        :return:
+        """
+        points = [(point, _name) for point, _name in zip(self._hashes, self._names) if _name != name]
+        self._hashes = [point for point, _ in points]
+        self._names = [_name for _, _name in points]
+
+    def get(self, cache_key):
+        """
+        获取key所在的节点
+        :param cache_key:
+        :return:
+        """
+        if not self._hashes:
+            raise TypeException(u'没有可用的节点')
+        pos = bisect.bisect(self._hashes, self._hash(hash_tag(cache_key)))
+        return self._names[pos % len(self._names)]
+
+
+class _Sharded(object):
+    """
+    客户端分片中的容器，多个key的操作在发送前检查所有的key在同一个节点
+    """
+    def __init__(self, sharded, cache_key):
+        self.sharded = sharded
+        super(_Sharded, self).__init__(sharded.get_node(cache_key), cache_key)
+
+    def _check_keys(self, keys):
+        self.sharded.check_same_node(keys)
+
+
+class ShardedSet(_Sharded, Set):
+    """
+    客户端分片中的集合
+    """
+
+
+class ShardedSortedSet(_Sharded, SortedSet):
+    """
+    客户端分片中的有序集合
+    """
+
+
+class ShardedMRedis(object):
+    """
+    客户端分片，根据容器的cache_key用一致性哈希选择节点
+
+    多个key的操作（Set.union、SortedSet.intersection_store等）只能在同一个节点上执行，
+    需要用{tag}让相关的key分到同一个节点，例如user:{1}:friends和user:{1}:followers，不在同一个节点时抛出TypeException
+    """
+    def __init__(self, nodes, replicas=160, **kwargs):
+        """
+
+        :param nodes: 节点列表，可以是连接参数的字典（可选name作为节点名）或者MRedis对象
+        :param replicas: 每个节点的虚拟节点个数
+        :param kwargs: 所有节点共用的连接参数
+        """
+        self.kwargs = kwargs
+        self.nodes = {}
+        self.ring = HashRing(replicas=replicas)
+        for node in nodes:
+            self._add_node(node)
+
+    def _add_node(self, node):
+        if isinstance(node, MRedis):
+            client = node
+            config = client.connection_pool.connection_kwargs
+            name = '%s:%s/%s' % (config.get('host'), config.get('port'), config.get('db', 0))
+        else:
+            config = dict(self.kwargs)
+            config.update(node)
+            name = config.pop('name', None) or '%s:%s/%s' % (
+                config.get('host', 'localhost'), config.get('port', 6379), config.get('db', 0))
+            client = MRedis(**config)
+
+        if name in self.nodes:
+            raise TypeException(u'节点已经存在: %s' % name)
+        self.nodes[name] = client
+        self.ring.add(name)
+        return name
+
+    def get_node_name(self, cache_key):
+        """
+        获取key所在节点的名字
+        :param cache_key:
+        :return:
+        """
+        return self.ring.get(cache_key)
+
+    def get_node(self, cache_key):
+        """
+        获取key所在的节点
+        :param cache_key:
+        :return: MRedis
+        """
+        return self.nodes[self.ring.get(cache_key)]
+
+    def check_same_node(self, keys):
+        """
+        检查所有的key在同一个节点
+        :param keys:
+        :return:
+        """
+        names = set(self.ring.get(cache_key) for cache_key in keys)
+        if len(names) > 1:
+            raise TypeException(u'key不在同一个节点，需要用{hash_tag}让它们分到同一个节点: %s' % ', '.join(keys))
+
+    def __iter__(self):
+        """
+        遍历所有节点的key
+        :return:
+        """
+        return itertools.chain.from_iterable(node.scan_iter() for node in self.nodes.values())
+
+    def search(self, pattern):
+        """
+        在所有节点中按照格式来搜索
+        :param pattern:
+        :return:
+        """
+        return itertools.chain.from_iterable(node.scan_iter(pattern) for node in self.nodes.values())
+
+    def add_node(self, node, migrate=True, count=100):
+        """
+        添加节点
+        :param node: 连接参数的字典或者MRedis对象
+        :param migrate: 是否把属于新节点的key迁移过去
+        :param count: 迁移时每次SCAN的个数
+        :return: 迁移的key个数
+        """
+        self._add_node(node)
+        return self.rebalance(count) if migrate else 0
+
+    def remove_node(self, name, migrate=True, count=100):
+        """
+        删除节点
+        :param name: 节点名
+        :param migrate: 是否把该节点的key迁移到其他节点
+        :param count: 迁移时每次SCAN的个数
+        :return: 迁移的key个数
+        """
+        self.ring.remove(name)
+        node = self.nodes.pop(name)
+        if not migrate:
+            return 0
+        return self._migrate_from(node, count)
+
+    def rebalance(self, count=100):
+        """
+        把不在正确节点上的key迁移到正确的节点，使用DUMP/RESTORE，保留过期时间
+        :param count: 每次SCAN的个数
+        :return: 迁移的key个数
+        """
+        moved = 0
+        for name, node in list(self.nodes.items()):
+            moved += self._migrate_from(node, count, name)
+        return moved
+
+    def _migrate_from(self, node, count, name=None):
+        moved = 0
+        batch = []
+        for cache_key in node.scan_iter(count=count):
+            if isinstance(cache_key, bytes):
+                cache_key = cache_key.decode('utf-8')
+            if name is None or self.ring.get(cache_key) != name:
+                batch.append(cache_key)
+            if len(batch) >= count:
+                moved += self._migrate_keys(node, batch)
+                batch = []
+        if batch:
+            moved += self._migrate_keys(node, batch)
+        return moved
+
+    def _migrate_keys(self, node, keys, retries=3):
+        """
+        通过DUMP/RESTORE把key复制到新的节点，源节点上只删除DUMP之后没有修改过的key（lua脚本比较DUMP的结果），
+        迁移期间被修改的key重新复制，写入不会丢失；
+        哈希环已经指向新的节点，目标节点上只覆盖上一次复制的值，迁移期间目标节点上新的写入保留，源节点上的旧值删除
+        :param node: 源节点
+        :param keys:
+        :param retries: 被修改的key最多重新复制的次数
+        :return: 迁移的key个数
+        """
+        restored = {}
+        for _ in range(retries + 1):
+            pipe = node.pipeline(transaction=False)
+            for cache_key in keys:
+                pipe.execute_command('DUMP', cache_key, NEVER_DECODE=True)
+                pipe.pttl(cache_key)
+            results = pipe.execute()
+
+            targets = {}
+            for idx, cache_key in enumerate(keys):
+                data, ttl = results[idx * 2], results[idx * 2 + 1]
+                # 复制之前在源节点上被删除
+                if data is None and cache_key not in restored:
+                    continue
+                targets.setdefault(self.get_node_name(cache_key), []).append((cache_key, ttl, data))
+
+            dumped_keys, dumps, superseded = [], [], []
+            for name, items in targets.items():
+                args = []
+                for cache_key, ttl, data in items:
+                    args.extend([ttl if ttl > 0 else 0, data or b'', restored.get(cache_key, b'')])
+                busy = registry['migrate_restore'](self.nodes[name], [item[0] for item in items], args)
+                busy = set(items[idx - 1][0] for idx in busy)
+                for cache_key, ttl, data in items:
+                    if cache_key in busy:
+                        superseded.append(cache_key)
+                        restored.pop(cache_key, None)
+                    elif data is None:
+                        # 复制之后在源节点上被删除
+                        restored.pop(cache_key)
+                    else:
+                        restored[cache_key] = data
+                        dumped_keys.append(cache_key)
+                        dumps.append(data)
+
+            if superseded:
+                node.delete(*superseded)
+            if not dumped_keys:
+                return len(restored)
+            changed = registry['migrate_delete'](node, dumped_keys, dumps)
+            keys = [dumped_keys[idx - 1] for idx in changed]
+            if not keys:
+                return len(restored)
+        raise MigrateException(u'迁移期间key一直被修改，仍然保留在源节点上: %s' % keys)
+
+    def List(self, cache_key):
+        """
+        创建列表对象
+        :param cache_key:
+        :return:
+        """
+        return List(self.get_node(cache_key), cache_key)
+
+    def Set(self, cache_key):
+        """
+        创建集合对象
+        :param cache_key:
+        :return:
+        """
+        return ShardedSet(self, cache_key)
+
+    def SortedSet(self, cache_key):
+        """
+        创建有序集合对象
+        :param cache_key:
+        :return:
+        """
+        return ShardedSortedSet(self, cache_key)
+
+    def Hash(self, cache_key):
+        """
+        创建哈希对象
+        :param cache_key:
+        :return:
+        """
+        return Hash(self.get_node(cache_key), cache_key)
+
+    def HyperLogLog(self, cache_key):
+        """
+        创建基数统计对象
+        :param cache_key:
+        :return:
+        """
+        return HyperLogLog(self.get_node(cache_key), cache_key)
+
+    def Stream(self, cache_key):
+        """
+        创建流对象
+        :param cache_key:
+        :return:
+        """
+        return Stream(self.get_node(cache_key), cache_key)
+
+    def Counter(self, cache_key, expire_time=60 * 60 * 24):
+        """
+        创建计数器对象
+        :param cache_key:
+        :param expire_time:
+        :return:
+        """
+        return Counter(self.get_node(cache_key), cache_key, expire_time)
+
+    def RateLimit(self, cache_key, limit=5, per=60, ret=None):
+        """
+        创建频率限制对象，每个关键字的列表根据关键字分片
+        :param cache_key:
+        :param limit:
+        :param per:
+        :param ret:
+        :return:
+        """
+        return RateLimit(self, cache_key, limit, per, ret)
+
+    def Lock(self, cache_key):
+        """
+        创建锁
+        :param cache_key:
+        :return:
+        """
+        return Lock(self.get_node(cache_key), cache_key)
@@ -0,0 +1,162 @@
+# -*- coding: UTF-8 -*-
+import shutil
+import socket
+import subprocess
+import time
+import unittest
+
+try:
+    from mredis.aio.database import AsyncMRedis
+except ImportError:
+    AsyncMRedis = None
+
+REDIS_SERVER = shutil.which('redis-server')
+
+
+def _free_port():
+    sock = socket.socket()
+    sock.bind(('localhost', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+@unittest.skipIf(AsyncMRedis is None or REDIS_SERVER is None, 'redis.asyncio or redis-server not available')
+class TestAsync(unittest.IsolatedAsyncioTestCase):
+    """
+    测试异步客户端，使用本地启动的redis-server
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.port = _free_port()
+        cls.server = subprocess.Popen(
+            [REDIS_SERVER, '--port', str(cls.port), '--save', '', '--appendonly', 'no'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for _ in range(100):
+            try:
+                socket.create_connection(('localhost', cls.port), 0.1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+
+    async def asyncSetUp(self):
+        self.mredis = AsyncMRedis(host='localhost', port=self.port, decode_responses=True)
+        await self.mredis.flushdb()
+
+    async def asyncTearDown(self):
+        await self.mredis.flushdb()
+        await self.mredis.aclose()
+
+    async def test_hash(self):
+        """
+        测试哈希
+        """
+        hash = self.mredis.Hash('test_hash')
+        self.assertEqual(await hash.setdefault('first', 1), 1)
+        await hash.update({'second': 2, 'third': 3})
+        self.assertEqual(await hash.len(), 3)
+        self.assertEqual(await hash.get('second'), '2')
+        self.assertEqual(await hash.get('six', -1), -1)
+        self.assertTrue(await hash.contains('first'))
+
+        items = {}
+        async for key, value in hash:
+            items[key] = value
+        self.assertEqual(items, {'first': '1', 'second': '2', 'third': '3'})
+
+        self.assertEqual(await hash.pop('first'), '1')
+        self.assertEqual(await hash.len(), 2)
+
+    async def test_set_sorted_set(self):
+        """
+        测试集合和有序集合
+        """
+        set1 = self.mredis.Set('test_set1')
+        set2 = self.mredis.Set('test_set2')
+        await set1.update({1, 2, 3})
+        await set2.update({2, 3, 4})
+        self.assertEqual(set(await set1.intersection(set2)), {'2', '3'})
+        self.assertTrue(await set1.contains(1))
+        self.assertEqual({value async for value in set1}, {'1', '2', '3'})
+
+        sorted_set = self.mredis.SortedSet('test_sorted_set')
+        await sorted_set.append({'zero': 0, 'first': 1, 'second': 2})
+        self.assertEqual(await sorted_set.range(0, 1), ['zero', 'first'])
+        self.assertTrue(await sorted_set.contains('zero'))
+        self.assertEqual(dict([item async for item in sorted_set]), {'zero': 0, 'first': 1, 'second': 2})
+
+    async def test_list_counter(self):
+        """
+        测试列表和计数器
+        """
+        values = self.mredis.List('test_list')
+        await values.extend([10, 20, 30, 40])
+        self.assertEqual(await values.pop(1), '20')
+        self.assertEqual(await values.data(), ['10', '30', '40'])
+        self.assertEqual([value async for value in values], ['10', '30', '40'])
+
+        counter = self.mredis.Counter('test_counter')
+        self.assertEqual(await counter.incr('first', 2), 2)
+        self.assertEqual(await counter.decr('first', -2), 0)
+        self.assertEqual(await counter.as_dict(), {})
+
+    async def test_stream(self):
+        """
+        测试流和消费组
+        """
+        stream = self.mredis.Stream('test_stream')
+        group = await self.mredis.ConsumerGroup('test_group', ['test_stream']).create(mkstream=True)
+        msg_id = await stream.add({'name': 'mredis'})
+        self.assertEqual(await stream.len(), 1)
+        self.assertEqual((await stream.get(msg_id))[1], {'name': 'mredis'})
+
+        result = await group.read('consumer', count=1)
+        self.assertEqual(result[0][1][0][0], msg_id)
+        self.assertEqual(await group.ack('test_stream', msg_id), 1)
+
+    async def test_lock_rate_limit(self):
+        """
+        测试锁和频率限制
+        """
+        lock = self.mredis.Lock('test_lock')
+        self.assertTrue(await lock.acquire(expire_time=10))
+        self.assertFalse(await lock.acquire(blocking=False))
+        self.assertTrue(await lock.release())
+
+        rate_limit = self.mredis.RateLimit('test_rate_limit', limit=2, per=60, ret=-1)
+
+        @rate_limit.rate_limit()
+        async def get_value(value):
+            return value
+
+        self.assertEqual([await get_value(1) for _ in range(3)], [1, 1, -1])
+
+    async def test_func_cache(self):
+        """
+        测试函数缓存和函数锁
+        """
+        calls = []
+
+        @self.mredis.func_cache()
+        async def get_sum(a, b):
+            calls.append((a, b))
+            return a + b
+
+        self.assertEqual(await get_sum(1, 1), 2)
+        self.assertEqual(await get_sum(1, 1), 2)
+        self.assertEqual(calls, [(1, 1)])
+        await get_sum.invalidate(1, 1)
+        self.assertEqual(await get_sum(1, 1), 2)
+        self.assertEqual(len(calls), 2)
+
+        @self.mredis.func_mutex(lock_params=('a', ))
+        async def get_diff(a, b):
+            return a - b
+
+        self.assertEqual(await get_diff(2, 1), 1)
@@ -0,0 +1,88 @@
+# -*- coding: UTF-8 -*-
+
+from mredis.batch import Deferred
+from mredis.exception import BatchException
+from mredis.tests.test_basic import TestBasic
+
+
+class TestBatch(TestBasic):
+    """
+    测试批量执行
+    """
+    def test_batch(self):
+        """
+        测试命令在结束时一起执行
+        """
+        self.mredis.Hash('test_hash').update({'first': 1})
+        with self.mredis.batch() as batch:
+            hash_data = batch.Hash('test_hash').data()
+            batch.Set('test_set').add(1)
+            batch.SortedSet('test_sorted_set').append({'first': 1})
+            batch.List('test_list').append(1)
+            set_len = batch.Set('test_set').__len__()
+
+            self.assertIsInstance(hash_data, Deferred)
+            self.assertFalse(hash_data.resolved)
+            self.assertFalse(self.mredis.exists('test_set'))
+            self.assertEqual(len(batch), 5)
+
+        self.assertEqual(hash_data.value, {'first': '1'})
+        self.assertEqual(set_len.value, 1)
+        self.assertEqual(len(self.mredis.SortedSet('test_sorted_set')), 1)
+        self.assertEqual(self.mredis.List('test_list').data(), ['1'])
+
+    def test_resolve_on_demand(self):
+        """
+        测试依赖中间结果的方法
+        """
+        self.mredis.Hash('test_hash').update({'first': 1})
+        with self.mredis.batch() as batch:
+            hash = batch.Hash('test_hash')
+            self.assertEqual(hash.get('first').value, '1')
+            self.assertEqual(hash.get('second', 0), 0)
+            self.assertEqual(len(hash), 1)
+            self.assertTrue('first' in hash)
+
+    def test_auto_execute(self):
+        """
+        测试达到数量时自动执行
+        """
+        with self.mredis.batch(size=3) as batch:
+            counter = batch.Counter('test_counter')
+            results = [batch.sadd('test_set', idx) for idx in range(7)]
+            self.assertTrue(results[5].resolved)
+            self.assertFalse(results[6].resolved)
+            self.assertEqual(len(batch), 1)
+            counter['first'] = 1
+        self.assertEqual(len(self.mredis.Set('test_set')), 7)
+        self.assertEqual(self.mredis.Counter('test_counter').value('first'), '1')
+
+    def test_counter(self):
+        """
+        测试计数器的增加进入同一个pipeline
+        """
+        self.mredis.Counter('test_counter')['second'] = 1
+        with self.mredis.explain(server_time=False) as explain:
+            with self.mredis.batch() as batch:
+                counter = batch.Counter('test_counter')
+                results = [counter.incr('first'), counter.incr('first', 2), counter.decr('second')]
+                self.assertEqual(len(batch), 3)
+                self.assertFalse(any(result.resolved for result in results))
+        self.assertEqual(sum(call['round_trips'] for call in explain.calls), 1)
+        self.assertEqual([result.value for result in results], [1, 3, 0])
+        self.assertEqual(self.mredis.Counter('test_counter').as_dict(), {'first': '3'})
+        self.assertTrue(0 < self.mredis.ttl('test_counter') <= 60 * 60 * 24)
+
+    def test_error(self):
+        """
+        测试出现异常时放弃执行
+        """
+        try:
+            with self.mredis.batch() as batch:
+                result = batch.sadd('test_set', 1)
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertFalse(self.mredis.exists('test_set'))
+        self.assertRaises(BatchException, lambda: result.value)
@@ -0,0 +1,39 @@
+# -*- coding: UTF-8 -*-
+from mredis.benchmarks import containers, contention
+from mredis.benchmarks.compare import compare
+from mredis.tests.test_basic import TestBasic
+
+
+class TestBenchmarks(TestBasic):
+    """
+    测试性能测试
+    """
+    def test_containers(self):
+        """
+        测试容器用例的结果
+        """
+        results = containers.run(self.mredis, 10, 'Hash.get')
+        self.assertEqual([item['name'] for item in results], ['Hash.get'])
+        self.assertEqual(results[0]['ops'], 10)
+        self.assertIn('p99_us', results[0])
+
+    def test_contention(self):
+        """
+        测试竞争场景，最终的值等于操作次数
+        """
+        results = contention.run(self.mredis, 2, 20, modes=('thread',), scenarios=['Counter', 'Lock'])
+        self.assertEqual(len(results), 2)
+        for item in results:
+            self.assertEqual(item['errors'], 0)
+            self.assertEqual(item['actual'], item['expected'])
+
+    def test_compare(self):
+        """
+        测试比较结果
+        """
+        old = {'a': {'ops_per_sec': 100.0, 'round_trips_per_op': 1.0},
+               'b': {'ops_per_sec': 100.0, 'round_trips_per_op': 1.0}}
+        new = {'a': {'ops_per_sec': 95.0, 'round_trips_per_op': 1.0},
+               'b': {'ops_per_sec': 100.0, 'round_trips_per_op': 2.0}}
+        rows = dict((row[0], row[-1]) for row in compare(old, new, 0.1))
+        self.assertEqual(rows, {'a': False, 'b': True})
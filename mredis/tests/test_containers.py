@@ -1 +1 @@
-# -*- coding: UTF-8 -*-from mredis.tests.test_basic import TestBasicclass TestHash(TestBasic):    """    测试哈希    """    def setUp(self):        super(TestHash, self).setUp()        self.hash = self.mredis.Hash('test_hash')    def test_get_set(self):        """        测试获取和设置        """        self.assertEqual(len(self.hash), 0)        self.hash.setdefault('first', 1)        self.hash['second'] = 2        self.hash.update({"third": 3, "forth": 4})        self.assertEqual(len(self.hash), 4)        keys = ["first", "second", "third", "forth"]        for idx in range(4):            key = keys[idx]            self.assertEqual(self.hash[key], str(idx + 1))            self.assertEqual(self.hash.get(key), str(idx + 1))            self.assertTrue(self.hash.has_key(key))            self.assertTrue(key in self.hash)        self.assertEqual(self.hash.get("six", -1), -1)    def test_remove(self):        """        测试删除        """        self.assertEqual(len(self.hash), 0)        self.hash.update({"first": 1, "second": 2, "third": 3, "forth": 4})        del self.hash['first']        self.assertEqual(len(self.hash), 3)        self.assertTrue('first' not in self.hash)        self.assertEqual(self.hash.pop("second", -1), '2')        self.assertEqual(len(self.hash), 2)        self.assertTrue('second' not in self.hash)        self.assertTrue(self.hash.popitem())        self.assertEqual(len(self.hash), 1)        self.hash.clear()        self.assertEqual(len(self.hash), 0)    def test_iter(self):        """        测试遍历        """        self.hash.update({"first": 1, "second": 2, "third": 3, "forth": 4})        self.assertEqual(sorted(self.hash.items(), key=lambda x: x[1]),                         [('first', '1'), ('second', '2'), ('third', '3'), ('forth', '4')])        keys = ['first', 'second', 'third', 'forth']        self.assertSetEqual(set(self.hash.keys()), set(keys))        self.assertSetEqual(set(self.hash.values()), {'1', '2', '3', '4'})        for key, val in self.hash:            self.assertTrue(key in keys)            self.assertEqual(self.hash[key], val)    def test_incr_desc(self):        """        测试增加减少        """        self.hash['first'] = 1        self.hash.incr('first', 2)        self.assertEqual(self.hash['first'], '3')        self.hash.desc('first', 3)        self.assertEqual(self.hash['first'], '0')        self.hash['first'] = 1.1        self.hash.incr_float('first', 2.2)        self.assertEqual(self.hash['first'], '3.3')        # 当计算的结果得到是整数的时候，那么取出来的结果就是整数，而不是3.0的浮点数        self.hash.desc_float('first', 0.3)        self.assertEqual(self.hash['first'], '3')class TestSet(TestBasic):    """    测试集合    """    def setUp(self):        super(TestSet, self).setUp()        self.set1 = self.mredis.Set('test_set1')        self.set2 = self.mredis.Set('test_set2')        self.set3 = self.mredis.Set('test_set3')    def test_add_get_pop(self):        """        测试增加减少        """        self.set1.add(1)        self.assertEqual(len(self.set1), 1)        self.set1.discard(1)        self.assertEqual(len(self.set1), 0)        self.set1.update({2, 3, 4})        self.set1.remove(2, 3)        self.assertEqual(len(self.set1), 1)        result = self.set1.rand(1)        self.assertSetEqual(set(result), {'4'})        self.set1.pop(2)        self.assertEqual(len(self.set1), 0)        self.set1.clear()        self.assertEqual(len(self.set1), 0)    def test_union_inter_difference(self):        """        测试集合相关功能        """        self.set1.update({1, 2, 3})        self.assertEqual(len(self.set1), 3)        self.set2.update({2, 3, 4})        self.assertEqual(len(self.set2), 3)        self.set3.update({4, 5, 6})        self.assertEqual(len(self.set3), 3)        # 测试intersection、union、difference        result = self.set1.intersection(self.set2)        self.assertSetEqual(set(result), {'2', '3'})        result = self.set1.union(self.set2)        self.assertSetEqual(set(result), {'1', '2', '3', '4'})        result = self.set1.difference(self.set2)        self.assertSetEqual(set(result), {'1'})        self.set1.update(self.set2)        self.assertEqual(len(self.set1), 4)        # 测试intersection_store、union_store、difference_store        self.set1.union_store(self.set1.cache_key, self.set2, self.set3)        self.assertEqual(len(self.set1), 6)        self.set1.intersection_store(self.set1.cache_key, self.set2)        self.assertEqual(len(self.set1), 3)        self.assertSetEqual(self.set1.data(), {'2', '3', '4'})        self.set1.difference_store(self.set1.cache_key, self.set3)        self.assertEqual(len(self.set1), 2)        self.assertSetEqual(self.set1.data(), {'2', '3'})    def test_iter(self):        """        测试遍历        """        values = [1, 2, 3, 4]        self.set1.update(values)        for val in self.set1:            self.assertTrue(int(val) in values)class TestSortedSet(TestBasic):    """    测试有序集合    """    def setUp(self):        super(TestSortedSet, self).setUp()        self.sorted_set = self.mredis.SortedSet('test_sorted_set')    def test_append_remove(self):        """        测试添加删除        """        self.sorted_set.append({'third': 3, 'second': 2, 'first': 1})        self.sorted_set.append(fifth=5, forth=4)        result = self.sorted_set.pop_max(1)        self.assertEqual(result[0], ('fifth', 5.0))        self.assertEqual(len(self.sorted_set), 4)        result = self.sorted_set.pop_min(1)        self.assertEqual(result[0], ('first', 1.0))        self.assertEqual(len(self.sorted_set), 3)        del self.sorted_set['second']        self.assertEqual(len(self.sorted_set), 2)        self.sorted_set.remove('third')        self.assertEqual(len(self.sorted_set), 1)        del self.sorted_set[:1]        self.assertEqual(len(self.sorted_set), 0)        self.sorted_set.append({'third': 3, 'second': 2, 'first': 1})        self.assertEqual(len(self.sorted_set), 3)        # 删除两个，分别是first和second        self.sorted_set.remove_by_rank(0, 1)        self.assertEqual(len(self.sorted_set), 1)        # 没有删除        self.sorted_set.remove_by_score(0, 1)        self.assertEqual(len(self.sorted_set), 1)        self.assertTrue('third' in self.sorted_set)        # 删除third        self.sorted_set.remove_by_score(2, 3)        self.assertEqual(len(self.sorted_set), 0)    def test_get_set(self):        """        测试获取设置        """        self.sorted_set['first'] = 1        self.sorted_set.append({'third': 3, 'second': 2})        # 测试range        result = self.sorted_set.range(0, 1)        self.assertEqual(result, ['first', 'second'])        result = self.sorted_set.range(0, 1, is_desc=True)        self.assertEqual(result, ['third', 'second'])        result = self.sorted_set.range(0, 1, is_reverse=True)        self.assertEqual(result, ['third', 'second'])        result = self.sorted_set.range(0, 1, is_with_scores=True)        self.assertEqual(result, [('first', 1), ('second', 2)])        # 测试range_by_score        result = self.sorted_set.range_by_score(1, 2)        self.assertEqual(result, ['first', 'second'])        result = self.sorted_set.range_by_score(1, 2, 0, 1)        self.assertEqual(result, ['first', 'second'])        result = self.sorted_set.range_by_score(1, 2, is_reverse=True)        self.assertEqual(result, ['second', 'first'])        result = self.sorted_set.range_by_score(1, 2, is_with_scores=True)        self.assertEqual(result, [('first', 1.0), ('second', 2.0)])        # 测试rank和score        result = self.sorted_set.score('first')        self.assertEqual(result, 1)        result = self.sorted_set.rank('first')        self.assertEqual(result, 0)    def test_iter(self):        """        测试遍历        """        self.sorted_set.append({'third': 3, 'second': 2, 'first': 1})        for member, score in self.sorted_set:            self.assertTrue(member)            self.assertTrue(score)class TestList(TestBasic):    """    测试列表    """    def setUp(self):        super(TestList, self).setUp()        self.list = self.mredis.List('test_list')    def test_append_remove(self):        """        测试添加删除        """        self.list.append(10)        self.list.extend([20, 30, 40])        self.list.prepend(0)        self.assertEqual(len(self.list), 5)        self.list.insert_by_value(10, 1)        self.assertEqual(len(self.list), 6)        self.list.pop(0)        self.assertEqual(len(self.list), 5)        self.list.remove(1)        self.assertEqual(len(self.list), 4)        self.list[0] = 1        self.assertEqual(len(self.list), 4)        del self.list[0]        self.assertEqual(len(self.list), 3)        self.list.trim(0, 0)        self.assertEqual(len(self.list), 1)        self.list += [1, 2, 3]        self.assertEqual(len(self.list), 4)        result = self.list[1: 3]        self.assertEqual(result, ['1', '2', '3'])        result = self.list[-1]        self.assertEqual(result, '3')
\ No newline at end of file
+# -*- coding: UTF-8 -*-from unittest import mockfrom redis.exceptions import ResponseErrorfrom mredis.containers import Streamfrom mredis.exception import TypeException, EmptyException, IndexErrorExceptionfrom mredis.tests.test_basic import TestBasicclass TestHash(TestBasic):    """    测试哈希    """    def setUp(self):        super(TestHash, self).setUp()        self.hash = self.mredis.Hash('test_hash')    def test_get_set(self):        """        测试获取和设置        """        self.assertEqual(len(self.hash), 0)        self.hash.setdefault('first', 1)        self.hash['second'] = 2        self.hash.update({"third": 3, "forth": 4})        self.assertEqual(len(self.hash), 4)        keys = ["first", "second", "third", "forth"]        for idx in range(4):            key = keys[idx]            self.assertEqual(self.hash[key], str(idx + 1))            self.assertEqual(self.hash.get(key), str(idx + 1))            self.assertTrue(self.hash.has_key(key))            self.assertTrue(key in self.hash)        self.assertEqual(self.hash.get("six", -1), -1)    def test_remove(self):        """        测试删除        """        self.assertEqual(len(self.hash), 0)        self.hash.update({"first": 1, "second": 2, "third": 3, "forth": 4})        del self.hash['first']        self.assertEqual(len(self.hash), 3)        self.assertTrue('first' not in self.hash)        self.assertEqual(self.hash.pop("second", -1), '2')        self.assertEqual(len(self.hash), 2)        self.assertTrue('second' not in self.hash)        self.assertTrue(self.hash.popitem())        self.assertEqual(len(self.hash), 1)        self.hash.clear()        self.assertEqual(len(self.hash), 0)    def test_iter(self):        """        测试遍历        """        self.hash.update({"first": 1, "second": 2, "third": 3, "forth": 4})        self.assertEqual(sorted(self.hash.items(), key=lambda x: x[1]),                         [('first', '1'), ('second', '2'), ('third', '3'), ('forth', '4')])        keys = ['first', 'second', 'third', 'forth']        self.assertSetEqual(set(self.hash.keys()), set(keys))        self.assertSetEqual(set(self.hash.values()), {'1', '2', '3', '4'})        for key, val in self.hash:            self.assertTrue(key in keys)            self.assertEqual(self.hash[key], val)    def test_incr_desc(self):        """        测试增加减少        """        self.hash['first'] = 1        self.hash.incr('first', 2)        self.assertEqual(self.hash['first'], '3')        self.hash.desc('first', 3)        self.assertEqual(self.hash['first'], '0')        self.hash['first'] = 1.1        self.hash.incr_float('first', 2.2)        self.assertEqual(self.hash['first'], '3.3')        # 当计算的结果得到是整数的时候，那么取出来的结果就是整数，而不是3.0的浮点数        self.hash.desc_float('first', 0.3)        self.assertEqual(self.hash['first'], '3')class TestSet(TestBasic):    """    测试集合    """    def setUp(self):        super(TestSet, self).setUp()        self.set1 = self.mredis.Set('test_set1')        self.set2 = self.mredis.Set('test_set2')        self.set3 = self.mredis.Set('test_set3')    def test_add_get_pop(self):        """        测试增加减少        """        self.set1.add(1)        self.assertEqual(len(self.set1), 1)        self.set1.discard(1)        self.assertEqual(len(self.set1), 0)        self.set1.update({2, 3, 4})        self.set1.remove(2, 3)        self.assertEqual(len(self.set1), 1)        result = self.set1.rand(1)        self.assertSetEqual(set(result), {'4'})        self.set1.pop(2)        self.assertEqual(len(self.set1), 0)        self.set1.clear()        self.assertEqual(len(self.set1), 0)    def test_union_inter_difference(self):        """        测试集合相关功能        """        self.set1.update({1, 2, 3})        self.assertEqual(len(self.set1), 3)        self.set2.update({2, 3, 4})        self.assertEqual(len(self.set2), 3)        self.set3.update({4, 5, 6})        self.assertEqual(len(self.set3), 3)        # 测试intersection、union、difference        result = self.set1.intersection(self.set2)        self.assertSetEqual(set(result), {'2', '3'})        result = self.set1.union(self.set2)        self.assertSetEqual(set(result), {'1', '2', '3', '4'})        result = self.set1.difference(self.set2)        self.assertSetEqual(set(result), {'1'})        self.set1.update(self.set2)        self.assertEqual(len(self.set1), 4)        # 测试intersection_store、union_store、difference_store        self.set1.union_store(self.set1.cache_key, self.set2, self.set3)        self.assertEqual(len(self.set1), 6)        self.set1.intersection_store(self.set1.cache_key, self.set2)        self.assertEqual(len(self.set1), 3)        self.assertSetEqual(self.set1.data(), {'2', '3', '4'})        self.set1.difference_store(self.set1.cache_key, self.set3)        self.assertEqual(len(self.set1), 2)        self.assertSetEqual(self.set1.data(), {'2', '3'})    def test_iter(self):        """        测试遍历        """        values = [1, 2, 3, 4]        self.set1.update(values)        for val in self.set1:            self.assertTrue(int(val) in values)class TestSortedSet(TestBasic):    """    测试有序集合    """    def setUp(self):        super(TestSortedSet, self).setUp()        self.sorted_set = self.mredis.SortedSet('test_sorted_set')    def test_append_remove(self):        """        测试添加删除        """        self.sorted_set.append({'third': 3, 'second': 2, 'first': 1})        self.sorted_set.append(fifth=5, forth=4)        result = self.sorted_set.pop_max(1)        self.assertEqual(result[0], ('fifth', 5.0))        self.assertEqual(len(self.sorted_set), 4)        result = self.sorted_set.pop_min(1)        self.assertEqual(result[0], ('first', 1.0))        self.assertEqual(len(self.sorted_set), 3)        del self.sorted_set['second']        self.assertEqual(len(self.sorted_set), 2)        self.sorted_set.remove('third')        self.assertEqual(len(self.sorted_set), 1)        del self.sorted_set[:1]        self.assertEqual(len(self.sorted_set), 0)        self.sorted_set.append({'third': 3, 'second': 2, 'first': 1})        self.assertEqual(len(self.sorted_set), 3)        # 删除两个，分别是first和second        self.sorted_set.remove_by_rank(0, 1)        self.assertEqual(len(self.sorted_set), 1)        # 没有删除        self.sorted_set.remove_by_score(0, 1)        self.assertEqual(len(self.sorted_set), 1)        self.assertTrue('third' in self.sorted_set)        # 删除third        self.sorted_set.remove_by_score(2, 3)        self.assertEqual(len(self.sorted_set), 0)    def test_get_set(self):        """        测试获取设置        """        self.sorted_set['first'] = 1        self.sorted_set.append({'third': 3, 'second': 2})        # 测试range        result = self.sorted_set.range(0, 1)        self.assertEqual(result, ['first', 'second'])        result = self.sorted_set.range(0, 1, is_desc=True)        self.assertEqual(result, ['third', 'second'])        result = self.sorted_set.range(0, 1, is_reverse=True)        self.assertEqual(result, ['third', 'second'])        result = self.sorted_set.range(0, 1, is_with_scores=True)        self.assertEqual(result, [('first', 1), ('second', 2)])        # 测试range_by_score        result = self.sorted_set.range_by_score(1, 2)        self.assertEqual(result, ['first', 'second'])        result = self.sorted_set.range_by_score(1, 2, 0, 1)        self.assertEqual(result, ['first', 'second'])        result = self.sorted_set.range_by_score(1, 2, is_reverse=True)        self.assertEqual(result, ['second', 'first'])        result = self.sorted_set.range_by_score(1, 2, is_with_scores=True)        self.assertEqual(result, [('first', 1.0), ('second', 2.0)])        # 测试rank和score        result = self.sorted_set.score('first')        self.assertEqual(result, 1)        result = self.sorted_set.rank('first')        self.assertEqual(result, 0)    def test_iter(self):        """        测试遍历        """        self.sorted_set.append({'third': 3, 'second': 2, 'first': 1})        for member, score in self.sorted_set:            self.assertTrue(member)            self.assertTrue(score)    def test_lookup(self):        """        测试一次网络往返获取多个成员的分值和排名        """        self.sorted_set.append({'zero': 0, 'first': 1, 'second': 2})        self.assertTrue('zero' in self.sorted_set)        self.assertFalse('other' in self.sorted_set)        members = ['second', 'other', 'zero']        with self.mredis.explain(server_time=False) as explain:            self.assertEqual(self.sorted_set.scores(members), [2.0, None, 0.0])            self.assertEqual(self.sorted_set.ranks(members), [2, None, 0])            self.assertEqual(self.sorted_set.ranks(members, is_reverse=True), [0, None, 2])            self.assertEqual(self.sorted_set.contains_many(members), [True, False, True])        self.assertEqual([call['round_trips'] for call in explain.calls], [1, 1, 1, 1])        self.assertEqual(self.sorted_set.scores([]), [])        # 服务端不支持ZMSCORE时使用lua脚本，之后不再尝试ZMSCORE        error = ResponseError("unknown command 'ZMSCORE', with args beginning with: ")        with mock.patch.object(self.mredis, 'zmscore', side_effect=error) as zmscore:            with self.mredis.explain(server_time=False) as explain:                self.assertEqual(self.sorted_set.scores(members), [2.0, None, 0.0])                self.assertEqual(self.sorted_set.contains_many(members), [True, False, True])            self.assertEqual(zmscore.call_count, 1)        self.assertEqual([command['command'] for call in explain.calls for command in call['commands']],                         ['EVALSHA', 'EVALSHA'])        self.assertEqual(self.sorted_set.scores(members), [2.0, None, 0.0])        with self.mredis.batch() as batch:            self.assertEqual(batch.SortedSet('test_sorted_set').scores(members), [2.0, None, 0.0])class TestList(TestBasic):    """    测试列表    """    def setUp(self):        super(TestList, self).setUp()        self.list = self.mredis.List('test_list')    def test_append_remove(self):        """        测试添加删除        """        self.list.append(10)        self.list.extend([20, 30, 40])        self.list.prepend(0)        self.assertEqual(len(self.list), 5)        self.list.insert_by_value(10, 1)        self.assertEqual(len(self.list), 6)        self.list.pop(0)        self.assertEqual(len(self.list), 5)        self.list.remove(1)        self.assertEqual(len(self.list), 4)        self.list[0] = 1        self.assertEqual(len(self.list), 4)        del self.list[0]        self.assertEqual(len(self.list), 3)        self.list.trim(0, 0)        self.assertEqual(len(self.list), 1)        self.list += [1, 2, 3]        self.assertEqual(len(self.list), 4)        result = self.list[1: 4]        self.assertEqual(result, ['1', '2', '3'])        result = self.list[-1]        self.assertEqual(result, '3')    def test_slice(self):        """        测试切片和python的列表相同        """        values = [str(idx) for idx in range(10)]        self.list.extend(values)        for item in [slice(None), slice(2, 5), slice(-3, None), slice(None, -2), slice(-100, 100), slice(5, 2),                     slice(3, 0), slice(None, 0), slice(None, None, 3), slice(1, -1, 2), slice(None, None, -1),                     slice(8, 2, -2), slice(-2, -8, -3), slice(5, -1, -1), slice(2, None, -1), slice(100, None, -4)]:            self.assertEqual(self.list[item], values[item], item)        self.assertRaises(ValueError, self.list.__getitem__, slice(None, None, 0))    def test_iter_chunks(self):        """        测试分页遍历        """        values = [str(idx) for idx in range(25)]        self.list.extend(values)        self.assertEqual([len(chunk) for chunk in self.list.iter_chunks(10)], [10, 10, 5])        self.assertEqual(list(self.list.iter_chunks(5, prefetch=0))[-1], values[20:])        self.assertEqual(list(self.list.iter_chunks(10, is_reverse=True))[0], values[:-11:-1])        self.assertEqual(list(self.list.iter_chunks(25)), [values])        self.assertEqual(list(self.list), values)        self.assertEqual(list(reversed(self.list)), values[::-1])        self.assertEqual(list(self.mredis.List('test_other')), [])class TestRoundTrips(TestBasic):    """    测试多步操作的方法只有一次网络往返    """    def assertOneRoundTrip(self, func):        with self.mredis.explain(server_time=False) as explain:            result = func()        self.assertEqual([call['round_trips'] for call in explain.calls], [1], explain.commands())        return result    def test_hash(self):        """        测试哈希        """        hash = self.mredis.Hash('test_hash')        hash.update({'first': 1, 'second': 2})        self.assertEqual(self.assertOneRoundTrip(lambda: hash.get('first')), '1')        self.assertEqual(self.assertOneRoundTrip(lambda: hash.get('none', 0)), 0)        self.assertEqual(self.assertOneRoundTrip(lambda: hash.pop('first')), '1')        self.assertEqual(self.assertOneRoundTrip(lambda: hash.pop('first', 0)), 0)        self.assertEqual(self.assertOneRoundTrip(lambda: hash.setdefault('second', 3)), '2')        self.assertEqual(self.assertOneRoundTrip(lambda: hash.setdefault('third', 3)), 3)        self.assertEqual(hash['third'], '3')        self.assertEqual(self.assertOneRoundTrip(lambda: hash.popitem())[0] in ('second', 'third'), True)        self.assertEqual(len(hash), 1)        hash.popitem()        self.assertRaises(TypeException, hash.popitem)        self.assertRaises(TypeException, hash.pop, 'first')    def test_list(self):        """        测试列表        """        values = self.mredis.List('test_list')        values.extend([0, 1, 2, 3, 4])        self.assertEqual(self.assertOneRoundTrip(lambda: values.pop(2)), '2')        self.assertEqual(self.assertOneRoundTrip(lambda: values.pop(0)), '0')        self.assertEqual(self.assertOneRoundTrip(lambda: values.pop()), '4')        self.assertOneRoundTrip(lambda: values.__setitem__(1, 5))        self.assertEqual(values.data(), ['1', '5'])        self.assertRaises(IndexErrorException, values.pop, 5)        self.assertRaises(IndexErrorException, values.__setitem__, 5, 1)        values.delete()        self.assertRaises(EmptyException, values.pop)        self.assertRaises(EmptyException, values.pop, 1)    def test_sorted_set_stream(self):        """        测试有序集合和流        """        sorted_set = self.mredis.SortedSet('test_sorted_set')        sorted_set.append({'first': 1})        self.assertTrue(self.assertOneRoundTrip(lambda: 'first' in sorted_set))        stream = Stream(self.mredis, 'test_stream')        msg_id = stream.add({'first': 1})        self.assertEqual(self.assertOneRoundTrip(lambda: stream.get(msg_id)), (msg_id, {'first': '1'}))        self.assertEqual(stream[msg_id], (msg_id, {'first': '1'}))class TestBulk(TestBasic):    """    测试分块写入    """    def round_trips(self, func):        with self.mredis.explain(server_time=False) as explain:            result = func()        return result, sum(call['round_trips'] for call in explain.calls)    def test_hash(self):        """        测试哈希        """        hash = self.mredis.Hash('test_hash')        items = (('key_%s' % idx, idx) for idx in range(2500))        self.assertEqual(self.round_trips(lambda: hash.update(items, chunk_size=1000)), (2500, 1))        self.assertEqual(len(hash), 2500)        self.assertEqual(self.round_trips(lambda: hash.update({'key_1': 1})), (1, 1))        self.assertEqual(hash.update({}), 0)        other = self.mredis.Hash('test_other')        self.assertEqual(other.update(hash, chunk_size=100), 2500)        self.assertEqual(other.data(), hash.data())        self.assertRaises(TypeException, hash.update, 1)    def test_set_list(self):        """        测试集合和列表        """        container = self.mredis.Set('test_set')        result = self.round_trips(lambda: container.update(iter(range(100)), chunk_size=10, max_in_flight=3))        self.assertEqual(result, (100, 4))        self.assertEqual(len(container), 100)        values = self.mredis.List('test_list')        self.assertEqual(values.extend((idx for idx in range(100)), chunk_size=7), 100)        self.assertEqual(values.data(), [str(idx) for idx in range(100)])        self.assertEqual(values.extend([]), 0)    def test_sorted_set(self):        """        测试有序集合        """        sorted_set = self.mredis.SortedSet('test_sorted_set')        members = (('member_%s' % idx, idx) for idx in range(100))        self.assertEqual(sorted_set.append(members, chunk_size=30, other=100), 101)        self.assertEqual(sorted_set.score('member_99'), 99)        self.assertEqual(sorted_set.score('other'), 100)    def test_batch(self):        """        测试批量执行中分块写入的命令进入Batch的pipeline        """        with self.mredis.batch() as batch:            self.assertEqual(batch.List('test_list').extend(range(25), chunk_size=10), 25)            self.assertEqual(len(batch), 3)        self.assertEqual(len(self.mredis.List('test_list')), 25)class TestCappedList(TestBasic):    """    测试固定长度的列表    """    def test_push(self):        """        测试添加和读取最新的值        """        events = self.mredis.CappedList('test_events', 3)        for idx in range(5):            events.push(idx)        self.assertEqual(events.latest(), ['4', '3', '2'])        self.assertEqual(events.latest(2), ['4', '3'])        with self.mredis.explain(server_time=False) as explain:            self.assertEqual(events.push(*range(5, 10)), 3)        self.assertEqual(explain.calls[0]['round_trips'], 1)        self.assertEqual(events.data(), ['9', '8', '7'])        values = self.mredis.List('test_list')        self.assertEqual(values.push_capped(5, 1, 2), 2)        self.assertEqual(values.latest(5), ['2', '1'])        self.assertRaises(TypeException, values.push_capped, 0, 1)        # 脚本分块LPUSH，超过unpack上限的值也可以一次添加        self.assertEqual(values.push_capped(20000, *range(9000)), 9002)        self.assertEqual(values.latest(2), ['8999', '8998'])        self.assertRaises(TypeException, self.mredis.CappedList, 'test_events', 0)    def test_not_capped(self):        """        测试不会超出长度        """        events = self.mredis.CappedList('test_events', 3)        events.push(1, 2, 3)        self.assertRaises(TypeException, events.append, 9)        self.assertRaises(TypeException, events.extend, [1, 2, 3])        self.assertRaises(TypeException, events.insert_by_value, '1', 9)        self.assertRaises(TypeException, events.__iadd__, [1])        self.assertEqual(len(events), 3)        self.assertEqual(events.latest(0), [])        self.assertEqual(events.latest(-1), [])        self.assertEqual(self.mredis.List('test_events').latest(0), [])    def test_fan_out(self):        """        测试添加到多个列表        """        cache_keys = ['test_events_%s' % idx for idx in range(250)]        with self.mredis.explain(server_time=False) as explain:            self.assertEqual(self.mredis.push_capped(iter(cache_keys), ['a', 'b', 'c'], 2, chunk_size=100), 250)        self.assertEqual(sum(call['round_trips'] for call in explain.calls), 3)        self.assertEqual(self.mredis.CappedList('test_events_249', 2).latest(), ['c', 'b'])class TestSetResult(TestBasic):    """    测试服务端的集合运算结果    """    def setUp(self):        super(TestSetResult, self).setUp()        self.set1 = self.mredis.Set('test_set1')        self.set2 = self.mredis.Set('test_set2')        self.set3 = self.mredis.Set('test_set3')        self.set1.update(range(1000))        self.set2.update(range(500, 1500))        self.set3.update(range(900, 2000))    def test_lazy(self):        """        测试运算结果保存在临时key中        """        result = self.set1.lazy_intersection(self.set2, ttl=10)        self.assertEqual(result.count, 500)        self.assertEqual(len(result), 500)        self.assertTrue(0 < result.left_seconds() <= 10)        self.assertTrue(result.cache_key.startswith('mredis_tmp:{test_set1}:'))        self.assertEqual(set(result.iter_scan(count=100)), set(str(idx) for idx in range(500, 1000)))        self.assertEqual(len(result.rand(10)), 10)        self.assertTrue('600' in result)        # 继续运算        chained = result.lazy_difference(self.set3)        self.assertEqual(chained.count, 400)        self.assertEqual(self.set1.lazy_union(self.set3).count, 2000)        with chained:            self.assertEqual(len(chained.lazy_intersection(self.set1)), 400)        self.assertEqual(len(chained), 0)        empty = self.set1.lazy_difference(self.set1)        self.assertEqual((empty.count, len(empty), list(empty)), (0, 0, []))        self.assertRaises(TypeException, self.set1.lazy_union, 'test_set2')    def test_count(self):        """        测试只返回个数        """        with self.mredis.explain(server_time=False) as explain:            self.assertEqual(self.set1.union_count(self.set2, self.set3), 2000)        self.assertEqual(explain.calls[0]['round_trips'], 1)        self.assertEqual(self.set1.intersection_count(self.set2, self.set3), 100)        self.assertEqual(self.set1.difference_count(self.set2), 500)        self.assertEqual(len(self.mredis.keys('mredis_tmp:*')), 0)    def test_batch(self):        """        测试批量执行        """        with self.mredis.batch() as batch:            count = batch.Set('test_set1').intersection_count(batch.Set('test_set2'))            result = batch.Set('test_set1').lazy_union(batch.Set('test_set2'))        self.assertEqual(count.value, 500)        self.assertEqual(result.count.value, 1500)class TestBitmap(TestBasic):    """    测试整数id的位图    """    def test_basic(self):        """        测试添加、删除和判断        """        bitmap = self.mredis.Bitmap('test_bitmap')        self.assertEqual(bitmap.add(10), 0)        self.assertEqual(bitmap.add(10), 1)        self.assertTrue(10 in bitmap)        self.assertFalse(11 in bitmap)        self.assertEqual(bitmap.discard(10), 1)        self.assertEqual(len(bitmap), 0)        self.assertRaises(TypeException, bitmap.add, -1)        self.assertRaises(TypeException, bitmap.add, '1')        self.assertRaises(TypeException, bitmap.__contains__, 2 ** 32)    def test_many(self):        """        测试批量添加和判断        """        bitmap = self.mredis.Bitmap('test_bitmap')        with self.mredis.explain(server_time=False) as explain:            self.assertEqual(bitmap.add_many(range(0, 3000, 3), chunk_size=100), 1000)            self.assertEqual(bitmap.contains_many([0, 1, 2999, 3000]), [True, False, False, False])        self.assertEqual([call['round_trips'] for call in explain.calls], [2, 1])        self.assertEqual(len(bitmap), 1000)        self.assertEqual(bitmap.discard_many([0, 3, 6]), 3)        self.assertEqual(bitmap.contains_many([0, 9]), [False, True])        self.assertEqual(bitmap.contains_many([]), [])    def test_iter(self):        """        测试分段读取后在本地解码        """        bitmap = self.mredis.Bitmap('test_bitmap')        self.assertEqual(list(bitmap), [])        ids = [0, 7, 8, 255, 4096, 10 ** 6, 10 ** 6 + 1]        bitmap.add_many(ids)        self.assertEqual(list(bitmap), ids)        self.assertEqual(list(bitmap.iter_ids(window=1, prefetch=0)), ids)        # 稀疏的位图跳过为0的区域        with self.mredis.explain(server_time=False) as explain:            self.assertEqual(list(bitmap.iter_ids(prefetch=0)), ids)        self.assertEqual(sum(call['round_trips'] for call in explain.calls), 2)        self.assertEqual(bitmap.data(), set(ids))    def test_operation(self):        """        测试服务端的位运算        """        first = self.mredis.Bitmap('test_first')        second = self.mredis.Bitmap('test_second')        third = self.mredis.Bitmap('test_third')        first.add_many(range(0, 100))        second.add_many(range(50, 200))        third.add_many(range(90, 1000))        with first & second as result:            self.assertEqual((result.count, len(result)), (50, 50))            self.assertTrue(result.cache_key.startswith('mredis_tmp:{test_first}:'))            self.assertEqual(list(result), list(range(50, 100)))        self.assertEqual(len(result), 0)        self.assertEqual(list(first | second), list(range(200)))        self.assertEqual(list(first - second), list(range(50)))        self.assertEqual(list(second - first), list(range(100, 200)))        self.assertEqual((first ^ second).count, 150)        self.assertEqual(first.difference(second, third, ttl=10).count, 50)        self.assertEqual(first.intersection_count(second, third), 10)        self.assertEqual(first.union_count(second, third), 1000)        self.assertEqual(first.difference_count(third), 90)        self.assertEqual(first.difference_count(), 100)        self.assertRaises(TypeException, first.union, self.mredis.Set('test_set'))    def test_batch(self):        """        测试批量执行        """        with self.mredis.batch() as batch:            bitmap = batch.Bitmap('test_bitmap')            bitmap.add_many([1, 2, 3])            count = bitmap.intersection_count(batch.Bitmap('test_other'))            self.assertEqual(list(bitmap), [1, 2, 3])        self.assertEqual(count.value, 0)class TestHyperLogLog(TestBasic):    """    测试基数统计    """    def test_add_count(self):        """        测试添加和计数        """        hll = self.mredis.HyperLogLog('test_hll')        self.assertEqual(hll.add(1, 2, 3), 1)        self.assertEqual(hll.add(1), 0)        self.assertEqual(hll.count(), 3)        self.assertEqual(len(hll), 3)
\ No newline at end of file
@@ -0,0 +1,65 @@
+# -*- coding: UTF-8 -*-
+from mredis.tests.test_basic import TestBasic
+
+
+class TestExplain(TestBasic):
+    """
+    测试explain
+    """
+    def test_commands(self):
+        """
+        测试每次调用的命令序列和网络往返次数
+        """
+        hash = self.mredis.Hash('test_hash')
+        hash['first'] = 1
+        with self.mredis.explain() as explain:
+            hash.get('first')
+            self.mredis.Counter('test_counter').incr('first')
+            self.mredis.get('test_key')
+
+        self.assertEqual([call['name'] for call in explain.calls], ['Hash.get', 'Counter.incr', 'GET'])
+        self.assertEqual([record['command'] for record in explain.calls[1]['commands']], ['EVALSHA'])
+        self.assertEqual(explain.calls[1]['round_trips'], 1)
+        self.assertEqual(explain.commands()[-1], ('GET', ('test_key',)))
+        # *2\r\n$3\r\nGET\r\n$8\r\ntest_key\r\n
+        self.assertEqual(explain.calls[2]['sent'], 27)
+        for call in explain.calls:
+            self.assertIn('test_explain.py', call['site'])
+            self.assertGreaterEqual(call['server_time'], 0)
+
+    def test_repeated_calls(self):
+        """
+        测试同一个位置的多次调用分别记录，并且在报告中汇总
+        """
+        hash = self.mredis.Hash('test_hash')
+        with self.mredis.explain(server_time=False) as explain:
+            for idx in range(3):
+                hash.incr('key_%s' % idx)
+        self.assertEqual(len(explain.calls), 3)
+        sites = explain.sites()
+        self.assertEqual(len(sites), 1)
+        self.assertEqual((sites[0]['name'], sites[0]['calls'], sites[0]['round_trips']), ('Hash.incr', 3, 3))
+        self.assertIn('Hash.incr', explain.report())
+
+    def test_pipeline(self):
+        """
+        测试pipeline记录为一次网络往返
+        """
+        with self.mredis.explain(server_time=False) as explain:
+            pipe = self.mredis.pipeline()
+            pipe.set('test_key', 1)
+            pipe.get('test_key')
+            self.assertEqual(pipe.execute(), [True, '1'])
+        self.assertEqual(len(explain.calls), 1)
+        self.assertEqual(explain.calls[0]['name'], 'PIPELINE')
+        self.assertEqual(explain.calls[0]['round_trips'], 1)
+        self.assertEqual(explain.commands(), [('SET', ('test_key', 1)), ('GET', ('test_key',))])
+
+    def test_stop(self):
+        """
+        测试停止后不再记录
+        """
+        with self.mredis.explain(server_time=False) as explain:
+            self.mredis.get('test_key')
+        self.mredis.get('test_key')
+        self.assertEqual(len(explain.calls), 1)
@@ -9,6 +9,10 @@
 @desc:      测试锁
 """
 
+import threading
+import time
+
+from mredis.database import MRedis
 from mredis.tests.test_basic import TestBasic
 
 
@@ -53,3 +57,245 @@ class TestFunCache(TestBasic):
         self.assertEqual(result, 2)
 
         self.assertTrue(self.mredis.exists(cache_key))
+
+    def test_function_local_cache(self):
+        """
+        测试进程内的一级缓存
+        """
+        # pickle的结果是二进制，使用不解码的客户端
+        mredis = MRedis(host='localhost', port=6379)
+        local_cache = mredis.LocalCache(max_entries=10)
+        self.addCleanup(local_cache.close)
+        calls = []
+
+        @mredis.func_cache(local_cache=local_cache)
+        def get_sum(a, b):
+            calls.append((a, b))
+            return a + b
+
+        self.assertEqual(get_sum(1, 1), 2)
+        self.assertEqual(get_sum(1, 1), 2)
+        self.assertEqual(calls, [(1, 1)])
+        self.assertEqual(get_sum.stats['local'], {'hits': 1, 'misses': 1})
+        self.assertEqual(get_sum.stats['redis'], {'hits': 0, 'misses': 1})
+
+        # 本地缓存清空后从redis读取
+        local_cache.clear()
+        self.assertEqual(get_sum(1, 1), 2)
+        self.assertEqual(get_sum.stats['redis'], {'hits': 1, 'misses': 1})
+        self.assertEqual(calls, [(1, 1)])
+
+    def test_function_cache_invalidate(self):
+        """
+        测试跨进程失效
+        """
+        local_cache = self.mredis.LocalCache()
+        other_cache = self.mredis.LocalCache()
+        self.addCleanup(local_cache.close)
+        self.addCleanup(other_cache.close)
+
+        @self.mredis.func_cache(local_cache=local_cache)
+        def get_sum(a, b):
+            return a + b
+
+        other_get_sum = self.mredis.func_cache(local_cache=other_cache)(get_sum.__wrapped__)
+        self.assertEqual(other_get_sum(1, 1), 2)
+        cache_key = self.mredis._get_func_cache_key_id(get_sum, (1, 1), {})
+        self.assertEqual(len(other_cache), 1)
+
+        get_sum.invalidate(1, 1)
+        self.assertFalse(self.mredis.exists(cache_key))
+        for _ in range(100):
+            if not len(other_cache):
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(other_cache), 0)
+
+    def test_function_cache_falsy(self):
+        """
+        测试缓存结果为假值
+        """
+        mredis = MRedis(host='localhost', port=6379)
+        calls = []
+
+        @mredis.func_cache()
+        def get_empty(value):
+            calls.append(value)
+            return value
+
+        for value in (0, [], None):
+            self.assertEqual(get_empty(value), value)
+            self.assertEqual(get_empty(value), value)
+        self.assertEqual(calls, [0, [], None])
+
+    def test_function_cache_single_flight(self):
+        """
+        测试缓存失效时只有一个调用者重新计算
+        """
+        mredis = MRedis(host='localhost', port=6379)
+        calls = []
+
+        @mredis.func_cache(single_flight=True, wait_timeout=5)
+        def get_sum(a, b):
+            calls.append((a, b))
+            time.sleep(0.2)
+            return a + b
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_sum(1, 1))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [2] * 5)
+        self.assertEqual(calls, [(1, 1)])
+
+    def test_function_cache_early_refresh(self):
+        """
+        测试提前重新计算
+        """
+        mredis = MRedis(host='localhost', port=6379)
+        calls = []
+
+        @mredis.func_cache(expire_times=60, beta=1e9)
+        def get_sum(a, b):
+            calls.append((a, b))
+            time.sleep(0.01)
+            return a + b
+
+        self.assertEqual(get_sum(1, 1), 2)
+        self.assertEqual(get_sum(1, 1), 2)
+        self.assertEqual(len(calls), 2)
+
+        @mredis.func_cache(expire_times=60, beta=1e-9)
+        def get_diff(a, b):
+            calls.append((a, b))
+            return a - b
+
+        self.assertEqual(get_diff(2, 1), 1)
+        self.assertEqual(get_diff(2, 1), 1)
+        self.assertEqual(len(calls), 3)
+
+    def test_function_cache_key(self):
+        """
+        测试缓存的key
+        """
+        def get_sum(a, b):
+            return a + b
+
+        key = self.mredis._get_func_cache_key_id(get_sum, (), {'a': 1, 'b': 2})
+        self.assertEqual(key, self.mredis._get_func_cache_key_id(get_sum, (), {'b': 2, 'a': 1}))
+        self.assertTrue(key.startswith('func_cache:%s.' % __name__))
+        self.assertNotEqual(key, self.mredis._get_func_cache_key_id(get_sum, (1, 2), {}))
+
+        key = self.mredis._get_func_cache_key_id(get_sum, (1, 2), {}, key_func=lambda a, b: '%s_%s' % (a, b))
+        self.assertTrue(key.endswith(':1_2'))
+
+    def test_function_cache_many(self):
+        """
+        测试批量调用
+        """
+        calls = []
+
+        @self.mredis.func_cache()
+        def get_sum(a, b=0):
+            calls.append(a)
+            return a + b
+
+        self.assertEqual(get_sum(1, b=1), 2)
+        self.assertEqual(get_sum.many([1, 2, 3], b=1), [2, 3, 4])
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertEqual(get_sum.stats['redis'], {'hits': 1, 'misses': 3})
+
+        self.assertEqual(get_sum(1, 1), 2)
+        self.assertEqual(get_sum.many([(1, 1), (4, 1)]), [2, 5])
+        self.assertEqual(calls, [1, 2, 3, 1, 4])
+        self.assertEqual(get_sum(4, 1), 5)
+        self.assertEqual(calls, [1, 2, 3, 1, 4])
+
+    def test_function_cache_stats_threads(self):
+        """
+        测试多线程调用时命中次数不丢失
+        """
+        @self.mredis.func_cache()
+        def get_sum(a, b):
+            return a + b
+
+        get_sum(1, 1)
+
+        def run():
+            for _ in range(100):
+                get_sum(1, 1)
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(get_sum.stats['redis'], {'hits': 800, 'misses': 1})
+
+
+class TestLocalCache(TestBasic):
+    """
+    测试进程内缓存
+    """
+    def test_lru(self):
+        """
+        测试按条目数和大小淘汰
+        """
+        local_cache = self.mredis.LocalCache(max_entries=2, max_size=10)
+        local_cache.set('a', 1, size=4)
+        local_cache.set('b', 2, size=4)
+        self.assertEqual(local_cache.get('a'), (True, 1))
+
+        # 'b'最久未使用，被淘汰
+        local_cache.set('c', 3, size=4)
+        self.assertEqual(local_cache.get('b'), (False, None))
+        self.assertEqual(local_cache.size, 8)
+
+        # 超过大小限制
+        local_cache.set('d', 4, size=8)
+        self.assertEqual(len(local_cache), 1)
+        self.assertEqual(local_cache.stats()['evictions'], 3)
+
+    def test_expire(self):
+        """
+        测试过期
+        """
+        local_cache = self.mredis.LocalCache()
+        local_cache.set('a', 1, expire_time=0.01)
+        time.sleep(0.02)
+        self.assertEqual(local_cache.get('a'), (False, None))
+
+
+class TestRateLimit(TestBasic):
+    """
+    测试频率限制
+    """
+    def test_rate_limit(self):
+        """
+        测试函数的频率限制，默认根据参数限制
+        """
+        rate_limit = self.mredis.RateLimit('test_rate_limit', limit=2, per=60, ret=-1)
+
+        @rate_limit.rate_limit()
+        def get_value(value):
+            return value
+
+        self.assertEqual([get_value(1) for _ in range(3)], [1, 1, -1])
+        self.assertEqual(get_value(2), 2)
+
+    def test_function_key(self):
+        """
+        测试通过function指定关键字
+        """
+        rate_limit = self.mredis.RateLimit('test_rate_limit', limit=2, per=60, ret=-1)
+
+        @rate_limit.rate_limit(function=lambda user_id, value: 'test_rate_limit_%s' % user_id)
+        def get_value(user_id, value):
+            return value
+
+        self.assertEqual([get_value(1, value) for value in range(3)], [0, 1, -1])
+        self.assertEqual(get_value(2, 3), 3)
+        self.assertEqual(len(self.mredis.List('test_rate_limit_1')), 2)
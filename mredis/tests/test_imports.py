@@ -0,0 +1,29 @@
+# -*- coding: UTF-8 -*-
+import subprocess
+import sys
+import unittest
+
+from mredis.benchmarks.imports import import_times
+
+
+class TestImports(unittest.TestCase):
+    """
+    测试导入MRedis时不加载容器模块和可选依赖
+    """
+    def test_lazy(self):
+        modules = import_times('from mredis.database import MRedis')
+        self.assertIn('mredis.database', modules)
+        for name in ('mredis.containers', 'mredis.lock', 'mredis.lua', 'mredis.batch', 'mredis.explain',
+                     'mredis.serializer', 'simplejson', 'mako'):
+            self.assertNotIn(name, modules)
+
+    def test_factory(self):
+        """
+        测试第一次使用时才导入
+        """
+        code = ('import sys\n'
+                'from mredis.database import MRedis\n'
+                'MRedis().Hash("test_hash")\n'
+                'print("mredis.containers" in sys.modules, "mredis.lock" in sys.modules)\n')
+        output = subprocess.check_output([sys.executable, '-c', code]).decode('utf-8').strip()
+        self.assertEqual(output, 'True False')
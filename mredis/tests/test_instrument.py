@@ -0,0 +1,105 @@
+# -*- coding: UTF-8 -*-
+import collections
+import threading
+
+from mredis.instrument import Histogram
+from mredis.tests.test_basic import TestBasic
+
+
+class TestInstrument(TestBasic):
+    """
+    测试命令统计
+    """
+    def tearDown(self):
+        self.mredis.uninstrument()
+        super(TestInstrument, self).tearDown()
+
+    def test_histogram(self):
+        """
+        测试直方图的百分位
+        """
+        histogram = Histogram()
+        for value in range(1, 1001):
+            histogram.record(value / 1e6)
+        self.assertEqual(histogram.count, 1000)
+        self.assertAlmostEqual(histogram.percentile(50), 500 / 1e6, delta=500 / 1e6 / 16)
+        self.assertAlmostEqual(histogram.percentile(99), 990 / 1e6, delta=990 / 1e6 / 16)
+        self.assertEqual(histogram.percentile(100), 1000 / 1e6)
+        self.assertEqual(histogram.count_below(1.0), 1000)
+
+    def test_attribute(self):
+        """
+        测试命令归属到容器的方法
+        """
+        hash = self.mredis.Hash('test_hash')
+        hash['first'] = 1
+
+        calls = []
+        instrumentation = self.mredis.instrument()
+        instrumentation.add_hook(pre=lambda call: calls.append(call['command']))
+        hash.pop('first')
+
+        result = instrumentation.to_dict()
+        self.assertEqual(set(result['calls']['Hash.pop']['commands']), set(calls))
+        self.assertEqual(result['commands'], dict(collections.Counter(calls)))
+
+        text = instrumentation.to_prometheus()
+        self.assertIn('mredis_commands_total{container="Hash",method="pop",command="EVALSHA"} 1', text)
+        self.assertIn('mredis_command_duration_seconds_count{container="Hash",method="pop",command="EVALSHA"} 1',
+                      text)
+
+    def test_error(self):
+        """
+        测试命令出错时也会记录
+        """
+        errors = []
+        instrumentation = self.mredis.instrument()
+        instrumentation.add_hook(post=lambda call, elapsed, error: errors.append(error))
+        self.mredis.set('test_string', 'value')
+        self.assertRaises(Exception, self.mredis.Hash('test_string').data)
+        self.assertEqual(len(errors), 2)
+        self.assertIsNotNone(errors[1])
+        self.assertEqual(instrumentation.to_dict()['calls']['Hash.data']['commands']['HGETALL']['count'], 1)
+
+    def test_export_concurrent(self):
+        """
+        测试导出时其他线程同时记录
+        """
+        instrumentation = self.mredis.instrument()
+        stop = threading.Event()
+        recorded = [0]
+
+        def record():
+            while not stop.is_set():
+                index = recorded[0]
+                instrumentation.record('Hash', 'method_%s' % (index % 10), 'HGET', index % 1000 / 1e6)
+                recorded[0] += 1
+
+        thread = threading.Thread(target=record)
+        thread.start()
+        try:
+            for _ in range(200):
+                instrumentation.to_dict()
+                instrumentation.to_prometheus()
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(instrumentation.to_dict()['commands']['HGET'], recorded[0])
+
+    def test_pipeline(self):
+        """
+        测试pipeline中的每个命令都会记录
+        """
+        calls = []
+        instrumentation = self.mredis.instrument()
+        instrumentation.add_hook(post=lambda call, elapsed, error: calls.append((call['command'], error)))
+        self.mredis.Set('test_set').update(range(3000))
+        with self.mredis.batch() as batch:
+            batch.Hash('test_hash')['first'] = 1
+            batch.Hash('test_hash')['second'] = 2
+
+        result = instrumentation.to_dict()
+        self.assertEqual(result['commands']['SADD'], 3)
+        self.assertEqual(result['commands']['HSET'], 2)
+        self.assertEqual(result['calls']['Set.update']['commands']['SADD']['count'], 3)
+        self.assertEqual(calls.count(('HSET', None)), 2)
@@ -0,0 +1,80 @@
+# -*- coding: UTF-8 -*-
+import redis
+
+from mredis.database import MRedis
+from mredis.lock import Lock
+from mredis.lua import registry
+from mredis.tests.test_basic import TestBasic
+
+
+class TestLua(TestBasic):
+    """
+    测试lua脚本注册表
+    """
+    def test_registry(self):
+        """
+        测试导入时读取所有脚本并计算SHA
+        """
+        for name in ('lock_acquire', 'lock_release', 'hash_pop', 'list_pop'):
+            self.assertIn(name, registry)
+        self.assertEqual(registry.load(self.mredis), [script.sha for script in registry])
+        self.assertIs(Lock(self.mredis, 'test_lock').lua_acquire, Lock(self.mredis, 'other_lock').lua_acquire)
+
+    def test_preload(self):
+        """
+        测试建立连接时预加载脚本
+        """
+        self.mredis.script_flush()
+        database = MRedis(host='localhost', port=6379, decode_responses=True)
+        database.ping()
+        self.assertTrue(all(self.mredis.script_exists(*[script.sha for script in registry])))
+
+        database = MRedis(host='localhost', port=6379, decode_responses=True, preload_scripts=False)
+        self.mredis.script_flush()
+        database.ping()
+        self.assertFalse(any(self.mredis.script_exists(*[script.sha for script in registry])))
+
+    def test_noscript(self):
+        """
+        测试服务端没有脚本时重新加载
+        """
+        lock = self.mredis.Lock('test_lock')
+        self.assertTrue(lock.acquire(expire_time=10))
+        self.mredis.script_flush()
+        self.assertTrue(lock.release())
+        self.assertFalse(self.mredis.exists('test_lock'))
+
+    def test_noscript_pipeline(self):
+        """
+        测试服务端没有脚本时pipeline和批量执行中的脚本在执行前加载
+        """
+        self.mredis.Hash('test_hash').update({'second': 2})
+        self.mredis.script_flush()
+        with self.mredis.batch() as batch:
+            count = batch.Counter('test_counter').incr('first')
+        self.assertEqual(count.value, 1)
+
+        self.mredis.script_flush()
+        pipe = self.mredis.pipeline()
+        registry['hash_pop'](pipe, ['test_hash'], ['second'])
+        self.assertEqual(pipe.execute(), ['2'])
+
+    def test_connect_func(self):
+        """
+        测试预加载在原来的redis_connect_func之后执行，不修改传入的连接池
+        """
+        connected = []
+
+        def connect_func(connection):
+            connected.append(connection)
+            connection.on_connect()
+
+        self.mredis.script_flush()
+        database = MRedis(host='localhost', port=6379, decode_responses=True, redis_connect_func=connect_func)
+        database.ping()
+        self.assertEqual(len(connected), 1)
+        self.assertTrue(all(self.mredis.script_exists(*[script.sha for script in registry])))
+
+        pool = redis.ConnectionPool(host='localhost', port=6379, decode_responses=True)
+        MRedis(connection_pool=pool)
+        self.assertIsNone(pool.connection_kwargs.get('redis_connect_func'))
@@ -0,0 +1,201 @@
+# -*- coding: UTF-8 -*-
+import threading
+import time
+import unittest
+
+from redis.exceptions import ResponseError
+
+from mredis.containers import Stream
+from mredis.memory import MemoryRedis, MemoryStore
+from mredis.tests import test_batch, test_containers, test_explain, test_func, test_near_cache, test_probabilistic, \
+    test_serializer
+
+
+class MemoryMixin(object):
+    """
+    使用内存后端执行原有的测试
+    """
+    def __init__(self, *args, **kwargs):
+        super(MemoryMixin, self).__init__(*args, **kwargs)
+        self.mredis = MemoryRedis(decode_responses=True)
+
+
+class TestMemoryHash(MemoryMixin, test_containers.TestHash):
+    pass
+
+
+class TestMemorySet(MemoryMixin, test_containers.TestSet):
+    pass
+
+
+class TestMemorySortedSet(MemoryMixin, test_containers.TestSortedSet):
+    pass
+
+
+class TestMemoryList(MemoryMixin, test_containers.TestList):
+    pass
+
+
+class TestMemoryRoundTrips(MemoryMixin, test_containers.TestRoundTrips):
+    pass
+
+
+class TestMemoryCappedList(MemoryMixin, test_containers.TestCappedList):
+    pass
+
+
+class TestMemorySetResult(MemoryMixin, test_containers.TestSetResult):
+    pass
+
+
+class TestMemoryBitmap(MemoryMixin, test_containers.TestBitmap):
+    pass
+
+
+class TestMemoryHyperLogLog(MemoryMixin, test_containers.TestHyperLogLog):
+    pass
+
+
+class TestMemoryBulk(MemoryMixin, test_containers.TestBulk):
+    pass
+
+
+class TestMemoryBatch(MemoryMixin, test_batch.TestBatch):
+    pass
+
+
+class TestMemoryExplain(MemoryMixin, test_explain.TestExplain):
+    pass
+
+
+class TestMemoryLock(MemoryMixin, test_func.TestLock):
+    pass
+
+
+class TestMemoryRateLimit(MemoryMixin, test_func.TestRateLimit):
+    pass
+
+
+class TestMemorySerializer(MemoryMixin, test_serializer.TestSerializer):
+    pass
+
+
+class TestMemoryNearCache(MemoryMixin, test_near_cache.TestNearCacheVersion):
+    pass
+
+
+class TestMemoryBloomFilter(MemoryMixin, test_probabilistic.TestBloomFilter):
+    pass
+
+
+class TestMemoryCountMinSketch(MemoryMixin, test_probabilistic.TestCountMinSketch):
+    pass
+
+
+class TestMemoryTopK(MemoryMixin, test_probabilistic.TestTopK):
+    pass
+
+
+class TestMemory(unittest.TestCase):
+    """
+    测试内存后端
+    """
+    def setUp(self):
+        self.mredis = MemoryRedis(decode_responses=True)
+
+    def test_expire(self):
+        """
+        测试过期时间
+        """
+        self.mredis.set('test_key', 1, px=50)
+        self.mredis.hset('test_hash', 'key', 1)
+        self.mredis.pexpire('test_hash', 50)
+        self.assertTrue(0 < self.mredis.pttl('test_key') <= 50)
+        self.assertEqual(self.mredis.ttl('test_other'), -2)
+        time.sleep(0.06)
+        self.assertIsNone(self.mredis.get('test_key'))
+        self.assertEqual(self.mredis.keys(), [])
+
+        self.mredis.set('test_key', 1, ex=10)
+        self.mredis.set('test_key', 2)
+        self.assertEqual(self.mredis.ttl('test_key'), -1)
+
+    def test_wrong_type(self):
+        """
+        测试类型错误和不支持的命令
+        """
+        self.mredis.set('test_key', 1)
+        self.assertRaises(ResponseError, self.mredis.hget, 'test_key', 'key')
+        self.assertRaises(ResponseError, self.mredis.incr, 'test_key', 'a')
+        self.assertRaises(ResponseError, self.mredis.execute_command, 'NOT_A_COMMAND')
+        self.assertRaises(ResponseError, self.mredis.register_script('return 1'))
+
+    def test_raw(self):
+        """
+        测试没有decode_responses时返回bytes
+        """
+        store = MemoryStore()
+        MemoryRedis(store=store, decode_responses=True).Hash('test_hash')['key'] = 'value'
+        database = MemoryRedis(store=store)
+        self.assertEqual(database.hgetall('test_hash'), {b'key': b'value'})
+        self.assertEqual(database.Counter('test_counter').incr('key', 2), 2)
+
+    def test_blocking(self):
+        """
+        测试阻塞的命令被其他线程唤醒
+        """
+        lock = self.mredis.Lock('test_lock')
+        self.assertTrue(lock.acquire(expire_time=10))
+        thread = threading.Timer(0.05, lock.release)
+        thread.start()
+        start_time = time.time()
+        self.assertTrue(self.mredis.Lock('test_lock').acquire(block_timeout=2, expire_time=10))
+        self.assertLess(time.time() - start_time, 1)
+        thread.join()
+        self.assertIsNone(self.mredis.blpop('test_list', 0.05))
+
+    def test_pipeline(self):
+        """
+        测试pipeline中的错误
+        """
+        pipe = self.mredis.pipeline()
+        pipe.set('test_key', 'a').incr('test_key').get('test_key')
+        self.assertRaises(ResponseError, pipe.execute)
+        pipe.set('test_key', 'a').incr('test_key').get('test_key')
+        result = pipe.execute(raise_on_error=False)
+        self.assertTrue(isinstance(result[1], ResponseError))
+        self.assertEqual(result[2], 'a')
+
+    def test_stream_group(self):
+        """
+        测试消费组
+        """
+        stream = Stream(self.mredis, 'test_stream')
+        first = stream.add({'key': 1})
+        self.mredis.xgroup_create('test_stream', 'group', '0')
+        result = self.mredis.xreadgroup('group', 'consumer', {'test_stream': '>'})
+        self.assertEqual(result, [['test_stream', [(first, {'key': '1'})]]])
+        self.assertEqual(self.mredis.xpending('test_stream', 'group')['pending'], 1)
+        self.assertEqual(self.mredis.xack('test_stream', 'group', first), 1)
+        self.assertEqual(self.mredis.xreadgroup('group', 'consumer', {'test_stream': '>'}, block=10), [])
+
+    def test_pubsub(self):
+        """
+        测试发布订阅
+        """
+        pubsub = self.mredis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe('test_channel')
+        self.assertEqual(self.mredis.publish('test_channel', 'data'), 1)
+        message = pubsub.get_message(timeout=1)
+        self.assertEqual((message['channel'], message['data']), ('test_channel', 'data'))
+
+        messages = []
+        pubsub.unsubscribe('test_channel')
+        pubsub.psubscribe(**{'test_*': messages.append})
+        thread = pubsub.run_in_thread(sleep_time=0.01)
+        self.mredis.publish('test_pattern', 'data')
+        time.sleep(0.05)
+        thread.stop()
+        thread.join(1)
+        self.assertEqual([message['channel'] for message in messages], ['test_pattern'])
+        self.assertEqual(self.mredis.publish('test_channel', 'data'), 0)
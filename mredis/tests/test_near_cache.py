@@ -0,0 +1,153 @@
+# -*- coding: UTF-8 -*-
+import time
+
+from mredis.exception import TypeException
+from mredis.tests.test_basic import TestBasic
+
+
+def wait_for(condition, timeout=1):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class TestNearCacheVersion(TestBasic):
+    """
+    测试通过广播消息失效的本地副本
+    """
+    invalidation = 'version'
+
+    def setUp(self):
+        super(TestNearCacheVersion, self).setUp()
+        self.near_cache = self.mredis.NearCache(invalidation=self.invalidation, configure=True)
+
+    def tearDown(self):
+        self.near_cache.close()
+        super(TestNearCacheVersion, self).tearDown()
+
+    def test_hash(self):
+        """
+        测试哈希的读取使用本地副本
+        """
+        config = self.near_cache.Hash('test_config')
+        config.update({'first': 1, 'second': 2})
+        self.assertEqual(config.data(), {'first': '1', 'second': '2'})
+        self.assertEqual(config.get('first'), '1')
+        self.assertEqual(config['second'], '2')
+        self.assertEqual(config.get('third', 3), 3)
+        self.assertTrue('first' in config)
+        self.assertEqual(len(config), 2)
+        self.assertEqual(self.near_cache.stats()['misses'], 1)
+        self.assertEqual(self.near_cache.stats()['hits'], 5)
+
+        # 通过容器修改后立即读到新的值
+        config['first'] = 10
+        self.assertEqual(config['first'], '10')
+        config.pop('second')
+        self.assertEqual(config.data(), {'first': '10'})
+
+    def test_set(self):
+        """
+        测试集合的读取使用本地副本
+        """
+        permissions = self.near_cache.Set('test_permissions')
+        permissions.update({1, 2})
+        self.assertTrue(1 in permissions)
+        self.assertFalse(3 in permissions)
+        self.assertEqual(permissions.data(), {'1', '2'})
+        permissions.add(3)
+        self.assertTrue(3 in permissions)
+        self.assertEqual(len(permissions), 3)
+
+    def test_sorted_set(self):
+        """
+        测试有序集合的读取使用本地副本
+        """
+        sorted_set = self.near_cache.SortedSet('test_sorted_set')
+        sorted_set.append({'first': 0, 'second': 2, 'third': 3})
+        self.assertEqual(sorted_set.score('second'), 2.0)
+        self.assertIsNone(sorted_set.score('other'))
+        self.assertTrue('first' in sorted_set)
+        self.assertEqual(sorted_set.rank('first'), 0)
+        self.assertEqual(sorted_set.rank('first', is_reverse=True), 2)
+        sorted_set.incr('first', 10)
+        self.assertEqual(sorted_set.rank('first'), 2)
+
+    def test_other_process(self):
+        """
+        测试其他进程的修改使本地副本失效
+        """
+        other = self.mredis.NearCache(invalidation=self.invalidation, configure=True)
+        try:
+            self.assertEqual(self.near_cache.Hash('test_config').data(), {})
+            other.Hash('test_config')['key'] = 'value'
+            self.assertTrue(wait_for(lambda: self.near_cache.Hash('test_config').data() == {'key': 'value'}))
+            self.assertEqual(self.near_cache.stats()['invalidations'], 1)
+            # 修改的进程同样会收到失效消息，记录修改到失效的延迟
+            self.assertTrue(wait_for(lambda: other.stats()['lag']['count'] == 1))
+        finally:
+            other.close()
+
+    def test_staleness(self):
+        """
+        测试副本超过max_staleness后重新读取
+        """
+        self.near_cache.max_staleness = 0.05
+        config = self.near_cache.Hash('test_config')
+        config['key'] = 'value'
+        self.assertEqual(config['key'], 'value')
+        time.sleep(0.06)
+        self.assertEqual(config['key'], 'value')
+        self.assertEqual(self.near_cache.stats()['misses'], 2)
+
+    def test_plain_write(self):
+        """
+        测试普通容器的修改最多在max_staleness后读到
+        """
+        self.near_cache.max_staleness = 0.05
+        config = self.near_cache.Hash('test_config')
+        config['key'] = 'value'
+        self.assertEqual(config['key'], 'value')
+        self.mredis.Hash('test_config')['key'] = 'other'
+        time.sleep(0.06)
+        self.assertEqual(config['key'], 'other')
+
+    def test_capacity(self):
+        """
+        测试容量限制
+        """
+        self.near_cache.max_entries = 2
+        for index in range(3):
+            self.near_cache.Set('test_set_%s' % index).data()
+        self.assertEqual(len(self.near_cache), 2)
+        self.assertEqual(self.near_cache.stats()['evictions'], 1)
+
+        self.near_cache.max_size = 4
+        self.near_cache.Set('test_big').update(['12345'])
+        self.assertEqual(self.near_cache.Set('test_big').data(), {'12345'})
+        self.assertEqual(self.near_cache.size, 0)
+
+    def test_mode(self):
+        """
+        测试不支持的失效方式
+        """
+        self.assertRaises(TypeException, self.mredis.NearCache, invalidation='other')
+
+
+class TestNearCacheKeyspace(TestNearCacheVersion):
+    """
+    测试通过键空间通知失效的本地副本
+    """
+    invalidation = 'keyspace'
+
+    def test_raw_write(self):
+        """
+        测试不经过NearCache的修改也会使副本失效
+        """
+        permissions = self.near_cache.Set('test_permissions')
+        self.assertFalse('admin' in permissions)
+        self.mredis.sadd('test_permissions', 'admin')
+        self.assertTrue(wait_for(lambda: 'admin' in permissions))
+        self.mredis.delete('test_permissions')
+        self.assertTrue(wait_for(lambda: 'admin' not in permissions))
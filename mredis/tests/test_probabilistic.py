@@ -0,0 +1,162 @@
+# -*- coding: UTF-8 -*-
+from mredis.exception import TypeException
+from mredis.tests.test_basic import TestBasic
+
+
+class TestBloomFilter(TestBasic):
+    """
+    测试布隆过滤器
+    """
+    def test_basic(self):
+        """
+        测试添加和判断
+        """
+        bloom = self.mredis.BloomFilter('test_bloom', 1000, 0.01)
+        self.assertTrue(bloom.add('first'))
+        self.assertFalse(bloom.add('first'))
+        self.assertTrue('first' in bloom)
+        self.assertFalse('second' in bloom)
+        self.assertEqual(len(bloom), 1)
+        self.assertEqual(bloom.layer(0), (1000, 9586, 7))
+        self.assertRaises(TypeException, self.mredis.BloomFilter, 'test_bloom', 0)
+        self.assertRaises(TypeException, self.mredis.BloomFilter, 'test_bloom', 1000, 1)
+
+    def test_many(self):
+        """
+        测试批量添加和判断，多次脚本调用只有一次网络往返
+        """
+        bloom = self.mredis.BloomFilter('test_bloom', 1000, 0.01)
+        with self.mredis.explain(server_time=False) as explain:
+            added = bloom.add_many(['url_%s' % idx for idx in range(1000)], chunk_size=300)
+            found = bloom.contains_many(['url_%s' % idx for idx in range(1000)])
+        self.assertEqual([call['round_trips'] for call in explain.calls], [1, 1])
+        self.assertTrue(all(found))
+        self.assertEqual(len(bloom), sum(added))
+        self.assertTrue(sum(added) > 980)
+        self.assertEqual(bloom.add_many(['url_1', 'new', 'new']), [False, True, False])
+        self.assertEqual(bloom.contains_many([]), [])
+
+        false_positives = sum(bloom.contains_many(['other_%s' % idx for idx in range(10000)]))
+        self.assertTrue(false_positives < 200)
+
+    def test_scalable(self):
+        """
+        测试超过容量后增加一层
+        """
+        bloom = self.mredis.BloomFilter('test_bloom', 100, 0.01, scalable=True)
+        bloom.add_many(range(1000))
+        counts = bloom.counts()
+        self.assertEqual(counts[:3], [100, 200, 400])
+        self.assertEqual(len(counts), 4)
+        self.assertTrue(all(bloom.contains_many(range(1000))))
+        self.assertTrue(sum(bloom.contains_many(range(10000, 20000))) < 300)
+
+        fixed = self.mredis.BloomFilter('test_fixed', 100, 0.01)
+        fixed.add_many(range(1000))
+        self.assertEqual(len(fixed.counts()), 1)
+
+    def test_batch(self):
+        """
+        测试批量执行
+        """
+        with self.mredis.batch() as batch:
+            batch.Set('test_set').add(1)
+            bloom = batch.BloomFilter('test_bloom', 1000)
+            self.assertEqual(bloom.add_many([1, 2]), [True, True])
+            self.assertEqual(bloom.contains_many([1, 3]), [True, False])
+
+        # 多块的调用在Batch中也只有一次网络往返
+        with self.mredis.explain(server_time=False) as explain:
+            with self.mredis.batch() as batch:
+                bloom = batch.BloomFilter('test_bloom', 1000)
+                self.assertEqual(bloom.add_many(range(10, 35), chunk_size=10), [True] * 25)
+        self.assertEqual(sum(call['round_trips'] for call in explain.calls), 1)
+
+
+class TestCountMinSketch(TestBasic):
+    """
+    测试Count-Min Sketch
+    """
+    def test_count(self):
+        """
+        测试估计值不会低于真实值
+        """
+        sketch = self.mredis.CountMinSketch('test_sketch', width=100, depth=4)
+        self.assertEqual(sketch.incr('first'), 1)
+        self.assertEqual(sketch.incr('first', 4), 5)
+        self.assertEqual(sketch['first'], 5)
+        self.assertEqual(sketch['other'], 0)
+        self.assertRaises(TypeException, sketch.incr, 'first', 0)
+
+        items = ['item_%s' % (idx % 300) for idx in range(3000)]
+        with self.mredis.explain(server_time=False) as explain:
+            estimates = sketch.incr_many(items, chunk_size=1000)
+        self.assertEqual(explain.calls[0]['round_trips'], 1)
+        self.assertEqual(len(estimates), 3000)
+        self.assertTrue(all(value >= 10 for value in sketch.query_many(['item_%s' % idx for idx in range(300)])))
+        self.assertEqual(sketch.total(), 3005)
+        self.assertEqual(sketch.query_many([]), [])
+
+    def test_conservative(self):
+        """
+        测试保守更新的高估更少
+        """
+        items = dict(('item_%s' % idx, idx % 10 + 1) for idx in range(500))
+        errors = []
+        for conservative in (True, False):
+            sketch = self.mredis.CountMinSketch('test_sketch_%s' % conservative, 50, 3, conservative)
+            sketch.incr_many(items)
+            estimates = sketch.query_many(list(items))
+            self.assertTrue(all(estimate >= count for estimate, count in zip(estimates, items.values())))
+            errors.append(sum(estimates) - sum(items.values()))
+        self.assertTrue(errors[0] < errors[1])
+
+
+class TestTopK(TestBasic):
+    """
+    测试出现次数最多的k个元素
+    """
+    def test_top(self):
+        """
+        测试保留次数最多的元素
+        """
+        top = self.mredis.TopK('test_top', 3)
+        items = ['hot_%s' % (idx % 3) for idx in range(300)] + ['cold_%s' % idx for idx in range(100)]
+        top.add_many(items)
+        self.assertEqual(len(top), 3)
+        self.assertEqual(sorted(top.top()), [('hot_0', 100), ('hot_1', 100), ('hot_2', 100)])
+        self.assertTrue('hot_0' in top)
+        self.assertFalse('cold_0' in top)
+        self.assertEqual(top.query('cold_0'), 1)
+
+        # 次数相同时挤出成员最小的
+        self.assertEqual(top.add('new', 200), ['hot_0'])
+        self.assertEqual(top.top(1), [('new', 200)])
+        self.assertEqual(top.sketch.cache_key, '{test_top}:sketch')
+        top.delete()
+        self.assertEqual(self.mredis.keys('*'), [])
+
+    def test_tag(self):
+        """
+        测试分片标签相同的TopK使用不同的sketch
+        """
+        clicks = self.mredis.TopK('{user:1}:clicks', 3)
+        views = self.mredis.TopK('{user:1}:views', 3)
+        self.assertEqual(clicks.sketch.cache_key, '{user:1}:clicks:sketch')
+        clicks.add('x', 5)
+        self.assertEqual(views.query('x'), 0)
+        self.assertEqual(views.sketch.total(), 0)
+        views.add('x', 2)
+        views.delete()
+        self.assertEqual(clicks.query('x'), 5)
+        self.assertEqual(clicks.top(), [('x', 5)])
+
+    def test_batch(self):
+        """
+        测试批量执行
+        """
+        with self.mredis.batch() as batch:
+            batch.Set('test_set').add(1)
+            top = batch.TopK('test_top', 2)
+            self.assertEqual(top.add_many({'first': 3, 'second': 1, 'third': 2}), ['second'])
+        self.assertEqual(self.mredis.TopK('test_top', 2).top(), [('first', 3), ('third', 2)])
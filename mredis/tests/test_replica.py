@@ -0,0 +1,145 @@
+# -*- coding: UTF-8 -*-
+import threading
+from unittest import mock
+
+import redis
+
+from mredis.database import MRedis
+from mredis.tests.test_basic import TestBasic
+
+
+class TestReplica(TestBasic):
+    """
+    测试从库路由，用同一个redis的其他db模拟从库，这样可以区分命令发送到了哪里
+    """
+    def setUp(self):
+        super(TestReplica, self).setUp()
+        self.replica = redis.Redis(host='localhost', port=6379, db=1, decode_responses=True)
+        self.replica.flushdb()
+        self.replica.hset('test_hash', 'from', 'replica')
+        self.mredis.hset('test_hash', 'from', 'primary')
+
+    def tearDown(self):
+        self.replica.flushdb()
+        super(TestReplica, self).tearDown()
+
+    def test_route(self):
+        """
+        测试只读命令发送到从库
+        """
+        mredis = MRedis(host='localhost', port=6379, decode_responses=True, replicas=[{'db': 1}])
+        hash = mredis.Hash('test_hash')
+        self.assertEqual(hash.data(), {'from': 'replica'})
+        self.assertEqual(mredis.hget('test_hash', 'from', ), 'replica')
+        self.assertEqual(mredis.execute_command('HGET', 'test_hash', 'from', consistent=True), 'primary')
+
+        with mredis.consistent():
+            self.assertEqual(hash.data(), {'from': 'primary'})
+        with mredis.Lock('test_lock'):
+            self.assertEqual(hash['from'], 'primary')
+
+        # 写入发送到主库，pipeline也发送到主库
+        hash['from'] = 'write'
+        self.assertEqual(self.mredis.hget('test_hash', 'from'), 'write')
+        pipe = mredis.pipeline()
+        pipe.hget('test_hash', 'from')
+        self.assertEqual(pipe.execute(), ['write'])
+
+    def test_consistent(self):
+        """
+        测试容器的读取方法通过with db.consistent()读取主库
+        """
+        mredis = MRedis(host='localhost', port=6379, decode_responses=True, replicas=[{'db': 1}])
+        self.mredis.sadd('test_set', 'primary')
+        self.mredis.zadd('test_sorted_set', {'primary': 1})
+        hash, values, sorted_set = mredis.Hash('test_hash'), mredis.Set('test_set'), mredis.SortedSet('test_sorted_set')
+        self.assertEqual(hash.get('from'), 'replica')
+        self.assertEqual(values.data(), set())
+        with mredis.consistent():
+            self.assertEqual(hash.get('from'), 'primary')
+            self.assertEqual(values.data(), {'primary'})
+            self.assertEqual(sorted_set.range(0, -1), ['primary'])
+        self.assertEqual(sorted_set.range(0, -1), [])
+
+    def test_replica_down(self):
+        """
+        测试从库连接失败时在主库上重试，并且暂时不使用该从库
+        """
+        mredis = MRedis(host='localhost', port=6379, decode_responses=True, replicas=[{'db': 1}])
+        replica_set = mredis.replica_set
+        replica = replica_set.clients[0]
+        error = redis.ConnectionError('replica down')
+        with mock.patch.object(replica, 'execute_command', side_effect=error) as execute_command:
+            self.assertEqual(mredis.hget('test_hash', 'from'), 'primary')
+            self.assertEqual(mredis.Hash('test_hash').data(), {'from': 'primary'})
+            self.assertEqual(execute_command.call_count, 1)
+        self.assertEqual(replica_set._healthy, [])
+        self.assertEqual(replica_set.lags, [None])
+
+        # check_interval之后重新检查，从库恢复后继续使用
+        replica_set.check()
+        self.assertEqual(replica_set._healthy, [0])
+        self.assertEqual(mredis.hget('test_hash', 'from'), 'replica')
+
+    def test_lock_threads(self):
+        """
+        测试多个线程同时使用同一个锁时各自恢复consistent
+        """
+        lock = self.mredis.Lock('test_lock')
+        entered, exited = threading.Event(), threading.Event()
+        levels = []
+
+        def other():
+            with lock:
+                entered.set()
+                exited.wait(1)
+            levels.append(self.mredis._local.consistent)
+
+        thread = threading.Thread(target=other)
+        with mock.patch.object(lock, 'acquire', return_value=True), \
+                mock.patch.object(lock, 'release', return_value=True):
+            with lock:
+                thread.start()
+                entered.wait(1)
+            levels.append(self.mredis._local.consistent)
+            exited.set()
+            thread.join()
+        self.assertEqual(levels, [0, 0])
+
+    def test_strategy(self):
+        """
+        测试选择从库的策略
+        """
+        mredis = MRedis(host='localhost', port=6379, decode_responses=True, replicas=[{'db': 1}, self.mredis])
+        self.assertEqual([mredis.hget('test_hash', 'from') for _ in range(4)],
+                         ['replica', 'primary', 'replica', 'primary'])
+
+        mredis = MRedis(host='localhost', port=6379, decode_responses=True, replicas=[{'db': 1}, self.mredis],
+                        replica_strategy='least_outstanding')
+        mredis.replica_set.outstanding[0] = 1
+        self.assertEqual(mredis.hget('test_hash', 'from'), 'primary')
+
+    def test_max_lag(self):
+        """
+        测试落后太多的从库不被使用
+        """
+        mredis = MRedis(host='localhost', port=6379, decode_responses=True, replicas=[{'db': 1}],
+                        max_replica_lag=-1)
+        self.assertEqual(mredis.hget('test_hash', 'from'), 'primary')
+        self.assertEqual(len(mredis.replica_set.lags), 1)
+        self.assertTrue(mredis.replica_set.lags[0] >= 0)
+
+    def test_check_error(self):
+        """
+        测试之后的检查在辅助线程中执行，主库检查失败时继续使用上一次的从库
+        """
+        mredis = MRedis(host='localhost', port=6379, decode_responses=True, replicas=[{'db': 1}],
+                        max_replica_lag=2 ** 62)
+        replica_set = mredis.replica_set
+        self.assertEqual(mredis.hget('test_hash', 'from'), 'replica')
+        replica_set.check_interval = 0
+        with mock.patch.object(mredis, 'info', side_effect=redis.ConnectionError('primary down')):
+            self.assertEqual(mredis.hget('test_hash', 'from'), 'replica')
+            replica_set._checker.join(1)
+            self.assertEqual(mredis.hget('test_hash', 'from'), 'replica')
+        self.assertEqual(replica_set._healthy, [0])
@@ -0,0 +1,105 @@
+# -*- coding: UTF-8 -*-
+import threading
+
+from mredis.exception import TypeException
+from mredis.tests.test_basic import TestBasic
+
+
+class TestScan(TestBasic):
+    """
+    测试预取的SCAN
+    """
+    def test_hash(self):
+        """
+        测试分多页读取的哈希
+        """
+        hash = self.mredis.Hash('test_hash')
+        hash.update(dict(('key_%s' % idx, idx) for idx in range(1000)))
+        self.assertEqual(dict(hash.iter_scan(count=50)), hash.data())
+        self.assertEqual(dict(hash.iter_scan(count=50, prefetch=0)), hash.data())
+        self.assertEqual(dict(hash), hash.data())
+        self.assertEqual(len(list(hash.search('key_1*', count=50))), 111)
+
+    def test_set(self):
+        """
+        测试集合和有序集合
+        """
+        container = self.mredis.Set('test_set')
+        container.update(range(1000))
+        self.assertEqual(set(container.iter_scan(count=50, prefetch=3)), container.data())
+
+        sorted_set = self.mredis.SortedSet('test_sorted_set')
+        sorted_set.append(dict(('member_%s' % idx, idx) for idx in range(1000)))
+        self.assertEqual(dict(sorted_set.iter_scan(count=50))['member_10'], 10.0)
+
+    def test_partition(self):
+        """
+        测试多个进程分别遍历一部分元素
+        """
+        container = self.mredis.Set('test_set')
+        container.update(range(1000))
+        parts = [set(container.iter_scan(count=100, partition=(index, 3))) for index in range(3)]
+        self.assertEqual(sum(len(part) for part in parts), 1000)
+        self.assertEqual(set().union(*parts), container.data())
+        self.assertRaises(TypeException, container.iter_scan, partition=(3, 3))
+
+    def test_keys(self):
+        """
+        测试遍历所有的key
+        """
+        for idx in range(600):
+            self.mredis.set('test_key_%s' % idx, idx)
+        self.mredis.Hash('test_hash')['key'] = 1
+        self.assertEqual(len(list(self.mredis.iter_scan('test_key_*', count=50))), 600)
+        self.assertEqual(list(self.mredis.iter_scan(count=50, _type='hash')), ['test_hash'])
+        self.assertEqual(len(list(self.mredis)), 601)
+
+    def test_stop(self):
+        """
+        测试提前结束遍历后辅助线程退出
+        """
+        container = self.mredis.Set('test_set')
+        container.update(range(1000))
+        threads = threading.active_count()
+        iterator = container.iter_scan(count=10, prefetch=1)
+        next(iterator)
+        self.assertEqual(threading.active_count(), threads + 1)
+        iterator.close()
+        for thread in threading.enumerate():
+            if thread is not threading.current_thread() and thread.daemon:
+                thread.join(1)
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_batch(self):
+        """
+        测试批量执行中的遍历
+        """
+        self.mredis.Hash('test_hash').update(dict(('key_%s' % idx, idx) for idx in range(1000)))
+        with self.mredis.batch() as batch:
+            batch.Set('test_set').add(1)
+            self.assertEqual(len(list(batch.Hash('test_hash').iter_scan(count=50))), 1000)
+        self.assertEqual(self.mredis.Set('test_set').data(), {'1'})
+
+    def test_context(self):
+        """
+        测试辅助线程中保持consistent，开启explain时不预取
+        """
+        container = self.mredis.Set('test_set')
+        container.update(range(1000))
+        sscan = self.mredis.sscan
+        levels = []
+
+        def record(*args, **kwargs):
+            levels.append(getattr(self.mredis._local, 'consistent', 0))
+            return sscan(*args, **kwargs)
+
+        self.mredis.sscan = record
+        with self.mredis.consistent():
+            self.assertEqual(len(set(container.iter_scan(count=50))), 1000)
+        self.assertGreater(len(levels), 1)
+        self.assertEqual(set(levels), {1})
+        del self.mredis.sscan
+
+        with self.mredis.explain(server_time=False) as explain:
+            self.assertEqual(len(set(container.iter_scan(count=50))), 1000)
+        self.assertEqual(sum(call['round_trips'] for call in explain.calls), len(levels))
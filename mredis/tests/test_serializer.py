@@ -0,0 +1,60 @@
+# -*- coding: UTF-8 -*-
+import pickle
+
+from mredis.containers import Container
+from mredis.serializer import Serializer, msgpack, lzma
+from mredis.tests.test_basic import TestBasic
+
+
+class TestSerializer(TestBasic):
+    """
+    测试序列化
+    """
+    data = {'name': u'mredis', 'values': list(range(500)), 'nested': {'a': [1, 2.5, None]}}
+
+    def test_codecs(self):
+        """
+        测试各种序列化方式
+        """
+        codecs = ['pickle', 'marshal', 'json']
+        if msgpack is not None:
+            codecs.append('msgpack')
+        for codec in codecs:
+            serializer = Serializer(codec)
+            self.assertEqual(serializer.loads(serializer.dumps(self.data)), self.data)
+
+    def test_compress(self):
+        """
+        测试超过阈值才压缩
+        """
+        compressors = ['zlib'] if lzma is None else ['zlib', 'lzma']
+        for compress in compressors:
+            serializer = Serializer(compress=compress, compress_threshold=100)
+            raw = serializer.dumps(self.data)
+            self.assertLess(len(raw), len(Serializer().dumps(self.data)))
+            self.assertEqual(serializer.loads(raw), self.data)
+
+            small = serializer.dumps(1)
+            self.assertEqual(small[:1], Serializer().dumps(1)[:1])
+            self.assertEqual(serializer.loads(small), 1)
+
+    def test_read_other_format(self):
+        """
+        测试读取其他序列化方式和没有头部的旧数据
+        """
+        serializer = Serializer('json', compress='zlib', compress_threshold=0)
+        self.assertEqual(Serializer().loads(serializer.dumps(self.data)), self.data)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(Serializer().loads(pickle.dumps(self.data, protocol)), self.data)
+
+    def test_container(self):
+        """
+        测试Container的序列化读写
+        """
+        container = Container(self.mredis, 'test_pickle')
+        self.assertEqual(container.get_pickle(), "")
+        container.set_pickle(self.data, serializer=Serializer('marshal', compress='zlib', compress_threshold=0))
+        self.assertEqual(container.get_pickle(), self.data)
+
+        self.mredis.set('test_pickle', pickle.dumps(self.data))
+        self.assertEqual(container.get_pickle(), self.data)
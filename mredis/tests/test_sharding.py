@@ -0,0 +1,153 @@
+# -*- coding: UTF-8 -*-
+from unittest import mock
+
+from mredis.database import MRedis
+from mredis.exception import TypeException
+from mredis.sharding import HashRing, ShardedMRedis, hash_tag
+from mredis.tests.test_basic import TestBasic
+
+
+class TestSharding(TestBasic):
+    """
+    测试客户端分片，使用同一个redis的不同db模拟多个节点
+    """
+    dbs = (1, 2, 3, 4)
+
+    def setUp(self):
+        super(TestSharding, self).setUp()
+        self.sharded = ShardedMRedis([{'db': db} for db in self.dbs[:3]], host='localhost', port=6379,
+                                     decode_responses=True)
+        for db in self.dbs:
+            MRedis(db=db).flushdb()
+
+    def tearDown(self):
+        for db in self.dbs:
+            MRedis(db=db).flushdb()
+        super(TestSharding, self).tearDown()
+
+    def test_hash_tag(self):
+        """
+        测试hash tag
+        """
+        self.assertEqual(hash_tag('user:{1}:friends'), '1')
+        self.assertEqual(hash_tag('user:{}:friends'), 'user:{}:friends')
+        self.assertEqual(hash_tag('user:1'), 'user:1')
+
+        ring = HashRing(['a', 'b', 'c'])
+        self.assertEqual(ring.get('user:{1}:friends'), ring.get('user:{1}:followers'))
+
+        keys = ['key_%s' % idx for idx in range(1000)]
+        before = dict((key, ring.get(key)) for key in keys)
+        self.assertEqual(set(before.values()), {'a', 'b', 'c'})
+        ring.add('d')
+        moved = [key for key in keys if ring.get(key) != before[key]]
+        # 只有属于新节点的key会移动
+        self.assertTrue(all(ring.get(key) == 'd' for key in moved))
+        self.assertLess(len(moved), 500)
+
+    def test_containers(self):
+        """
+        测试容器分布在不同节点
+        """
+        for idx in range(30):
+            self.sharded.Set('set_%s' % idx).add(idx)
+        self.assertEqual(len(list(self.sharded)), 30)
+        self.assertEqual(len(list(self.sharded.search('set_1*'))), 11)
+        self.assertEqual(len(set(self.sharded.get_node_name('set_%s' % idx) for idx in range(30))), 3)
+
+        set1 = self.sharded.Set('user:{1}:friends')
+        set2 = self.sharded.Set('user:{1}:followers')
+        set1.update({1, 2, 3})
+        set2.update({2, 3, 4})
+        self.assertEqual(set(set1.intersection(set2)), {'2', '3'})
+
+    def test_rebalance(self):
+        """
+        测试添加和删除节点时迁移key
+        """
+        for idx in range(100):
+            self.sharded.Hash('hash_%s' % idx)['value'] = idx
+        self.sharded.get_node('hash_0').expire('hash_0', 100)
+
+        moved = self.sharded.add_node({'db': self.dbs[3]})
+        self.assertTrue(0 < moved < 100)
+        for idx in range(100):
+            self.assertEqual(self.sharded.Hash('hash_%s' % idx)['value'], str(idx))
+        self.assertTrue(0 < self.sharded.Hash('hash_0').left_seconds() <= 100)
+
+        name = self.sharded.get_node_name('hash_1')
+        self.sharded.remove_node(name)
+        self.assertEqual(len(list(self.sharded)), 100)
+        self.assertEqual(self.sharded.Hash('hash_1')['value'], '1')
+
+    def _moving_key(self):
+        """
+        添加一个节点，返回一个会迁移到新节点的key、源节点和新节点
+        """
+        for idx in range(100):
+            self.sharded.Hash('hash_%s' % idx)['value'] = idx
+        name = self.sharded._add_node({'db': self.dbs[3]})
+        cache_key = next(key for key in ('hash_%s' % idx for idx in range(100))
+                         if self.sharded.get_node_name(key) == name)
+        source = next(node for node in self.sharded.nodes.values() if node.exists(cache_key))
+        return cache_key, source, self.sharded.nodes[name]
+
+    def test_migrate_write(self):
+        """
+        测试迁移期间源节点上的写入不会丢失
+        """
+        cache_key, source, target = self._moving_key()
+        evalsha = target.evalsha
+        writes = []
+
+        def write_then_restore(*args):
+            # 第一次复制之前，其他客户端修改了源节点上的key
+            if not writes:
+                writes.append(source.hset(cache_key, 'other', 1))
+            return evalsha(*args)
+
+        with mock.patch.object(target, 'evalsha', side_effect=write_then_restore):
+            self.assertTrue(self.sharded.rebalance() > 0)
+        self.assertEqual(writes, [1])
+        self.assertFalse(source.exists(cache_key))
+        self.assertEqual(self.sharded.Hash(cache_key).data(), {'value': cache_key[5:], 'other': '1'})
+
+    def test_migrate_new_write(self):
+        """
+        测试迁移期间新节点上的写入不会被源节点上的旧值覆盖
+        """
+        cache_key, source, target = self._moving_key()
+        evalsha = target.evalsha
+        writes = []
+
+        def write_then_restore(*args):
+            # 哈希环已经指向新节点，复制之前其他客户端写入了新节点
+            if not writes:
+                writes.append(self.sharded.Hash(cache_key).database.hset(cache_key, 'value', 'new'))
+            return evalsha(*args)
+
+        with mock.patch.object(target, 'evalsha', side_effect=write_then_restore):
+            self.sharded.rebalance()
+        self.assertEqual(writes, [1])
+        self.assertFalse(source.exists(cache_key))
+        self.assertEqual(self.sharded.Hash(cache_key).data(), {'value': 'new'})
+
+    def test_cross_node(self):
+        """
+        测试多个key的操作不在同一个节点时抛出异常
+        """
+        keys = ['set_%s' % idx for idx in range(30)]
+        first = keys[0]
+        other = next(key for key in keys if self.sharded.get_node_name(key) != self.sharded.get_node_name(first))
+        set1, set2 = self.sharded.Set(first), self.sharded.Set(other)
+        set1.update({1, 2})
+        set2.update({2, 3})
+        for func in (set1.union, set1.intersection, set1.difference, set1.lazy_union, set1.union_count):
+            self.assertRaises(TypeException, func, set2)
+        self.assertRaises(TypeException, set1.union_store, first, set2)
+        self.assertRaises(TypeException, set1.update, set2)
+        self.assertRaises(TypeException, set1.union_store, other, set1)
+        sorted_set1 = self.sharded.SortedSet(first)
+        self.assertRaises(TypeException, sorted_set1.union_store, other)
+        self.assertRaises(TypeException, sorted_set1.intersection_store, other)
+        self.assertEqual(set1.union(self.sharded.Set(first)), {'1', '2'})
@@ -0,0 +1,20 @@
+# -*- coding: UTF-8 -*-
+import hashlib
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def hash_key(value):
+    """
+    非加密的快速哈希，安装了xxhash时使用xxh3_128
+    :param value: bytes
+    :return:
+    """
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(value)
+    if hasattr(hashlib, 'blake2b'):
+        return hashlib.blake2b(value, digest_size=16).hexdigest()
+    return hashlib.md5(value).hexdigest()
@@ -9,7 +9,13 @@ setup(
     description="redis wrapper",
     author="georgewang",
     author_email="georgewang1994@163.com",
-    install_requires=['redis>=3.0.0', 'simplejson'],
+    python_requires='>=3.6',
+    install_requires=['redis>=4.2.0'],
+    extras_require={
+        'simplejson': ['simplejson'],
+        'msgpack': ['msgpack'],
+        'xxhash': ['xxhash'],
+    },
     url='https://github.com/GeorgeWang1994/MRedis',
     packages=find_packages(),
     license='MIT',
@@ -19,12 +25,14 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 2',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3 :: Only',
         'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
     keywords='redis client python',
     test_suite='mredis.tests',